@@ -1,19 +1,20 @@
 # Standard imports
 import json
-from functools import reduce
-from operator import concat
 from os import environ
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Literal
 from dyntastic import A
 from fastapi import HTTPException, Query
 from fastapi_tools import QueryPagination
 
 # Local imports
 from ....events.events import put_fastq_set_update_event
+from ....hydration import batch_get_data_map
+from ....index_query import IndexQuery, query_index_ids, query_index_items
 from ....models import ReferenceGenome
 from ....models.fastq import FastqData
 from ....models.fastq_set import FastqSetData, FastqSetCreate
 from ....models.library import LibraryData
+from ....transactions import save_if_unchanged, delete_if_unchanged
 
 from ....models.job import JobResponse, JobCreate, JobData, JobType
 from ....models import FastqSetJobType
@@ -61,6 +62,63 @@ def fastq_set_create_obj_to_fastq_set_data_obj(fastq_create_obj: FastqSetCreate)
 
 
 
+def get_latest_fastq_set_id(library_orcabus_id: str, excluded_fastq_set_id: Optional[str] = None) -> Optional[str]:
+    """
+    Get the fastq set of the library with the most recent instrument run id,
+    from a single library summary index query (the latest instrument run id of each fastq set is projected into it).
+    Fastq sets written before the latest instrument run id was kept are read (along with their fastqs) instead.
+    :param library_orcabus_id:
+    :param excluded_fastq_set_id: i.e a fastq set deleted within the current transaction (the index does not see the delete)
+    :return: None if the library has no (other) fastq sets
+    """
+    library_fastq_set_items = list(filter(
+        lambda fastq_set_item_iter_: fastq_set_item_iter_['id'] != excluded_fastq_set_id,
+        query_index_items(
+            FastqSetData.__table_name__,
+            IndexQuery(
+                index_name="library_orcabus_id_summary-index",
+                key_attr="library_orcabus_id",
+                key_values=[library_orcabus_id],
+                filter_condition=None,
+            ),
+            attributes=['id', 'latest_instrument_run_id']
+        )
+    ))
+
+    if len(library_fastq_set_items) == 0:
+        return None
+
+    # Fill in the latest instrument run id of older fastq sets
+    unsummarised_fastq_set_objs = list(batch_get_data_map(
+        FastqSetData,
+        map(
+            lambda fastq_set_item_iter_: fastq_set_item_iter_['id'],
+            filter(
+                lambda fastq_set_item_iter_: fastq_set_item_iter_.get('latest_instrument_run_id') is None,
+                library_fastq_set_items
+            )
+        )
+    ).values())
+    if len(unsummarised_fastq_set_objs) > 0:
+        fastq_data_map = FastqSetData.get_fastq_data_map(unsummarised_fastq_set_objs)
+        for fastq_set_obj in unsummarised_fastq_set_objs:
+            fastq_set_obj.update_fastq_summary(fastq_data_map)
+    latest_instrument_run_id_map = dict(map(
+        lambda fastq_set_obj_iter_: (fastq_set_obj_iter_.id, fastq_set_obj_iter_.latest_instrument_run_id),
+        unsummarised_fastq_set_objs
+    ))
+
+    # The first fastq set with the most recent instrument run id
+    return max(
+        library_fastq_set_items,
+        key=lambda fastq_set_item_iter_: (
+            fastq_set_item_iter_.get('latest_instrument_run_id') or
+            latest_instrument_run_id_map.get(fastq_set_item_iter_['id']) or
+            ""
+        )
+    )['id']
+
+
 # Unlink a fastq set from a file cleanup
 def unlink_with_cleanup(fastq_set_obj: FastqSetData, fastq_obj: FastqData):
     """
@@ -76,13 +134,16 @@ def unlink_with_cleanup(fastq_set_obj: FastqSetData, fastq_obj: FastqData):
     * If the fastq set was the 'current' fastq set, setting the 'current fastq set' to true for another set of the same library
         * Ideally one with the most recent instrument run id
 
+    Call within a write transaction, so the unlink and its cleanup are committed together,
+    and fail (rather than overwrite) if the fastq or fastq sets were changed since they were read.
+
     :param fastq_set_obj:
     :param fastq_obj:
     :return:
     """
     # Save the fastq list row object (the easy bit)
     fastq_obj.fastq_set_id = None
-    fastq_obj.save()
+    save_if_unchanged(fastq_obj)
 
     # Remove the fastq list row from the fastq set
     fastq_set_obj.fastq_set_ids = list(filter(
@@ -93,11 +154,12 @@ def unlink_with_cleanup(fastq_set_obj: FastqSetData, fastq_obj: FastqData):
     # Check if the fastq set is empty
     if len(fastq_set_obj.fastq_set_ids) == 0:
         # Delete the fastq set if it is empty
-        fastq_set_obj.delete()
+        delete_if_unchanged(fastq_set_obj)
 
         put_fastq_set_update_event(
             fastq_set_response_object={"fastqSetId": fastq_set_obj.id},
-            event_status='FASTQ_SET_DELETED'
+            event_status='FASTQ_SET_DELETED',
+            fastq_set_obj=fastq_set_obj
         )
 
         if not fastq_set_obj.is_current_fastq_set:
@@ -107,63 +169,25 @@ def unlink_with_cleanup(fastq_set_obj: FastqSetData, fastq_obj: FastqData):
         # If there are other fastq sets for this library,
         # make the one with the most recent instrument run id
         # The current fastq set
-        available_fastq_sets = list(FastqSetData.query(
-            A.library_orcabus_id == fastq_obj.library_orcabus_id,
-            index="library_orcabus_id-index",
-            load_full_item=True
-        ))
-
-        # If there is only one fastq set, make it the current fastq set
-        if len(available_fastq_sets) == 1:
-            available_fastq_sets[0].is_current_fastq_set = True
-            available_fastq_sets[0].save()
-
-            put_fastq_set_update_event(
-                fastq_set_response_object=available_fastq_sets[0].to_dict(),
-                event_status='FASTQ_SET_IS_CURRENT'
-            )
+        latest_fastq_set_id = get_latest_fastq_set_id(fastq_obj.library_orcabus_id, fastq_set_obj.id)
+        if latest_fastq_set_id is None:
+            # No other fastq sets in the library
+            return
 
-        # Find all instrument run ids
-        elif len(available_fastq_sets) > 1:
-            all_instrument_run_ids = list(set(list(reduce(
-                concat,
-                # Iterate over each of the fastq sets
-                list(map(
-                    # Iterate over each of the fastq list rows in the fastq set
-                    lambda fastq_set_iter_: (
-                        # Get the instrument run id for the given fastq list rows
-                        list(map(
-                            lambda fastq_iter_: FastqData.get(fastq_iter_).instrument_run_id,
-                            fastq_set_iter_.fastq_set_ids
-                        ))
-                    ),
-                    available_fastq_sets
-                ))
-            ))))
-
-            # Get the most recent instrument run id
-            most_recent_instrument_run_id = max(all_instrument_run_ids)
-
-            # Set the fastq set with the most recent instrument run id as the current fastq set
-            for fastq_set_iter in available_fastq_sets:
-                instrument_run_id_in_set = list(map(
-                    lambda fastq_iter: FastqData.get(fastq_iter).instrument_run_id,
-                    fastq_set_iter.fastq_set_ids
-                ))
-                if most_recent_instrument_run_id in instrument_run_id_in_set:
-                    fastq_set_iter.is_current_fastq_set = True
-                    fastq_set_iter.save()
-                    put_fastq_set_update_event(
-                        fastq_set_response_object=fastq_set_iter.to_dict(),
-                        event_status='FASTQ_SET_IS_CURRENT'
-                    )
-                    break
+        latest_fastq_set_obj = FastqSetData.get(latest_fastq_set_id)
+        latest_fastq_set_obj.is_current_fastq_set = True
+        save_if_unchanged(latest_fastq_set_obj)
+        put_fastq_set_update_event(
+            event_status='FASTQ_SET_IS_CURRENT',
+            fastq_set_obj=latest_fastq_set_obj
+        )
     else:
         # Initial save, few cases where we are going to just return
-        fastq_set_obj.save()
+        fastq_set_obj.update_fastq_summary()
+        save_if_unchanged(fastq_set_obj)
         put_fastq_set_update_event(
-            fastq_set_response_object=fastq_set_obj.to_dict(),
-            event_status='FASTQ_UNLINKED'
+            event_status='FASTQ_UNLINKED',
+            fastq_set_obj=fastq_set_obj
         )
 
 
@@ -177,21 +201,21 @@ def run_and_save_fastq_job(fastq_id: str, job_type: JobType) -> JobResponse:
     except AssertionError as e:
         raise HTTPException(status_code=409, detail=str(e))
 
-    existing_jobs = list(
-        JobData.query(
-            A.fastq_id == fastq.id,
-            filter_condition=(
-                ( A.job_type == job_type ) &
-                ( A.status.is_in(['PENDING', 'RUNNING']))
-            ),
-            index="fastq_id-index",
-            load_full_item=True
-        )
+    # Job type and status are projected into the index, so we only need the ids
+    existing_job_ids = query_index_ids(
+        JobData.__table_name__,
+        index_name="fastq_id-index",
+        key_attr="fastq_id",
+        key_value=fastq.id,
+        filter_condition=(
+            ( A.job_type == job_type ) &
+            ( A.status.is_in(['PENDING', 'RUNNING']))
+        ),
     )
-    if len(existing_jobs) > 0:
+    if len(existing_job_ids) > 0:
         raise HTTPException(
             status_code=218,
-            detail=f"A job already exists for this job in the PENDING or RUNNING state, please wait for it to finish. See '{existing_jobs[0].id}'"
+            detail=f"A job already exists for this job in the PENDING or RUNNING state, please wait for it to finish. See '{existing_job_ids[0]}'"
         )
 
     # Create the job
@@ -303,8 +327,8 @@ def run_and_save_fastq_set_job(
                 (A.job_type == job_type) &
                 (A.status.is_in(['PENDING', 'RUNNING']))
             ),
+            # All job attributes are projected into the index, so we don't need to read the base table
             index="fastq_set_id-index",
-            load_full_item=True
         )
     )
 
@@ -352,3 +376,44 @@ def get_pagination_params(
     rows_per_page: int = Query(100, gt=1, alias='rowsPerPage')
 ) -> QueryPagination:
     return {"page": page, "rowsPerPage": rows_per_page}
+
+
+def get_next_token(
+    # Set nextToken (an empty string for the first page) to use cursor based pagination
+    next_token: Optional[str] = Query(
+        None,
+        alias='nextToken',
+        description=(
+            "Use cursor based pagination rather than page based pagination. "
+            "Set to an empty string for the first page, then to the nextToken of the previous response."
+        )
+    )
+) -> Optional[str]:
+    return next_token
+
+
+def get_fields(
+    # Sparse fieldsets, i.e 'id,lane,library.libraryId'
+    fields: Optional[str] = Query(
+        None,
+        description=(
+            "Comma separated list of (camel case) fields to return, use '.' to select nested fields, "
+            "i.e 'id,lane,library.libraryId'. All fields are returned if not set."
+        )
+    )
+) -> Optional[str]:
+    return fields
+
+
+def get_response_format(
+    # Stream the results as newline delimited json
+    response_format: Literal['json', 'ndjson'] = Query(
+        'json',
+        alias='format',
+        description=(
+            "Set to 'ndjson' to stream every matching row as newline delimited json, one object per line. "
+            "Pagination parameters are ignored in this mode."
+        )
+    )
+) -> Literal['json', 'ndjson']:
+    return response_format
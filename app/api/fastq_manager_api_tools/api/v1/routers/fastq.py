@@ -6,9 +6,12 @@ Routes for the API V1 Fastq endpoint
 This is the list of routes available
 - GET /fastq  (requires at least one of index, lane, library_id or instrument_run_id)
 - POST /fastq  Create a fastq
+- POST /fastq:bulkImport  Create every fastq on an instrument run (from a fastq_list.csv or a list of fastqs)
 - GET /fastq/{fastq_id}
 - GET /fastq/{fastq_id}/toFastqListRow
+- GET /fastq:toFastqListRows  (fastq list rows for an instrument run, fastq sets or libraries, as json, ndjson or csv)
 - GET /fastq/{fastq_id}/presign
+- POST /fastq:presign  (presign the read sets of a list of fastqs and / or an instrument run)
 
 # Workflow based updates
 - PATCH /fastq/{fastq_id}:runQcStats
@@ -25,35 +28,57 @@ This is the list of routes available
 - PATCH /fastq/{fastq_id}/validate
 - PATCH /fastq/{fastq_id}/addFastqPairStorageObject
 - PATCH /fastq/{fastq_id}/detachFastqPairStorageObject
+- PATCH /fastq:bulkUpdate  Apply qc, read count, file compression, ntsm or validity updates to many fastqs at once
 - DELETE /fastq/{fastq_id}
 
 """
 # Standard imports
-from operator import concat
+import json
 from textwrap import dedent
-from typing import Optional, Dict, Annotated
-from fastapi import Depends, Query
+from typing import Optional, Dict, Annotated, List, Union, Literal, Any, Callable
+from fastapi import Body, Depends, Query, Request, Response
 from fastapi.routing import APIRouter, HTTPException
+from boto3.dynamodb.conditions import ConditionBase
 from dyntastic import A, DoesNotExist
-from functools import reduce
 from itertools import product
+from pydantic import ValidationError
 
 # Import from orcabus layers
 from fastapi_tools import QueryPagination
 from orcabus_api_tools.filemanager.errors import S3FileNotFoundError
-from orcabus_api_tools.metadata import (
-    get_library_orcabus_id_from_library_id
-)
 
 # Local imports
-from . import run_and_save_fastq_job, get_pagination_params
+from . import run_and_save_fastq_job, get_pagination_params, get_next_token, get_fields, get_response_format
+from ....bulk_import import bulk_import_fastqs, fastq_list_csv_to_fastq_create_dicts, FastqBulkImportError
+from ....bulk_update import bulk_update_fastqs
+from ....metadata_cache import get_library_orcabus_ids_from_library_ids
 from ....events.events import put_fastq_update_event
+from ....events.outbox import outbox_transaction
+from ....fieldsets import parse_fields, sparse_response
+from ....responses import json_response
+from ....hydration import batch_get_data_map
+from ....globals import (
+    QUERY_PLAN_HEADER, FASTQ_LIST_CSV_COLUMNS, FASTQ_LIST_CSV_FILE_NAME, CSV_MEDIA_TYPE,
+    FastqStateChangeStatusEventsType
+)
+from ....index_query import query_index_items, query_index_page, query_index_ids, iter_index_items
+from ....pagination import decode_next_token, get_page_slice, query_paginated_response_from_page
+from ....planner import (
+    FastqQueryPredicate, QueryPlan, plan_fastq_query, get_plan_predicate, query_plan_to_str
+)
+from ....presign import presign_fastq_list
+from ....streaming import ndjson_streaming_response, csv_streaming_response, iter_serialized_data
+from ....transactions import TransactionConflictError
+from ....versioned_update import update_with_retry, VersionConflictError
 
 # Model imports
-from ....models import FastqListRowDict, PresignedUrlModel, BoolQueryOptionsAnnotated
+from ....models import FastqListRowDict, PresignedUrlModel, FastqPresignedUrlModel, BoolQueryOptionsAnnotated
+from ....models.bulk_import import FastqBulkImportResponseDict
+from ....models.bulk_update import FastqBulkUpdateResponseDict
 from ....models.fastq import (
-    FastqData, FastqCreate,
-    FastqListResponse, FastqQueryPaginatedResponse, FastqResponseDict
+    FastqData, FastqCreate, FastqMissingReadSetError,
+    FastqListResponse, FastqQueryPaginatedResponse, FastqCursorPaginatedResponse, FastqResponseDict,
+    FastqSparseQueryPaginatedResponse, FastqSparseCursorPaginatedResponse
 )
 from ....models.fastq_pair import FastqPairStorageObjectPatch, FastqPairStorageObjectData
 from ....models.fastq_set import FastqSetData
@@ -61,17 +86,112 @@ from ....models.file_compression_info import FileCompressionInfoPatch, FileCompr
 from ....models.job import JobData, JobResponse, JobQueryPaginatedResponse
 from ....models.library import LibraryData, LibraryPatch
 from ....models.ntsm import NtsmUriUpdate, NtsmUriData
+from ....models.presign import FastqPresignRequest
 from ....models.qc import QcInformationPatch, QcInformationData
 from ....models.query import LabMetadataQueryParameters, InstrumentQueryParameters, FastqSetIdQueryParameters
 from ....models.read_count_info import ReadCountInfoPatch, ReadCountInfoData
 from ....utils import (
-    is_orcabus_ulid,
     sanitise_fqr_orcabus_id
 )
 
 router = APIRouter()
 
 
+def get_fastq_query_plan(
+        lab_metadata_query_parameters: LabMetadataQueryParameters,
+        instrument_query_parameters: InstrumentQueryParameters,
+        fastq_set_query_parameters: FastqSetIdQueryParameters,
+        filter_expression: Optional[ConditionBase] = None,
+) -> QueryPlan:
+    """
+    Collect a predicate for each of the query parameters set, and plan the fastq query
+    :param lab_metadata_query_parameters:
+    :param instrument_query_parameters:
+    :param fastq_set_query_parameters:
+    :param filter_expression: i.e is_valid == True
+    :raises HTTPException: if none of fastqSetId, libraryId or instrumentRunId are set
+    :return:
+    """
+    # Set library list for lab metadata query
+    lab_metadata_query_parameters.set_library_list_from_query()
+
+    # Check if all the parameters are None
+    if all(map(lambda x: x is None, [
+        fastq_set_query_parameters.fastq_set_id_list,
+        lab_metadata_query_parameters.library_list,
+        instrument_query_parameters.instrument_run_id_list
+    ])):
+        raise HTTPException(
+            status_code=400,
+            detail="At least one of fastqSetId, libraryId or instrumentRunId is required"
+        )
+
+    # Collect a predicate for each of the indexes we could query
+    # The query planner will then pick the cheapest index to query, and apply the rest as filters
+    predicates: List[FastqQueryPredicate] = []
+
+    # We can generate rgids given the index and lane
+    if instrument_query_parameters.index_list is not None and instrument_query_parameters.lane_list is not None:
+        # Generate the rgid from the index and lane
+        # Note that this cross product of indexes and lanes
+        # BUT we can query the rgid_ext directly
+        rgid_ext_list = list(map(
+            lambda rgid_iter_: ".".join(map(str, rgid_iter_)),
+            list(product(
+                instrument_query_parameters.index_list,
+                instrument_query_parameters.lane_list,
+                instrument_query_parameters.instrument_run_id_list
+            ))
+        ))
+        predicates.append(FastqQueryPredicate(
+            key_attr="rgid_ext",
+            key_values=rgid_ext_list,
+            attr_filters={},
+        ))
+    elif instrument_query_parameters.index_list is not None:
+        # We can use a filter expression to query the index
+        predicates.append(FastqQueryPredicate(
+            key_attr="instrument_run_id",
+            key_values=instrument_query_parameters.instrument_run_id_list,
+            attr_filters={"index": instrument_query_parameters.index_list},
+        ))
+    elif instrument_query_parameters.lane_list is not None:
+        # We can use a filter expression to query the lane
+        predicates.append(FastqQueryPredicate(
+            key_attr="instrument_run_id",
+            key_values=instrument_query_parameters.instrument_run_id_list,
+            attr_filters={"lane": instrument_query_parameters.lane_list},
+        ))
+    elif instrument_query_parameters.instrument_run_id_list is not None:
+        predicates.append(FastqQueryPredicate(
+            key_attr="instrument_run_id",
+            key_values=instrument_query_parameters.instrument_run_id_list,
+            attr_filters={},
+        ))
+
+    # Set library list query
+    if lab_metadata_query_parameters.library_list is not None:
+        # Resolve library ids concurrently (and cached)
+        library_orcabus_ids = get_library_orcabus_ids_from_library_ids(
+            lab_metadata_query_parameters.library_list
+        )
+        predicates.append(FastqQueryPredicate(
+            key_attr="library_orcabus_id",
+            key_values=library_orcabus_ids,
+            attr_filters={},
+        ))
+
+    if fastq_set_query_parameters.fastq_set_id_list is not None:
+        predicates.append(FastqQueryPredicate(
+            key_attr="fastq_set_id",
+            key_values=fastq_set_query_parameters.fastq_set_id_list,
+            attr_filters={},
+        ))
+
+    # Plan the query
+    return plan_fastq_query(predicates, filter_expression)
+
+
 ## Query options
 @router.get(
     "", tags=["fastq query"],
@@ -96,10 +216,20 @@ This means you cannot<br>
 
 You may query multiple instrumentRunIds and metadata attributes using the <code>[]</code> syntax.<br>
 
-For example, to query multiple libraries, use <code>library[]=L12345&library[]=L123456</code>
+For example, to query multiple libraries, use <code>library[]=L12345&library[]=L123456</code><br>
+
+For large queries, use cursor based pagination by setting <code>nextToken=</code> (empty) on the first request,
+then passing the <code>nextToken</code> from each response to get the next page.
+Only the requested page is read from the database.
+
+Use <code>fields</code> to only return a subset of each fastq, i.e <code>fields=id,lane,library.libraryId</code>
+
+For exports, set <code>format=ndjson</code> to stream every matching fastq as newline delimited json.
 """)
 )
-async def list_fastq(
+def list_fastq(
+        # Response, used to set the query plan header
+        response: Response,
         # Lab metadata options
         lab_metadata_query_parameters: LabMetadataQueryParameters = Depends(),
         # Instrument query options
@@ -117,236 +247,268 @@ async def list_fastq(
         ),
         # Pagination
         pagination: QueryPagination = Depends(get_pagination_params),
-) -> FastqQueryPaginatedResponse:
+        next_token: Optional[str] = Depends(get_next_token),
+        # Sparse fieldsets
+        fields: Optional[str] = Depends(get_fields),
+        # Streaming
+        response_format: Literal['json', 'ndjson'] = Depends(get_response_format),
+) -> Union[FastqQueryPaginatedResponse, FastqCursorPaginatedResponse]:
+    # Validate the fields before we run any queries
+    field_tree = parse_fields(fields, FastqResponseDict)
+
     # Check boolean parameters
     if valid == 'ALL':
         filter_expression = None
     else:
         filter_expression = A.is_valid == valid
 
-    # Set library list for lab metadata query
-    lab_metadata_query_parameters.set_library_list_from_query()
-
-    # Check if all the parameters are None
-    if all(map(lambda x: x is None, [
-        fastq_set_query_parameters.fastq_set_id_list,
-        lab_metadata_query_parameters.library_list,
-        instrument_query_parameters.instrument_run_id_list
-    ])):
-        raise HTTPException(
-            status_code=400,
-            detail="At least one of fastqSetId, libraryId or instrumentRunId is required"
-        )
-
-    # If not, use index queries for each the fastqs and provide an intersection of the results.
-    query_lists = []
-
-    # We can generate rgids given the index and lane
-    if instrument_query_parameters.index_list is not None and instrument_query_parameters.lane_list is not None:
-        # Generate the rgid from the index and lane
-        # Note that this cross product of indexes and lanes
-        # BUT we can query the rgid_ext directly
-        rgid_ext_list = list(map(
-            lambda rgid_iter_: ".".join(map(str, rgid_iter_)),
-            list(product(
-                instrument_query_parameters.index_list,
-                instrument_query_parameters.lane_list,
-                instrument_query_parameters.instrument_run_id_list
-            ))
-        ))
-        query_lists.append(
-            list(reduce(
-                concat,
-                list(map(
-                    lambda rgid_ext_iter_: (
-                        list(FastqData.query(
-                            A.rgid_ext == rgid_ext_iter_,
-                            filter_condition=filter_expression,
-                            index="rgid_ext-index",
-                            load_full_item=True
-                        ))
-                    ),
-                    rgid_ext_list
-                ))
-            ))
-        )
-    elif instrument_query_parameters.index_list is not None:
-        # We can use a filter expression to query the index
-        filter_expression = filter_expression & A.index.is_in(instrument_query_parameters.index_list)
-        query_lists.append(
-            list(reduce(
-                concat,
-                list(map(
-                    lambda instrument_run_id_iter_: (
-                        list(FastqData.query(
-                            A.instrument_run_id == instrument_run_id_iter_,
-                            filter_condition=filter_expression,
-                            index="instrument_run_id-index",
-                            load_full_item=True
-                        ))
-                    ),
-                    instrument_query_parameters.instrument_run_id_list
-                ))
-            ))
-        )
-    elif instrument_query_parameters.lane_list is not None:
-        # We can use a filter expression to query the lane
-        query_lists.append(
-            list(reduce(
-                concat,
-                list(map(
-                    lambda instrument_run_id_iter_: (
-                        list(FastqData.query(
-                            A.instrument_run_id == instrument_run_id_iter_,
-                            filter_condition=(filter_expression & A.lane.is_in(instrument_query_parameters.lane_list)),
-                            index="instrument_run_id-index",
-                            load_full_item=True
-                        ))
-                    ),
-                    instrument_query_parameters.instrument_run_id_list
-                ))
-            ))
-        )
-    elif instrument_query_parameters.instrument_run_id_list is not None:
-        query_lists.append(
-            list(reduce(
-                concat,
-                list(map(
-                    lambda instrument_run_id_iter_: (
-                        list(FastqData.query(
-                            A.instrument_run_id == instrument_run_id_iter_,
-                            filter_condition=filter_expression,
-                            index="instrument_run_id-index",
-                            load_full_item=True
-                        ))
-                    ),
-                    instrument_query_parameters.instrument_run_id_list
-                ))
-            ))
-        )
-
-    # Set library list query
-    if lab_metadata_query_parameters.library_list is not None:
-        library_orcabus_ids = list(map(
-            lambda library_id_iter_: (
-                library_id_iter_ if is_orcabus_ulid(library_id_iter_)
-                else get_library_orcabus_id_from_library_id(library_id_iter_)
+    # Plan the query, and report the plan in the response headers
+    query_plan = get_fastq_query_plan(
+        lab_metadata_query_parameters,
+        instrument_query_parameters,
+        fastq_set_query_parameters,
+        filter_expression
+    )
+    response.headers[QUERY_PLAN_HEADER] = query_plan_to_str(query_plan)
+    plan_predicate = get_plan_predicate(FastqData.__table_name__, query_plan)
+
+    params_response = dict(filter(
+        lambda kv: kv[1] is not None,
+        dict(
+            **lab_metadata_query_parameters.to_params_dict(),
+            **instrument_query_parameters.to_params_dict(),
+            **fastq_set_query_parameters.to_params_dict(),
+            **{
+                "valid": valid,
+            },
+            **{
+                "includeS3Details": include_s3_details,
+            },
+            **{
+                "fields": fields,
+            },
+            **pagination
+        ).items()
+    ))
+
+    # Stream the driving index query, loading and serializing the fastqs in chunks as they are read
+    if response_format == 'ndjson':
+        return ndjson_streaming_response(iter_serialized_data(
+            FastqData,
+            map(
+                lambda item_iter_: item_iter_['id'],
+                filter(
+                    plan_predicate,
+                    iter_index_items(
+                        FastqData.__table_name__,
+                        query_plan['index_query'],
+                        attributes=query_plan['attributes']
+                    )
+                )
             ),
-            lab_metadata_query_parameters.library_list
+            serialize_chunk=lambda fastq_list_iter_: FastqListResponse(
+                fastq_list=fastq_list_iter_,
+                include_s3_details=include_s3_details,
+                fields=field_tree
+            ).model_dump(by_alias=True)
         ))
 
-        query_lists.append(
-            # Need to flatten list, might be multiple queries
-            list(reduce(
-                concat,
-                list(map(
-                    lambda library_orcabus_id_iter_: (
-                        list(FastqData.query(
-                            A.library_orcabus_id == library_orcabus_id_iter_,
-                            filter_condition=filter_expression,
-                            index="library_orcabus_id-index",
-                            load_full_item=True
-                        ))
-                    ),
-                    library_orcabus_ids
-                ))
-            ))
+    # Cursor based pagination, page through the driving index query
+    # and only read and serialize the fastqs in this page
+    if next_token is not None:
+        page_items, next_cursor = query_index_page(
+            FastqData.__table_name__,
+            query_plan['index_query'],
+            rows_per_page=pagination['rowsPerPage'],
+            cursor=decode_next_token(next_token, params_response),
+            attributes=query_plan['attributes'],
+            predicate=plan_predicate
         )
 
-    if fastq_set_query_parameters.fastq_set_id_list is not None:
-        query_lists.append(
-            # Need to flatten list, might be multiple queries here
-            list(reduce(
-                concat,
-                list(map(
-                    lambda fastq_set_id_iter: (
-                        list(FastqData.query(
-                            A.fastq_set_id == fastq_set_id_iter,
-                            filter_condition=filter_expression,
-                            index="fastq_set_id-index",
-                            load_full_item=True
-                        ))
-                    ),
-                    fastq_set_query_parameters.fastq_set_id_list
-                ))
-            ))
+        fastq_data_map = batch_get_data_map(
+            FastqData,
+            map(lambda item_iter_: item_iter_['id'], page_items)
         )
 
-    # Get the intersection of the query lists
-    if len(query_lists) == 1:
-        return FastqQueryPaginatedResponse.from_results_list(
+        if field_tree is not None:
+            return sparse_response(FastqSparseCursorPaginatedResponse.from_results_page(
+                results=FastqListResponse(
+                    fastq_list=list(fastq_data_map.values()),
+                    include_s3_details=include_s3_details,
+                    fields=field_tree
+                ).model_dump(by_alias=True),
+                rows_per_page=pagination['rowsPerPage'],
+                next_cursor=next_cursor,
+                params_response=params_response,
+            ))
+
+        return FastqCursorPaginatedResponse.from_results_page(
             results=FastqListResponse(
-                fastq_list=list(map(
-                    lambda fqlr_iter_: fqlr_iter_.to_dict(),
-                    query_lists[0]
-                )),
+                fastq_list=list(fastq_data_map.values()),
                 include_s3_details=include_s3_details
-            ).model_dump(),
-            query_pagination=pagination,
-            params_response=dict(filter(
-                lambda kv: kv[1] is not None,
-                dict(
-                    **lab_metadata_query_parameters.to_params_dict(),
-                    **instrument_query_parameters.to_params_dict(),
-                    **fastq_set_query_parameters.to_params_dict(),
-                    **{
-                        "valid": valid,
-                    },
-                    **{
-                        "includeS3Details": include_s3_details,
-                    },
-                    **pagination
-                ).items()
-            )),
+            ).model_dump(by_alias=True),
+            rows_per_page=pagination['rowsPerPage'],
+            next_cursor=next_cursor,
+            params_response=params_response,
         )
 
-    # Else query list is greater than one
-    # Bind on the id
-    fqr_orcabus_ids = set(map(lambda fqlr_iter_: fqlr_iter_.id, query_lists[0]))
-    # For each list reduce to the fqr orcabus that match the previous set
-    for query_list in query_lists[1:]:
-        fqr_orcabus_ids = fqr_orcabus_ids.intersection(
-            set(map(lambda fqlr_iter_: fqlr_iter_.id, query_list))
+    # Run the driving index query (index only) for the count,
+    # then only load and serialize the fastqs in the requested page (unique, but maintain order)
+    fastq_ids = list(dict.fromkeys(map(
+        lambda item_iter_: item_iter_['id'],
+        filter(
+            plan_predicate,
+            query_index_items(
+                FastqData.__table_name__,
+                query_plan['index_query'],
+                attributes=query_plan['attributes']
+            )
         )
+    )))
+
+    fastq_data_map = batch_get_data_map(
+        FastqData,
+        get_page_slice(fastq_ids, pagination)
+    )
+
+    if field_tree is not None:
+        return sparse_response(query_paginated_response_from_page(
+            FastqSparseQueryPaginatedResponse,
+            results=FastqListResponse(
+                fastq_list=list(fastq_data_map.values()),
+                include_s3_details=include_s3_details,
+                fields=field_tree
+            ).model_dump(by_alias=True),
+            count=len(fastq_ids),
+            query_pagination=pagination,
+            params_response=params_response,
+        ))
 
-    # Now we have our fqr_orcabus_ids, we can get the FastqListRow objects
-    return FastqQueryPaginatedResponse.from_results_list(
+    return query_paginated_response_from_page(
+        FastqQueryPaginatedResponse,
         results=FastqListResponse(
-            fastq_list=list(map(
-                lambda fqlr_iter_: fqlr_iter_.to_dict(),
-                filter(
-                    lambda fq_iter_: fq_iter_.id in fqr_orcabus_ids,
-                    query_lists[0]
-                )
-            )),
+            fastq_list=list(fastq_data_map.values()),
             include_s3_details=include_s3_details
         ).model_dump(by_alias=True),
+        count=len(fastq_ids),
         query_pagination=pagination,
-        params_response=dict(filter(
-            lambda kv: kv[1] is not None,
-            dict(
-                **lab_metadata_query_parameters.to_params_dict(),
-                **instrument_query_parameters.to_params_dict(),
-                **fastq_set_query_parameters.to_params_dict(),
-                **{
-                    "valid": valid,
-                },
-                **{
-                    "includeS3Details": include_s3_details,
-                },
-                **pagination
-            ).items()
-        )),
+        params_response=params_response,
     )
 
 
+@router.get(
+    ":toFastqListRows",
+    tags=["fastq workflow"],
+    description=dedent("""
+Return every matching fastq in fastq list row format, i.e to prepare a fastq list for a whole instrument run.<br>
+Specify any of instrumentRunId, fastqSetId or one of [library, sample, subject, individual, project],
+using the <code>[]</code> syntax to query multiple values.<br>
+
+The library metadata and s3 uris are resolved in batches, rather than one row at a time.<br>
+
+If any matching fastq has no read set, a 409 is returned listing the fastq ids, rather than an incomplete fastq list
+(with <code>format=ndjson</code>, the stream ends early instead).<br>
+
+Use <code>bucket</code> and <code>keyPrefix</code> to return the s3 uris under a given bucket / key prefix.<br>
+
+Set <code>format=csv</code> to return a fastq_list.csv (RGID,RGSM,RGLB,Lane,Read1File,Read2File),
+or <code>format=ndjson</code> to stream each row as newline delimited json as it is resolved.
+""")
+)
+def to_fastq_list_rows(
+        # Lab metadata options
+        lab_metadata_query_parameters: LabMetadataQueryParameters = Depends(),
+        # Instrument query options
+        instrument_query_parameters: InstrumentQueryParameters = Depends(),
+        # Fastq Set query options
+        fastq_set_query_parameters: FastqSetIdQueryParameters = Depends(),
+        # Filter query
+        valid: Annotated[BoolQueryOptionsAnnotated, Query()] = True,
+        bucket: Optional[str] = Query(
+            default=None,
+            description="If provided, return the s3-uris for the ingest ids that belong to this bucket"
+        ),
+        key_prefix: Optional[str] = Query(
+            default=None,
+            alias="keyPrefix",
+            description="If provided, return the s3-uris for the ingest ids that belong to this key prefix"
+        ),
+        response_format: Literal['json', 'ndjson', 'csv'] = Query(
+            'json',
+            alias='format',
+            description="One of 'json' (a list of fastq list rows), 'ndjson' or 'csv' (a fastq_list.csv)"
+        ),
+) -> List[FastqListRowDict]:
+    # Check boolean parameters
+    if valid == 'ALL':
+        filter_expression = None
+    else:
+        filter_expression = A.is_valid == valid
+
+    query_plan = get_fastq_query_plan(
+        lab_metadata_query_parameters,
+        instrument_query_parameters,
+        fastq_set_query_parameters,
+        filter_expression
+    )
+    plan_predicate = get_plan_predicate(FastqData.__table_name__, query_plan)
+
+    # Load the fastqs in chunks, and render each chunk of rows in batches
+    fastq_list_rows_iter = iter_serialized_data(
+        FastqData,
+        map(
+            lambda item_iter_: item_iter_['id'],
+            filter(
+                plan_predicate,
+                iter_index_items(
+                    FastqData.__table_name__,
+                    query_plan['index_query'],
+                    attributes=query_plan['attributes']
+                )
+            )
+        ),
+        serialize_chunk=lambda fastq_list_iter_: FastqData.to_fastq_list_rows(
+            fastq_list_iter_,
+            bucket=bucket,
+            key_prefix=key_prefix
+        )
+    )
+
+    if response_format == 'ndjson':
+        list_response = ndjson_streaming_response(fastq_list_rows_iter)
+        list_response.headers[QUERY_PLAN_HEADER] = query_plan_to_str(query_plan)
+        return list_response
+
+    # We render every row before we respond, so a missing file is an error rather than a truncated fastq list
+    try:
+        fastq_list_rows = list(fastq_list_rows_iter)
+    except S3FileNotFoundError:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Fastq objects cannot be found under the prefix s3://{bucket}/{key_prefix}"
+        )
+    except FastqMissingReadSetError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if response_format == 'csv':
+        list_response = csv_streaming_response(
+            fastq_list_rows,
+            columns=FASTQ_LIST_CSV_COLUMNS,
+            file_name=FASTQ_LIST_CSV_FILE_NAME
+        )
+    else:
+        list_response = json_response(fastq_list_rows)
+    list_response.headers[QUERY_PLAN_HEADER] = query_plan_to_str(query_plan)
+    return list_response
+
+
 # Get a fastq from orcabus id
 @router.get(
     "/{fastq_id}",
     tags=["fastq query"],
     description="Get a Fastq List Row Object by its orcabus id, 'fqr.' prefix is optional"
 )
-async def get_fastq(
+def get_fastq(
         fastq_id: str = Depends(sanitise_fqr_orcabus_id),
         # Include s3 uri - resolve the s3 uri if requested
         include_s3_details: Optional[bool] = Query(
@@ -354,14 +516,21 @@ async def get_fastq(
             alias="includeS3Details",
             description="Include the s3 details such as s3 uri and storage class, currently returns the most recent fastq file"
         ),
+        # Sparse fieldsets
+        fields: Optional[str] = Depends(get_fields),
 ) -> FastqResponseDict:
+    field_tree = parse_fields(fields, FastqResponseDict)
     try:
-        return FastqData.get(fastq_id).to_dict(
-            include_s3_details=include_s3_details
-        )
+        fastq_obj = FastqData.get(fastq_id)
     except DoesNotExist as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+    # Already serialized, return directly
+    return json_response(fastq_obj.to_dict(
+        include_s3_details=include_s3_details,
+        fields=field_tree
+    ))
+
 
 # Create a fastq object
 @router.post(
@@ -372,42 +541,131 @@ async def get_fastq(
     Please use the fastqSet endpoint if registering multiple fastqs simultaneously to reduce race conditions
     """)
 )
-async def create_fastq(fastq_obj: FastqCreate) -> FastqResponseDict:
+def create_fastq(fastq_obj: FastqCreate) -> FastqResponseDict:
     # First convert the CreateFastqListRow to a FastqListRow
     fastq_obj = FastqData(**dict(fastq_obj.model_dump(by_alias=True)))
 
     # # Check if the fastq already exists
     try:
-        assert len(list(FastqData.query(
-            A.rgid_ext == fastq_obj.rgid_ext,
-            index="rgid_ext-index",
-            load_full_item=True
-        ))) == 0, f"Fastq with index.lane.instrumentRunId '{fastq_obj.rgid_ext}' already exists"
+        assert len(query_index_ids(
+            FastqData.__table_name__,
+            index_name="rgid_ext-index",
+            key_attr="rgid_ext",
+            key_value=fastq_obj.rgid_ext,
+        )) == 0, f"Fastq with index.lane.instrumentRunId '{fastq_obj.rgid_ext}' already exists"
     except AssertionError as e:
         # Return a 409 Conflict if the fastq already exists
         raise HTTPException(status_code=409, detail=str(e))
 
-    # Save the fastq
-    fastq_obj.save()
-
-    # Write fastq dict
-    fastq_dict = fastq_obj.to_dict()
-    put_fastq_update_event(
-        fastq_response_object=fastq_dict,
-        event_status='FASTQ_CREATED'
-    )
+    # Commit the write along with its events
+    with outbox_transaction():
+        # Save the fastq
+        fastq_obj.save()
+
+        # Write fastq dict
+        fastq_dict = fastq_obj.to_dict()
+        put_fastq_update_event(
+            fastq_response_object=fastq_dict,
+            event_status='FASTQ_CREATED',
+            fastq_obj=fastq_obj
+        )
 
     # Return the fastq as a dictionary
     return fastq_dict
 
 
+async def get_bulk_import_body(request: Request) -> Dict[str, str]:
+    # The body is either a fastq_list.csv or a json list of fastqs, so we read it ourselves
+    return {
+        "contentType": request.headers.get("content-type", "application/json"),
+        "body": (await request.body()).decode(),
+    }
+
+
+# Create many fastq objects at once
+@router.post(
+    ":bulkImport",
+    tags=["fastq create"],
+    description=dedent("""
+Create every fastq on an instrument run at once.<br>
+The body is either a fastq_list.csv (<code>Content-Type: text/csv</code>, with the columns
+RGID,RGSM,RGLB,Lane,Read1File,Read2File, RGLB is the library id and the read files are s3 uris),
+in which case <code>instrumentRunId</code> is required, or a json list of fastq objects (as for POST /fastq).<br>
+
+Every existing fastq on the instrument run is read in a single index query,
+any fastq that already exists (or is listed twice) rejects the whole import with a 409,
+unless <code>skipExisting</code> is set, in which case existing fastqs are skipped.<br>
+
+Set <code>createFastqSets</code> to group the new fastqs into fastq sets, one per library.
+New fastqs are linked to a fastq set in the library that accepts additional fastqs,
+otherwise a new fastq set is created (the current fastq set, unless the library already has one).<br>
+
+Fastqs and fastq sets are written in batches, and their events are sent in batches.
+"""),
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/FastqCreate"}}},
+                CSV_MEDIA_TYPE: {"schema": {"type": "string"}},
+            }
+        }
+    }
+)
+def bulk_import_fastq(
+        bulk_import_body: Dict[str, str] = Depends(get_bulk_import_body),
+        instrument_run_id: Optional[str] = Query(
+            default=None,
+            alias="instrumentRunId",
+            description="The instrument run id of every fastq in the fastq_list.csv (required for a csv body)"
+        ),
+        skip_existing: Optional[bool] = Query(
+            default=False,
+            alias="skipExisting",
+            description="Skip fastqs that already exist, rather than rejecting the import"
+        ),
+        create_fastq_sets: Optional[bool] = Query(
+            default=False,
+            alias="createFastqSets",
+            description="Group the new fastqs into fastq sets, one per library"
+        ),
+) -> FastqBulkImportResponseDict:
+    try:
+        if bulk_import_body['contentType'].startswith(CSV_MEDIA_TYPE):
+            if instrument_run_id is None:
+                raise ValueError("instrumentRunId is required to import a fastq_list.csv")
+            fastq_create_dicts = fastq_list_csv_to_fastq_create_dicts(bulk_import_body['body'], instrument_run_id)
+        else:
+            fastq_create_dicts = json.loads(bulk_import_body['body'])
+            if not isinstance(fastq_create_dicts, list):
+                raise ValueError("Expected a json list of fastq objects")
+    except ValueError as e:
+        # Includes json decode errors
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if len(fastq_create_dicts) == 0:
+        raise HTTPException(status_code=400, detail="No fastqs to import")
+
+    try:
+        return json_response(bulk_import_fastqs(
+            fastq_create_dicts,
+            skip_existing=skip_existing,
+            create_fastq_sets=create_fastq_sets,
+        ))
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (FastqBulkImportError, TransactionConflictError) as e:
+        # Return a 409 Conflict if any of the fastqs already exist
+        raise HTTPException(status_code=409, detail=str(e))
+
+
 # MODIFIED GETS
 @router.get(
     "/{fastq_id}/toFastqListRow",
     tags=["fastq workflow"],
     description="Return in fastq list row format"
 )
-async def to_fastq_list_row(
+def to_fastq_list_row(
         fastq_id: str = Depends(sanitise_fqr_orcabus_id),
         bucket: Optional[str] = Query(
             default=None,
@@ -436,35 +694,25 @@ async def to_fastq_list_row(
     tags=["fastq update"],
     description="Update the library associated with a Fastq List Row Object"
 )
-async def update_library(
+def update_library(
         fastq_id: str = Depends(sanitise_fqr_orcabus_id),
         library_obj: LibraryPatch = Depends()
 ) -> FastqResponseDict:
-    fastq_obj = FastqData.get(fastq_id)
-
     library_obj = LibraryData(**dict(library_obj.model_dump(by_alias=True)))
 
-    if fastq_obj.fastq_set_id is not None:
-        raise HTTPException(
-            status_code=409,
-            detail="Cannot update library for a fastq that is part of a fastq set, please first unlink and then update library"
-        )
-
-    # Update the library object
-    fastq_obj.library = library_obj
-
-    # Save the fastq object
-    fastq_obj.save()
-
-    fastq_obj_dict = fastq_obj.to_dict()
+    def apply_update(fastq_obj: FastqData) -> List[str]:
+        if fastq_obj.fastq_set_id is not None:
+            raise HTTPException(
+                status_code=409,
+                detail="Cannot update library for a fastq that is part of a fastq set, please first unlink and then update library"
+            )
 
-    put_fastq_update_event(
-        fastq_response_object=fastq_obj_dict,
-        event_status='LIBRARY_UPDATED'
-    )
+        # Update the library object
+        fastq_obj.library = library_obj
+        # The library orcabus id is the key of the library index
+        return ["library", "library_orcabus_id"]
 
-    # Return the fastq to dictionary
-    return fastq_obj_dict
+    return update_fastq(fastq_id, apply_update, 'LIBRARY_UPDATED')
 
 
 @router.get(
@@ -472,16 +720,47 @@ async def update_library(
     tags=["fastq download"],
     description="Get a presigned url for the fastq files pair"
 )
-async def get_presigned_url(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> PresignedUrlModel:
+def get_presigned_url(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> PresignedUrlModel:
     return FastqData.get(fastq_id).presign_uris()
 
 
+@router.post(
+    ":presign",
+    tags=["fastq download"],
+    description=dedent("""
+Get presigned urls for the fastq file pairs of a list of fastqs (<code>fastqIdList</code>)
+and / or every valid fastq on an instrument run (<code>instrumentRunId</code>).<br>
+The s3 details are resolved in one pass, and urls are signed locally where possible.
+Fastqs without a read set are skipped.
+""")
+)
+def presign_fastqs(presign_request: FastqPresignRequest) -> List[FastqPresignedUrlModel]:
+    fastq_id_list = []
+    if presign_request.fastq_id_list is not None:
+        fastq_id_list.extend(presign_request.fastq_id_list)
+    if presign_request.instrument_run_id is not None:
+        fastq_id_list.extend(query_index_ids(
+            FastqData.__table_name__,
+            index_name="instrument_run_id-index",
+            key_attr="instrument_run_id",
+            key_value=presign_request.instrument_run_id,
+            filter_condition=(A.is_valid == True),
+        ))
+
+    try:
+        fastq_data_map = batch_get_data_map(FastqData, fastq_id_list)
+    except DoesNotExist as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    return json_response(presign_fastq_list(list(fastq_data_map.values())))
+
+
 # - PATCH /fastq/{fastq_id}:runQcStats
 @router.patch(
     "/{fastq_id}:runQcStats",
     tags=["fastq workflow"]
 )
-async def run_qc_stats(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> JobResponse:
+def run_qc_stats(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> JobResponse:
     return run_and_save_fastq_job(fastq_id, 'QC')
 
 
@@ -490,7 +769,7 @@ async def run_qc_stats(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> JobR
     "/{fastq_id}:runNtsm",
     tags=["fastq workflow"]
 )
-async def run_qc_stats(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> JobResponse:
+def run_qc_stats(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> JobResponse:
     return run_and_save_fastq_job(fastq_id, 'NTSM')
 
 
@@ -499,7 +778,7 @@ async def run_qc_stats(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> JobR
     "/{fastq_id}:runFileCompressionInformation",
     tags=["fastq workflow"]
 )
-async def run_qc_stats(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> JobResponse:
+def run_qc_stats(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> JobResponse:
     return run_and_save_fastq_job(fastq_id, 'FILE_COMPRESSION')
 
 
@@ -508,7 +787,7 @@ async def run_qc_stats(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> JobR
     "/{fastq_id}:runReadCountInformation",
     tags=["fastq workflow"]
 )
-async def run_qc_stats(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> JobResponse:
+def run_qc_stats(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> JobResponse:
     return run_and_save_fastq_job(fastq_id, 'READ_COUNT')
 
 
@@ -517,19 +796,26 @@ async def run_qc_stats(fastq_id: str = Depends(sanitise_fqr_orcabus_id)) -> JobR
     "/{fastq_id}/jobs",
     tags=["fastq workflow"]
 )
-async def get_jobs(
+def get_jobs(
         fastq_id: str = Depends(sanitise_fqr_orcabus_id),
         # Pagination options
         pagination: QueryPagination = Depends(get_pagination_params),
 ) -> JobQueryPaginatedResponse:
+    # Query the index for the job ids, then read all jobs in a single batch
+    job_data_map = batch_get_data_map(
+        JobData,
+        query_index_ids(
+            JobData.__table_name__,
+            index_name="fastq_id-index",
+            key_attr="fastq_id",
+            key_value=fastq_id,
+        )
+    )
+
     return JobQueryPaginatedResponse.from_results_list(
         results=list(map(
             lambda job_iter_: job_iter_.to_dict(),
-            list(JobData.query(
-                A.fastq_id == fastq_id,
-                index="fastq_id-index",
-                load_full_item=True
-            ))
+            job_data_map.values()
         )),
         query_pagination=pagination,
         params_response={
@@ -540,31 +826,82 @@ async def get_jobs(
     )
 
 
+# Bulk updates
+@router.patch(
+    ":bulkUpdate",
+    tags=["fastq update"],
+    description=dedent("""
+Apply updates to many fastqs at once.<br>
+The body is a list of entries, each with a <code>fastqId</code> and any of
+<code>qc</code>, <code>readCount</code>, <code>fileCompressionInformation</code>, <code>ntsm</code> (a file storage object)
+or <code>isValid</code>, as for the addQcStats, addReadCount, addFileCompressionInformation, addNtsmStorageObject
+and validate / invalidate routes.<br>
+
+The fastqs are read and written in batches, and their events are sent in batches.<br>
+
+Each entry has its own result (in the order of the entries),
+one of UPDATED, NOT_FOUND, INVALID or CONFLICT, an entry that cannot be applied does not fail the request.
+""")
+)
+def bulk_update_fastq(
+        bulk_update_entries: List[Dict[str, Any]] = Body(
+            ...,
+            description="List of {fastqId, qc|readCount|fileCompressionInformation|ntsm|isValid} entries"
+        ),
+) -> FastqBulkUpdateResponseDict:
+    if len(bulk_update_entries) == 0:
+        raise HTTPException(status_code=400, detail="No fastq updates to apply")
+
+    return json_response(bulk_update_fastqs(bulk_update_entries))
+
+
 # PATCHES
+def update_fastq(
+        fastq_id: str,
+        apply_update: Callable[[FastqData], List[str]],
+        event_status: FastqStateChangeStatusEventsType,
+) -> FastqResponseDict:
+    """
+    Write only the attributes changed by the update, along with the update event, retrying on a version conflict
+    :param fastq_id:
+    :param apply_update: Changes the fastq in memory, and returns the names of the attributes changed
+    :param event_status:
+    :return:
+    """
+    def put_update_event(fastq_obj: FastqData) -> FastqResponseDict:
+        # Generate fastq object as a dict with s3 details
+        fastq_dict = fastq_obj.to_dict()
+
+        put_fastq_update_event(
+            fastq_response_object=fastq_dict,
+            event_status=event_status,
+            fastq_obj=fastq_obj
+        )
+
+        return fastq_dict
+
+    try:
+        return update_with_retry(FastqData, fastq_id, apply_update, put_update_event)
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
 @router.patch(
     "/{fastq_id}/addQcStats",
     tags=["fastq update"],
     description="Add QC Stats to a Fastq List Row Object"
 )
-async def add_qc_stats(
+def add_qc_stats(
         fastq_id: str = Depends(sanitise_fqr_orcabus_id),
         qc_obj: QcInformationPatch = Depends()
 ) -> FastqResponseDict:
-    fastq_obj = FastqData.get(fastq_id)
-    fastq_obj.qc = QcInformationData(**dict(qc_obj.model_dump(by_alias=True)))
-    fastq_obj.save()
+    qc_data = QcInformationData(**dict(qc_obj.model_dump(by_alias=True)))
 
-    # Create dict
-    fastq_obj_dict = fastq_obj.to_dict()
+    def apply_update(fastq_obj: FastqData) -> List[str]:
+        fastq_obj.qc = qc_data
+        return ["qc"]
 
-    # Put update event into the ethos
-    put_fastq_update_event(
-        fastq_response_object=fastq_obj_dict,
-        event_status='QC_UPDATED'
-    )
-
-    # Return the fastq as a dictionary
-    return fastq_obj_dict
+    return update_fastq(fastq_id, apply_update, 'QC_UPDATED')
 
 
 @router.patch(
@@ -572,30 +909,19 @@ async def add_qc_stats(
     tags=["fastq update"],
     description="Add Read Count Information to a Fastq List Row Object"
 )
-async def add_read_count(
+def add_read_count(
         fastq_id: str = Depends(sanitise_fqr_orcabus_id),
         read_count_obj: ReadCountInfoPatch = Depends()
 ) -> FastqResponseDict:
-    fastq = FastqData.get(fastq_id)
-
     # Get read count info
     read_count_info_data = ReadCountInfoData(**dict(read_count_obj.model_dump(by_alias=True)))
 
-    # Update attributes
-    fastq.read_count = read_count_info_data.read_count
-    fastq.base_count_est = read_count_info_data.base_count_est
-
-    fastq.save()
+    def apply_update(fastq_obj: FastqData) -> List[str]:
+        fastq_obj.read_count = read_count_info_data.read_count
+        fastq_obj.base_count_est = read_count_info_data.base_count_est
+        return ["read_count", "base_count_est"]
 
-    # Generate fastq object as a dict
-    fastq_dict = fastq.to_dict()
-
-    put_fastq_update_event(
-        fastq_response_object=fastq_dict,
-        event_status='READ_COUNT_UPDATED'
-    )
-
-    return fastq_dict
+    return update_fastq(fastq_id, apply_update, 'READ_COUNT_UPDATED')
 
 
 @router.patch(
@@ -603,42 +929,32 @@ async def add_read_count(
     tags=["fastq update"],
     description="Add File Compression Information to a Fastq List Row Object"
 )
-async def add_file_compression(
+def add_file_compression(
         fastq_id: str = Depends(sanitise_fqr_orcabus_id),
         file_compression_obj: FileCompressionInfoPatch = Depends()
 ) -> FastqResponseDict:
-    # Get fastq object
-    fastq = FastqData.get(fastq_id)
-
     # Read in file compression data
     file_compression_info_data = FileCompressionInfoData(**dict(file_compression_obj.model_dump(by_alias=True)))
 
-    # Assert that files is not None
-    try:
-        assert fastq.read_set is not None, "No FastqPairStorageObject exists for this fastq, cannot add compression information"
-    except AssertionError as e:
-        raise HTTPException(status_code=409, detail=str(e))
-
-    # Add compression info
-    fastq.read_set.compression_format = file_compression_info_data.compression_format
-    fastq.read_set.r1.gzip_compression_size_in_bytes = file_compression_info_data.r1_gzip_compression_size_in_bytes
-    fastq.read_set.r1.raw_md5sum = file_compression_info_data.r1_raw_md5sum
-
-    if fastq.read_set.r2 is not None:
-        fastq.read_set.r2.gzip_compression_size_in_bytes = file_compression_info_data.r2_gzip_compression_size_in_bytes
-        fastq.read_set.r2.raw_md5sum = file_compression_info_data.r2_raw_md5sum
+    def apply_update(fastq_obj: FastqData) -> List[str]:
+        # Assert that files is not None
+        try:
+            assert fastq_obj.read_set is not None, "No FastqPairStorageObject exists for this fastq, cannot add compression information"
+        except AssertionError as e:
+            raise HTTPException(status_code=409, detail=str(e))
 
-    fastq.save()
+        # Add compression info
+        fastq_obj.read_set.compression_format = file_compression_info_data.compression_format
+        fastq_obj.read_set.r1.gzip_compression_size_in_bytes = file_compression_info_data.r1_gzip_compression_size_in_bytes
+        fastq_obj.read_set.r1.raw_md5sum = file_compression_info_data.r1_raw_md5sum
 
-    # Generate fastq object as a dict with s3 details
-    fastq_dict = fastq.to_dict()
+        if fastq_obj.read_set.r2 is not None:
+            fastq_obj.read_set.r2.gzip_compression_size_in_bytes = file_compression_info_data.r2_gzip_compression_size_in_bytes
+            fastq_obj.read_set.r2.raw_md5sum = file_compression_info_data.r2_raw_md5sum
 
-    put_fastq_update_event(
-        fastq_response_object=fastq_dict,
-        event_status='FILE_COMPRESSION_UPDATED'
-    )
+        return ["read_set"]
 
-    return fastq_dict
+    return update_fastq(fastq_id, apply_update, 'FILE_COMPRESSION_UPDATED')
 
 
 @router.patch(
@@ -646,25 +962,17 @@ async def add_file_compression(
     tags=["fastq update"],
     description="Add Ntsm Storage Object to a Fastq List Row Object"
 )
-async def add_ntsm_uri(
+def add_ntsm_uri(
         fastq_id: str = Depends(sanitise_fqr_orcabus_id),
         ntsm: NtsmUriUpdate = Depends()
 ) -> FastqResponseDict:
-    fastq = FastqData.get(fastq_id)
-    fastq.ntsm = NtsmUriData(**dict(ntsm.model_dump())).ntsm
-    fastq.save()
+    ntsm_data = NtsmUriData(**dict(ntsm.model_dump())).ntsm
 
-    fastq.save()
+    def apply_update(fastq_obj: FastqData) -> List[str]:
+        fastq_obj.ntsm = ntsm_data
+        return ["ntsm"]
 
-    # Generate fastq object as a dict with s3 details
-    fastq_dict = fastq.to_dict()
-
-    put_fastq_update_event(
-        fastq_response_object=fastq_dict,
-        event_status='NTSM_UPDATED'
-    )
-
-    return fastq_dict
+    return update_fastq(fastq_id, apply_update, 'NTSM_UPDATED')
 
 
 # Validation
@@ -673,22 +981,14 @@ async def add_ntsm_uri(
     tags=["fastq validate"],
     description="Validate a Fastq List Row Object"
 )
-async def validate_fastq(
+def validate_fastq(
         fastq_id: str = Depends(sanitise_fqr_orcabus_id)
 ) -> FastqResponseDict:
-    fastq = FastqData.get(fastq_id)
-    fastq.is_valid = True
-    fastq.save()
-
-    # Generate fastq object as a dict with s3 details
-    fastq_dict = fastq.to_dict()
-
-    put_fastq_update_event(
-        fastq_response_object=fastq_dict,
-        event_status='FASTQ_IS_VALID'
-    )
+    def apply_update(fastq_obj: FastqData) -> List[str]:
+        fastq_obj.is_valid = True
+        return ["is_valid"]
 
-    return fastq_dict
+    return update_fastq(fastq_id, apply_update, 'FASTQ_IS_VALID')
 
 
 @router.patch(
@@ -696,30 +996,22 @@ async def validate_fastq(
     tags=["fastq validate"],
     description="Invalidate a Fastq List Row Object, this is useful if an instrument run has failed"
 )
-async def invalidate_fastq(
+def invalidate_fastq(
         fastq_id: str = Depends(sanitise_fqr_orcabus_id)
 ) -> FastqResponseDict:
-    fastq_obj = FastqData.get(fastq_id)
-
-    # Check if the fastq is part of a fastq set
-    if fastq_obj.fastq_set_id is not None:
-        raise HTTPException(
-            status_code=409,
-            detail="Cannot invalidate a fastq that is part of a fastq set, please first unlink and then invalidate"
-        )
-
-    fastq_obj.is_valid = False
-    fastq_obj.save()
+    def apply_update(fastq_obj: FastqData) -> List[str]:
+        # Check if the fastq is part of a fastq set
+        # (a fastq linked since we read it is a version conflict, so is checked again on the retry)
+        if fastq_obj.fastq_set_id is not None:
+            raise HTTPException(
+                status_code=409,
+                detail="Cannot invalidate a fastq that is part of a fastq set, please first unlink and then invalidate"
+            )
 
-    # Generate fastq object as a dict with s3 details
-    fastq_dict = fastq_obj.to_dict()
+        fastq_obj.is_valid = False
+        return ["is_valid"]
 
-    put_fastq_update_event(
-        fastq_response_object=fastq_dict,
-        event_status='FASTQ_IS_INVALID'
-    )
-
-    return fastq_dict
+    return update_fastq(fastq_id, apply_update, 'FASTQ_IS_INVALID')
 
 
 @router.patch(
@@ -727,28 +1019,22 @@ async def invalidate_fastq(
     tags=["fastq update"],
     description="Add Fastq Pair Storage Object to a Fastq List Row Object"
 )
-async def add_fastq_pair_storage_object(
+def add_fastq_pair_storage_object(
         fastq_id: str = Depends(sanitise_fqr_orcabus_id),
         fastq_pair_storage_obj: FastqPairStorageObjectPatch = Depends()
 ) -> FastqResponseDict:
-    fastq = FastqData.get(fastq_id)
-    # Check that no fastqPairStorageObject exists for this fastq id
-    try:
-        assert fastq.read_set is None, "A FastqPairStorageObject already exists for this fastq, please detach it first"
-    except AssertionError as e:
-        raise HTTPException(status_code=404, detail=str(e))
-    fastq.read_set = FastqPairStorageObjectData(**dict(fastq_pair_storage_obj.model_dump(by_alias=True)))
-    fastq.save()
-
-    # Generate fastq object as a dict with s3 details
-    fastq_dict = fastq.to_dict()
+    read_set_data = FastqPairStorageObjectData(**dict(fastq_pair_storage_obj.model_dump(by_alias=True)))
 
-    put_fastq_update_event(
-        fastq_response_object=fastq_dict,
-        event_status='READ_SET_ADDED'
-    )
+    def apply_update(fastq_obj: FastqData) -> List[str]:
+        # Check that no fastqPairStorageObject exists for this fastq id
+        try:
+            assert fastq_obj.read_set is None, "A FastqPairStorageObject already exists for this fastq, please detach it first"
+        except AssertionError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        fastq_obj.read_set = read_set_data
+        return ["read_set"]
 
-    return fastq_dict
+    return update_fastq(fastq_id, apply_update, 'READ_SET_ADDED')
 
 
 @router.patch(
@@ -756,27 +1042,20 @@ async def add_fastq_pair_storage_object(
     tags=["fastq update"],
     description="Remove Fastq Pair Storage Object from a Fastq List Row Object"
 )
-async def remove_fastq_pair_storage_object(
+def remove_fastq_pair_storage_object(
         fastq_id: str = Depends(sanitise_fqr_orcabus_id)
 ) -> FastqResponseDict:
-    fastq = FastqData.get(fastq_id)
-    # Check that the fastqPairStorageObject exists for this fastq id
-    try:
-        assert fastq.read_set is not None, "no FastqPairStorageObject does not exists for this fastq"
-    except AssertionError as e:
-        raise HTTPException(status_code=404, detail=str(e))
-    fastq.read_set = None
-    fastq.save()
-
-    # Generate fastq object as a dict
-    fastq_dict = fastq.to_dict()
-
-    put_fastq_update_event(
-        fastq_response_object=fastq_dict,
-        event_status='READ_SET_DELETED'
-    )
+    def apply_update(fastq_obj: FastqData) -> List[str]:
+        # Check that the fastqPairStorageObject exists for this fastq id
+        try:
+            assert fastq_obj.read_set is not None, "no FastqPairStorageObject does not exists for this fastq"
+        except AssertionError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        # Removed from the item
+        fastq_obj.read_set = None
+        return ["read_set"]
 
-    return fastq_dict
+    return update_fastq(fastq_id, apply_update, 'READ_SET_DELETED')
 
 
 # DELETE
@@ -785,7 +1064,7 @@ async def remove_fastq_pair_storage_object(
     tags=["fastq delete"],
     description="Delete a Fastq List Row Object"
 )
-async def delete_fastq(fastq_id: str) -> Dict[str, str]:
+def delete_fastq(fastq_id: str) -> Dict[str, str]:
     # Get the fastq object
     fastq_obj = FastqData.get(fastq_id)
 
@@ -802,11 +1081,14 @@ async def delete_fastq(fastq_id: str) -> Dict[str, str]:
             # If the fastq set id does not exist, then we can delete it
             pass
 
-    fastq_obj.delete()
+    # Commit the write along with its events
+    with outbox_transaction():
+        fastq_obj.delete()
 
-    put_fastq_update_event(
-        fastq_response_object={"fastqId": fastq_obj.id},
-        event_status='FASTQ_DELETED'
-    )
+        put_fastq_update_event(
+            fastq_response_object={"fastqId": fastq_obj.id},
+            event_status='FASTQ_DELETED',
+            fastq_obj=fastq_obj
+        )
 
     return {"status": "ok"}
@@ -10,6 +10,7 @@ This is the list of routes available
 - GET /fastqSet/{fastqSetId} - Get a fastq set object by its orcabus id
 - CREATE /fastqSet - Create a list of fastq objects all belonging to the same fastq set id / library
 - GET /fastqSet/{fastqSetId}/toFastqListRows - Get fastq list rows for a given fastq set id
+- GET /fastqSet/{fastqSetId}/presign - Get presigned urls for every fastq in the fastq set
 - PATCH /fastqSet/{fastqSetId} - Link Fastq add a fastq object to this fastq set
 - PATCH /fastqSet/{fastqSetId} - Unlink Fastq remove a fastq object from this fastq set
 - PATCH /fastqSet/{fastqSetId}/currentFastqSet - Set as current fastq, all other fastq sets in this library must first be set to FALSE for isCurrent parameter
@@ -25,33 +26,50 @@ This is the list of routes available
 # Standard imports
 from operator import concat
 from textwrap import dedent
-from typing import List, Optional, Union, Dict, Annotated, cast
+from typing import List, Optional, Union, Dict, Annotated, cast, Literal
 from fastapi import Depends, Query
 from fastapi.routing import APIRouter, HTTPException
+from boto3.dynamodb.conditions import Attr
 from dyntastic import A, DoesNotExist
 from functools import reduce
 from fastapi_tools import QueryPagination
 
 # Import metadata tools
-from orcabus_api_tools.metadata import (
-    get_library_orcabus_id_from_library_id
-)
 from . import (
     unlink_with_cleanup, run_ntsm_eval,
-    get_pagination_params, run_and_save_fastq_set_job
+    get_pagination_params, get_next_token, get_fields, get_response_format, run_and_save_fastq_set_job
 )
 
+from ....metadata_cache import get_library_orcabus_ids_from_library_ids
 from ....events.events import (
     put_fastq_update_event, put_fastq_set_update_event
 )
+from ....transactions import (
+    write_transaction, save_if_not_exists, save_if_unchanged, delete_if_unchanged, condition_check,
+    TransactionConflictError
+)
+from ....fieldsets import parse_fields, sparse_response
+from ....responses import json_response
 from ....globals import RUN_EXTRACT_FINGERPRINT_AWS_STEP_FUNCTION_ARN_ENV_VAR
+from ....hydration import batch_get_data_map
+from ....index_query import (
+    IndexQuery, combine_conditions,
+    query_index_items, query_index_page, unique_attr_values,
+    iter_index_items
+)
+from ....pagination import decode_next_token, get_page_slice, query_paginated_response_from_page
+from ....streaming import ndjson_streaming_response, iter_serialized_data
+from ....versioned_update import update_with_retry, VersionConflictError
 
 # Model imports
-from ....models import FastqListRowDict, EmptyDict, BoolQueryOptionsAnnotated, ReferenceGenome
-from ....models.fastq import FastqData
+from ....models import (
+    FastqListRowDict, FastqPresignedUrlModel, EmptyDict, BoolQueryOptionsAnnotated, ReferenceGenome
+)
+from ....models.fastq import FastqData, FastqMissingReadSetError
 from ....models.fastq_set import (
     FastqSetData, FastqSetResponse, FastqSetListResponse, FastqSetCreate,
-    FastqSetQueryPaginatedResponse, FastqSetResponseDict
+    FastqSetQueryPaginatedResponse, FastqSetCursorPaginatedResponse, FastqSetResponseDict,
+    FastqSetSparseQueryPaginatedResponse, FastqSetSparseCursorPaginatedResponse
 )
 from ....models.library import LibraryData
 from ....models.merge_fastq_sets import MergePatch
@@ -62,7 +80,6 @@ from ....models.fastq_set_job import (
 from ....models.somalier import SomalierUriUpdate, SomalierUriData
 from ....models.somalier_extract_patch import ExtractFingerprintPatch
 from ....utils import (
-    is_orcabus_ulid,
     sanitise_fqs_orcabus_id,
     sanitise_fqr_orcabus_id,
     sanitise_fqs_orcabus_id_x,
@@ -86,10 +103,19 @@ You must specify any of the following combinations:<br>
 
 You may query multiple instrumentRunIds and metadata attributes using the <code>[]</code> syntax.<br>
 
-For example, to query multiple libraries, use <code>library[]=L12345&library[]=L123456</code>
+For example, to query multiple libraries, use <code>library[]=L12345&library[]=L123456</code><br>
+
+For large queries, use cursor based pagination by setting <code>nextToken=</code> (empty) on the first request,
+then passing the <code>nextToken</code> from each response to get the next page.
+Only the requested page is read from the database.
+
+Use <code>fields</code> to only return a subset of each fastq set, i.e <code>fields=id,library.libraryId</code>.
+The member fastqs are only read if <code>fastqSet</code> is selected.
+
+For exports, set <code>format=ndjson</code> to stream every matching fastq set as newline delimited json.
 """)
 )
-async def list_fastq_sets(
+def list_fastq_sets(
         # Lab metadata options
         lab_metadata_query_parameters: LabMetadataQueryParameters = Depends(LabMetadataQueryParameters),
         # Instrument query options
@@ -111,7 +137,15 @@ async def list_fastq_sets(
         ),
         # Pagination
         pagination: QueryPagination = Depends(get_pagination_params),
-) -> FastqSetQueryPaginatedResponse:
+        next_token: Optional[str] = Depends(get_next_token),
+        # Sparse fieldsets
+        fields: Optional[str] = Depends(get_fields),
+        # Streaming
+        response_format: Literal['json', 'ndjson'] = Depends(get_response_format),
+) -> Union[FastqSetQueryPaginatedResponse, FastqSetCursorPaginatedResponse]:
+    # Validate the fields before we run any queries
+    field_tree = parse_fields(fields, FastqSetResponseDict)
+
     # Check boolean parameters
     filter_expression_list = []
     # Append filter expressions for current fastq set collection
@@ -123,18 +157,20 @@ async def list_fastq_sets(
     if allow_additional_fastqs == 'ALL':
         pass
     else:
-        filter_expression_list.append(A.allow_additional_fastqs == allow_additional_fastqs)
+        filter_expression_list.append(A.allow_additional_fastq == allow_additional_fastqs)
 
     # Set library list for lab metadata query
     lab_metadata_query_parameters.set_library_list_from_query()
 
     # Combine the filter expressions
-    if len(filter_expression_list) == 0:
-        filter_expression = None
-    else:
-        filter_expression = filter_expression_list[0]
-        for filter_expression_iter_ in filter_expression_list[1:]:
-            filter_expression = filter_expression & filter_expression_iter_
+    filter_expression = combine_conditions(*filter_expression_list)
+
+    # Fastq sets loaded by id rather than through the library index are filtered in memory
+    def is_fastq_set_match(fastq_set_obj: FastqSetData) -> bool:
+        return (
+            (current_fastq_set == 'ALL' or fastq_set_obj.is_current_fastq_set == current_fastq_set) and
+            (allow_additional_fastqs == 'ALL' or fastq_set_obj.allow_additional_fastq == allow_additional_fastqs)
+        )
 
     # Check if all the parameters are None
     if all(map(lambda x: x is None, [
@@ -146,139 +182,210 @@ async def list_fastq_sets(
             detail="At least one metadata id (library, sample, subject, individual, project) is required or instrumentRunId"
         )
 
-    # If not, use index queries for each the fastqs and provide an intersection of the results.
-    query_lists = []
+    params_response = dict(filter(
+        lambda kv: kv[1] is not None,
+        dict(
+            **lab_metadata_query_parameters.to_params_dict(),
+            **instrument_query_parameters.to_params_dict(),
+            **{
+                "includeS3Details": include_s3_details,
+                "currentFastqSet": current_fastq_set,
+                "allowAdditionalFastqs": allow_additional_fastqs,
+                "fields": fields,
+            }
+        ).items()
+    ))
 
     # Set library list query
+    library_index_query: Optional[IndexQuery] = None
     if lab_metadata_query_parameters.library_list is not None:
-        library_orcabus_ids = list(map(
-            lambda library_id_iter_: (
-                library_id_iter_ if is_orcabus_ulid(library_id_iter_)
-                else get_library_orcabus_id_from_library_id(library_id_iter_)
-            ),
+        # Resolve library ids concurrently (and cached)
+        library_orcabus_ids = get_library_orcabus_ids_from_library_ids(
             lab_metadata_query_parameters.library_list
-        ))
-
-        query_lists.append(
-            # Need to flatten list, might be multiple queries
-            list(reduce(
-                concat,
-                list(map(
-                    lambda library_orcabus_id_iter_: (
-                        list(FastqSetData.query(
-                            A.library_orcabus_id == library_orcabus_id_iter_,
-                            filter_condition=filter_expression,
-                            index="library_orcabus_id-index",
-                            load_full_item=True
-                        ))
-                    ),
-                    library_orcabus_ids
-                ))
-            ))
+        )
+        library_index_query = IndexQuery(
+            index_name="library_orcabus_id-index",
+            key_attr="library_orcabus_id",
+            key_values=library_orcabus_ids,
+            filter_condition=filter_expression,
         )
 
+    # Get the unique list of fastq set ids (maintaining order) for the instrument run ids
+    # We only need the fastq set id attribute, so we don't need to read the full fastq items
+    instrument_fastq_set_ids: Optional[List[str]] = None
     if instrument_query_parameters.instrument_run_id_list is not None:
-        # First get the fqr data for the instrument run ids
-        fastq_data_in_instrument_run_ids = list(reduce(
-            concat,
-            list(map(
-                lambda instrument_run_id_iter_: (
-                    list(FastqData.query(
-                        A.instrument_run_id == instrument_run_id_iter_,
-                        index="instrument_run_id-index",
-                        load_full_item=True
-                    ))
+        instrument_fastq_set_ids = unique_attr_values(
+            query_index_items(
+                FastqData.__table_name__,
+                IndexQuery(
+                    index_name="instrument_run_id-index",
+                    key_attr="instrument_run_id",
+                    key_values=instrument_query_parameters.instrument_run_id_list,
+                    filter_condition=None,
                 ),
-                instrument_query_parameters.instrument_run_id_list
-            ))
+                attributes=['id', 'fastq_set_id']
+            ),
+            'fastq_set_id'
+        )
+
+    # Stream the fastq sets, loading and serializing (with their member fastqs) in chunks
+    if response_format == 'ndjson':
+        if library_index_query is not None:
+            # Stream the library index, the instrument run ids (if any) are applied as an in-memory filter
+            instrument_fastq_set_id_set = (
+                set(instrument_fastq_set_ids) if instrument_fastq_set_ids is not None else None
+            )
+            fastq_set_ids_iter = filter(
+                lambda fastq_set_id_iter_: (
+                    instrument_fastq_set_id_set is None or
+                    fastq_set_id_iter_ in instrument_fastq_set_id_set
+                ),
+                map(
+                    lambda item_iter_: item_iter_['id'],
+                    iter_index_items(FastqSetData.__table_name__, library_index_query, attributes=['id'])
+                )
+            )
+            chunk_filter = None
+        else:
+            # Fastq sets loaded by id are filtered in memory
+            fastq_set_ids_iter = instrument_fastq_set_ids
+            chunk_filter = is_fastq_set_match
+
+        return ndjson_streaming_response(iter_serialized_data(
+            FastqSetData,
+            fastq_set_ids_iter,
+            serialize_chunk=lambda fastq_set_list_iter_: FastqSetListResponse(
+                fastq_set_list=fastq_set_list_iter_,
+                include_s3_details=include_s3_details,
+                fields=field_tree
+            ).model_dump(by_alias=True),
+            chunk_filter=chunk_filter
         ))
 
-        # Get the unique list of fastq set ids
-        fastq_set_ids = list(set(list(map(
-            lambda fqr_iter_: fqr_iter_.fastq_set_id,
-            fastq_data_in_instrument_run_ids
-        ))))
-
-        # Filter the fastq set ids by the filter expressions - current fastq set
-        if current_fastq_set != 'ALL':
-            fastq_set_ids = list(filter(
-                lambda fastq_set_id_iter_: FastqSetData.get(fastq_set_id_iter_).is_current_fastq_set == current_fastq_set,
-                fastq_set_ids
-            ))
-        # Filter the fastq set ids by the filter expressions - allow additional fastqs
-        if allow_additional_fastqs != 'ALL':
-            fastq_set_ids = list(filter(
-                lambda fastq_set_id_iter_: FastqSetData.get(fastq_set_id_iter_).allow_additional_fastq == allow_additional_fastqs,
-                fastq_set_ids
-            ))
+    # Cursor based pagination, only read and serialize the fastq sets in this page
+    if next_token is not None:
+        cursor = decode_next_token(next_token, params_response)
 
-        query_lists.append(
-            # Given a list of fastq set ids, get the FastqSetData objects
-            list(map(
-                lambda fastq_set_id_iter_: FastqSetData.get(fastq_set_id_iter_),
-                fastq_set_ids
+        if library_index_query is not None:
+            # Page through the library index, the instrument run ids (if any) are applied as an in-memory filter
+            instrument_fastq_set_id_set = (
+                set(instrument_fastq_set_ids) if instrument_fastq_set_ids is not None else None
+            )
+            page_items, next_cursor = query_index_page(
+                FastqSetData.__table_name__,
+                library_index_query,
+                rows_per_page=pagination['rowsPerPage'],
+                cursor=cursor,
+                attributes=['id'],
+                predicate=lambda item_iter_: (
+                    instrument_fastq_set_id_set is None or
+                    item_iter_['id'] in instrument_fastq_set_id_set
+                )
+            )
+            fastq_set_obj_list = list(batch_get_data_map(
+                FastqSetData,
+                map(lambda item_iter_: item_iter_['id'], page_items)
+            ).values())
+        else:
+            # Page through the fastq set ids from the instrument run
+            # Load the fastq sets in chunks of a page, and filter in memory, until the page is full
+            # The cursor is the position in the fastq set id list
+            fastq_set_id_offset = cursor['fastqSetIdOffset'] if cursor is not None else 0
+            fastq_set_obj_list = []
+            while (
+                    fastq_set_id_offset < len(instrument_fastq_set_ids) and
+                    len(fastq_set_obj_list) < pagination['rowsPerPage']
+            ):
+                fastq_set_ids_chunk = instrument_fastq_set_ids[
+                    fastq_set_id_offset:fastq_set_id_offset + pagination['rowsPerPage'] - len(fastq_set_obj_list)
+                ]
+                fastq_set_obj_list.extend(filter(
+                    is_fastq_set_match,
+                    batch_get_data_map(FastqSetData, fastq_set_ids_chunk).values()
+                ))
+                fastq_set_id_offset += len(fastq_set_ids_chunk)
+
+            if fastq_set_id_offset < len(instrument_fastq_set_ids):
+                next_cursor = {"fastqSetIdOffset": fastq_set_id_offset}
+            else:
+                next_cursor = None
+
+        if field_tree is not None:
+            return sparse_response(FastqSetSparseCursorPaginatedResponse.from_results_page(
+                results=FastqSetListResponse(
+                    fastq_set_list=fastq_set_obj_list,
+                    include_s3_details=include_s3_details,
+                    fields=field_tree
+                ).model_dump(by_alias=True),
+                rows_per_page=pagination['rowsPerPage'],
+                next_cursor=next_cursor,
+                params_response=params_response,
             ))
-        )
 
-    # Get the intersection of the query lists
-    if len(query_lists) == 1:
-        return FastqSetQueryPaginatedResponse.from_results_list(
+        return FastqSetCursorPaginatedResponse.from_results_page(
             results=FastqSetListResponse(
-                fastq_set_list=list(map(
-                    lambda fqs_iter_: FastqSetData.from_response(**fqs_iter_.to_dict()),
-                    query_lists[0]
-                )),
+                fastq_set_list=fastq_set_obj_list,
                 include_s3_details=include_s3_details
-            ).model_dump(),
-            query_pagination=pagination,
-            params_response=dict(filter(
-                lambda kv: kv[1] is not None,
-                dict(
-                    **lab_metadata_query_parameters.to_params_dict(),
-                    **instrument_query_parameters.to_params_dict(),
-                    **{
-                        "includeS3Details": include_s3_details,
-                        "currentFastqSet": current_fastq_set,
-                        "allowAdditionalFastqs": allow_additional_fastqs
-                    }
-                ).items()
-            ))
+            ).model_dump(by_alias=True),
+            rows_per_page=pagination['rowsPerPage'],
+            next_cursor=next_cursor,
+            params_response=params_response,
         )
 
-    # Else query list is greater than one
-    # Bind on the id
-    fqs_orcabus_ids = set(map(lambda fqs_iter_: fqs_iter_.id, query_lists[0]))
-    # For each list reduce to the rgids that match the previous set
-    for query_list in query_lists[1:]:
-        fqs_orcabus_ids = fqs_orcabus_ids.intersection(
-            set(map(lambda fqs_iter_: fqs_iter_.id, query_list))
+    # Get the matching fastq sets for the count, then only read (from the library index)
+    # and serialize (with their member fastqs) the fastq sets in the requested page
+    if library_index_query is not None:
+        # The library index is read index only, the instrument run ids (if any) are applied as an in-memory filter
+        instrument_fastq_set_id_set = (
+            set(instrument_fastq_set_ids) if instrument_fastq_set_ids is not None else None
         )
+        fastq_set_ids = list(dict.fromkeys(filter(
+            lambda fastq_set_id_iter_: (
+                instrument_fastq_set_id_set is None or
+                fastq_set_id_iter_ in instrument_fastq_set_id_set
+            ),
+            map(
+                lambda item_iter_: item_iter_['id'],
+                query_index_items(FastqSetData.__table_name__, library_index_query, attributes=['id'])
+            )
+        )))
+        fastq_set_count = len(fastq_set_ids)
+        fastq_set_obj_list = list(batch_get_data_map(
+            FastqSetData,
+            get_page_slice(fastq_set_ids, pagination)
+        ).values())
+    else:
+        # Load each of the fastq sets in a single batch, and filter in memory
+        fastq_set_obj_list = list(filter(
+            is_fastq_set_match,
+            batch_get_data_map(FastqSetData, instrument_fastq_set_ids).values()
+        ))
+        fastq_set_count = len(fastq_set_obj_list)
+        fastq_set_obj_list = get_page_slice(fastq_set_obj_list, pagination)
+
+    # Serialize once, the member fastqs of the fastq sets in the page are collected in a single batched pass
+    if field_tree is not None:
+        return sparse_response(query_paginated_response_from_page(
+            FastqSetSparseQueryPaginatedResponse,
+            results=FastqSetListResponse(
+                fastq_set_list=fastq_set_obj_list,
+                include_s3_details=include_s3_details,
+                fields=field_tree
+            ).model_dump(by_alias=True),
+            count=fastq_set_count,
+            query_pagination=pagination,
+            params_response=params_response
+        ))
 
-    # Now we have our fqr_orcabus_ids, we can get the FastqListRow objects
-    return FastqSetQueryPaginatedResponse.from_results_list(
+    return query_paginated_response_from_page(
+        FastqSetQueryPaginatedResponse,
         results=FastqSetListResponse(
-            fastq_set_list=list(map(
-                lambda fqs_iter_: FastqSetData.from_response(**fqs_iter_.to_dict()),
-                filter(
-                    lambda fq_iter_: fq_iter_.id in fqs_orcabus_ids,
-                    query_lists[0]
-                )
-            )),
+            fastq_set_list=fastq_set_obj_list,
             include_s3_details=include_s3_details
         ).model_dump(by_alias=True),
+        count=fastq_set_count,
         query_pagination=pagination,
-        params_response=dict(filter(
-            lambda kv: kv[1] is not None,
-            dict(
-                **lab_metadata_query_parameters.to_params_dict(),
-                **instrument_query_parameters.to_params_dict(),
-                **{
-                    "includeS3Details": include_s3_details,
-                    "currentFastqSet": current_fastq_set,
-                    "allowAdditionalFastqs": allow_additional_fastqs
-                }
-            ).items()
-        ))
+        params_response=params_response
     )
 
 
@@ -291,7 +398,17 @@ async def list_fastq_sets(
     Please use the fastqSet endpoint if registering multiple fastqs simultaneously to reduce race conditions
     """)
 )
-async def create_fastq(fastq_set_obj_create: FastqSetCreate) -> FastqSetResponseDict:
+def create_fastq(fastq_set_obj_create: FastqSetCreate) -> FastqSetResponseDict:
+    # Read the existing fastqs of the fastq set in BatchGetItem calls,
+    # each FastqData.get below is then served from the request identity map
+    try:
+        batch_get_data_map(
+            FastqData,
+            filter(lambda fastq_obj_iter_: isinstance(fastq_obj_iter_, str), fastq_set_obj_create.fastq_set)
+        )
+    except DoesNotExist as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
     # Confirm that the library id matches those in the fastq objects
     if len(set(list(map(
         lambda fastq_obj: fastq_obj.library.orcabus_id,
@@ -347,15 +464,20 @@ async def create_fastq(fastq_set_obj_create: FastqSetCreate) -> FastqSetResponse
             fastq_set_obj_create.fastq_set
         ))
     ))
-    for rgid_ext_iter_ in rgid_exts:
-        for existing_iter in list(FastqData.query(
-            A.rgid_ext == rgid_ext_iter_,
-            index="rgid_ext-index",
-            load_full_item=True
-        )):
-            if not existing_iter.id in existing_fqr_orcabus_ids:
-                has_duplicates = True
-                errors.append(f"Fastq with rgid_ext '{rgid_ext_iter_}' already exists")
+    # We only need the id and rgid_ext of any existing fastqs, so query the index only
+    for existing_iter_ in query_index_items(
+        FastqData.__table_name__,
+        IndexQuery(
+            index_name="rgid_ext-index",
+            key_attr="rgid_ext",
+            key_values=rgid_exts,
+            filter_condition=None,
+        ),
+        attributes=['id', 'rgid_ext']
+    ):
+        if not existing_iter_['id'] in existing_fqr_orcabus_ids:
+            has_duplicates = True
+            errors.append(f"Fastq with rgid_ext '{existing_iter_['rgid_ext']}' already exists")
     if has_duplicates:
         raise HTTPException(
             status_code=409,
@@ -365,28 +487,34 @@ async def create_fastq(fastq_set_obj_create: FastqSetCreate) -> FastqSetResponse
     # Get library object
     library_obj = LibraryData(**dict(fastq_set_obj_create.library))
 
-    # Check for this library if there is a current fastq set
+    # Check for this library if there is a current fastq set,
+    # or a fastq set accepting additional fastqs (both are projected into the library index)
+    library_fastq_set_items = []
+    if fastq_set_obj_create.is_current_fastq_set or fastq_set_obj_create.allow_additional_fastq:
+        library_fastq_set_items = query_index_items(
+            FastqSetData.__table_name__,
+            IndexQuery(
+                index_name="library_orcabus_id-index",
+                key_attr="library_orcabus_id",
+                key_values=[library_obj.orcabus_id],
+                filter_condition=None,
+            ),
+            attributes=['id', 'is_current_fastq_set', 'allow_additional_fastq']
+        )
     if fastq_set_obj_create.is_current_fastq_set:
-        # Check if there is a current fastq set in the library
-        # Check if there are other fastq sets in the library
-        if len(list(FastqSetData.query(
-                A.library_orcabus_id == library_obj.orcabus_id,
-                filter_condition=(A.is_current_fastq_set == True),
-                index="library_orcabus_id-index",
-                load_full_item=True
-        ))) > 0:
+        if any(map(
+            lambda fastq_set_item_iter_: fastq_set_item_iter_.get('is_current_fastq_set', False),
+            library_fastq_set_items
+        )):
             raise HTTPException(
                 status_code=409,
                 detail=f"Cannot create fastq set. Another fastq set in library '{fastq_set_obj_create.library.library_id}' is already the current fastq set"
             )
     if fastq_set_obj_create.allow_additional_fastq:
-        # Check if there are other fastq sets in the library
-        if len(list(FastqSetData.query(
-                A.library_orcabus_id == library_obj.orcabus_id,
-                filter_condition=(A.allow_additional_fastq == True),
-                index="library_orcabus_id-index",
-                load_full_item=True
-        ))) > 0:
+        if any(map(
+            lambda fastq_set_item_iter_: fastq_set_item_iter_.get('allow_additional_fastq', False),
+            library_fastq_set_items
+        )):
             raise HTTPException(
                 status_code=409,
                 detail=f"Cannot create fastq set. Another fastq set in library '{fastq_set_obj_create.library.orcabus_id}' is already accepting additional fastqs."
@@ -410,6 +538,14 @@ async def create_fastq(fastq_set_obj_create: FastqSetCreate) -> FastqSetResponse
         fastq_set_ids=list(map(lambda fastq_data_obj_iter_: fastq_data_obj_iter_.id, fastq_data_objs))
     )
 
+    # Keep the fastq count and latest instrument run id of the fastq set
+    fastq_set_data_obj.update_fastq_summary(
+        dict(map(
+            lambda fastq_obj_iter_: (fastq_obj_iter_.id, fastq_obj_iter_),
+            fastq_data_objs
+        ))
+    )
+
     # Check all fastqs are valid
     all_valid = True
     for fastq_obj in fastq_data_objs:
@@ -430,30 +566,61 @@ async def create_fastq(fastq_set_obj_create: FastqSetCreate) -> FastqSetResponse
                    f"{fastq_set_data_obj.library.orcabus_id} != {first_fastq_obj.library.orcabus_id}"
         )
 
-    # Add the fastq_set_id to the fastq objects
-    for fastq_obj in fastq_data_objs:
-        fastq_obj.fastq_set_id = fastq_set_data_obj.id
-        fastq_obj.save()
-
-    # Save the fastq set
-    fastq_set_data_obj.save()
+    # Commit the writes, along with their events, in a single transaction
+    # (the events of each write are put straight after the write, so a create too large for a single transaction
+    # still commits each write along with its events)
+    try:
+        with write_transaction():
+            # No other fastq set of the library has since become the current fastq set (or accepting additional fastqs)
+            # Checked first, so a failed check writes nothing, even for a create too large for a single transaction
+            library_fastq_set_condition = combine_conditions(
+                (
+                    Attr('is_current_fastq_set').not_exists() | Attr('is_current_fastq_set').eq(False)
+                    if fastq_set_obj_create.is_current_fastq_set
+                    else None
+                ),
+                (
+                    Attr('allow_additional_fastq').not_exists() | Attr('allow_additional_fastq').eq(False)
+                    if fastq_set_obj_create.allow_additional_fastq
+                    else None
+                ),
+            )
+            for fastq_set_item in library_fastq_set_items:
+                condition_check(FastqSetData, fastq_set_item['id'], library_fastq_set_condition)
+
+            # Add the fastq_set_id to the fastq objects, along with the create events
+            # Existing fastqs must not have been changed (i.e linked to another fastq set) since we read them
+            for fastq_obj in fastq_data_objs:
+                fastq_obj.fastq_set_id = fastq_set_data_obj.id
+                if fastq_obj.id in existing_fqr_orcabus_ids:
+                    save_if_unchanged(fastq_obj)
+                else:
+                    save_if_not_exists(fastq_obj)
+                put_fastq_update_event(
+                    event_status='FASTQ_CREATED',
+                    fastq_obj=fastq_obj
+                )
 
-    # Generate the fastq set dictionary
-    # This will also calculate all of the s3 details for all fastq list rows
-    fastq_set_dict = fastq_set_data_obj.to_dict()
+            # Save the fastq set
+            save_if_not_exists(fastq_set_data_obj)
 
-    # Add in the create events
-    for fastq_obj in fastq_data_objs:
-        put_fastq_update_event(
-            fastq_response_object=fastq_obj.to_dict(),
-            event_status='FASTQ_CREATED'
-        )
+            # Generate the fastq set dictionary
+            # This will also calculate all of the s3 details for all fastq list rows
+            fastq_set_dict = fastq_set_data_obj.to_dict(
+                fastq_data_map=dict(map(
+                    lambda fastq_obj_iter_: (fastq_obj_iter_.id, fastq_obj_iter_),
+                    fastq_data_objs
+                ))
+            )
 
-    # Add in the fastq set created event
-    put_fastq_set_update_event(
-        fastq_set_response_object=fastq_set_dict,
-        event_status='FASTQ_SET_CREATED',
-    )
+            # Add in the fastq set created event
+            put_fastq_set_update_event(
+                fastq_set_response_object=fastq_set_dict,
+                event_status='FASTQ_SET_CREATED',
+                fastq_set_obj=fastq_set_data_obj
+            )
+    except TransactionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     # Return the fastq as a dictionary
     return fastq_set_dict
@@ -466,7 +633,7 @@ async def create_fastq(fastq_set_obj_create: FastqSetCreate) -> FastqSetResponse
     tags=["fastqset ntsm"],
     description="Validate all fastq list rows in the ntsm match, run all-by-all on the ntsms in the fastq set"
 )
-async def validate_ntsm_internal(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id)) -> Dict:
+def validate_ntsm_internal(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id)) -> Dict:
     # Get the fastq set object
     fastq_set_obj = FastqSetData.get(fastq_set_id)
 
@@ -478,10 +645,7 @@ async def validate_ntsm_internal(fastq_set_id: str = Depends(sanitise_fqs_orcabu
         )
 
     # Get the fastq list rows
-    fastq_list = list(map(
-        lambda fastq_set_id_iter: FastqData.get(fastq_set_id_iter),
-        fastq_set_obj.fastq_set_ids
-    ))
+    fastq_list = fastq_set_obj.get_fastq_objs()
 
     # Check fastq list rows have an ntsm object
     if not all(list(filter(
@@ -505,7 +669,7 @@ async def validate_ntsm_internal(fastq_set_id: str = Depends(sanitise_fqs_orcabu
     tags=["fastqset ntsm"],
     description="Validate all fastq list rows in the ntsm match, run all-by-all on the ntsms in the fastq set"
 )
-async def validate_ntsm_external(
+def validate_ntsm_external(
         fastq_set_id_x: str = Depends(sanitise_fqs_orcabus_id_x),
         fastq_set_id_y = Depends(sanitise_fqs_orcabus_id_y)
 ) -> Dict:
@@ -520,11 +684,9 @@ async def validate_ntsm_external(
             detail=f"Fastq set '{fastq_set_id_x}' does not exist"
         )
 
-    # Get the fastq list rows
-    fastq_list_x = list(map(
-        lambda fastq_obj_iter_: FastqData.get(fastq_obj_iter_),
-        fastq_set_obj_x.fastq_set_ids
-    ))
+    # Get the fastq list rows for both fastq sets in a single batch
+    fastq_data_map = FastqSetData.get_fastq_data_map([fastq_set_obj_x, fastq_set_obj_y])
+    fastq_list_x = fastq_set_obj_x.get_fastq_objs(fastq_data_map)
 
     # Check fastq list rows have an ntsm object
     if not all(list(filter(
@@ -544,10 +706,7 @@ async def validate_ntsm_external(
         )
 
     # Get the fastq list rows
-    fastq_list_y = list(map(
-        lambda fastq_obj_iter_: FastqData.get(fastq_obj_iter_),
-        fastq_set_obj_y.fastq_set_ids
-    ))
+    fastq_list_y = fastq_set_obj_y.get_fastq_objs(fastq_data_map)
 
     # Check fastq list rows have an ntsm object
     if not all(list(filter(
@@ -570,7 +729,7 @@ async def validate_ntsm_external(
     tags=["fastqset somalier"],
     description="Extract Fingerprints from either a BAM that represents the fastq set or from the fastq files directly via a tiny alignment"
 )
-async def extract_fingerprint_patch(
+def extract_fingerprint_patch(
         fastq_set_id: str = Depends(sanitise_fqs_orcabus_id),
         extract_fingerprint: ExtractFingerprintPatch = Depends()
 ) -> Dict:
@@ -631,7 +790,7 @@ async def extract_fingerprint_patch(
     tags=["fastqset somalier"],
     description="Add Fingerprints"
 )
-async def add_fingerprint(
+def add_fingerprint(
         fastq_set_id: str = Depends(sanitise_fqs_orcabus_id),
         somalier: SomalierUriUpdate = Depends()
 ) -> FastqSetResponseDict:
@@ -642,21 +801,29 @@ async def add_fingerprint(
             detail=f"Fastq set '{fastq_set_id}' does not exist"
         )
 
-    fastq_set = FastqSetData.get(fastq_set_id)
-    fastq_set.somalier = SomalierUriData(**dict(somalier.model_dump())).somalier
-    fastq_set.save()
+    somalier_data = SomalierUriData(**dict(somalier.model_dump())).somalier
 
-    fastq_set.save()
+    def apply_update(fastq_set_obj: FastqSetData) -> List[str]:
+        fastq_set_obj.somalier = somalier_data
+        return ["somalier"]
 
-    # Generate fastq object as a dict with s3 details
-    fastq_set_dict = fastq_set.to_dict()
+    def put_update_event(fastq_set_obj: FastqSetData) -> FastqSetResponseDict:
+        # Generate fastq object as a dict with s3 details
+        fastq_set_dict = fastq_set_obj.to_dict()
 
-    put_fastq_set_update_event(
-        fastq_set_response_object=fastq_set_dict,
-        event_status='SOMALIER_UPDATED'
-    )
+        put_fastq_set_update_event(
+            fastq_set_response_object=fastq_set_dict,
+            event_status='SOMALIER_UPDATED',
+            fastq_set_obj=fastq_set_obj
+        )
 
-    return fastq_set_dict
+        return fastq_set_dict
+
+    # Write only the fingerprint, along with its event, retrying on a version conflict
+    try:
+        return update_with_retry(FastqSetData, fastq_set_id, apply_update, put_update_event)
+    except VersionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 
 # GET /fastqSet/{fastqSetId}/jobs - Get all jobs for a given fastq set id
@@ -665,7 +832,7 @@ async def add_fingerprint(
     tags=["fastqset jobs"],
     description="Get all jobs for a given fastq set id, sorted by start_time descending"
 )
-async def get_fastq_set_jobs(
+def get_fastq_set_jobs(
         fastq_set_id: str = Depends(sanitise_fqs_orcabus_id),
         pagination: QueryPagination = Depends(get_pagination_params),
 ) -> FastqSetJobQueryPaginatedResponse:
@@ -686,10 +853,10 @@ async def get_fastq_set_jobs(
 
     # Query all jobs for this fastq set
     jobs = list(
+        # All job attributes are projected into the index, so we don't need to read the base table
         FastqSetJobData.query(
             A.fastq_set_id == fastq_set_id,
             index="fastq_set_id-index",
-            load_full_item=True
         )
     )
 
@@ -717,25 +884,32 @@ async def get_fastq_set_jobs(
     tags=["fastqset query"],
     description="Get a Fastq Set Object by its orcabus id, 'fqs.' prefix is optional"
 )
-async def get_fastq(
+def get_fastq(
         fastq_set_id: str = Depends(sanitise_fqs_orcabus_id),
         # Include s3 uri - resolve the s3 uri if requested
         include_s3_details: Optional[bool] = Query(
             default=False,
             alias="includeS3Details",
             description="Include the s3 uris for the fastq objects"
-        )
+        ),
+        # Sparse fieldsets
+        fields: Optional[str] = Depends(get_fields),
 ) -> FastqSetResponseDict:
+    field_tree = parse_fields(fields, FastqSetResponseDict)
     try:
-        return FastqSetListResponse(
+        fastq_set_dict = FastqSetListResponse(
             fastq_set_list=[
                 FastqSetData.get(fastq_set_id)
             ],
-            include_s3_details=include_s3_details
+            include_s3_details=include_s3_details,
+            fields=field_tree
         ).model_dump(by_alias=True)[0]
     except DoesNotExist as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+    # Already serialized, return directly
+    return json_response(fastq_set_dict)
+
 # Modified Gets
 
 # GET /fastqSet/{fastqSetId}/toFastqListRows - Get fastq list rows for a given fastq set id
@@ -744,7 +918,7 @@ async def get_fastq(
     tags=["fastqset workflow"],
     description="Return in fastq list row format"
 )
-async def to_fastq_list_rows(
+def to_fastq_list_rows(
         fastq_set_id: str = Depends(sanitise_fqs_orcabus_id),
         bucket: Optional[str] = Query(
             default=None,
@@ -756,10 +930,31 @@ async def to_fastq_list_rows(
             description="If provided, return the s3-uri for the ingest id that belongs to this key prefix"
         )
 ) -> List[FastqListRowDict]:
-    return FastqSetData.get(fastq_set_id).to_fastq_list_rows(
-        bucket=bucket,
-        key_prefix=key_prefix
-    )
+    try:
+        return FastqSetData.get(fastq_set_id).to_fastq_list_rows(
+            bucket=bucket,
+            key_prefix=key_prefix
+        )
+    except FastqMissingReadSetError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+# GET /fastqSet/{fastqSetId}/presign - Get presigned urls for every fastq in the fastq set
+@router.get(
+    "/{fastq_set_id}/presign",
+    tags=["fastqset download"],
+    description="Get presigned urls for the fastq file pairs of every fastq in the fastq set"
+)
+def get_presigned_urls(
+        fastq_set_id: str = Depends(sanitise_fqs_orcabus_id),
+) -> List[FastqPresignedUrlModel]:
+    try:
+        fastq_set_obj = FastqSetData.get(fastq_set_id)
+    except DoesNotExist as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    return json_response(fastq_set_obj.presign_uris())
+
 
 # Patches
 
@@ -769,7 +964,7 @@ async def to_fastq_list_rows(
     tags=["fastqset update"],
     description="Link a fastq object to this fastq set"
 )
-async def link_fastq(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id), fastq_id = Depends(sanitise_fqr_orcabus_id)) -> FastqSetResponseDict:
+def link_fastq(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id), fastq_id = Depends(sanitise_fqr_orcabus_id)) -> FastqSetResponseDict:
     fastq_set_obj = FastqSetData.get(fastq_set_id)
     fastq_obj = FastqData.get(fastq_id)
 
@@ -808,29 +1003,38 @@ async def link_fastq(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id), fastq
             detail=f"Fastq '{fastq_id}' is not a valid fastq"
         )
 
-    # Add the fastq set id to the fastq object
-    fastq_obj.fastq_set_id = fastq_set_id
-
-    # Save the fastq object
-    fastq_obj.save()
-
-    # Append fastq object to fastq set
-    fastq_set_obj.fastq_set_ids.append(fastq_obj.id)
-    fastq_set_obj.save()
-
-    # Create dicts (and cache s3 details)
-    fastq_set_dict = fastq_set_obj.to_dict()
-    fastq_dict = fastq_obj.to_dict()
-
-    # Add in the updated events
-    put_fastq_update_event(
-        fastq_response_object=fastq_dict,
-        event_status='FASTQ_SET_UPDATED'
-    )
-    put_fastq_set_update_event(
-        fastq_set_response_object=fastq_set_dict,
-        event_status='FASTQ_LINKED'
-    )
+    # Commit the writes, along with their events, in a single transaction
+    # Neither the fastq nor the fastq set may have been changed since we checked them
+    try:
+        with write_transaction():
+            # Add the fastq set id to the fastq object
+            fastq_obj.fastq_set_id = fastq_set_id
+
+            # Save the fastq object
+            save_if_unchanged(fastq_obj)
+
+            # Append fastq object to fastq set
+            fastq_set_obj.fastq_set_ids.append(fastq_obj.id)
+            fastq_set_obj.update_fastq_summary({fastq_obj.id: fastq_obj})
+            save_if_unchanged(fastq_set_obj)
+
+            # Create dicts (and cache s3 details)
+            fastq_set_dict = fastq_set_obj.to_dict(fastq_data_map={fastq_obj.id: fastq_obj})
+            fastq_dict = fastq_obj.to_dict()
+
+            # Add in the updated events
+            put_fastq_update_event(
+                fastq_response_object=fastq_dict,
+                event_status='FASTQ_SET_UPDATED',
+                fastq_obj=fastq_obj
+            )
+            put_fastq_set_update_event(
+                fastq_set_response_object=fastq_set_dict,
+                event_status='FASTQ_LINKED',
+                fastq_set_obj=fastq_set_obj
+            )
+    except TransactionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     return fastq_set_dict
 
@@ -841,7 +1045,7 @@ async def link_fastq(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id), fastq
     tags=["fastqset update"],
     description="Unlink a fastq object to this fastq set"
 )
-async def unlink_fastq(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id), fastq_id = Depends(sanitise_fqr_orcabus_id)) -> Union[FastqSetResponse, EmptyDict]:
+def unlink_fastq(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id), fastq_id = Depends(sanitise_fqr_orcabus_id)) -> Union[FastqSetResponse, EmptyDict]:
     fastq_set_obj = FastqSetData.get(fastq_set_id)
     fastq_obj = FastqData.get(fastq_id)
 
@@ -866,8 +1070,12 @@ async def unlink_fastq(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id), fas
             detail=f"Fastq '{fastq_id}' is not a member of fastq set '{fastq_set_id}'"
         )
 
-    # Clean up
-    unlink_with_cleanup(fastq_set_obj, fastq_obj)
+    # Clean up, committing the writes, along with their events, in a single transaction
+    try:
+        with write_transaction():
+            unlink_with_cleanup(fastq_set_obj, fastq_obj)
+    except TransactionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     # Reload the fastq set
     try:
@@ -884,7 +1092,7 @@ async def unlink_fastq(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id), fas
     tags=["fastqset update"],
     description="Set this fastq set as the current fastq set for this library"
 )
-async def set_is_current_fastq_set(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id)) -> FastqSetResponseDict:
+def set_is_current_fastq_set(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id)) -> FastqSetResponseDict:
     fastq_set_obj = FastqSetData.get(fastq_set_id)
 
     # Check fastq set exists
@@ -901,13 +1109,24 @@ async def set_is_current_fastq_set(fastq_set_id: str = Depends(sanitise_fqs_orca
             detail=f"Fastq set '{fastq_set_id}' is already the current fastq set"
         )
 
-    # Check if there are other fastq sets in the library
-    if len(list(FastqSetData.query(
-        A.library_orcabus_id == fastq_set_obj.library_orcabus_id,
-        filter_condition=(A.id != fastq_set_id) & (A.is_current_fastq_set == True),
-        index="library_orcabus_id-index",
-        load_full_item=True
-    ))) > 0:
+    # Check if there are other fastq sets in the library (the flag is projected into the library index)
+    library_fastq_set_items = list(filter(
+        lambda fastq_set_item_iter_: fastq_set_item_iter_['id'] != fastq_set_id,
+        query_index_items(
+            FastqSetData.__table_name__,
+            IndexQuery(
+                index_name="library_orcabus_id-index",
+                key_attr="library_orcabus_id",
+                key_values=[fastq_set_obj.library_orcabus_id],
+                filter_condition=None,
+            ),
+            attributes=['id', 'is_current_fastq_set']
+        )
+    ))
+    if any(map(
+        lambda fastq_set_item_iter_: fastq_set_item_iter_.get('is_current_fastq_set', False),
+        library_fastq_set_items
+    )):
         raise HTTPException(
             status_code=409,
             detail=f"Another fastq set in library '{fastq_set_obj.library_orcabus_id}' is already the current fastq set"
@@ -915,13 +1134,28 @@ async def set_is_current_fastq_set(fastq_set_id: str = Depends(sanitise_fqs_orca
 
     # Set the fastq set as the current fastq set
     fastq_set_obj.is_current_fastq_set = True
-    fastq_set_obj.save()
 
-    fastq_set_dict = fastq_set_obj.to_dict()
-    put_fastq_set_update_event(
-        fastq_set_response_object=fastq_set_dict,
-        event_status='FASTQ_SET_IS_CURRENT'
-    )
+    # Commit the write along with its events, in a single transaction
+    # Neither the fastq set, nor whether another fastq set of the library is the current fastq set,
+    # may have changed since we checked them
+    try:
+        with write_transaction():
+            for fastq_set_item in library_fastq_set_items:
+                condition_check(
+                    FastqSetData, fastq_set_item['id'],
+                    Attr('is_current_fastq_set').not_exists() | Attr('is_current_fastq_set').eq(False)
+                )
+
+            save_if_unchanged(fastq_set_obj)
+
+            fastq_set_dict = fastq_set_obj.to_dict()
+            put_fastq_set_update_event(
+                fastq_set_response_object=fastq_set_dict,
+                event_status='FASTQ_SET_IS_CURRENT',
+                fastq_set_obj=fastq_set_obj
+            )
+    except TransactionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     # Return the fastq set as a dictionary
     return fastq_set_dict
@@ -933,7 +1167,7 @@ async def set_is_current_fastq_set(fastq_set_id: str = Depends(sanitise_fqs_orca
     tags=["fastqset update"],
     description="Set current fastq set flag to false for this fastq set"
 )
-async def set_is_not_current_fastq_set(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id)) -> FastqSetResponseDict:
+def set_is_not_current_fastq_set(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id)) -> FastqSetResponseDict:
     fastq_set_obj = FastqSetData.get(fastq_set_id)
 
     # Check fastq set exists
@@ -952,13 +1186,20 @@ async def set_is_not_current_fastq_set(fastq_set_id: str = Depends(sanitise_fqs_
 
     # Set the fastq set as the current fastq set
     fastq_set_obj.is_current_fastq_set = False
-    fastq_set_obj.save()
 
-    fastq_set_dict = fastq_set_obj.to_dict()
-    put_fastq_set_update_event(
-        fastq_set_response_object=fastq_set_dict,
-        event_status='FASTQ_SET_IS_NOT_CURRENT'
-    )
+    # Commit the write along with its events, the fastq set may not have been changed since we checked it
+    try:
+        with write_transaction():
+            save_if_unchanged(fastq_set_obj)
+
+            fastq_set_dict = fastq_set_obj.to_dict()
+            put_fastq_set_update_event(
+                fastq_set_response_object=fastq_set_dict,
+                event_status='FASTQ_SET_IS_NOT_CURRENT',
+                fastq_set_obj=fastq_set_obj
+            )
+    except TransactionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     # Return the fastq set as a dictionary
     return fastq_set_dict
@@ -969,7 +1210,7 @@ async def set_is_not_current_fastq_set(fastq_set_id: str = Depends(sanitise_fqs_
     tags=["fastqset update"],
     description="Allow additional fastqs to this fastq set"
 )
-async def set_allow_additional_fastqs(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id)) -> FastqSetResponseDict:
+def set_allow_additional_fastqs(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id)) -> FastqSetResponseDict:
     fastq_set_obj = FastqSetData.get(fastq_set_id)
 
     # Check fastq set exists
@@ -986,16 +1227,24 @@ async def set_allow_additional_fastqs(fastq_set_id: str = Depends(sanitise_fqs_o
             detail=f"Fastq set '{fastq_set_id}' already allows additional fastqs"
         )
 
-    # Check if there are other fastq sets in the library
-    if len(list(filter(
-            lambda fastq_set_iter_: fastq_set_iter_.id != fastq_set_id,
-            list(FastqSetData.query(
-                A.library_orcabus_id == fastq_set_obj.library_orcabus_id,
-                filter_condition=(A.allow_additional_fastq == True),
-                index="library_orcabus_id-index",
-                load_full_item=True
-            ))
-    ))) > 0:
+    # Check if there are other fastq sets in the library (the flag is projected into the library index)
+    library_fastq_set_items = list(filter(
+        lambda fastq_set_item_iter_: fastq_set_item_iter_['id'] != fastq_set_id,
+        query_index_items(
+            FastqSetData.__table_name__,
+            IndexQuery(
+                index_name="library_orcabus_id-index",
+                key_attr="library_orcabus_id",
+                key_values=[fastq_set_obj.library_orcabus_id],
+                filter_condition=None,
+            ),
+            attributes=['id', 'allow_additional_fastq']
+        )
+    ))
+    if any(map(
+        lambda fastq_set_item_iter_: fastq_set_item_iter_.get('allow_additional_fastq', False),
+        library_fastq_set_items
+    )):
         raise HTTPException(
             status_code=409,
             detail=f"Another fastq set in library '{fastq_set_obj.library_orcabus_id}' is already accepting additional fastqs"
@@ -1003,13 +1252,28 @@ async def set_allow_additional_fastqs(fastq_set_id: str = Depends(sanitise_fqs_o
 
     # Set the fastq set as the current fastq set
     fastq_set_obj.allow_additional_fastq = True
-    fastq_set_obj.save()
 
-    fastq_set_dict = fastq_set_obj.to_dict()
-    put_fastq_set_update_event(
-        fastq_set_response_object=fastq_set_dict,
-        event_status='FASTQ_SET_ADDITIONAL_FASTQS_ALLOWED',
-    )
+    # Commit the write along with its events, in a single transaction
+    # Neither the fastq set, nor whether another fastq set of the library accepts additional fastqs,
+    # may have changed since we checked them
+    try:
+        with write_transaction():
+            for fastq_set_item in library_fastq_set_items:
+                condition_check(
+                    FastqSetData, fastq_set_item['id'],
+                    Attr('allow_additional_fastq').not_exists() | Attr('allow_additional_fastq').eq(False)
+                )
+
+            save_if_unchanged(fastq_set_obj)
+
+            fastq_set_dict = fastq_set_obj.to_dict()
+            put_fastq_set_update_event(
+                fastq_set_response_object=fastq_set_dict,
+                event_status='FASTQ_SET_ADDITIONAL_FASTQS_ALLOWED',
+                fastq_set_obj=fastq_set_obj
+            )
+    except TransactionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     # Return the fastq set as a dictionary
     return fastq_set_dict
@@ -1021,7 +1285,7 @@ async def set_allow_additional_fastqs(fastq_set_id: str = Depends(sanitise_fqs_o
     tags=["fastqset update"],
     description="Disallow additional fastqs to this fastq set"
 )
-async def set_allow_additional_fastqs_to_false(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id)) -> FastqSetResponseDict:
+def set_allow_additional_fastqs_to_false(fastq_set_id: str = Depends(sanitise_fqs_orcabus_id)) -> FastqSetResponseDict:
     fastq_set_obj = FastqSetData.get(fastq_set_id)
 
     # Check fastq set exists
@@ -1040,13 +1304,20 @@ async def set_allow_additional_fastqs_to_false(fastq_set_id: str = Depends(sanit
 
     # Set the fastq set as the current fastq set
     fastq_set_obj.allow_additional_fastq = False
-    fastq_set_obj.save()
 
-    fastq_set_dict = fastq_set_obj.to_dict()
-    put_fastq_set_update_event(
-        fastq_set_response_object=fastq_set_dict,
-        event_status='FASTQ_SET_ADDITIONAL_FASTQS_DISALLOWED',
-    )
+    # Commit the write along with its events, the fastq set may not have been changed since we checked it
+    try:
+        with write_transaction():
+            save_if_unchanged(fastq_set_obj)
+
+            fastq_set_dict = fastq_set_obj.to_dict()
+            put_fastq_set_update_event(
+                fastq_set_response_object=fastq_set_dict,
+                event_status='FASTQ_SET_ADDITIONAL_FASTQS_DISALLOWED',
+                fastq_set_obj=fastq_set_obj
+            )
+    except TransactionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     # Return the fastq set as a dictionary
     return fastq_set_dict
@@ -1058,7 +1329,7 @@ async def set_allow_additional_fastqs_to_false(fastq_set_id: str = Depends(sanit
     tags=["fastqset merge"],
     description="Merge multiple fastq sets into a single fastq set"
 )
-async def merge_fastq_sets(
+def merge_fastq_sets(
         fastq_set_ids: MergePatch = Depends()
 ) -> FastqSetResponseDict:
     # Check that the fastq set ids are unique
@@ -1076,18 +1347,19 @@ async def merge_fastq_sets(
             detail="Need at least two fastq set ids to merge"
         )
 
-    # Get all items as objects
-    fastq_set_obj_list = list(map(
-        lambda fastq_set_id_iter_: FastqSetData.get(fastq_set_id_iter_),
-        fastq_set_ids
-    ))
-
-    # Check all fastq sets exist
-    if None in fastq_set_obj_list:
+    # Get all items as objects (in BatchGetItem calls)
+    try:
+        fastq_set_data_map = batch_get_data_map(FastqSetData, fastq_set_ids)
+    except DoesNotExist:
+        # Check all fastq sets exist
         raise HTTPException(
             status_code=404,
             detail="One or more fastq sets do not exist"
         )
+    fastq_set_obj_list = list(map(
+        lambda fastq_set_id_iter_: fastq_set_data_map[fastq_set_id_iter_],
+        fastq_set_ids
+    ))
 
     # Check that the library orcabus id matches for all the fastq sets
     if len(set(list(map(
@@ -1107,8 +1379,9 @@ async def merge_fastq_sets(
             fastq_set_obj_list
         ))
     ))))
+    fastq_data_map = batch_get_data_map(FastqData, fastq_obj_id_list)
     fastq_obj_list = list(map(
-        lambda fastq_obj_id_iter_: FastqData.get(fastq_obj_id_iter_),
+        lambda fastq_obj_id_iter_: fastq_data_map[fastq_obj_id_iter_],
         fastq_obj_id_list
     ))
 
@@ -1136,37 +1409,55 @@ async def merge_fastq_sets(
         is_current_fastq_set=is_current_fastq_set,
         fastq_set_ids=fastq_id_list
     )
-    new_fastq_set_data_obj.save()
+    new_fastq_set_data_obj.update_fastq_summary(fastq_data_map)
 
-    # Delete the old fastq sets
-    for fastq_set_obj in fastq_set_obj_list:
-        fastq_set_obj.delete()
-        put_fastq_set_update_event(
-            fastq_set_response_object={
-                "fastqSetId": fastq_set_obj.id
-            },
-            event_status='FASTQ_SET_DELETED',
-        )
+    # Commit the writes, along with their events, in a single transaction
+    # The fastqs are moved to the new fastq set before the old fastq sets are deleted,
+    # so even a merge too large for a single transaction never leaves a fastq pointing at a deleted fastq set
+    try:
+        with write_transaction():
+            save_if_not_exists(new_fastq_set_data_obj)
+
+            # For each fastq object, update the fastq set id
+            # (neither the fastqs nor the old fastq sets may have been changed since we read them)
+            for fastq_obj in fastq_obj_list:
+                fastq_obj.fastq_set_id = new_fastq_set_data_obj.id
+                save_if_unchanged(fastq_obj)
+                put_fastq_update_event(
+                    event_status='FASTQ_SET_UPDATED',
+                    fastq_obj=fastq_obj
+                )
 
-    # For each fastq object, update the fastq set id
-    for fastq_obj in fastq_obj_list:
-        fastq_obj.fastq_set_id = new_fastq_set_data_obj.id
-        fastq_obj.save()
-        put_fastq_update_event(
-            fastq_response_object=fastq_obj.to_dict(),
-            event_status='FASTQ_SET_UPDATED'
-        )
+            # Delete the old fastq sets
+            for fastq_set_obj in fastq_set_obj_list:
+                delete_if_unchanged(fastq_set_obj)
+                put_fastq_set_update_event(
+                    fastq_set_response_object={
+                        "fastqSetId": fastq_set_obj.id
+                    },
+                    event_status='FASTQ_SET_DELETED',
+                    fastq_set_obj=fastq_set_obj
+                )
 
-    new_fastq_set_data_obj_dict = new_fastq_set_data_obj.to_dict()
-    put_fastq_set_update_event(
-        fastq_set_response_object={
-            "newFastqSetId": new_fastq_set_data_obj.id,
-            "oldFastqSetIds": fastq_set_ids,
-            "libraryId": new_fastq_set_data_obj.library,
-            "fastqListRowIds": fastq_id_list
-        },
-        event_status='FASTQ_SET_MERGED',
-    )
+            new_fastq_set_data_obj_dict = new_fastq_set_data_obj.to_dict(
+                fastq_data_map=dict(map(
+                    lambda fastq_obj_iter_: (fastq_obj_iter_.id, fastq_obj_iter_),
+                    fastq_obj_list
+                ))
+            )
+            put_fastq_set_update_event(
+                fastq_set_response_object={
+                    "newFastqSetId": new_fastq_set_data_obj.id,
+                    "oldFastqSetIds": fastq_set_ids,
+                    "libraryId": new_fastq_set_data_obj.library.library_id,
+                    "fastqListRowIds": fastq_id_list
+                },
+                event_status='FASTQ_SET_MERGED',
+                fastq_set_obj=new_fastq_set_data_obj,
+                merged_fastq_set_ids=fastq_set_ids
+            )
+    except TransactionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
     # Return the new fastq set object
     return new_fastq_set_data_obj_dict
@@ -41,7 +41,7 @@ router = APIRouter()
     tags=["multiqc"],
     description="Generate a multiqc report for a set of fastq files",
 )
-async def generate_multiqc_report(
+def generate_multiqc_report(
         fastq_id_list: List[str] = Depends(sanitise_fqr_orcabus_id_list),
         # FIXME add query - to combine library lanes?
 ) -> MultiqcJobResponseDict:
@@ -106,7 +106,7 @@ async def generate_multiqc_report(
     tags=["multiqc presign"],
     description="Get a presigned URL for a multiqc report job by its ID",
 )
-async def get_multiqc_report_presigned_url(
+def get_multiqc_report_presigned_url(
         multiqc_job_id: str = Depends(sanitise_multiqc_job_id)
 ) -> str:
     multiqc_job_obj = MultiqcJobData.get(multiqc_job_id)
@@ -129,7 +129,7 @@ async def get_multiqc_report_presigned_url(
     tags=["multiqc get"],
     description="Get a multiqc report job by its ID",
 )
-async def get_multiqc_job(
+def get_multiqc_job(
         multiqc_job_id: str = Depends(sanitise_multiqc_job_id),
         include_s3_details: Optional[bool] = Query(
             default=False,
@@ -151,7 +151,7 @@ async def get_multiqc_job(
     tags=["multiqc update"],
     description="Update the job status of a multiqc report",
 )
-async def add_multiqc_job_status_update(
+def add_multiqc_job_status_update(
         multiqc_job_id: str = Depends(sanitise_multiqc_job_id),
         multiqc_job_information: Annotated[MultiqcJobPatch, Body()] = get_default_patch_multiqc_job_entry()
 ) -> MultiqcJobResponseDict:
@@ -8,7 +8,12 @@ Some shortcut routes for getting the fastq object from the rgid
 from typing import Optional
 from fastapi import Depends, Query
 from fastapi.routing import APIRouter, HTTPException
-from dyntastic import A
+
+# Local imports
+from . import get_fields
+from ....fieldsets import parse_fields
+from ....responses import json_response
+from ....index_query import query_index_ids
 
 # Model imports
 from ....models.fastq import (
@@ -24,7 +29,7 @@ router = APIRouter()
     tags=["rgid query"],
     description="Get a Fastq Object by its rgid (index.lane.instrument_run_id) / (CCGCGGTT+CTAGCGCT.2.241024_A00130_0336_BHW7MVDSXC)"
 )
-async def get_fastq_from_rgid(
+def get_fastq_from_rgid(
         rgid: str = Depends(sanitise_rgid),
         # Include s3 uri - resolve the s3 uri if requested
         include_s3_details: Optional[bool] = Query(
@@ -32,28 +37,32 @@ async def get_fastq_from_rgid(
             alias="includeS3Details",
             description="Include the s3 details such as s3 uri and storage class"
         ),
+        # Sparse fieldsets
+        fields: Optional[str] = Depends(get_fields),
 ) -> Optional[FastqResponseDict]:
-    query_response = list(FastqData.query(
-        A.rgid_ext == rgid,
-        index="rgid_ext-index",
-        load_full_item=True
-    ))
+    field_tree = parse_fields(fields, FastqResponseDict)
+
+    # We only need the id from the index, the full item is read once below
+    fastq_ids = query_index_ids(
+        FastqData.__table_name__,
+        index_name="rgid_ext-index",
+        key_attr="rgid_ext",
+        key_value=rgid,
+    )
 
     # If no results, return None
-    if len(query_response) == 0:
+    if len(fastq_ids) == 0:
         return None
 
-    if len(query_response) > 1:
+    if len(fastq_ids) > 1:
         # Return a 409 Conflict if the fastq already exists
         raise HTTPException(
             status_code=409,
             detail=f"Got multiple fastq rows for the same rgid {rgid}, This is not allowed."
         )
 
-    # Get the first item from the query response
-    fastq_id = query_response[0].id
-
-    # Get the full fastq row data
-    return FastqData.get(fastq_id).to_dict(
-        include_s3_details=include_s3_details
-    )
+    # Get the full fastq row data, already serialized so return directly
+    return json_response(FastqData.get(fastq_ids[0]).to_dict(
+        include_s3_details=include_s3_details,
+        fields=field_tree
+    ))
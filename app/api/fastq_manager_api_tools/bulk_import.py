@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+
+"""
+Bulk fastq import
+
+Registering an instrument run one fastq at a time (POST /fastq) runs an rgid_ext index query and a PutItem per fastq,
+and POST /fastqSet reads each member fastq three or four times over.
+
+A bulk import takes every fastq on the run at once (as a fastq_list.csv or a list of fastq create objects), and
+  * resolves the libraries in one batch of (cached) metadata lookups,
+    and the read set s3 uris to ingest ids concurrently,
+  * reads every existing rgid_ext on the run(s) with a single index only query (one per instrument run),
+    so duplicates (against the table, or within the import) are found in memory,
+  * optionally groups the new fastqs into fastq sets, one per library,
+    a library with a fastq set accepting additional fastqs has the new fastqs linked to that fastq set,
+    otherwise a new fastq set is created (the current fastq set, unless the library already has one),
+  * writes the fastqs and fastq sets in transactions (see write_transaction), and emits the events in batches,
+    each new fastq (and fastq set) is written on the condition that no item has its id,
+    and each linked fastq set on the condition that it is still at the version we read.
+
+An import too large for a single transaction is committed in consecutive transactions, so is not atomic,
+if an import fails part way through, run it again with skipExisting to import the remaining fastqs.
+"""
+
+# Standard imports
+import csv
+import io
+import typing
+from collections import Counter
+from itertools import chain
+from typing import Dict, List, Tuple
+
+# Local imports
+from .concurrency import concurrent_map
+from .events.events import put_fastq_update_event, put_fastq_set_update_event
+from .hydration import batch_get_data_map
+from .index_query import IndexQuery, query_index_items
+from .metadata_cache import get_library_orcabus_id_from_library_id, get_library_id_from_library_orcabus_id
+from .metrics import increment_request_metric
+from .models.bulk_import import FastqBulkImportResponseDict
+from .models.fastq import FastqData, FastqCreate
+from .models.fastq_set import FastqSetData
+from .transactions import write_transaction, save_if_not_exists, save_if_unchanged
+
+if typing.TYPE_CHECKING:
+    from .models.fastq import FastqResponseDict
+
+
+class FastqBulkImportError(ValueError):
+    """
+    The import conflicts with existing fastqs, or with itself
+    """
+    pass
+
+
+def fastq_list_csv_to_fastq_create_dicts(fastq_list_csv_str: str, instrument_run_id: str) -> List[Dict]:
+    """
+    Convert a fastq_list.csv (RGID,RGSM,RGLB,Lane,Read1File,Read2File) to a list of fastq create objects.
+    The rgid is either index.lane.instrumentRunId (as written by GET /fastq:toFastqListRows)
+    or the BCLConvert form index.index2.lane, the library is taken from RGLB.
+    Read files must be s3 uris.
+    :param fastq_list_csv_str:
+    :param instrument_run_id:
+    :return:
+    """
+    fastq_create_dicts = []
+    for row_num, row in enumerate(csv.DictReader(io.StringIO(fastq_list_csv_str)), start=1):
+        try:
+            rgid = row['RGID']
+            lane = str(row['Lane'])
+            library_id = row['RGLB']
+            read_file_uris = [row['Read1File'], row.get('Read2File')]
+        except KeyError as e:
+            raise ValueError(f"Row {row_num} of the fastq list csv is missing the column {e}")
+
+        # Remove the instrument run id, and then the lane, the remainder is the index
+        if rgid.endswith(f".{instrument_run_id}"):
+            rgid = rgid[:-len(instrument_run_id) - 1]
+        rgid_parts = rgid.split(".")
+        if rgid_parts[-1] == lane:
+            rgid_parts = rgid_parts[:-1]
+
+        read_file_uris = list(filter(
+            lambda read_file_uri_iter_: read_file_uri_iter_ is not None and read_file_uri_iter_ != "",
+            read_file_uris
+        ))
+        if not all(map(lambda read_file_uri_iter_: read_file_uri_iter_.startswith("s3://"), read_file_uris)):
+            raise ValueError(f"Row {row_num} of the fastq list csv has a read file that is not an s3 uri")
+
+        fastq_create_dicts.append({
+            "index": "+".join(rgid_parts),
+            "lane": int(lane),
+            "instrumentRunId": instrument_run_id,
+            "library": {
+                "libraryId": library_id,
+            },
+            "readSet": dict(zip(
+                ["r1", "r2"],
+                map(lambda read_file_uri_iter_: {"s3Uri": read_file_uri_iter_}, read_file_uris)
+            )),
+        })
+
+    return fastq_create_dicts
+
+
+def get_fastq_data_objs(fastq_create_dicts: List[Dict]) -> List[FastqData]:
+    """
+    Validate the fastq create objects, the libraries are looked up in batches first (so each fastq hits the cache),
+    and the s3 uris of the read sets are resolved to ingest ids concurrently
+    :param fastq_create_dicts:
+    :return:
+    """
+    library_dicts = list(map(
+        lambda fastq_create_dict_iter_: fastq_create_dict_iter_.get("library", {}),
+        fastq_create_dicts
+    ))
+    get_library_orcabus_id_from_library_id.get_many(map(
+        lambda library_dict_iter_: library_dict_iter_['libraryId'],
+        filter(
+            lambda library_dict_iter_: not library_dict_iter_.get('orcabusId') and library_dict_iter_.get('libraryId'),
+            library_dicts
+        )
+    ))
+    get_library_id_from_library_orcabus_id.get_many(map(
+        lambda library_dict_iter_: library_dict_iter_['orcabusId'],
+        filter(
+            lambda library_dict_iter_: not library_dict_iter_.get('libraryId') and library_dict_iter_.get('orcabusId'),
+            library_dicts
+        )
+    ))
+
+    return concurrent_map(
+        lambda fastq_create_dict_iter_: FastqData(**dict(
+            FastqCreate.model_validate(fastq_create_dict_iter_).model_dump(by_alias=True)
+        )),
+        fastq_create_dicts
+    )
+
+
+def get_existing_rgid_ext_map(instrument_run_ids: List[str]) -> Dict[str, str]:
+    """
+    Get every existing rgid_ext on the instrument runs, from the instrument run id index alone
+    :param instrument_run_ids:
+    :return: Map of rgid_ext to fastq id
+    """
+    return dict(map(
+        lambda item_iter_: (item_iter_['rgid_ext'], item_iter_['id']),
+        query_index_items(
+            FastqData.__table_name__,
+            IndexQuery(
+                index_name="instrument_run_id-index",
+                key_attr="instrument_run_id",
+                key_values=list(dict.fromkeys(instrument_run_ids)),
+                filter_condition=None,
+            ),
+            attributes=['id', 'rgid_ext']
+        )
+    ))
+
+
+def filter_existing_fastqs(
+        fastq_data_objs: List[FastqData],
+        skip_existing: bool = False
+) -> Tuple[List[FastqData], List[str]]:
+    """
+    Find the fastqs that already exist, or that are duplicated within the import
+    :param fastq_data_objs:
+    :param skip_existing: Skip the fastqs that already exist, rather than raising an error
+    :raises FastqBulkImportError: On any duplicate within the import, or any existing fastq (unless skipping)
+    :return: The new fastqs, and the rgids of the fastqs skipped
+    """
+    rgid_ext_list = list(map(lambda fastq_obj_iter_: fastq_obj_iter_.rgid_ext, fastq_data_objs))
+    duplicate_rgid_exts = list(map(
+        lambda kv: kv[0],
+        filter(lambda kv: kv[1] > 1, Counter(rgid_ext_list).items())
+    ))
+    if len(duplicate_rgid_exts) > 0:
+        raise FastqBulkImportError(
+            "; ".join(map(
+                lambda rgid_ext_iter_: f"Fastq with rgid_ext '{rgid_ext_iter_}' is listed more than once",
+                duplicate_rgid_exts
+            ))
+        )
+
+    existing_rgid_ext_map = get_existing_rgid_ext_map(list(map(
+        lambda fastq_obj_iter_: fastq_obj_iter_.instrument_run_id,
+        fastq_data_objs
+    )))
+    existing_rgid_exts = list(filter(
+        lambda rgid_ext_iter_: rgid_ext_iter_ in existing_rgid_ext_map,
+        rgid_ext_list
+    ))
+    if len(existing_rgid_exts) > 0 and not skip_existing:
+        raise FastqBulkImportError(
+            "; ".join(map(
+                lambda rgid_ext_iter_: f"Fastq with rgid_ext '{rgid_ext_iter_}' already exists",
+                existing_rgid_exts
+            ))
+        )
+
+    return (
+        list(filter(
+            lambda fastq_obj_iter_: fastq_obj_iter_.rgid_ext not in existing_rgid_ext_map,
+            fastq_data_objs
+        )),
+        existing_rgid_exts
+    )
+
+
+def group_into_fastq_sets(fastq_data_objs: List[FastqData]) -> Tuple[List[FastqSetData], List[FastqSetData]]:
+    """
+    Group the new fastqs into fastq sets, one per library.
+    The fastq sets of each library are read from the library index alone,
+    only the fastq sets accepting additional fastqs are read in full.
+    :param fastq_data_objs:
+    :return: The new fastq sets, and the existing fastq sets the new fastqs are linked to
+    """
+    library_fastqs_map: Dict[str, List[FastqData]] = {}
+    for fastq_obj in fastq_data_objs:
+        library_fastqs_map.setdefault(fastq_obj.library.orcabus_id, []).append(fastq_obj)
+
+    library_fastq_set_items = query_index_items(
+        FastqSetData.__table_name__,
+        IndexQuery(
+            index_name="library_orcabus_id-index",
+            key_attr="library_orcabus_id",
+            key_values=list(library_fastqs_map.keys()),
+            filter_condition=None,
+        ),
+        attributes=['id', 'library_orcabus_id', 'is_current_fastq_set', 'allow_additional_fastq']
+    )
+
+    libraries_with_current_fastq_set = set(map(
+        lambda item_iter_: item_iter_['library_orcabus_id'],
+        filter(lambda item_iter_: item_iter_.get('is_current_fastq_set', False), library_fastq_set_items)
+    ))
+    linked_fastq_set_data_map = batch_get_data_map(
+        FastqSetData,
+        map(
+            lambda item_iter_: item_iter_['id'],
+            filter(lambda item_iter_: item_iter_.get('allow_additional_fastq', False), library_fastq_set_items)
+        )
+    )
+    library_linked_fastq_set_map = dict(map(
+        lambda fastq_set_obj_iter_: (fastq_set_obj_iter_.library.orcabus_id, fastq_set_obj_iter_),
+        linked_fastq_set_data_map.values()
+    ))
+
+    new_fastq_set_objs = []
+    linked_fastq_set_objs = []
+    for library_orcabus_id, library_fastq_objs in library_fastqs_map.items():
+        fastq_set_obj = library_linked_fastq_set_map.get(library_orcabus_id, None)
+        if fastq_set_obj is None:
+            fastq_set_obj = FastqSetData(
+                library=library_fastq_objs[0].library,
+                allow_additional_fastq=False,
+                is_current_fastq_set=library_orcabus_id not in libraries_with_current_fastq_set,
+                fastq_set_ids=[],
+            )
+            new_fastq_set_objs.append(fastq_set_obj)
+        else:
+            linked_fastq_set_objs.append(fastq_set_obj)
+
+        for fastq_obj in library_fastq_objs:
+            fastq_obj.fastq_set_id = fastq_set_obj.id
+            fastq_set_obj.fastq_set_ids.append(fastq_obj.id)
+
+    return new_fastq_set_objs, linked_fastq_set_objs
+
+
+def bulk_import_fastqs(
+        fastq_create_dicts: List[Dict],
+        skip_existing: bool = False,
+        create_fastq_sets: bool = False,
+) -> FastqBulkImportResponseDict:
+    """
+    Import many fastqs at once
+    :param fastq_create_dicts: Fastq create objects (camel case), i.e from fastq_list_csv_to_fastq_create_dicts
+    :param skip_existing: Skip fastqs that already exist, rather than rejecting the import
+    :param create_fastq_sets: Group the new fastqs into fastq sets (one per library)
+    :raises FastqBulkImportError:
+    :raises TransactionConflictError: A fastq or fastq set was written by another request, nothing more was written
+    :return:
+    """
+    fastq_data_objs, skipped_rgid_exts = filter_existing_fastqs(
+        get_fastq_data_objs(fastq_create_dicts),
+        skip_existing=skip_existing
+    )
+
+    new_fastq_set_objs = []
+    linked_fastq_set_objs = []
+    if create_fastq_sets and len(fastq_data_objs) > 0:
+        new_fastq_set_objs, linked_fastq_set_objs = group_into_fastq_sets(fastq_data_objs)
+
+    increment_request_metric("bulkImport.fastqs", len(fastq_data_objs))
+    increment_request_metric("bulkImport.skipped", len(skipped_rgid_exts))
+
+    fastq_data_map = dict(map(
+        lambda fastq_obj_iter_: (fastq_obj_iter_.id, fastq_obj_iter_),
+        fastq_data_objs
+    ))
+    # The linked fastq sets also need their existing fastqs for the (full payload) events and the response
+    fastq_data_map.update(batch_get_data_map(
+        FastqData,
+        filter(
+            lambda fastq_id_iter_: fastq_id_iter_ not in fastq_data_map,
+            chain.from_iterable(map(
+                lambda fastq_set_obj_iter_: fastq_set_obj_iter_.fastq_set_ids,
+                linked_fastq_set_objs
+            ))
+        )
+    ))
+
+    # Keep the fastq count and latest instrument run id of each fastq set
+    for fastq_set_obj in chain(new_fastq_set_objs, linked_fastq_set_objs):
+        fastq_set_obj.update_fastq_summary(fastq_data_map)
+
+    # Commit the writes along with their events, the events of each write are put straight after the write
+    with write_transaction():
+        fastq_dict_list: List['FastqResponseDict'] = []
+        for fastq_obj in fastq_data_objs:
+            save_if_not_exists(fastq_obj)
+            fastq_dict = fastq_obj.to_dict()
+            put_fastq_update_event(
+                fastq_response_object=fastq_dict,
+                event_status='FASTQ_CREATED',
+                fastq_obj=fastq_obj
+            )
+            fastq_dict_list.append(fastq_dict)
+
+        # Existing fastq sets must not have been changed (i.e linked to by another import) since we read them
+        fastq_set_dict_list = []
+        for fastq_set_obj, event_status, save_func in chain(
+                map(
+                    lambda fastq_set_obj_iter_: (fastq_set_obj_iter_, 'FASTQ_SET_CREATED', save_if_not_exists),
+                    new_fastq_set_objs
+                ),
+                map(
+                    lambda fastq_set_obj_iter_: (fastq_set_obj_iter_, 'FASTQ_LINKED', save_if_unchanged),
+                    linked_fastq_set_objs
+                ),
+        ):
+            save_func(fastq_set_obj)
+            fastq_set_dict = fastq_set_obj.to_dict(fastq_data_map=fastq_data_map)
+            put_fastq_set_update_event(
+                fastq_set_response_object=fastq_set_dict,
+                event_status=event_status,
+                fastq_set_obj=fastq_set_obj
+            )
+            fastq_set_dict_list.append(fastq_set_dict)
+
+    return FastqBulkImportResponseDict(
+        fastqList=fastq_dict_list,
+        fastqSetList=fastq_set_dict_list,
+        skippedRgidList=skipped_rgid_exts,
+    )
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+"""
+Bulk fastq updates
+
+The update_fastq_object lambda calls addQcStats, addReadCount, addFileCompressionInformation or addNtsmStorageObject
+once per fastq, each call reads the whole fastq, writes the whole fastq and sends its own event,
+so a backfill over an instrument run is hundreds of round trips.
+
+A bulk update takes a list of entries, each with a fastq id and any of qc, readCount, fileCompressionInformation,
+ntsm or isValid, and
+  * validates the entries concurrently (s3 uris are resolved to ingest ids as part of validation),
+  * reads every fastq in BatchGetItem calls,
+  * applies the entries of each fastq in memory, in order,
+  * writes each updated fastq once, a versioned UpdateItem of only the changed attributes (see versioned_update.py),
+    with the fastqs written concurrently, and emits the events in batches.
+A fastq changed by another writer since we read it is read again, and its entries re-applied.
+
+An entry that cannot be applied does not fail the request, each entry has its own result
+  * UPDATED, the entry was applied,
+  * NOT_FOUND, the fastq does not exist,
+  * INVALID, the entry could not be validated,
+  * CONFLICT, the entry conflicts with the fastq (i.e compression information for a fastq without a read set),
+    or the fastq was changed by another writer on every attempt.
+An entry with a conflicting update is not applied at all.
+"""
+
+# Standard imports
+import typing
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from dyntastic import DoesNotExist
+from pydantic import ValidationError
+
+# Layer imports
+from orcabus_api_tools.filemanager.errors import S3FileNotFoundError
+
+# Local imports
+from .concurrency import concurrent_map
+from .events.events import put_fastq_update_event
+from .hydration import batch_get_items
+from .metrics import increment_request_metric
+from .models.bulk_update import (
+    FastqBulkUpdateEntry, FastqBulkUpdateResultDict, FastqBulkUpdateResponseDict
+)
+from .models.fastq import FastqData
+from .models.file_compression_info import FileCompressionInfoData
+from .models.file_storage import FileStorageObjectData
+from .models.qc import QcInformationData
+from .models.read_count_info import ReadCountInfoData
+from .versioned_update import update_with_retry, VersionConflictError
+
+if typing.TYPE_CHECKING:
+    from .globals import FastqStateChangeStatusEventsType
+
+
+class FastqBulkUpdateConflictError(ValueError):
+    """
+    The entry conflicts with the current state of the fastq
+    """
+    pass
+
+
+# The fastq attributes changed by each update
+EVENT_STATUS_ATTR_NAMES: Dict['FastqStateChangeStatusEventsType', List[str]] = {
+    'QC_UPDATED': ['qc'],
+    'READ_COUNT_UPDATED': ['read_count', 'base_count_est'],
+    'FILE_COMPRESSION_UPDATED': ['read_set'],
+    'NTSM_UPDATED': ['ntsm'],
+    'FASTQ_IS_VALID': ['is_valid'],
+    'FASTQ_IS_INVALID': ['is_valid'],
+}
+
+
+def validate_entry(entry_index: int, entry_dict: Dict[str, Any]) -> Union[FastqBulkUpdateEntry, FastqBulkUpdateResultDict]:
+    """
+    Validate an entry, returning its (INVALID) result if it cannot be validated
+    :param entry_index:
+    :param entry_dict:
+    :return:
+    """
+    try:
+        return FastqBulkUpdateEntry.model_validate(entry_dict)
+    except (ValidationError, ValueError, S3FileNotFoundError) as e:
+        return FastqBulkUpdateResultDict(
+            entryIndex=entry_index,
+            fastqId=entry_dict.get("fastqId") if isinstance(entry_dict, dict) else None,
+            status="INVALID",
+            detail=str(e),
+        )
+
+
+def apply_entry(fastq_obj: FastqData, entry: FastqBulkUpdateEntry) -> List['FastqStateChangeStatusEventsType']:
+    """
+    Apply the entry to the fastq (in memory), as the equivalent single fastq routes would
+    :param fastq_obj:
+    :param entry:
+    :raises FastqBulkUpdateConflictError: Nothing is applied if any update conflicts with the fastq
+    :return: The event status of each update applied
+    """
+    # Check for conflicts before we change anything
+    if entry.file_compression_information is not None and fastq_obj.read_set is None:
+        raise FastqBulkUpdateConflictError(
+            "No FastqPairStorageObject exists for this fastq, cannot add compression information"
+        )
+    if entry.is_valid is False and fastq_obj.fastq_set_id is not None:
+        raise FastqBulkUpdateConflictError(
+            "Cannot invalidate a fastq that is part of a fastq set, please first unlink and then invalidate"
+        )
+
+    event_statuses = []
+
+    if entry.qc is not None:
+        fastq_obj.qc = QcInformationData(**dict(entry.qc.model_dump(by_alias=True)))
+        event_statuses.append('QC_UPDATED')
+
+    if entry.read_count is not None:
+        read_count_info_data = ReadCountInfoData(**dict(entry.read_count.model_dump(by_alias=True)))
+        fastq_obj.read_count = read_count_info_data.read_count
+        fastq_obj.base_count_est = read_count_info_data.base_count_est
+        event_statuses.append('READ_COUNT_UPDATED')
+
+    if entry.file_compression_information is not None:
+        file_compression_info_data = FileCompressionInfoData(
+            **dict(entry.file_compression_information.model_dump(by_alias=True))
+        )
+        fastq_obj.read_set.compression_format = file_compression_info_data.compression_format
+        fastq_obj.read_set.r1.gzip_compression_size_in_bytes = file_compression_info_data.r1_gzip_compression_size_in_bytes
+        fastq_obj.read_set.r1.raw_md5sum = file_compression_info_data.r1_raw_md5sum
+        if fastq_obj.read_set.r2 is not None:
+            fastq_obj.read_set.r2.gzip_compression_size_in_bytes = file_compression_info_data.r2_gzip_compression_size_in_bytes
+            fastq_obj.read_set.r2.raw_md5sum = file_compression_info_data.r2_raw_md5sum
+        event_statuses.append('FILE_COMPRESSION_UPDATED')
+
+    if entry.ntsm is not None:
+        fastq_obj.ntsm = FileStorageObjectData(**dict(entry.ntsm.model_dump()))
+        event_statuses.append('NTSM_UPDATED')
+
+    if entry.is_valid is not None:
+        fastq_obj.is_valid = entry.is_valid
+        event_statuses.append('FASTQ_IS_VALID' if entry.is_valid else 'FASTQ_IS_INVALID')
+
+    return event_statuses
+
+
+def update_fastq_entries(
+        fastq_id: str,
+        fastq_entries: List[Tuple[int, FastqBulkUpdateEntry]],
+        fastq_obj: Optional[FastqData],
+) -> List[FastqBulkUpdateResultDict]:
+    """
+    Apply the entries of a fastq, in order, and write the fastq once (along with the event of each update),
+    retrying on a version conflict
+    :param fastq_id:
+    :param fastq_entries: The (entry index, entry) of each entry of the fastq
+    :param fastq_obj: The fastq as read, None if it does not exist
+    :return: The result of each entry
+    """
+    if fastq_obj is None:
+        return list(map(
+            lambda fastq_entry_iter_: FastqBulkUpdateResultDict(
+                entryIndex=fastq_entry_iter_[0],
+                fastqId=fastq_id,
+                status="NOT_FOUND",
+                detail=f"FastqData with id {fastq_id} does not exist",
+            ),
+            fastq_entries
+        ))
+
+    # The (CONFLICT) results, and the (entry index, event status) of every update applied, of the latest attempt
+    conflict_results: List[FastqBulkUpdateResultDict] = []
+    applied_updates: List[Tuple[int, 'FastqStateChangeStatusEventsType']] = []
+
+    def apply_update(fastq_obj_: FastqData) -> List[str]:
+        # Applied again, to the latest fastq, on a retry
+        conflict_results.clear()
+        applied_updates.clear()
+        for entry_index, entry in fastq_entries:
+            try:
+                event_statuses = apply_entry(fastq_obj_, entry)
+            except FastqBulkUpdateConflictError as e:
+                conflict_results.append(FastqBulkUpdateResultDict(
+                    entryIndex=entry_index,
+                    fastqId=fastq_id,
+                    status="CONFLICT",
+                    detail=str(e),
+                ))
+                continue
+            applied_updates.extend(map(lambda event_status_iter_: (entry_index, event_status_iter_), event_statuses))
+
+        return list(dict.fromkeys(chain.from_iterable(map(
+            lambda applied_update_iter_: EVENT_STATUS_ATTR_NAMES[applied_update_iter_[1]],
+            applied_updates
+        ))))
+
+    def put_update_events(fastq_obj_: FastqData) -> List[FastqBulkUpdateResultDict]:
+        fastq_dict = fastq_obj_.to_dict() if len(applied_updates) > 0 else None
+
+        updated_results = {}
+        for entry_index, event_status in applied_updates:
+            put_fastq_update_event(
+                fastq_response_object=fastq_dict,
+                event_status=event_status,
+                fastq_obj=fastq_obj_
+            )
+            updated_results[entry_index] = FastqBulkUpdateResultDict(
+                entryIndex=entry_index,
+                fastqId=fastq_id,
+                status="UPDATED",
+                fastq=fastq_dict,
+            )
+
+        return conflict_results + list(updated_results.values())
+
+    try:
+        return update_with_retry(FastqData, fastq_id, apply_update, put_update_events, data_obj=fastq_obj)
+    except VersionConflictError as e:
+        # Nothing was written, so none of the entries were applied
+        return list(map(
+            lambda fastq_entry_iter_: FastqBulkUpdateResultDict(
+                entryIndex=fastq_entry_iter_[0],
+                fastqId=fastq_id,
+                status="CONFLICT",
+                detail=str(e),
+            ),
+            fastq_entries
+        ))
+    except DoesNotExist:
+        # Deleted since we read it
+        return update_fastq_entries(fastq_id, fastq_entries, None)
+
+
+def bulk_update_fastqs(entry_dicts: List[Dict[str, Any]]) -> FastqBulkUpdateResponseDict:
+    """
+    Apply many fastq updates at once
+    :param entry_dicts: The (camel case) bulk update entries
+    :return: A result for every entry, in the order of the entries
+    """
+    # Validate the entries concurrently, since validation may resolve s3 uris
+    validated_entries = concurrent_map(
+        lambda entry_pair_iter_: validate_entry(*entry_pair_iter_),
+        list(enumerate(entry_dicts))
+    )
+    # Invalid entries already have their result, the rest are filled in below
+    results: List[FastqBulkUpdateResultDict] = list(map(
+        lambda validated_entry_iter_: validated_entry_iter_ if isinstance(validated_entry_iter_, dict) else None,
+        validated_entries
+    ))
+
+    # Read every fastq at once, fastqs that do not exist are missing from the map
+    fastq_data_map: Dict[str, FastqData] = dict(map(
+        lambda item_iter_: (item_iter_['id'], FastqData(**item_iter_)),
+        batch_get_items(
+            FastqData.__table_name__,
+            list(dict.fromkeys(map(
+                lambda entry_iter_: entry_iter_.fastq_id,
+                filter(lambda entry_iter_: isinstance(entry_iter_, FastqBulkUpdateEntry), validated_entries)
+            )))
+        )
+    ))
+
+    # The entries of each fastq, in order
+    fastq_entries_map: Dict[str, List[Tuple[int, FastqBulkUpdateEntry]]] = {}
+    for entry_index, entry in enumerate(validated_entries):
+        if not isinstance(entry, FastqBulkUpdateEntry):
+            continue
+        fastq_entries_map.setdefault(entry.fastq_id, []).append((entry_index, entry))
+
+    # Each fastq is written once, however many entries it has
+    for fastq_results in concurrent_map(
+            lambda fastq_entries_iter_: update_fastq_entries(
+                fastq_entries_iter_[0], fastq_entries_iter_[1], fastq_data_map.get(fastq_entries_iter_[0], None)
+            ),
+            list(fastq_entries_map.items())
+    ):
+        for result in fastq_results:
+            results[result['entryIndex']] = result
+
+    increment_request_metric(
+        "bulkUpdate.fastqs",
+        len(set(map(
+            lambda result_iter_: result_iter_['fastqId'],
+            filter(lambda result_iter_: result_iter_['status'] == 'UPDATED', results)
+        )))
+    )
+
+    updated_count = len(list(filter(lambda result_iter_: result_iter_['status'] == 'UPDATED', results)))
+
+    return FastqBulkUpdateResponseDict(
+        updatedCount=updated_count,
+        failedCount=len(results) - updated_count,
+        results=results,
+    )
@@ -1,36 +1,267 @@
 #!/usr/bin/env python
 
+"""
+S3 details cache
+
+The file manager is queried for the s3 details (bucket, key, storage class, sha256) of each ingest id.
+We keep the results in a module level cache so that a warm lambda does not ask for the same ingest id twice.
+
+The cache is
+  * bounded, the least recently used entries are evicted once the cache is full,
+  * time limited, each entry expires after a ttl (stale entries are evicted when next checked),
+  * negative, ingest ids the file manager did not return (missing or deleted objects) are cached as None,
+    with a shorter ttl, so we do not re-request them on every call.
+
+Limits are set by the S3_CACHE_MAX_ENTRIES, S3_CACHE_TTL_SECONDS and S3_CACHE_NEGATIVE_TTL_SECONDS
+environment variables.
+
+Behind the in-memory cache sits an optional shared cache (see shared_cache.py),
+ingest ids missing from the in-memory cache are read from the shared cache in a single batch (filter_missing_ingest_ids),
+and file manager results are written through to both (update_cache_from_s3_objs).
+
+Entries set over the course of a request are also pinned to that request (see start_request_s3_objs),
+so once the s3 details for a response are resolved, they are not lost to an eviction before the response is serialized.
+
+Hits, misses, negative hits, stale hits and evictions are counted over the lifetime of the cache
+(see get_cache_stats) and for the current request (reported in the request metrics, i.e 's3Cache.hit=12').
+"""
+
+# Standard imports
+import threading
 import typing
-from typing import Dict
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
 from datetime import datetime
+from os import environ
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Local imports
+from .globals import (
+    S3_CACHE_MAX_ENTRIES_ENV_VAR, DEFAULT_S3_CACHE_MAX_ENTRIES,
+    S3_CACHE_TTL_SECONDS_ENV_VAR, DEFAULT_S3_CACHE_TTL_SECONDS,
+    S3_CACHE_NEGATIVE_TTL_SECONDS_ENV_VAR, DEFAULT_S3_CACHE_NEGATIVE_TTL_SECONDS,
+)
+from .metrics import increment_request_metric
+from .shared_cache import get_many_from_shared_cache, put_many_in_shared_cache
 
 if typing.TYPE_CHECKING:
     from orcabus_api_tools.filemanager.models import FileObject
 
-S3_INGEST_ID_TO_OBJ_MAP_CACHE: Dict[str, 'FileObject'] = {}
-S3_INGEST_ID_TO_OBJ_MAP_CACHE_TIMESTAMP: Dict[str, float] = {}
+S3_CACHE_METRIC_PREFIX = "s3Cache"
+
+
+def get_cache_max_entries() -> int:
+    return int(environ.get(S3_CACHE_MAX_ENTRIES_ENV_VAR, DEFAULT_S3_CACHE_MAX_ENTRIES))
+
+
+def get_cache_ttl_seconds() -> float:
+    return float(environ.get(S3_CACHE_TTL_SECONDS_ENV_VAR, DEFAULT_S3_CACHE_TTL_SECONDS))
+
+
+def get_cache_negative_ttl_seconds() -> float:
+    return float(environ.get(S3_CACHE_NEGATIVE_TTL_SECONDS_ENV_VAR, DEFAULT_S3_CACHE_NEGATIVE_TTL_SECONDS))
+
+
+# Ingest id -> (file object or None for a negative entry, expiry timestamp)
+# Ordered from least to most recently used
+S3_INGEST_ID_TO_OBJ_MAP_CACHE: 'OrderedDict[str, Tuple[Optional[FileObject], float]]' = OrderedDict()
+
+# Lifetime counters
+S3_CACHE_STATS: Counter = Counter()
+
+# The cache is read and updated from the query thread pool
+_S3_CACHE_LOCK = threading.Lock()
+
+# Entries set over the course of the current request
+REQUEST_S3_OBJS: ContextVar[Optional[Dict[str, Optional['FileObject']]]] = ContextVar("request_s3_objs", default=None)
+
+
+def start_request_s3_objs():
+    """
+    Start pinning the entries set over the course of this request (called by the http middleware)
+    :return:
+    """
+    REQUEST_S3_OBJS.set({})
+
+
+def _count(metric_name: str, count: int = 1):
+    # Must be called while holding the lock
+    S3_CACHE_STATS[metric_name] += count
+    increment_request_metric(f"{S3_CACHE_METRIC_PREFIX}.{metric_name}", count)
+
+
+def _set_entry(ingest_id: str, s3_obj: Optional['FileObject'], expiry_timestamp: float):
+    # Must be called while holding the lock
+    S3_INGEST_ID_TO_OBJ_MAP_CACHE[ingest_id] = (s3_obj, expiry_timestamp)
+    S3_INGEST_ID_TO_OBJ_MAP_CACHE.move_to_end(ingest_id)
+
+    request_s3_objs = REQUEST_S3_OBJS.get()
+    if request_s3_objs is not None:
+        request_s3_objs[ingest_id] = s3_obj
+
+    # Evict the least recently used entries
+    max_entries = get_cache_max_entries()
+    while len(S3_INGEST_ID_TO_OBJ_MAP_CACHE) > max_entries:
+        S3_INGEST_ID_TO_OBJ_MAP_CACHE.popitem(last=False)
+        _count("eviction")
+
 
 def update_cache(ingest_id: str, s3_obj: 'FileObject'):
-    global S3_INGEST_ID_TO_OBJ_MAP_CACHE
-    global S3_INGEST_ID_TO_OBJ_MAP_CACHE_TIMESTAMP
-    S3_INGEST_ID_TO_OBJ_MAP_CACHE[ingest_id] = s3_obj
-    S3_INGEST_ID_TO_OBJ_MAP_CACHE_TIMESTAMP[ingest_id] = datetime.now().timestamp()
+    """
+    Update the in-memory cache only (see update_cache_from_s3_objs to also write through to the shared cache)
+    :param ingest_id:
+    :param s3_obj:
+    :return:
+    """
+    with _S3_CACHE_LOCK:
+        _set_entry(ingest_id, s3_obj, datetime.now().timestamp() + get_cache_ttl_seconds())
+
+
+def update_cache_negative(ingest_id: str):
+    """
+    Record that the file manager has no (current) object for this ingest id
+    :param ingest_id:
+    :return:
+    """
+    with _S3_CACHE_LOCK:
+        _set_entry(ingest_id, None, datetime.now().timestamp() + get_cache_negative_ttl_seconds())
+
+
+def update_cache_from_s3_objs(ingest_ids: Iterable[str], s3_objs: List[Dict]):
+    """
+    Update the cache from a get_s3_objs_from_ingest_ids_map response,
+    any requested ingest ids that were not returned are cached as negative entries.
+    Entries are written through to the shared cache.
+    :param ingest_ids: The ingest ids that were requested
+    :param s3_objs: The response, a list of {'ingestId': ..., 'fileObject': ...}
+    :return:
+    """
+    now_timestamp = datetime.now().timestamp()
+    shared_cache_entries = {}
+
+    for s3_obj_iter_ in s3_objs:
+        update_cache(s3_obj_iter_['ingestId'], s3_obj_iter_['fileObject'])
+        shared_cache_entries[s3_obj_iter_['ingestId']] = (
+            s3_obj_iter_['fileObject'], now_timestamp + get_cache_ttl_seconds()
+        )
+
+    for ingest_id in ingest_ids:
+        if ingest_id not in shared_cache_entries:
+            update_cache_negative(ingest_id)
+            shared_cache_entries[ingest_id] = (None, now_timestamp + get_cache_negative_ttl_seconds())
+
+    put_many_in_shared_cache(shared_cache_entries)
+
+
+def filter_missing_ingest_ids(ingest_ids: Iterable[str]) -> List[str]:
+    """
+    Get the (unique) ingest ids that need to be requested from the file manager.
+    Ingest ids missing from the in-memory cache are read from the shared cache in a single batch,
+    and any shared cache entries found are added to the in-memory cache.
+    :param ingest_ids:
+    :return:
+    """
+    missing_ingest_ids = list(filter(
+        lambda ingest_id_iter_: not check_in_cache(ingest_id_iter_),
+        dict.fromkeys(ingest_ids)
+    ))
+
+    shared_cache_entries = get_many_from_shared_cache(missing_ingest_ids)
+
+    if len(shared_cache_entries) > 0:
+        max_expiry_timestamp = datetime.now().timestamp() + get_cache_ttl_seconds()
+        with _S3_CACHE_LOCK:
+            for ingest_id, (s3_obj, expiry_timestamp) in shared_cache_entries.items():
+                # Never hold an entry in memory for longer than the shared cache would
+                _set_entry(ingest_id, s3_obj, min(expiry_timestamp, max_expiry_timestamp))
+            _count("sharedHit", len(shared_cache_entries))
+            _count("sharedMiss", len(missing_ingest_ids) - len(shared_cache_entries))
+
+    return list(filter(
+        lambda ingest_id_iter_: ingest_id_iter_ not in shared_cache_entries,
+        missing_ingest_ids
+    ))
 
 
 def check_in_cache(ingest_id: str) -> bool:
-    global S3_INGEST_ID_TO_OBJ_MAP_CACHE
-    global S3_INGEST_ID_TO_OBJ_MAP_CACHE_TIMESTAMP
-    if ingest_id not in S3_INGEST_ID_TO_OBJ_MAP_CACHE:
-        return False
-    # Check if the cache is older than 15 minutes
-    if (S3_INGEST_ID_TO_OBJ_MAP_CACHE_TIMESTAMP[ingest_id] + 900 < datetime.now().timestamp()):
-        # Remove the stale entry
-        S3_INGEST_ID_TO_OBJ_MAP_CACHE.pop(ingest_id, None)
-        S3_INGEST_ID_TO_OBJ_MAP_CACHE_TIMESTAMP.pop(ingest_id, None)
-
-    return ingest_id in S3_INGEST_ID_TO_OBJ_MAP_CACHE
-
-
-def get_from_cache(ingest_id: str) -> 'FileObject':
-    global S3_INGEST_ID_TO_OBJ_MAP_CACHE
-    return S3_INGEST_ID_TO_OBJ_MAP_CACHE.get(ingest_id, None)
+    """
+    Check if the ingest id has a current (positive or negative) entry in the cache,
+    if not the ingest id should be requested from the file manager
+    :param ingest_id:
+    :return:
+    """
+    request_s3_objs = REQUEST_S3_OBJS.get()
+
+    with _S3_CACHE_LOCK:
+        if request_s3_objs is not None and ingest_id in request_s3_objs:
+            # Already resolved over this request
+            _count("hit" if request_s3_objs[ingest_id] is not None else "negativeHit")
+            return True
+
+        if ingest_id not in S3_INGEST_ID_TO_OBJ_MAP_CACHE:
+            _count("miss")
+            return False
+
+        s3_obj, expiry_timestamp = S3_INGEST_ID_TO_OBJ_MAP_CACHE[ingest_id]
+
+        if expiry_timestamp < datetime.now().timestamp():
+            # Remove the stale entry
+            S3_INGEST_ID_TO_OBJ_MAP_CACHE.pop(ingest_id, None)
+            _count("stale")
+            return False
+
+        S3_INGEST_ID_TO_OBJ_MAP_CACHE.move_to_end(ingest_id)
+        _count("hit" if s3_obj is not None else "negativeHit")
+        return True
+
+
+def get_from_cache(ingest_id: str) -> Optional['FileObject']:
+    """
+    Get the file object for the ingest id, None if the ingest id is not in the cache, or is a negative entry
+    :param ingest_id:
+    :return:
+    """
+    request_s3_objs = REQUEST_S3_OBJS.get()
+    if request_s3_objs is not None and ingest_id in request_s3_objs:
+        return request_s3_objs[ingest_id]
+
+    with _S3_CACHE_LOCK:
+        cache_entry = S3_INGEST_ID_TO_OBJ_MAP_CACHE.get(ingest_id, None)
+    if cache_entry is None:
+        return None
+    return cache_entry[0]
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """
+    Lifetime cache counters, along with the current size and limits, i.e for sizing the cache
+    :return:
+    """
+    with _S3_CACHE_LOCK:
+        return {
+            "size": len(S3_INGEST_ID_TO_OBJ_MAP_CACHE),
+            "maxEntries": get_cache_max_entries(),
+            **dict(map(
+                lambda metric_name_iter_: (metric_name_iter_, S3_CACHE_STATS[metric_name_iter_]),
+                ["hit", "negativeHit", "miss", "stale", "eviction", "sharedHit", "sharedMiss"]
+            ))
+        }
+
+
+def cache_stats_to_str(cache_stats: Dict[str, int]) -> str:
+    """
+    Render for the logs, i.e 'size=120,maxEntries=10000,hit=400,...'
+    :param cache_stats:
+    :return:
+    """
+    return ",".join(map(
+        lambda kv: f"{kv[0]}={kv[1]}",
+        cache_stats.items()
+    ))
+
+
+def clear_cache():
+    with _S3_CACHE_LOCK:
+        S3_INGEST_ID_TO_OBJ_MAP_CACHE.clear()
+        S3_CACHE_STATS.clear()
+    REQUEST_S3_OBJS.set(None)
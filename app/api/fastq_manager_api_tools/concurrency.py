@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+"""
+Concurrency helpers
+
+A single list query may fan out into many per-key DynamoDB queries
+(i.e one per instrument run id, library orcabus id, fastq set id or rgid_ext),
+or many BatchGetItem chunks, or many metadata lookups.
+
+Rather than run these one after the other, we run them on a shared, bounded thread pool,
+so a query over 50 libraries takes roughly as long as the slowest single library query.
+
+The pool size is set by the QUERY_CONCURRENCY_LIMIT environment variable.
+
+Each task runs in a copy of the calling context, so the request metrics counter is shared with the request.
+Nested calls (i.e a fan-out inside a fan-out) run serially in the calling worker,
+so we never block a worker waiting on a task that cannot be scheduled.
+"""
+
+# Standard imports
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar, copy_context
+from functools import cache
+from os import environ
+from typing import Callable, Iterable, List, TypeVar
+
+# Local imports
+from .globals import QUERY_CONCURRENCY_LIMIT_ENV_VAR, DEFAULT_QUERY_CONCURRENCY_LIMIT
+
+InputType = TypeVar("InputType")
+OutputType = TypeVar("OutputType")
+
+IN_QUERY_EXECUTOR: ContextVar[bool] = ContextVar("in_query_executor", default=False)
+
+
+def get_query_concurrency_limit() -> int:
+    return int(environ.get(QUERY_CONCURRENCY_LIMIT_ENV_VAR, DEFAULT_QUERY_CONCURRENCY_LIMIT))
+
+
+@cache
+def get_query_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=get_query_concurrency_limit(),
+        thread_name_prefix="query"
+    )
+
+
+def _run_in_query_executor(func: Callable[[InputType], OutputType], item: InputType) -> OutputType:
+    IN_QUERY_EXECUTOR.set(True)
+    return func(item)
+
+
+def concurrent_map(
+        func: Callable[[InputType], OutputType],
+        items: Iterable[InputType],
+) -> List[OutputType]:
+    """
+    Like list(map(func, items)), but runs each call on the bounded query thread pool.
+    Results are returned in the same order as the items, the first exception raised is re-raised.
+    :param func:
+    :param items:
+    :return:
+    """
+    items = list(items)
+
+    # Nothing to gain from the pool
+    if len(items) <= 1 or IN_QUERY_EXECUTOR.get() or get_query_concurrency_limit() <= 1:
+        return list(map(func, items))
+
+    futures = list(map(
+        lambda item_iter_: get_query_executor().submit(
+            # Each task needs its own context copy, a context cannot be entered by two threads at once
+            copy_context().run, _run_in_query_executor, func, item_iter_
+        ),
+        items
+    ))
+
+    return list(map(
+        lambda future_iter_: future_iter_.result(),
+        futures
+    ))
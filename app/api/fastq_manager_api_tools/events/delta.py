@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Compact (delta) event payloads
+
+The full event payload carries the whole response object for every status change (even FASTQ_IS_VALID),
+and a fastq set event embeds every fastq in the set, along with its qc and sequali reports.
+
+With EVENT_PAYLOAD_VERSION set to the delta payload version (DELTA_EVENT_PAYLOAD_VERSION),
+fastq and fastq set events instead carry
+  * the id of the fastq / fastq set,
+  * its version (incremented on every write, so consumers can order events and skip stale ones),
+  * only the fields changed by the event (changedFields), set by the event status (see FASTQ_STATUS_CHANGED_FIELDS),
+    a fastq set references its fastqs by id (fastqSetIds) rather than embedding them.
+
+Changed fields over the claim check threshold (EVENT_CLAIM_CHECK_THRESHOLD_BYTES) are written to s3
+(under EVENT_CLAIM_CHECK_S3_URI_PREFIX, if set), and the event carries the s3 uri (claimCheckUri) in their place.
+
+The payload versions match the schema versions under app/event-schemas.
+"""
+
+# Standard imports
+import json
+import typing
+from functools import cache
+from os import environ
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import boto3
+from ulid.api import monotonic
+
+# Local imports
+from ..globals import (
+    EVENT_PAYLOAD_VERSION_ENV_VAR, DEFAULT_EVENT_PAYLOAD_VERSION, DELTA_EVENT_PAYLOAD_VERSION,
+    EVENT_CLAIM_CHECK_S3_URI_PREFIX_ENV_VAR,
+    EVENT_CLAIM_CHECK_THRESHOLD_BYTES_ENV_VAR, DEFAULT_EVENT_CLAIM_CHECK_THRESHOLD_BYTES,
+    FastqStateChangeStatusEventsType,
+    FastqSetStateChangeStatusEventsType,
+)
+from ..metrics import increment_request_metric
+from ..models.fastq_set import FASTQ_SET_RESPONSE_ALIASES
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+    from ..models.fastq import FastqData
+    from ..models.fastq_set import FastqSetData
+
+# Changed (response) fields for each event status, None for every field
+FASTQ_STATUS_CHANGED_FIELDS: Dict[FastqStateChangeStatusEventsType, Optional[List[str]]] = {
+    "FASTQ_CREATED": None,
+    "FASTQ_DELETED": [],
+    "READ_SET_ADDED": ["readSet"],
+    "READ_SET_DELETED": ["readSet"],
+    "FILE_COMPRESSION_UPDATED": ["readSet"],
+    "QC_UPDATED": ["qc"],
+    "NTSM_UPDATED": ["ntsm"],
+    "READ_COUNT_UPDATED": ["readCount", "baseCountEst"],
+    "LIBRARY_UPDATED": ["library"],
+    "FASTQ_IS_VALID": ["isValid"],
+    "FASTQ_IS_INVALID": ["isValid"],
+    "FASTQ_SET_UPDATED": ["fastqSetId"],
+}
+
+FASTQ_SET_STATUS_CHANGED_FIELDS: Dict[FastqSetStateChangeStatusEventsType, Optional[List[str]]] = {
+    "FASTQ_SET_CREATED": None,
+    "FASTQ_SET_DELETED": [],
+    "FASTQ_LINKED": ["fastqSetIds"],
+    "FASTQ_UNLINKED": ["fastqSetIds"],
+    "FASTQ_SET_IS_CURRENT": ["isCurrentFastqSet"],
+    "FASTQ_SET_IS_NOT_CURRENT": ["isCurrentFastqSet"],
+    "FASTQ_SET_ADDITIONAL_FASTQS_ALLOWED": ["allowAdditionalFastq"],
+    "FASTQ_SET_ADDITIONAL_FASTQS_DISALLOWED": ["allowAdditionalFastq"],
+    "FASTQ_SET_MERGED": None,
+    "SOMALIER_UPDATED": ["somalier"],
+}
+
+# Every fastq set field, with the fastqs referenced by id
+FASTQ_SET_DELTA_FIELDS = [
+    *filter(lambda alias_iter_: alias_iter_ not in ["id", "fastqSet"], FASTQ_SET_RESPONSE_ALIASES.values()),
+    "fastqSetIds",
+]
+
+
+def is_delta_event_payload() -> bool:
+    return environ.get(EVENT_PAYLOAD_VERSION_ENV_VAR, DEFAULT_EVENT_PAYLOAD_VERSION) == DELTA_EVENT_PAYLOAD_VERSION
+
+
+def get_claim_check_threshold_bytes() -> int:
+    return int(environ.get(EVENT_CLAIM_CHECK_THRESHOLD_BYTES_ENV_VAR, DEFAULT_EVENT_CLAIM_CHECK_THRESHOLD_BYTES))
+
+
+@cache
+def get_s3_client() -> 'S3Client':
+    return boto3.client('s3')
+
+
+def put_claim_check(entity_id: str, changed_fields_str: str) -> str:
+    """
+    Write the changed fields to s3
+    :param entity_id:
+    :param changed_fields_str: The changed fields, as a json string
+    :return: The s3 uri of the changed fields
+    """
+    s3_uri_prefix_obj = urlparse(environ[EVENT_CLAIM_CHECK_S3_URI_PREFIX_ENV_VAR])
+    bucket = s3_uri_prefix_obj.netloc
+    key = f"{s3_uri_prefix_obj.path.lstrip('/')}{entity_id}/{monotonic.new().str}.json"
+
+    increment_request_metric("events.claimCheck")
+    get_s3_client().put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=changed_fields_str.encode(),
+        ContentType='application/json',
+    )
+
+    return f"s3://{bucket}/{key}"
+
+
+def get_delta_event_detail(entity_id: str, version: int, changed_fields: Dict) -> Dict:
+    """
+    Get the delta event detail, the changed fields are written to s3 if they are over the claim check threshold
+    :param entity_id:
+    :param version:
+    :param changed_fields:
+    :return:
+    """
+    changed_fields_str = json.dumps(changed_fields)
+
+    # Without a claim check location (i.e locally), the changed fields are always sent in the event
+    if (
+            environ.get(EVENT_CLAIM_CHECK_S3_URI_PREFIX_ENV_VAR) is not None and
+            len(changed_fields_str.encode()) > get_claim_check_threshold_bytes()
+    ):
+        return {
+            "id": entity_id,
+            "version": version,
+            "claimCheckUri": put_claim_check(entity_id, changed_fields_str),
+        }
+
+    return {
+        "id": entity_id,
+        "version": version,
+        "changedFields": changed_fields,
+    }
+
+
+def get_fastq_delta_event_detail(
+        fastq_obj: 'FastqData',
+        event_status: FastqStateChangeStatusEventsType
+) -> Dict:
+    changed_field_names = FASTQ_STATUS_CHANGED_FIELDS[event_status]
+
+    if changed_field_names is None:
+        changed_fields = fastq_obj.to_dict()
+        changed_fields.pop("id")
+    elif len(changed_field_names) == 0:
+        changed_fields = {}
+    else:
+        # Only serialize the changed fields
+        changed_fields = fastq_obj.to_dict(fields=dict.fromkeys(changed_field_names, True))
+
+    return get_delta_event_detail(fastq_obj.id, fastq_obj.version, changed_fields)
+
+
+def get_fastq_set_delta_event_detail(
+        fastq_set_obj: 'FastqSetData',
+        event_status: FastqSetStateChangeStatusEventsType,
+        merged_fastq_set_ids: Optional[List[str]] = None
+) -> Dict:
+    changed_field_names = FASTQ_SET_STATUS_CHANGED_FIELDS[event_status]
+
+    if changed_field_names is None:
+        changed_field_names = FASTQ_SET_DELTA_FIELDS
+
+    # The fastqs themselves are never read
+    response_field_names = list(filter(
+        lambda field_name_iter_: field_name_iter_ != "fastqSetIds",
+        changed_field_names
+    ))
+    if len(response_field_names) > 0:
+        changed_fields = fastq_set_obj.to_dict(fields=dict.fromkeys(response_field_names, True))
+    else:
+        changed_fields = {}
+
+    if "fastqSetIds" in changed_field_names:
+        changed_fields["fastqSetIds"] = list(fastq_set_obj.fastq_set_ids)
+
+    event_detail = get_delta_event_detail(fastq_set_obj.id, fastq_set_obj.version, changed_fields)
+
+    if merged_fastq_set_ids is not None:
+        event_detail["mergedFastqSetIds"] = merged_fastq_set_ids
+
+    return event_detail
@@ -1,7 +1,30 @@
 #!/usr/bin/env python3
+
+"""
+Events are buffered over the course of a request, rather than sent one PutEvents call at a time
+(i.e creating a fastq set emits an event for every fastq, and one for the fastq set).
+
+The http middleware starts a buffer for each request (start_request_event_buffer),
+and flushes it once the response is ready (flush_request_event_buffer).
+Entries are packed into PutEvents calls of at most ten entries and 256 KB,
+entries that fail (i.e are throttled) are retried on their own, with an exponential backoff.
+
+Outside of a request (no buffer), events are sent straight away.
+Events put within a write transaction are held back until it commits (see deferred_events).
+
+With the transactional outbox enabled, events are written to the outbox table instead (see outbox.py).
+
+Fastq and fastq set events carry the full response object, or only the changed fields (see delta.py).
+"""
+
 import json
+import threading
 import typing
-from typing import Dict, Union
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cache
+from time import sleep
+from typing import Dict, Iterator, List, Optional, Union
 from os import environ
 
 import boto3
@@ -12,74 +35,261 @@ from ..globals import (
     EVENT_DETAIL_TYPE_FASTQ_STATE_CHANGE_ENV_VAR,
     EVENT_DETAIL_TYPE_FASTQ_SET_STATE_CHANGE_ENV_VAR,
     EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE_ENV_VAR,
+    EVENTBRIDGE_PUT_EVENTS_MAX_ENTRIES,
+    EVENTBRIDGE_PUT_EVENTS_MAX_SIZE_BYTES,
+    EVENTBRIDGE_PUT_EVENTS_MAX_ATTEMPTS,
     FastqStateChangeStatusEventsType,
     FastqSetStateChangeStatusEventsType,
 )
+from ..metrics import increment_request_metric
 from ..models.fastq import FastqResponseDict
 from ..models.fastq_set import FastqSetResponseDict
 from ..models.multiqc import MultiqcJobResponseDict, MultiqcJobStatusType
+from .delta import is_delta_event_payload, get_fastq_delta_event_detail, get_fastq_set_delta_event_detail
+from .outbox import is_event_outbox_enabled, add_to_outbox
 
 if typing.TYPE_CHECKING:
     from mypy_boto3_events import EventBridgeClient
+    from ..models.fastq import FastqData
+    from ..models.fastq_set import FastqSetData
+    from mypy_boto3_events.type_defs import PutEventsRequestEntryTypeDef
+
+# Entries put over the course of the current request
+REQUEST_EVENT_BUFFER: ContextVar[Optional[List['PutEventsRequestEntryTypeDef']]] = ContextVar(
+    "request_event_buffer", default=None
+)
 
+# Events may be put from the query thread pool
+_REQUEST_EVENT_BUFFER_LOCK = threading.Lock()
 
+
+@cache
 def get_event_client() -> 'EventBridgeClient':
     """
     Get the event client for AWS EventBridge.
+    Clients are thread safe, so we create just the one.
     """
     return boto3.client('events')
 
 
+def get_entry_size(entry: 'PutEventsRequestEntryTypeDef') -> int:
+    """
+    The size of an entry as counted towards the PutEvents limit
+    https://docs.aws.amazon.com/eventbridge/latest/userguide/eb-putevent-size.html
+    :param entry:
+    :return:
+    """
+    return (
+        (14 if entry.get('Time') is not None else 0) +
+        len(entry['Source'].encode()) +
+        len(entry['DetailType'].encode()) +
+        len(entry['Detail'].encode()) +
+        sum(map(lambda resource_iter_: len(resource_iter_.encode()), entry.get('Resources', [])))
+    )
+
+
+def chunk_entries(entries: List['PutEventsRequestEntryTypeDef']) -> Iterator[List['PutEventsRequestEntryTypeDef']]:
+    """
+    Pack entries, in order, into chunks of at most ten entries and 256 KB.
+    An entry over the size limit on its own is given its own chunk (and is rejected by EventBridge).
+    :param entries:
+    :return:
+    """
+    entries_chunk = []
+    entries_chunk_size = 0
+    for entry in entries:
+        entry_size = get_entry_size(entry)
+        if len(entries_chunk) > 0 and (
+            len(entries_chunk) >= EVENTBRIDGE_PUT_EVENTS_MAX_ENTRIES or
+            entries_chunk_size + entry_size > EVENTBRIDGE_PUT_EVENTS_MAX_SIZE_BYTES
+        ):
+            yield entries_chunk
+            entries_chunk = []
+            entries_chunk_size = 0
+        entries_chunk.append(entry)
+        entries_chunk_size += entry_size
+    if len(entries_chunk) > 0:
+        yield entries_chunk
+
+
+def put_entries(entries: List['PutEventsRequestEntryTypeDef']):
+    """
+    Send the entries, in as few PutEvents calls as we can, retrying only the entries that failed
+    :param entries:
+    :return:
+    """
+    for entries_chunk in chunk_entries(entries):
+        attempts = 0
+        while len(entries_chunk) > 0:
+            if attempts >= EVENTBRIDGE_PUT_EVENTS_MAX_ATTEMPTS:
+                raise TimeoutError(
+                    f"Could not put {len(entries_chunk)} events on the event bus "
+                    f"after {EVENTBRIDGE_PUT_EVENTS_MAX_ATTEMPTS} attempts"
+                )
+            if attempts > 0:
+                # Exponential backoff on failed entries
+                sleep(0.05 * (2 ** attempts))
+                increment_request_metric("events.retriedEntries", len(entries_chunk))
+
+            response = get_event_client().put_events(Entries=entries_chunk)
+            increment_request_metric("events.entries", len(entries_chunk) - response['FailedEntryCount'])
+
+            # Result entries are in the same order as the request entries, failed entries have an error code
+            entries_chunk = list(map(
+                lambda entry_result_pair_iter_: entry_result_pair_iter_[0],
+                filter(
+                    lambda entry_result_pair_iter_: entry_result_pair_iter_[1].get('ErrorCode') is not None,
+                    zip(entries_chunk, response['Entries'])
+                )
+            ))
+            attempts += 1
+
+
+def start_request_event_buffer():
+    """
+    Start buffering the events put over the course of this request (called by the http middleware)
+    :return:
+    """
+    REQUEST_EVENT_BUFFER.set([])
+
+
+def flush_request_event_buffer():
+    """
+    Send the events put over the course of this request (called by the http middleware)
+    :return:
+    """
+    request_event_buffer = REQUEST_EVENT_BUFFER.get()
+    if request_event_buffer is None:
+        return
+    with _REQUEST_EVENT_BUFFER_LOCK:
+        entries = request_event_buffer.copy()
+        request_event_buffer.clear()
+    if len(entries) > 0:
+        put_entries(entries)
+
+
+@contextmanager
+def deferred_events() -> Iterator[None]:
+    """
+    Hold back the events put within the block until the block exits without an exception
+    (i.e until the transaction they describe has committed), events put in a failed block are dropped.
+    With the outbox, events are already committed along with their writes, so this does nothing.
+    :return:
+    """
+    outer_event_buffer = REQUEST_EVENT_BUFFER.get()
+    event_buffer_token = REQUEST_EVENT_BUFFER.set([])
+    try:
+        yield
+    except BaseException:
+        REQUEST_EVENT_BUFFER.reset(event_buffer_token)
+        raise
+    entries = REQUEST_EVENT_BUFFER.get()
+    REQUEST_EVENT_BUFFER.reset(event_buffer_token)
+
+    # Pass the entries on to the request buffer, or send them straight away outside of a request
+    if outer_event_buffer is None:
+        if len(entries) > 0:
+            put_entries(entries)
+        return
+    with _REQUEST_EVENT_BUFFER_LOCK:
+        outer_event_buffer.extend(entries)
+
+
+def get_entry(
+        event_detail_type: str,
+        event_status: str,
+        event_detail: Dict
+) -> 'PutEventsRequestEntryTypeDef':
+    return {
+        'EventBusName': environ[EVENT_BUS_NAME_ENV_VAR],
+        'Source': environ[EVENT_SOURCE_ENV_VAR],
+        'DetailType': event_detail_type,
+        'Detail': json.dumps(
+            dict(
+                status=event_status,
+                **event_detail,
+            ),
+        ),
+    }
+
+
 def put_event(
         event_detail_type: str,
         event_status: str,
         event_detail: Dict
 ):
+    # Committed along with the write (within an outbox transaction), and relayed to the event bus later
+    if is_event_outbox_enabled():
+        add_to_outbox(get_entry(event_detail_type, event_status, event_detail))
+        return
+
     # DEBUG
     if environ.get(EVENT_BUS_NAME_ENV_VAR) == 'local':
         return
-    get_event_client().put_events(
-        Entries=[
-            {
-                'EventBusName': environ[EVENT_BUS_NAME_ENV_VAR],
-                'Source': environ[EVENT_SOURCE_ENV_VAR],
-                'DetailType': event_detail_type,
-                'Detail': json.dumps(
-                    dict(
-                        status=event_status,
-                        **event_detail,
-                    ),
-                ),
-            },
-        ]
-    )
+
+    entry = get_entry(event_detail_type, event_status, event_detail)
+
+    request_event_buffer = REQUEST_EVENT_BUFFER.get()
+    if request_event_buffer is None:
+        put_entries([entry])
+        return
+
+    with _REQUEST_EVENT_BUFFER_LOCK:
+        request_event_buffer.append(entry)
+
 
 # Update events
 def put_fastq_update_event(
-        fastq_response_object: Union[FastqResponseDict, Dict],
-        event_status: FastqStateChangeStatusEventsType
+        fastq_response_object: Optional[Union[FastqResponseDict, Dict]] = None,
+        *,
+        event_status: FastqStateChangeStatusEventsType,
+        fastq_obj: Optional['FastqData'] = None
 ):
     """
     Put a update event to the event bus.
+    :param fastq_response_object: The full event payload, serialized from the fastq object if not given
+    :param event_status:
+    :param fastq_obj: The fastq object, required for the delta event payload
     """
+    if is_delta_event_payload():
+        event_detail = get_fastq_delta_event_detail(fastq_obj, event_status)
+    elif fastq_response_object is None:
+        event_detail = fastq_obj.to_dict()
+    else:
+        event_detail = fastq_response_object
+
     put_event(
         event_detail_type=environ[EVENT_DETAIL_TYPE_FASTQ_STATE_CHANGE_ENV_VAR],
         event_status=event_status,
-        event_detail=fastq_response_object,
+        event_detail=event_detail,
     )
 
 
 def put_fastq_set_update_event(
-        fastq_set_response_object: Union[FastqSetResponseDict, Dict],
-        event_status: FastqSetStateChangeStatusEventsType
+        fastq_set_response_object: Optional[Union[FastqSetResponseDict, Dict]] = None,
+        *,
+        event_status: FastqSetStateChangeStatusEventsType,
+        fastq_set_obj: Optional['FastqSetData'] = None,
+        merged_fastq_set_ids: Optional[List[str]] = None
 ):
     """
     Put a update event to the event bus.
+    :param fastq_set_response_object: The full event payload, serialized from the fastq set object if not given
+    :param event_status:
+    :param fastq_set_obj: The fastq set object, required for the delta event payload
+    :param merged_fastq_set_ids: The fastq sets merged into this fastq set (FASTQ_SET_MERGED only, delta payload)
     """
+    if is_delta_event_payload():
+        event_detail = get_fastq_set_delta_event_detail(fastq_set_obj, event_status, merged_fastq_set_ids)
+    elif fastq_set_response_object is None:
+        event_detail = fastq_set_obj.to_dict()
+    else:
+        event_detail = fastq_set_response_object
+
     put_event(
         event_detail_type=environ[EVENT_DETAIL_TYPE_FASTQ_SET_STATE_CHANGE_ENV_VAR],
         event_status=event_status,
-        event_detail=fastq_set_response_object
+        event_detail=event_detail
     )
 
 
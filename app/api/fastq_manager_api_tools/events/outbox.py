@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+"""
+Transactional event outbox
+
+Without the outbox, a write route saves to DynamoDB and then sends its events to the event bus,
+so the client waits on EventBridge, and an event is lost if the PutEvents call fails after the save.
+
+With the outbox enabled (EVENT_OUTBOX_ENABLED), events are instead written to the outbox table,
+within the same DynamoDB transaction as the writes they describe (see outbox_transaction),
+so a change and its events are committed together, or not at all.
+
+The outbox is drained to the event bus in batches by the relayEventOutbox lambda (triggered by the outbox table stream),
+or by relay_outbox (see relay.py) when running locally or in tests.
+
+A DynamoDB transaction holds at most 100 writes (events included)
+  * an outbox transaction is a single transaction, a block with more writes raises TransactionTooLargeError,
+    and nothing is written,
+  * operations over many items (i.e merging fastq sets, or a bulk import) use write_transaction (see transactions.py),
+    which commits larger blocks in consecutive transactions, so is only atomic up to 100 writes.
+    A block is only ever split before a write that is not an event,
+    so each write is always committed along with the events put after it (and before the next write),
+    callers put the events of each write straight after the write.
+
+write_transaction is transactional with or without the outbox, and joins (or is joined by) an outbox transaction.
+"""
+
+# Standard imports
+import typing
+from contextlib import contextmanager
+from os import environ
+from typing import Iterator, List, Tuple, Type
+
+from dyntastic import Dyntastic, transaction
+from dyntastic.transact import current_transaction_writer
+
+# Local imports
+from ..globals import (
+    EVENT_OUTBOX_ENABLED_ENV_VAR, DEFAULT_EVENT_OUTBOX_ENABLED, DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS
+)
+from ..metrics import increment_request_metric
+from ..models.event_outbox import EventOutboxData
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_events.type_defs import PutEventsRequestEntryTypeDef
+
+
+class TransactionTooLargeError(Exception):
+    """
+    The block holds more writes than fit in a single transaction, nothing was written
+    """
+    pass
+
+
+class OutboxTransactionWriter(transaction):
+    """
+    Collects the writes of a block, and commits them once the block exits without an exception.
+
+    The writes are grouped, each write that is not an event starts a group, and the events put after it join its group.
+    When the writes no longer fit in a single transaction
+      * unchunked, raises TransactionTooLargeError (nothing is written),
+      * chunked, commits the groups collected so far, and carries on with the current group,
+        so a group (a write and its events) is never split across transactions.
+
+    Saves and deletes increment the version of the data object as the write is collected (see next_version),
+    the version read is restored on any data object whose write is never committed.
+    """
+    def __init__(self, chunked: bool = False):
+        super().__init__(auto_commit=False)
+        self.chunked = chunked
+        # The position of the first write of the current group
+        self.group_start_index = 0
+        # The data objects with a write not yet committed, with the version read and the position of the write
+        self.uncommitted_read_versions: List[Tuple[Dyntastic, int, int]] = []
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            super().__exit__(exc_type, exc_value, traceback)
+        except BaseException:
+            self.restore_read_versions()
+            raise
+        if exc_type is not None:
+            self.restore_read_versions()
+        self.uncommitted_read_versions = []
+
+    def add_read_version(self, data_obj: Dyntastic, read_version: int):
+        """
+        Register the version read of a data object whose write was just added
+        :param data_obj:
+        :param read_version:
+        :return:
+        """
+        self.uncommitted_read_versions.append((data_obj, read_version, len(self.items) - 1))
+
+    def restore_read_versions(self):
+        # In reverse, so a data object written more than once gets the first version read
+        for data_obj, read_version, _ in reversed(self.uncommitted_read_versions):
+            data_obj.version = read_version
+        self.uncommitted_read_versions = []
+
+    def add(self, table: Type[Dyntastic], item: dict):
+        if not issubclass(table, EventOutboxData):
+            self.group_start_index = len(self.items)
+
+        if len(self.items) == DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS:
+            if not self.chunked or self.group_start_index == 0:
+                raise TransactionTooLargeError(
+                    f"Cannot write more than {DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS} items "
+                    f"(events included) in a single transaction"
+                )
+            # Commit the complete groups, and carry the current group over to the next transaction
+            group_items = self.items[self.group_start_index:]
+            self.items = self.items[:self.group_start_index]
+            self.commit()
+            self.items = group_items
+            # Only the writes of the current group are still uncommitted
+            self.uncommitted_read_versions = list(map(
+                lambda read_version_iter_: (
+                    read_version_iter_[0], read_version_iter_[1], read_version_iter_[2] - self.group_start_index
+                ),
+                filter(
+                    lambda read_version_iter_: read_version_iter_[2] >= self.group_start_index,
+                    self.uncommitted_read_versions
+                )
+            ))
+            self.group_start_index = 0
+
+        self._register_table(table)
+        self.items.append(item)
+
+
+def is_event_outbox_enabled() -> bool:
+    return environ.get(EVENT_OUTBOX_ENABLED_ENV_VAR, DEFAULT_EVENT_OUTBOX_ENABLED).lower() == 'true'
+
+
+@contextmanager
+def outbox_transaction() -> Iterator[None]:
+    """
+    Commit the saves and deletes made within the block, along with the events put within the block,
+    in a single DynamoDB transaction (once the block exits without an exception).
+    Reads within the block do not see the writes made within the block.
+    Nested blocks join the outer transaction, without the outbox this does nothing.
+    :raises TransactionTooLargeError: The block holds more than 100 writes (events included)
+    :return:
+    """
+    if not is_event_outbox_enabled() or current_transaction_writer() is not None:
+        yield
+        return
+
+    with OutboxTransactionWriter():
+        yield
+
+
+def add_to_outbox(entry: 'PutEventsRequestEntryTypeDef'):
+    """
+    Write the entry to the outbox, joining the current outbox transaction if there is one
+    :param entry:
+    :return:
+    """
+    increment_request_metric("events.outbox")
+    EventOutboxData.from_entry(entry).save()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+"""
+Local outbox relay
+
+A stand-in for the relayEventOutbox lambda, for running against a local DynamoDB or in tests,
+drains the outbox table, in the order the events were put.
+"""
+
+# Standard imports
+import typing
+from typing import Callable, List
+
+# Local imports
+from .events import put_entries
+from ..models.event_outbox import EventOutboxData
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_events.type_defs import PutEventsRequestEntryTypeDef
+
+
+def relay_outbox(
+        put_entries_func: Callable[[List['PutEventsRequestEntryTypeDef']], None] = put_entries
+) -> int:
+    """
+    Relay every event in the outbox, and remove the relayed events
+    :param put_entries_func: Sends the entries, defaults to the event bus (i.e a list.extend in tests)
+    :return: The number of events relayed
+    """
+    event_outbox_list = sorted(
+        EventOutboxData.scan(),
+        key=lambda event_outbox_iter_: event_outbox_iter_.id
+    )
+
+    if len(event_outbox_list) == 0:
+        return 0
+
+    put_entries_func(list(map(
+        lambda event_outbox_iter_: event_outbox_iter_.to_entry(),
+        event_outbox_list
+    )))
+
+    with EventOutboxData.batch_writer():
+        for event_outbox_obj in event_outbox_list:
+            event_outbox_obj.delete()
+
+    return len(event_outbox_list)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+"""
+Sparse fieldsets
+
+Clients may request a subset of the response fields with the 'fields' query parameter,
+a comma separated list of camel case paths, i.e
+
+    ?fields=id,lane,library.libraryId
+
+The paths are parsed into a field tree, i.e
+
+    {"id": True, "lane": True, "library": {"libraryId": True}}
+
+and validated against the response TypedDict (i.e FastqResponseDict).
+
+Data objects then only build the sub models for the selected top level fields,
+and the nested paths are selected from the serialized sub models.
+
+Since sparse responses do not match the full response TypedDict, they are returned as a json Response directly
+"""
+
+# Standard imports
+from typing import Dict, Optional, Union, Any, List, get_origin, get_args, is_typeddict
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from typing_extensions import TypeAliasType
+
+# Local imports
+from .responses import json_response
+
+# Field tree type, a leaf is True
+# Declared as a TypeAliasType, since pydantic cannot build a schema for a plain self-referencing alias
+FieldTree = TypeAliasType("FieldTree", Dict[str, Union[bool, "FieldTree"]])
+
+
+def _get_typed_dict_annotations(type_hint: Any) -> Optional[Dict[str, Any]]:
+    """
+    Unwrap Optional / List / Union type hints, and return the (merged) annotations of any TypedDicts.
+    Returns None if there are no TypedDicts to validate against.
+    :param type_hint:
+    :return:
+    """
+    origin = get_origin(type_hint)
+    if origin is Union:
+        annotations_list = list(filter(
+            lambda annotations_iter_: annotations_iter_ is not None,
+            map(_get_typed_dict_annotations, get_args(type_hint))
+        ))
+        if len(annotations_list) == 0:
+            return None
+        merged_annotations = {}
+        for annotations_iter_ in annotations_list:
+            merged_annotations.update(annotations_iter_)
+        return merged_annotations
+    if origin in (list, List):
+        return _get_typed_dict_annotations(get_args(type_hint)[0])
+    if is_typeddict(type_hint):
+        return type_hint.__annotations__
+    return None
+
+
+def _validate_field_tree(field_tree: FieldTree, type_hint: Any, path_prefix: str = ""):
+    annotations = _get_typed_dict_annotations(type_hint)
+    if annotations is None:
+        # Nothing we can validate against
+        return
+    for field_name, sub_field_tree in field_tree.items():
+        if field_name not in annotations:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown field '{path_prefix}{field_name}', expected one of {', '.join(annotations.keys())}"
+            )
+        if isinstance(sub_field_tree, dict):
+            _validate_field_tree(sub_field_tree, annotations[field_name], f"{path_prefix}{field_name}.")
+
+
+def parse_fields(fields: Optional[str], response_type: Any) -> Optional[FieldTree]:
+    """
+    Parse the fields query parameter into a field tree, and validate it against the response type
+    :param fields: i.e 'id,lane,library.libraryId'
+    :param response_type: i.e FastqResponseDict
+    :raises HTTPException: if a field path is not part of the response type
+    :return: None if no fields were requested
+    """
+    if fields is None or fields.strip() == "":
+        return None
+
+    field_tree: FieldTree = {}
+    for field_path in map(str.strip, fields.split(",")):
+        if field_path == "":
+            continue
+        field_names = field_path.split(".")
+        field_tree_iter_ = field_tree
+        for field_name in field_names[:-1]:
+            if field_tree_iter_.get(field_name) is True:
+                # Parent field is already selected in full
+                break
+            field_tree_iter_ = field_tree_iter_.setdefault(field_name, {})
+        else:
+            # Selecting the field in full overrides any nested selections
+            field_tree_iter_[field_names[-1]] = True
+
+    _validate_field_tree(field_tree, response_type)
+
+    return field_tree
+
+
+def has_any_field(field_tree: Optional[FieldTree], field_names: List[str]) -> bool:
+    """
+    Check if any of the top level fields are selected (all fields are selected if the tree is None)
+    :param field_tree:
+    :param field_names:
+    :return:
+    """
+    if field_tree is None:
+        return True
+    return any(map(
+        lambda field_name_iter_: field_name_iter_ in field_tree,
+        field_names
+    ))
+
+
+def select_fields(data: Any, field_tree: Union[bool, FieldTree]) -> Any:
+    """
+    Select the field tree from the serialized data, lists are selected item by item
+    :param data:
+    :param field_tree:
+    :return:
+    """
+    if field_tree is True or data is None:
+        return data
+    if isinstance(data, list):
+        return list(map(
+            lambda data_iter_: select_fields(data_iter_, field_tree),
+            data
+        ))
+    if not isinstance(data, dict):
+        return data
+    # Maintain the order of the serialized data
+    return dict(map(
+        lambda kv: (kv[0], select_fields(kv[1], field_tree[kv[0]])),
+        filter(
+            lambda kv: kv[0] in field_tree,
+            data.items()
+        )
+    ))
+
+
+def sparse_response(response_obj: Any) -> Response:
+    """
+    Sparse responses do not match the full response model, so we return them directly
+    :param response_obj:
+    :return:
+    """
+    return json_response(jsonable_encoder(response_obj))
@@ -27,8 +27,122 @@ MULTIQC_COLLECTOR_STEP_FUNCTION_ARN_ENV_VAR = "MULTIQC_COLLECTOR_STEP_FUNCTION_A
 
 DEFAULT_ROWS_PER_PAGE = 100
 
+# DynamoDB limits
+DYNAMODB_BATCH_GET_ITEM_MAX_KEYS = 100
+DYNAMODB_BATCH_GET_ITEM_MAX_ATTEMPTS = 5
+DYNAMODB_BATCH_WRITE_ITEM_MAX_ITEMS = 25
+DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS = 100
+DYNAMODB_IN_CONDITION_MAX_VALUES = 100
+# Versioned (partial) updates are retried on a version conflict, re-applying the change to the latest item
+DYNAMODB_VERSIONED_UPDATE_MAX_ATTEMPTS = 5
+
+# EventBridge limits
+EVENTBRIDGE_PUT_EVENTS_MAX_ENTRIES = 10
+EVENTBRIDGE_PUT_EVENTS_MAX_SIZE_BYTES = 256 * 1024
+EVENTBRIDGE_PUT_EVENTS_MAX_ATTEMPTS = 5
+
+# Concurrency
+# The maximum number of per-key queries (or batch gets) we run at once over a single request
+QUERY_CONCURRENCY_LIMIT_ENV_VAR = "QUERY_CONCURRENCY_LIMIT"
+DEFAULT_QUERY_CONCURRENCY_LIMIT = 16
+
+# Query planner
+# Rough estimate of the number of fastqs we read per key of each fastq table index
+FASTQ_INDEX_ESTIMATED_ROWS_PER_KEY = {
+    "rgid_ext": 1,
+    "fastq_set_id": 4,
+    "library_orcabus_id": 8,
+    "instrument_run_id": 1000,
+}
+# The attributes projected into each fastq table index (must match the infrastructure stack)
+# Each index includes the table key, the other index keys and is_valid
+# The instrument_run_id index additionally includes the index and lane
+FASTQ_INDEX_PROJECTED_ATTRIBUTES = {
+    index_key: [
+        "id", "is_valid",
+        *FASTQ_INDEX_ESTIMATED_ROWS_PER_KEY.keys(),
+        *(["index", "lane"] if index_key == "instrument_run_id" else [])
+    ]
+    for index_key in FASTQ_INDEX_ESTIMATED_ROWS_PER_KEY.keys()
+}
+
+# S3 details cache
+# The maximum number of ingest ids we hold, and how long we hold them for
+S3_CACHE_MAX_ENTRIES_ENV_VAR = "S3_CACHE_MAX_ENTRIES"
+DEFAULT_S3_CACHE_MAX_ENTRIES = 10000
+S3_CACHE_TTL_SECONDS_ENV_VAR = "S3_CACHE_TTL_SECONDS"
+DEFAULT_S3_CACHE_TTL_SECONDS = 900
+# Ingest ids not found by the file manager are held for a shorter time
+S3_CACHE_NEGATIVE_TTL_SECONDS_ENV_VAR = "S3_CACHE_NEGATIVE_TTL_SECONDS"
+DEFAULT_S3_CACHE_NEGATIVE_TTL_SECONDS = 60
+# Shared (second level) cache, one of 'none', 'dynamodb' or 'sqlite'
+S3_SHARED_CACHE_BACKEND_ENV_VAR = "S3_SHARED_CACHE_BACKEND"
+DEFAULT_S3_SHARED_CACHE_BACKEND = "none"
+DYNAMODB_S3_CACHE_TABLE_NAME_ENV_VAR = "DYNAMODB_S3_CACHE_TABLE_NAME"
+S3_SHARED_CACHE_SQLITE_PATH_ENV_VAR = "S3_SHARED_CACHE_SQLITE_PATH"
+DEFAULT_S3_SHARED_CACHE_SQLITE_PATH = "/tmp/fastq_manager_s3_cache.sqlite"
+# The maximum number of ingest ids we request from the file manager in a single call
+S3_RESOLVER_CHUNK_SIZE_ENV_VAR = "S3_RESOLVER_CHUNK_SIZE"
+DEFAULT_S3_RESOLVER_CHUNK_SIZE = 50
+
+# Metadata lookups cache (library, sample, subject, individual and project lookups)
+METADATA_CACHE_MAX_ENTRIES_ENV_VAR = "METADATA_CACHE_MAX_ENTRIES"
+DEFAULT_METADATA_CACHE_MAX_ENTRIES = 10000
+METADATA_CACHE_TTL_SECONDS_ENV_VAR = "METADATA_CACHE_TTL_SECONDS"
+DEFAULT_METADATA_CACHE_TTL_SECONDS = 600
+# Also hold the metadata lookups in the shared cache (using the S3_SHARED_CACHE_BACKEND), 'true' or 'false'
+METADATA_SHARED_CACHE_ENABLED_ENV_VAR = "METADATA_SHARED_CACHE_ENABLED"
+DEFAULT_METADATA_SHARED_CACHE_ENABLED = "false"
+
 DYNAMODB_FASTQ_SET_JOB_TABLE_NAME_ENV_VAR = "DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"
 
+# Presigned urls
+# Expiry of locally signed urls, must stay under the lifetime of the lambda session credentials
+PRESIGN_EXPIRY_SECONDS_ENV_VAR = "PRESIGN_EXPIRY_SECONDS"
+DEFAULT_PRESIGN_EXPIRY_SECONDS = 3600
+# Comma separated list of s3 uri prefixes we may read from (and so can sign urls for locally)
+PRESIGN_LOCAL_S3_URI_PREFIXES_ENV_VAR = "PRESIGN_LOCAL_S3_URI_PREFIXES"
+# Objects in these storage classes must be restored before they can be downloaded
+PRESIGN_ARCHIVED_STORAGE_CLASSES = ['Glacier', 'DeepArchive']
+
+# Response headers
+REQUEST_METRICS_HEADER = "X-Request-Metrics"
+QUERY_PLAN_HEADER = "X-Query-Plan"
+
+# Streaming responses
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+
+# Fastq list csv (as used by BCLConvert / DRAGEN), column name -> fastq list row key
+FASTQ_LIST_CSV_COLUMNS = {
+    "RGID": "rgid",
+    "RGSM": "rgsm",
+    "RGLB": "rglb",
+    "Lane": "lane",
+    "Read1File": "read1FileUri",
+    "Read2File": "read2FileUri",
+}
+FASTQ_LIST_CSV_FILE_NAME = "fastq_list.csv"
+
+# Transactional event outbox
+# Commit events to the outbox table along with the write, rather than sending them to the event bus, 'true' or 'false'
+EVENT_OUTBOX_ENABLED_ENV_VAR = "EVENT_OUTBOX_ENABLED"
+DEFAULT_EVENT_OUTBOX_ENABLED = "false"
+DYNAMODB_EVENT_OUTBOX_TABLE_NAME_ENV_VAR = "DYNAMODB_EVENT_OUTBOX_TABLE_NAME"
+# Relayed events are removed from the outbox, the ttl only clears events that could never be relayed
+EVENT_OUTBOX_TTL_SECONDS = 14 * 24 * 60 * 60
+
+# Event payload versions (see app/event-schemas)
+# The full payload carries the whole response object, the delta payload only carries the changed fields
+FULL_EVENT_PAYLOAD_VERSION = "2025.06.04"
+DELTA_EVENT_PAYLOAD_VERSION = "2026.10.17"
+EVENT_PAYLOAD_VERSION_ENV_VAR = "EVENT_PAYLOAD_VERSION"
+DEFAULT_EVENT_PAYLOAD_VERSION = FULL_EVENT_PAYLOAD_VERSION
+# Delta payloads over the threshold are written to s3 (under the claim check s3 uri prefix) and referenced by uri
+EVENT_CLAIM_CHECK_S3_URI_PREFIX_ENV_VAR = "EVENT_CLAIM_CHECK_S3_URI_PREFIX"
+EVENT_CLAIM_CHECK_THRESHOLD_BYTES_ENV_VAR = "EVENT_CLAIM_CHECK_THRESHOLD_BYTES"
+DEFAULT_EVENT_CLAIM_CHECK_THRESHOLD_BYTES = 64 * 1024
+
 # Envs
 EVENT_BUS_NAME_ENV_VAR = "EVENT_BUS_NAME"
 EVENT_SOURCE_ENV_VAR = "EVENT_SOURCE"
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+"""
+Hydration helpers
+
+A fastq set only stores the ids of its member fastqs, so any response that includes the fastq objects
+needs to read them back out of the fastq table.
+
+Rather than calling FastqData.get once per member (and then again on every serialization pass),
+we collect every id we need up front, and fetch them in chunks with strongly consistent BatchGetItem calls.
+
+The resulting map of id -> data object can then be shared across to_dict, to_fastq_list_rows,
+presign_uris and the ntsm validation routes.
+
+Since reads are strongly consistent, an id that is missing from the response really does not exist,
+so we no longer need to sleep and retry on a miss.
+
+Objects already read in the request are taken from the request identity map, rather than read again (see identity_map.py).
+"""
+
+# Standard imports
+from itertools import chain, islice
+from time import sleep
+from typing import Dict, Iterable, Iterator, List, Type, TypeVar
+from dyntastic import DoesNotExist
+
+# Local imports
+from .concurrency import concurrent_map
+from .globals import DYNAMODB_BATCH_GET_ITEM_MAX_KEYS, DYNAMODB_BATCH_GET_ITEM_MAX_ATTEMPTS
+from .identity_map import get_from_identity_map, add_to_identity_map
+from .utils import get_dynamodb_resource
+
+DataObjType = TypeVar("DataObjType")
+
+
+def chunk_list(items: List, chunk_size: int) -> List[List]:
+    return [
+        items[i:i + chunk_size]
+        for i in range(0, len(items), chunk_size)
+    ]
+
+
+def iter_chunks(items: Iterable, chunk_size: int) -> Iterator[List]:
+    """
+    Lazy version of chunk_list, for iterables we do not want to read up front
+    :param items:
+    :param chunk_size:
+    :return:
+    """
+    items_iter = iter(items)
+    while True:
+        items_chunk = list(islice(items_iter, chunk_size))
+        if len(items_chunk) == 0:
+            return
+        yield items_chunk
+
+
+def batch_get_items(table_name: str, ids: List[str]) -> List[Dict]:
+    """
+    Get a list of items from a table with hash key 'id'
+    Keys are chunked to the BatchGetItem limit, chunks are requested concurrently,
+    and any unprocessed keys are retried with a backoff
+    :param table_name:
+    :param ids:
+    :return:
+    """
+    def _batch_get_chunk(ids_chunk: List[str]) -> List[Dict]:
+        chunk_items = []
+        request_items = {
+            table_name: {
+                "Keys": list(map(lambda id_iter_: {"id": id_iter_}, ids_chunk)),
+                "ConsistentRead": True,
+            }
+        }
+        attempts = 0
+        while len(request_items) > 0:
+            if attempts >= DYNAMODB_BATCH_GET_ITEM_MAX_ATTEMPTS:
+                raise TimeoutError(
+                    f"Could not retrieve all items from table '{table_name}' "
+                    f"after {DYNAMODB_BATCH_GET_ITEM_MAX_ATTEMPTS} attempts"
+                )
+            if attempts > 0:
+                # Exponential backoff on throttled keys
+                sleep(0.05 * (2 ** attempts))
+
+            response = get_dynamodb_resource().batch_get_item(RequestItems=request_items)
+            chunk_items.extend(response['Responses'].get(table_name, []))
+
+            request_items = response.get('UnprocessedKeys', {})
+            attempts += 1
+
+        return chunk_items
+
+    # Chunks are requested concurrently
+    return list(chain.from_iterable(concurrent_map(
+        _batch_get_chunk,
+        chunk_list(ids, DYNAMODB_BATCH_GET_ITEM_MAX_KEYS)
+    )))
+
+
+def batch_get_data_map(
+        data_cls: Type[DataObjType],
+        ids: Iterable[str],
+        skip_missing: bool = False,
+) -> Dict[str, DataObjType]:
+    """
+    Get a map of id to data object for the dyntastic class provided.
+    Duplicate ids are only requested once.
+
+    :param data_cls: A Dyntastic class with 'id' as its hash key, i.e FastqData
+    :param ids:
+    :param skip_missing: Leave ids that do not exist out of the map, rather than raising,
+        i.e for ids read from an (eventually consistent) index
+    :raises DoesNotExist: if any of the ids do not exist (and skip_missing is False)
+    :return:
+    """
+    # Unique, but maintain order
+    ids = list(dict.fromkeys(ids))
+
+    if len(ids) == 0:
+        return {}
+
+    # Only read the ids not already read in this request
+    data_map = get_from_identity_map(data_cls, ids)
+    unread_ids = list(filter(
+        lambda id_iter_: id_iter_ not in data_map,
+        ids
+    ))
+    if len(unread_ids) > 0:
+        read_data_objs = list(map(
+            lambda item_iter_: data_cls(**item_iter_),
+            batch_get_items(data_cls.__table_name__, unread_ids)
+        ))
+        add_to_identity_map(*read_data_objs)
+        data_map.update(map(
+            lambda data_obj_iter_: (data_obj_iter_.id, data_obj_iter_),
+            read_data_objs
+        ))
+
+    missing_ids = list(filter(
+        lambda id_iter_: id_iter_ not in data_map,
+        ids
+    ))
+    if len(missing_ids) > 0 and not skip_missing:
+        raise DoesNotExist(
+            f"{data_cls.__name__} with id(s) {', '.join(missing_ids)} do not exist"
+        )
+
+    # In the order of the ids
+    return dict(map(
+        lambda id_iter_: (id_iter_, data_map[id_iter_]),
+        filter(
+            lambda id_iter_: id_iter_ in data_map,
+            ids
+        )
+    ))
+
+
+def iter_data_chunks(
+        data_cls: Type[DataObjType],
+        ids: Iterable[str],
+        chunk_size: int = DYNAMODB_BATCH_GET_ITEM_MAX_KEYS,
+) -> Iterator[List[DataObjType]]:
+    """
+    Lazily load the data objects in chunks (maintaining the order of the ids),
+    only one chunk of data objects is held in memory at a time.
+
+    Unlike batch_get_data_map, ids that no longer exist are skipped rather than raising,
+    since the ids are read from an (eventually consistent) index while the stream is in progress.
+
+    :param data_cls: A Dyntastic class with 'id' as its hash key, i.e FastqData
+    :param ids:
+    :param chunk_size:
+    :return:
+    """
+    for ids_chunk in iter_chunks(ids, chunk_size):
+        # Unique, but maintain order
+        ids_chunk = list(dict.fromkeys(ids_chunk))
+
+        item_map = dict(map(
+            lambda item_iter_: (item_iter_['id'], item_iter_),
+            batch_get_items(data_cls.__table_name__, ids_chunk)
+        ))
+
+        yield list(map(
+            lambda id_iter_: data_cls(**item_map[id_iter_]),
+            filter(
+                lambda id_iter_: id_iter_ in item_map,
+                ids_chunk
+            )
+        ))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+Request scoped identity map
+
+A route may read the same fastq many times over (i.e creating a fastq set reads each member fastq to check the library,
+again for the rgid_ext, again to build the fastq set, and again to serialize it), each read being a GetItem call.
+
+The http middleware starts an identity map for each request (start_request_identity_map),
+every fastq and fastq set read over the course of the request is kept in the map, by its id, so
+  * FastqData.get / FastqSetData.get return the object already read (see IdentityMapMixin),
+  * batch_get_data_map only requests the ids not already read (see hydration.py),
+  * a saved object replaces the object in the map, a deleted object is removed from the map.
+Within a request, each item is therefore read at most once, and every reader sees the same object.
+
+A strongly consistent get (i.e a versioned update, see versioned_update.py) always reads the item, and replaces it in the map.
+
+A failed write transaction clears the map, since the objects in the map may hold changes that were never written.
+
+Streaming responses (see streaming.py) do not use the map, so memory stays bounded by the chunk size.
+Outside of a request (no map), every get is a read.
+"""
+
+# Standard imports
+import threading
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+# Local imports
+from .metrics import increment_request_metric
+
+# (table name, id) -> data object, for the current request
+REQUEST_IDENTITY_MAP: ContextVar[Optional[Dict[Tuple[str, str], object]]] = ContextVar(
+    "request_identity_map", default=None
+)
+
+# The map may be read and updated from the query thread pool
+_IDENTITY_MAP_LOCK = threading.Lock()
+
+
+def start_request_identity_map():
+    """
+    Start keeping the objects read over the course of this request (called by the http middleware)
+    :return:
+    """
+    REQUEST_IDENTITY_MAP.set({})
+
+
+def clear_request_identity_map():
+    """
+    Forget every object read so far in this request, the next get of each is a read
+    :return:
+    """
+    request_identity_map = REQUEST_IDENTITY_MAP.get()
+    if request_identity_map is None:
+        return
+    with _IDENTITY_MAP_LOCK:
+        request_identity_map.clear()
+
+
+def get_from_identity_map(data_cls, ids: Iterable[str]) -> Dict:
+    """
+    Get the objects already read in this request
+    :param data_cls: A Dyntastic class with 'id' as its hash key, i.e FastqData
+    :param ids:
+    :return: A map of id to data object, ids not yet read are missing from the map
+    """
+    request_identity_map = REQUEST_IDENTITY_MAP.get()
+    if request_identity_map is None:
+        return {}
+
+    with _IDENTITY_MAP_LOCK:
+        data_map = dict(filter(
+            lambda data_pair_iter_: data_pair_iter_[1] is not None,
+            map(
+                lambda id_iter_: (id_iter_, request_identity_map.get((data_cls.__table_name__, id_iter_), None)),
+                ids
+            )
+        ))
+
+    if len(data_map) > 0:
+        increment_request_metric("identityMap.hit", len(data_map))
+    return data_map
+
+
+def add_to_identity_map(*data_objs):
+    """
+    Keep the objects, replacing any object with the same id
+    :param data_objs:
+    :return:
+    """
+    request_identity_map = REQUEST_IDENTITY_MAP.get()
+    if request_identity_map is None:
+        return
+    with _IDENTITY_MAP_LOCK:
+        for data_obj in data_objs:
+            request_identity_map[(data_obj.__table_name__, data_obj.id)] = data_obj
+
+
+def remove_from_identity_map(*data_objs):
+    """
+    Forget the objects (i.e once deleted)
+    :param data_objs:
+    :return:
+    """
+    request_identity_map = REQUEST_IDENTITY_MAP.get()
+    if request_identity_map is None:
+        return
+    with _IDENTITY_MAP_LOCK:
+        for data_obj in data_objs:
+            request_identity_map.pop((data_obj.__table_name__, data_obj.id), None)
+
+
+class IdentityMapMixin:
+    """
+    Get from, and keep saved objects in, the request identity map.
+    Goes before Dyntastic in the bases of the data class, i.e class FastqData(FastqWithId, IdentityMapMixin, Dyntastic)
+    """
+    @classmethod
+    def get(cls, hash_key, range_key=None, *, consistent_read: bool = False):
+        if not consistent_read:
+            data_obj = get_from_identity_map(cls, [hash_key]).get(hash_key, None)
+            if data_obj is not None:
+                return data_obj
+
+        data_obj = super().get(hash_key, range_key, consistent_read=consistent_read)
+        add_to_identity_map(data_obj)
+        return data_obj
+
+    def save(self, **kwargs):
+        response = super().save(**kwargs)
+        add_to_identity_map(self)
+        return response
+
+    def delete(self, **kwargs):
+        response = super().delete(**kwargs)
+        remove_from_identity_map(self)
+        return response
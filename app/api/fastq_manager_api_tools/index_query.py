@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+
+"""
+Index query helpers
+
+Dyntastic will run a query against a global secondary index, but will always return the full data object.
+These helpers query the indexes directly through boto3 so that we can
+
+* only request the attributes we need (i.e 'id' and the other index keys projected into the index)
+* stop reading once we have enough items for a page, and resume from a cursor on the next request
+
+A query is described by an IndexQuery, the index to query, the attribute that is the index partition key,
+and the list of values to query (we run one query per value, i.e one per instrument run id).
+"""
+
+# Standard imports
+from itertools import chain
+from typing import List, Optional, Dict, Callable, Tuple, TypedDict, Any, Iterable, Iterator, Type, TypeVar
+
+from boto3.dynamodb.conditions import Key, ConditionBase
+
+# Local imports
+from .concurrency import concurrent_map
+from .hydration import batch_get_data_map
+from .utils import get_dynamodb_resource
+
+DataObjType = TypeVar("DataObjType")
+
+
+class IndexQuery(TypedDict):
+    index_name: str
+    key_attr: str
+    key_values: List[str]
+    filter_condition: Optional[ConditionBase]
+
+
+class IndexQueryCursor(TypedDict):
+    # Position in the key values list
+    keyIndex: int
+    # The exclusive start key for the query of this key value
+    exclusiveStartKey: Optional[Dict[str, Any]]
+
+
+def combine_conditions(*conditions: Optional[ConditionBase]) -> Optional[ConditionBase]:
+    """
+    And together all conditions that are not None
+    :param conditions:
+    :return:
+    """
+    condition_list = list(filter(
+        lambda condition_iter_: condition_iter_ is not None,
+        conditions
+    ))
+    if len(condition_list) == 0:
+        return None
+    combined_condition = condition_list[0]
+    for condition_iter_ in condition_list[1:]:
+        combined_condition = combined_condition & condition_iter_
+    return combined_condition
+
+
+def _get_query_kwargs(
+        index_query: IndexQuery,
+        key_value: str,
+        attributes: Optional[List[str]] = None,
+) -> Dict:
+    query_kwargs = {
+        "IndexName": index_query['index_name'],
+        "KeyConditionExpression": Key(index_query['key_attr']).eq(key_value),
+    }
+    if index_query['filter_condition'] is not None:
+        query_kwargs['FilterExpression'] = index_query['filter_condition']
+    if attributes is not None:
+        # Use placeholders since some attributes such as 'index' are reserved words
+        # Use a prefix that will not collide with the placeholders boto3 generates for the conditions
+        query_kwargs['ProjectionExpression'] = ", ".join(map(
+            lambda attr_idx_: f"#proj{attr_idx_}",
+            range(len(attributes))
+        ))
+        query_kwargs['ExpressionAttributeNames'] = dict(map(
+            lambda attr_iter_: (f"#proj{attr_iter_[0]}", attr_iter_[1]),
+            enumerate(attributes)
+        ))
+    return query_kwargs
+
+
+def query_index_items(
+        table_name: str,
+        index_query: IndexQuery,
+        attributes: Optional[List[str]] = None,
+) -> List[Dict]:
+    """
+    Run the index query over all key values (concurrently), and return all items.
+    :param table_name:
+    :param index_query:
+    :param attributes: The attributes to return, these must be projected into the index, None for all projected attributes
+    :return:
+    """
+    def _query_key_value(key_value: str) -> List[Dict]:
+        table = get_dynamodb_resource().Table(table_name)
+        key_items = []
+        query_kwargs = _get_query_kwargs(index_query, key_value, attributes)
+        while True:
+            response = table.query(**query_kwargs)
+            key_items.extend(response['Items'])
+            if response.get('LastEvaluatedKey') is None:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        return key_items
+
+    # Query each key value concurrently, then flatten (maintaining the key value order)
+    return list(chain.from_iterable(concurrent_map(
+        _query_key_value,
+        index_query['key_values']
+    )))
+
+
+def iter_index_items(
+        table_name: str,
+        index_query: IndexQuery,
+        attributes: Optional[List[str]] = None,
+) -> Iterator[Dict]:
+    """
+    Lazily run the index query over each key value in turn,
+    yielding items as each page is read (rather than reading all items up front), i.e for streaming responses
+    :param table_name:
+    :param index_query:
+    :param attributes: The attributes to return, these must be projected into the index, None for all projected attributes
+    :return:
+    """
+    table = get_dynamodb_resource().Table(table_name)
+    for key_value in index_query['key_values']:
+        query_kwargs = _get_query_kwargs(index_query, key_value, attributes)
+        while True:
+            response = table.query(**query_kwargs)
+            yield from response['Items']
+            if response.get('LastEvaluatedKey') is None:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def query_index_ids(
+        table_name: str,
+        index_name: str,
+        key_attr: str,
+        key_value: str,
+        filter_condition: Optional[ConditionBase] = None,
+) -> List[str]:
+    """
+    Get the ids of the items matching a single index key, without reading the items from the base table,
+    i.e for existence checks
+    :param table_name:
+    :param index_name:
+    :param key_attr:
+    :param key_value:
+    :param filter_condition: Must only reference attributes projected into the index
+    :return:
+    """
+    return list(map(
+        lambda item_iter_: item_iter_['id'],
+        query_index_items(
+            table_name,
+            IndexQuery(
+                index_name=index_name,
+                key_attr=key_attr,
+                key_values=[key_value],
+                filter_condition=filter_condition,
+            ),
+            attributes=['id']
+        )
+    ))
+
+
+def query_index_page(
+        table_name: str,
+        index_query: IndexQuery,
+        rows_per_page: int,
+        cursor: Optional[IndexQueryCursor] = None,
+        attributes: Optional[List[str]] = None,
+        predicate: Optional[Callable[[Dict], bool]] = None,
+) -> Tuple[List[Dict], Optional[IndexQueryCursor]]:
+    """
+    Read a single page of items from the index query, starting at the cursor.
+
+    Key values are read one after the other, the table is read in chunks of at most rows_per_page items,
+    and we stop as soon as the page is full, so we never read much more than the page itself.
+
+    Items must also pass the (in memory) predicate if provided.
+
+    :param table_name:
+    :param index_query:
+    :param rows_per_page:
+    :param cursor: The cursor returned by the previous page, None for the first page
+    :param attributes: The attributes to return, 'id' and the index key are always returned
+    :param predicate: Optional in memory filter
+    :return: The items in this page, and the cursor for the next page (None if there are no more pages)
+    """
+    table = get_dynamodb_resource().Table(table_name)
+
+    if attributes is not None:
+        attributes = list(dict.fromkeys(['id', index_query['key_attr']] + attributes))
+
+    if cursor is None:
+        cursor = IndexQueryCursor(keyIndex=0, exclusiveStartKey=None)
+
+    key_index = cursor['keyIndex']
+    exclusive_start_key = cursor['exclusiveStartKey']
+    page_items = []
+
+    while key_index < len(index_query['key_values']) and len(page_items) < rows_per_page:
+        key_value = index_query['key_values'][key_index]
+        query_kwargs = _get_query_kwargs(index_query, key_value, attributes)
+        query_kwargs['Limit'] = rows_per_page
+        if exclusive_start_key is not None:
+            query_kwargs['ExclusiveStartKey'] = exclusive_start_key
+
+        response = table.query(**query_kwargs)
+
+        page_full = False
+        for item in response['Items']:
+            if predicate is None or predicate(item):
+                page_items.append(item)
+            if len(page_items) == rows_per_page:
+                # Resume from this item on the next page
+                # The index key is made up of the index partition key, and the table hash key 'id'
+                exclusive_start_key = {
+                    index_query['key_attr']: key_value,
+                    'id': item['id']
+                }
+                page_full = True
+                break
+
+        if page_full:
+            break
+
+        exclusive_start_key = response.get('LastEvaluatedKey')
+        if exclusive_start_key is None:
+            # Move on to the next key value
+            key_index += 1
+
+    if key_index >= len(index_query['key_values']):
+        return page_items, None
+
+    return page_items, IndexQueryCursor(
+        keyIndex=key_index,
+        exclusiveStartKey=exclusive_start_key
+    )
+
+
+def query_index_data(
+        data_cls: Type[DataObjType],
+        index_query: IndexQuery,
+) -> List[DataObjType]:
+    """
+    Run the index query over all key values (concurrently), and return the full data objects.
+    The index is queried for the ids only, the items are then read in batches (see hydration.py),
+    we do not query through dyntastic here, since its boto3 resource is shared by every thread of the pool.
+    Ids that no longer exist by the time the items are read are skipped.
+    :param data_cls: A Dyntastic class with 'id' as its hash key, i.e FastqSetData
+    :param index_query:
+    :return:
+    """
+    return list(batch_get_data_map(
+        data_cls,
+        unique_attr_values(
+            query_index_items(data_cls.__table_name__, index_query, attributes=['id']),
+            'id'
+        ),
+        skip_missing=True
+    ).values())
+
+
+def unique_attr_values(items: Iterable[Dict], attr: str) -> List[str]:
+    """
+    Get the unique, non null values of an attribute across a list of items (maintaining order)
+    :param items:
+    :param attr:
+    :return:
+    """
+    return list(dict.fromkeys(filter(
+        lambda value_iter_: value_iter_ is not None,
+        map(
+            lambda item_iter_: item_iter_.get(attr),
+            items
+        )
+    )))
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+"""
+Metadata lookups cache
+
+Library, sample, subject, individual and project lookups are http calls to the metadata service.
+A single list query may make hundreds of them, i.e a project query expands to every library in the project,
+and each fastq in a fastq list row response looks up its library.
+
+Each lookup below is wrapped in a MetadataLookup, which
+  * holds the results in a bounded, time limited, in-memory cache (METADATA_CACHE_MAX_ENTRIES, METADATA_CACHE_TTL_SECONDS),
+  * optionally holds the results in the shared cache too (METADATA_SHARED_CACHE_ENABLED, see shared_cache.py),
+  * resolves many keys at once (get_many), de-duplicating the keys,
+    and running the remaining lookups concurrently on the query thread pool.
+
+Failed lookups (i.e an unknown library id) are never cached.
+
+Cache hits and misses, and the lookups made, are counted in the request metrics (i.e 'metadataCache.hit=12').
+"""
+
+# Standard imports
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from itertools import chain
+from os import environ
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Layer imports
+from orcabus_api_tools import metadata
+
+# Local imports
+from .concurrency import concurrent_map
+from .globals import (
+    METADATA_CACHE_MAX_ENTRIES_ENV_VAR, DEFAULT_METADATA_CACHE_MAX_ENTRIES,
+    METADATA_CACHE_TTL_SECONDS_ENV_VAR, DEFAULT_METADATA_CACHE_TTL_SECONDS,
+    METADATA_SHARED_CACHE_ENABLED_ENV_VAR, DEFAULT_METADATA_SHARED_CACHE_ENABLED,
+)
+from .metrics import increment_request_metric
+from .shared_cache import get_many_from_shared_cache, put_many_in_shared_cache
+from .utils import is_orcabus_ulid
+
+METADATA_CACHE_METRIC_PREFIX = "metadataCache"
+
+
+def get_metadata_cache_max_entries() -> int:
+    return int(environ.get(METADATA_CACHE_MAX_ENTRIES_ENV_VAR, DEFAULT_METADATA_CACHE_MAX_ENTRIES))
+
+
+def get_metadata_cache_ttl_seconds() -> float:
+    return float(environ.get(METADATA_CACHE_TTL_SECONDS_ENV_VAR, DEFAULT_METADATA_CACHE_TTL_SECONDS))
+
+
+def is_metadata_shared_cache_enabled() -> bool:
+    return environ.get(
+        METADATA_SHARED_CACHE_ENABLED_ENV_VAR, DEFAULT_METADATA_SHARED_CACHE_ENABLED
+    ).lower() == 'true'
+
+
+# (Namespace, key) -> (value, expiry timestamp)
+# Ordered from least to most recently used, shared across all lookups
+METADATA_CACHE: 'OrderedDict[Tuple[str, str], Tuple[Any, float]]' = OrderedDict()
+
+# The cache is read and updated from the query thread pool
+_METADATA_CACHE_LOCK = threading.Lock()
+
+
+def _get_entries(namespace: str, keys: List[str]) -> Dict[str, Any]:
+    """
+    Get the current entries for the keys, keys with no (current) entry are omitted
+    :param namespace:
+    :param keys:
+    :return:
+    """
+    now_timestamp = datetime.now().timestamp()
+    entries = {}
+    with _METADATA_CACHE_LOCK:
+        for key in keys:
+            cache_entry = METADATA_CACHE.get((namespace, key), None)
+            if cache_entry is None:
+                continue
+            if cache_entry[1] < now_timestamp:
+                # Remove the stale entry
+                METADATA_CACHE.pop((namespace, key), None)
+                continue
+            METADATA_CACHE.move_to_end((namespace, key))
+            entries[key] = cache_entry[0]
+    return entries
+
+
+def _set_entries(namespace: str, entries: Dict[str, Tuple[Any, float]]):
+    with _METADATA_CACHE_LOCK:
+        for key, (value, expiry_timestamp) in entries.items():
+            METADATA_CACHE[(namespace, key)] = (value, expiry_timestamp)
+            METADATA_CACHE.move_to_end((namespace, key))
+
+        # Evict the least recently used entries
+        max_entries = get_metadata_cache_max_entries()
+        while len(METADATA_CACHE) > max_entries:
+            METADATA_CACHE.popitem(last=False)
+
+
+def clear_metadata_cache():
+    with _METADATA_CACHE_LOCK:
+        METADATA_CACHE.clear()
+
+
+class MetadataLookup:
+    """
+    A cached metadata lookup, called as the wrapped function (for a single key), or with get_many
+    """
+    def __init__(self, namespace: str, func: Callable[[str], Any]):
+        self.namespace = namespace
+        self.func = func
+
+    def __call__(self, key: str) -> Any:
+        return self.get_many([key])[key]
+
+    def _lookup(self, key: str) -> Any:
+        increment_request_metric(f"metadata.{self.namespace}")
+        return self.func(key)
+
+    def prime(self, values: Dict[str, Any]):
+        """
+        Add values we already have (i.e from a list response) to the in-memory cache
+        :param values:
+        :return:
+        """
+        expiry_timestamp = datetime.now().timestamp() + get_metadata_cache_ttl_seconds()
+        _set_entries(self.namespace, dict(map(
+            lambda kv: (kv[0], (kv[1], expiry_timestamp)),
+            values.items()
+        )))
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Look up many keys at once,
+        keys missing from the in-memory cache are read from the shared cache (if enabled) in a single batch,
+        any keys still missing are looked up concurrently.
+        :param keys:
+        :return: Map of key to value, for every (unique) key
+        """
+        keys = list(dict.fromkeys(keys))
+
+        values = _get_entries(self.namespace, keys)
+        missing_keys = list(filter(lambda key_iter_: key_iter_ not in values, keys))
+
+        if len(values) > 0:
+            increment_request_metric(f"{METADATA_CACHE_METRIC_PREFIX}.hit", len(values))
+        if len(missing_keys) > 0:
+            increment_request_metric(f"{METADATA_CACHE_METRIC_PREFIX}.miss", len(missing_keys))
+
+        if len(missing_keys) == 0:
+            return values
+
+        if is_metadata_shared_cache_enabled():
+            max_expiry_timestamp = datetime.now().timestamp() + get_metadata_cache_ttl_seconds()
+            shared_cache_entries = get_many_from_shared_cache(missing_keys, namespace=self.namespace)
+            # Never hold an entry in memory for longer than the shared cache would
+            _set_entries(self.namespace, dict(map(
+                lambda kv: (kv[0], (kv[1][0], min(kv[1][1], max_expiry_timestamp))),
+                shared_cache_entries.items()
+            )))
+            if len(shared_cache_entries) > 0:
+                increment_request_metric(f"{METADATA_CACHE_METRIC_PREFIX}.sharedHit", len(shared_cache_entries))
+            values.update(dict(map(
+                lambda kv: (kv[0], kv[1][0]),
+                shared_cache_entries.items()
+            )))
+            missing_keys = list(filter(lambda key_iter_: key_iter_ not in values, missing_keys))
+
+        if len(missing_keys) == 0:
+            return values
+
+        expiry_timestamp = datetime.now().timestamp() + get_metadata_cache_ttl_seconds()
+        new_entries = dict(zip(
+            missing_keys,
+            map(
+                lambda value_iter_: (value_iter_, expiry_timestamp),
+                concurrent_map(self._lookup, missing_keys)
+            )
+        ))
+
+        _set_entries(self.namespace, new_entries)
+        if is_metadata_shared_cache_enabled():
+            put_many_in_shared_cache(new_entries, namespace=self.namespace)
+
+        values.update(dict(map(
+            lambda kv: (kv[0], kv[1][0]),
+            new_entries.items()
+        )))
+
+        return values
+
+
+# Cached lookups
+get_library_orcabus_id_from_library_id = MetadataLookup(
+    "libraryOrcabusId", metadata.get_library_orcabus_id_from_library_id
+)
+get_library_id_from_library_orcabus_id = MetadataLookup(
+    "libraryId", metadata.get_library_id_from_library_orcabus_id
+)
+get_library_from_library_orcabus_id = MetadataLookup(
+    "library", metadata.get_library_from_library_orcabus_id
+)
+get_sample_orcabus_id_from_sample_id = MetadataLookup(
+    "sampleOrcabusId", metadata.get_sample_orcabus_id_from_sample_id
+)
+get_subject_orcabus_id_from_subject_id = MetadataLookup(
+    "subjectOrcabusId", metadata.get_subject_orcabus_id_from_subject_id
+)
+get_individual_orcabus_id_from_individual_id = MetadataLookup(
+    "individualOrcabusId", metadata.get_individual_orcabus_id_from_individual_id
+)
+get_project_orcabus_id_from_project_id = MetadataLookup(
+    "projectOrcabusId", metadata.get_project_orcabus_id_from_project_id
+)
+list_libraries_in_sample = MetadataLookup(
+    "sampleLibraries", metadata.list_libraries_in_sample
+)
+list_libraries_in_subject = MetadataLookup(
+    "subjectLibraries", metadata.list_libraries_in_subject
+)
+list_libraries_in_individual = MetadataLookup(
+    "individualLibraries", metadata.list_libraries_in_individual
+)
+list_libraries_in_project = MetadataLookup(
+    "projectLibraries", metadata.list_libraries_in_project
+)
+
+
+def get_library_orcabus_ids_from_library_ids(library_id_list: List[str]) -> List[str]:
+    """
+    Resolve a list of library ids (or library orcabus ids) to library orcabus ids, in the same order
+    :param library_id_list:
+    :return:
+    """
+    library_orcabus_id_map = get_library_orcabus_id_from_library_id.get_many(filter(
+        lambda library_id_iter_: not is_orcabus_ulid(library_id_iter_),
+        library_id_list
+    ))
+
+    return list(map(
+        lambda library_id_iter_: (
+            library_id_iter_ if is_orcabus_ulid(library_id_iter_)
+            else library_orcabus_id_map[library_id_iter_]
+        ),
+        library_id_list
+    ))
+
+
+def _get_library_orcabus_ids_in(
+        id_list: List[str],
+        get_orcabus_id_lookup: MetadataLookup,
+        list_libraries_lookup: MetadataLookup,
+) -> List[str]:
+    """
+    Resolve a list of sample / subject / individual / project ids (or orcabus ids),
+    to the orcabus ids of every library within them
+    :param id_list:
+    :param get_orcabus_id_lookup: i.e get_sample_orcabus_id_from_sample_id
+    :param list_libraries_lookup: i.e list_libraries_in_sample
+    :return:
+    """
+    orcabus_id_map = get_orcabus_id_lookup.get_many(filter(
+        lambda id_iter_: not is_orcabus_ulid(id_iter_),
+        id_list
+    ))
+    orcabus_ids = list(map(
+        lambda id_iter_: id_iter_ if is_orcabus_ulid(id_iter_) else orcabus_id_map[id_iter_],
+        id_list
+    ))
+
+    # Flatten the list of lists of library objects
+    library_list = list(chain.from_iterable(
+        list_libraries_lookup.get_many(orcabus_ids).values()
+    ))
+
+    # We also now know the orcabus id of each of these libraries
+    get_library_orcabus_id_from_library_id.prime(dict(map(
+        lambda library_iter_: (library_iter_['libraryId'], library_iter_['orcabusId']),
+        library_list
+    )))
+
+    return list(map(
+        lambda library_iter_: library_iter_['orcabusId'],
+        library_list
+    ))
+
+
+def get_libraries_from_metadata_query(
+    library: str = None,
+    library_list: Optional[str] = None,
+    sample: str = None,
+    sample_list: Optional[str] = None,
+    subject: str = None,
+    subject_list: Optional[str] = None,
+    individual: str = None,
+    individual_list: Optional[str] = None,
+    project: str = None,
+    project_list: Optional[str] = None,
+) -> List[str]:
+    if library is not None:
+        library_list = [library]
+
+    # Check sample list
+    if sample is not None:
+        sample_list = [sample]
+    if sample_list is not None:
+        library_list = _get_library_orcabus_ids_in(
+            sample_list, get_sample_orcabus_id_from_sample_id, list_libraries_in_sample
+        )
+
+    # Check subject list
+    if subject is not None:
+        subject_list = [subject]
+    if subject_list is not None:
+        library_list = _get_library_orcabus_ids_in(
+            subject_list, get_subject_orcabus_id_from_subject_id, list_libraries_in_subject
+        )
+
+    # Check individual list
+    if individual is not None:
+        individual_list = [individual]
+    if individual_list is not None:
+        library_list = _get_library_orcabus_ids_in(
+            individual_list, get_individual_orcabus_id_from_individual_id, list_libraries_in_individual
+        )
+
+    # Check project list
+    if project is not None:
+        project_list = [project]
+    if project_list is not None:
+        library_list = _get_library_orcabus_ids_in(
+            project_list, get_project_orcabus_id_from_project_id, list_libraries_in_project
+        )
+
+    if library_list is not None:
+        return list(set(library_list))  # Remove duplicates
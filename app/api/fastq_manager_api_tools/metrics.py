@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+"""
+Request metrics
+
+Keep a per-request count of the remote calls made while serving a request,
+i.e the number of DynamoDB Query / BatchGetItem calls, so we can see why a large query is slow.
+
+Botocore emits a 'before-call' event for every AWS API call,
+we register a handler on the default boto3 session so that every client and resource created from it
+(including those created by dyntastic) is counted.
+
+Counts are kept in a context variable, the http middleware in the handler starts a new counter for each request,
+and reports the counter in the logs and in the response headers.
+"""
+
+# Standard imports
+import logging
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+import boto3
+
+# Set basic logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REQUEST_METRICS: ContextVar[Optional[Counter]] = ContextVar("request_metrics", default=None)
+
+_BOTO_CALL_COUNTER_REGISTERED = False
+
+# Queries may be run concurrently, from multiple threads, on the same request counter
+_REQUEST_METRICS_LOCK = threading.Lock()
+
+
+def start_request_metrics() -> Counter:
+    """
+    Start a new counter for this request
+    :return:
+    """
+    request_metrics = Counter()
+    REQUEST_METRICS.set(request_metrics)
+    return request_metrics
+
+
+def get_request_metrics() -> Counter:
+    """
+    Get the counter for this request, outside of a request (i.e in tests) we start a new counter
+    :return:
+    """
+    request_metrics = REQUEST_METRICS.get()
+    if request_metrics is None:
+        request_metrics = start_request_metrics()
+    return request_metrics
+
+
+def increment_request_metric(metric_name: str, count: int = 1):
+    """
+    Increment a metric for the current request, i.e 'dynamodb.Query'
+    :param metric_name:
+    :param count:
+    :return:
+    """
+    request_metrics = get_request_metrics()
+    with _REQUEST_METRICS_LOCK:
+        request_metrics[metric_name] += count
+
+
+def request_metrics_to_str(request_metrics: Counter) -> str:
+    """
+    Render as a header value, i.e 'dynamodb.BatchGetItem=2,dynamodb.Query=1'
+    :param request_metrics:
+    :return:
+    """
+    return ",".join(map(
+        lambda kv: f"{kv[0]}={kv[1]}",
+        sorted(request_metrics.items())
+    ))
+
+
+def _count_boto_call(model=None, **kwargs):
+    if model is None:
+        return
+    increment_request_metric(f"{model.service_model.endpoint_prefix}.{model.name}")
+
+
+def register_boto_call_counter(session: Optional[boto3.session.Session] = None):
+    """
+    Count each AWS API call made by clients created from the session (defaults to the default boto3 session).
+    Must be called before any client is created, since clients copy the session handlers on creation.
+    :param session:
+    :return:
+    """
+    global _BOTO_CALL_COUNTER_REGISTERED
+    if session is not None:
+        session.events.register('before-call', _count_boto_call)
+        return
+    if _BOTO_CALL_COUNTER_REGISTERED:
+        return
+    boto3._get_default_session().events.register('before-call', _count_boto_call)
+    _BOTO_CALL_COUNTER_REGISTERED = True
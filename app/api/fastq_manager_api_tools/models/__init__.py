@@ -76,6 +76,10 @@ class PresignedUrlModel(TypedDict):
     r2: Optional[PresignedUrl]
 
 
+class FastqPresignedUrlModel(PresignedUrlModel):
+    fastqId: str
+
+
 FloatDecimal = Annotated[
     Decimal,
     PlainSerializer(lambda x: float(x), return_type=float, when_used='json')
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+
+"""
+Bulk fastq import response
+"""
+
+# Standard imports
+from typing import List, TypedDict
+
+# Local imports
+from .fastq import FastqResponseDict
+from .fastq_set import FastqSetResponseDict
+
+
+class FastqBulkImportResponseDict(TypedDict):
+    # The fastqs created
+    fastqList: List[FastqResponseDict]
+    # The fastq sets created, or linked to the new fastqs
+    fastqSetList: List[FastqSetResponseDict]
+    # The rgids of the fastqs that already existed (skipExisting only)
+    skippedRgidList: List[str]
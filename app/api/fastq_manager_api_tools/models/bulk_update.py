@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+Bulk fastq update request and response
+"""
+
+# Standard imports
+from typing import List, Literal, Optional, Self, TypedDict, NotRequired
+
+from pydantic import BaseModel, ConfigDict, model_validator
+
+# Local imports
+from ..utils import to_camel, sanitise_fqr_orcabus_id_sync
+from .fastq import FastqResponseDict
+from .file_compression_info import FileCompressionInfoCreate
+from .file_storage import FileStorageObjectCreate
+from .qc import QcInformationCreate
+from .read_count_info import ReadCountInfoCreate
+
+FastqBulkUpdateStatusType = Literal[
+    "UPDATED",
+    "NOT_FOUND",
+    "INVALID",
+    "CONFLICT",
+]
+
+# Update attribute (in the order they are applied)
+FASTQ_BULK_UPDATE_FIELDS = [
+    "qc",
+    "read_count",
+    "file_compression_information",
+    "ntsm",
+    "is_valid",
+]
+
+
+class FastqBulkUpdateEntry(BaseModel):
+    """
+    The updates to apply to a single fastq, equivalent to the addQcStats, addReadCount,
+    addFileCompressionInformation, addNtsmStorageObject and validate / invalidate routes
+    """
+    model_config = ConfigDict(
+        alias_generator=to_camel,
+        populate_by_name=True
+    )
+
+    fastq_id: str
+
+    qc: Optional[QcInformationCreate] = None
+    read_count: Optional[ReadCountInfoCreate] = None
+    file_compression_information: Optional[FileCompressionInfoCreate] = None
+    ntsm: Optional[FileStorageObjectCreate] = None
+    is_valid: Optional[bool] = None
+
+    @model_validator(mode='after')
+    def confirm_at_least_one_update(self) -> Self:
+        # The 'fqr.' prefix is optional
+        self.fastq_id = sanitise_fqr_orcabus_id_sync(self.fastq_id)
+        if all(map(lambda field_iter_: getattr(self, field_iter_) is None, FASTQ_BULK_UPDATE_FIELDS)):
+            raise ValueError(
+                "At least one of qc, readCount, fileCompressionInformation, ntsm or isValid is required"
+            )
+        return self
+
+
+class FastqBulkUpdateResultDict(TypedDict):
+    # The position of the entry in the request
+    entryIndex: int
+    fastqId: Optional[str]
+    status: FastqBulkUpdateStatusType
+    # Why the entry was not applied
+    detail: NotRequired[str]
+    # The updated fastq
+    fastq: NotRequired[FastqResponseDict]
+
+
+class FastqBulkUpdateResponseDict(TypedDict):
+    updatedCount: int
+    failedCount: int
+    results: List[FastqBulkUpdateResultDict]
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+"""
+Event outbox model
+
+An event waiting to be relayed to the event bus, written in the same transaction as the change it describes
+(see events/outbox.py)
+"""
+
+# Standard imports
+import typing
+from datetime import datetime, timezone
+from os import environ
+
+from dyntastic import Dyntastic
+from pydantic import BaseModel, Field
+from ulid.api import monotonic
+
+# Local imports
+from ..globals import DYNAMODB_EVENT_OUTBOX_TABLE_NAME_ENV_VAR, EVENT_OUTBOX_TTL_SECONDS
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_events.type_defs import PutEventsRequestEntryTypeDef
+
+
+def default_id_factory() -> str:
+    # Monotonic, so ids put within the same millisecond still sort in the order they were put
+    return monotonic.new().str
+
+
+def default_ttl_factory() -> int:
+    return int(datetime.now(timezone.utc).timestamp()) + EVENT_OUTBOX_TTL_SECONDS
+
+
+class EventOutboxBase(BaseModel):
+    # Ulids sort in the order the events were put
+    id: str = Field(default_factory=default_id_factory)
+    event_bus_name: str
+    source: str
+    detail_type: str
+    # The event detail as a json string
+    detail: str
+    ttl: int = Field(default_factory=default_ttl_factory)
+
+    @classmethod
+    def from_entry(cls, entry: 'PutEventsRequestEntryTypeDef') -> 'EventOutboxBase':
+        return cls(
+            event_bus_name=entry['EventBusName'],
+            source=entry['Source'],
+            detail_type=entry['DetailType'],
+            detail=entry['Detail'],
+        )
+
+    def to_entry(self) -> 'PutEventsRequestEntryTypeDef':
+        return {
+            'EventBusName': self.event_bus_name,
+            'Source': self.source,
+            'DetailType': self.detail_type,
+            'Detail': self.detail,
+        }
+
+
+class EventOutboxData(EventOutboxBase, Dyntastic):
+    """
+    The outbox table is only required when the outbox is enabled, so the table name is resolved on use
+    """
+    __table_name__ = lambda: environ[DYNAMODB_EVENT_OUTBOX_TABLE_NAME_ENV_VAR]
+    __table_host__ = environ['DYNAMODB_HOST']
+    __hash_key__ = "id"
@@ -1,32 +1,34 @@
 #!/usr/bin/env python3
-from functools import reduce
-from operator import concat
 
 # Standard imports
+from itertools import chain
+from boto3.dynamodb.conditions import Attr, ConditionBase
 from dyntastic import Dyntastic
 from os import environ
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import Field, BaseModel, model_validator, ConfigDict, computed_field
-from typing import Optional, List, ClassVar, TypedDict
+from typing import Optional, List, ClassVar, TypedDict, Dict, Any
 from fastapi_tools import QueryPaginatedResponse
 
 # Layer imports
-from orcabus_api_tools.filemanager import (
-    get_s3_uri_from_ingest_id, get_presigned_url_from_ingest_id,
-    get_presigned_url_expiry,
-    get_s3_objs_from_ingest_ids_map
-)
-from orcabus_api_tools.metadata import get_library_from_library_orcabus_id
+from orcabus_api_tools.filemanager import get_s3_uri_from_ingest_id
 
 # Local imports
 from datetime import datetime
 from . import FastqListRowDict, PresignedUrlModel, CenterType, PlatformType
-from ..cache import update_cache, check_in_cache
-from ..globals import FQR_CONTEXT_PREFIX, EVENT_BUS_NAME_ENV_VAR
+from ..cache import get_from_cache
+from ..concurrency import concurrent_map
+from ..fieldsets import FieldTree, has_any_field, select_fields
+from ..identity_map import IdentityMapMixin
+from ..metadata_cache import get_library_from_library_orcabus_id
+from ..pagination import CursorPaginatedResponse
+from ..presign import presign_fastq
+from ..resolver import resolve_s3_details, resolve_ingest_ids, iter_ingest_ids
+from ..globals import FQR_CONTEXT_PREFIX
+from ..versioned_update import next_version
 from ..utils import (
     get_ulid,
-    datetime_to_isoformat,
     to_snake, to_camel, datetime_to_hf_format, get_fastq_endpoint_url, datetime_to_isodate
 )
 
@@ -41,6 +43,47 @@ from .file_storage import (
 
 from .library import LibraryData, LibraryResponse, LibraryResponseDict
 from .qc import QcInformationData, QcInformationResponse, QcInformationCreate, QcInformationResponseDict
+from .serializers import (
+    build_alias_table, encode_value,
+    serialize_library, serialize_fastq_pair_storage_object, serialize_qc, serialize_file_storage_object
+)
+
+
+class FastqMissingReadSetError(ValueError):
+    """
+    One or more fastqs have no read set, so cannot be returned as fastq list rows
+    """
+    def __init__(self, fastq_ids: List[str]):
+        self.fastq_ids = fastq_ids
+        super().__init__(f"Fastq(s) {', '.join(fastq_ids)} have no read set")
+
+
+def get_read_file_uri(
+        ingest_id: str,
+        bucket: Optional[str] = None,
+        key_prefix: Optional[str] = None,
+) -> str:
+    """
+    Get the s3 uri for the ingest id, from the s3 details cache if the cached object is under the bucket / key prefix,
+    otherwise ask the file manager for the object under the bucket / key prefix
+    :param ingest_id:
+    :param bucket:
+    :param key_prefix:
+    :return:
+    """
+    file_object = get_from_cache(ingest_id)
+    if (
+            file_object is not None and
+            (bucket is None or file_object['bucket'] == bucket) and
+            (key_prefix is None or file_object['key'].startswith(key_prefix))
+    ):
+        return f"s3://{file_object['bucket']}/{file_object['key']}"
+
+    return get_s3_uri_from_ingest_id(
+        ingest_id,
+        bucket=bucket,
+        key_prefix=key_prefix,
+    )
 
 
 class FastqBase(BaseModel):
@@ -168,6 +211,21 @@ class FastqResponse(FastqWithId):
         return jsonable_encoder(data)
 
 
+# Response field name to camel case alias, in response field order
+FASTQ_RESPONSE_ALIASES = build_alias_table(FastqResponse)
+
+# Sub models serializers, equivalent to the model_dump of the sub model response class
+FASTQ_RESPONSE_SERIALIZERS = {
+    "library": lambda library_obj, include_s3_details: serialize_library(library_obj),
+    "read_set": serialize_fastq_pair_storage_object,
+    "qc": serialize_qc,
+    "ntsm": serialize_file_storage_object,
+}
+
+# Response fields that include s3 details
+FASTQ_RESPONSE_S3_FIELDS = ["readSet", "qc", "ntsm"]
+
+
 class FastqCreate(FastqBase):
     # Set the model configuration
     model_config = ConfigDict(
@@ -191,7 +249,7 @@ class FastqCreate(FastqBase):
         )
 
 
-class FastqData(FastqWithId, Dyntastic):
+class FastqData(FastqWithId, IdentityMapMixin, Dyntastic):
     # We don't use aliases, instead we convert all keys to snake case first
     # And then we convert them back to camel case in the to_dict method.
     # This separates out serialization to the database store and serialization to the client
@@ -203,6 +261,26 @@ class FastqData(FastqWithId, Dyntastic):
     def convert_keys_to_snake_case(cls, values):
         return {to_snake(k): v for k, v in values.items()}
 
+    # Incremented on every write, events carry the version so consumers can order them
+    version: int = 0
+
+    def save(self, *, condition: Optional[ConditionBase] = None):
+        # Without a condition of its own, a save is conditional on the version we read,
+        # so never overwrites a change made by another writer since (a ConditionalCheckFailedException instead)
+        # New fastqs (and fastqs written before versioning) are at version 0, so require an item without a version
+        if condition is None:
+            condition = (
+                Attr('version').not_exists() | Attr('version').eq(0)
+                if self.version == 0
+                else Attr('version').eq(self.version)
+            )
+        with next_version(self):
+            return super().save(condition=condition)
+
+    def delete(self, **kwargs):
+        with next_version(self):
+            return super().delete(**kwargs)
+
     @computed_field
     def rgid_ext(self) -> str:
         return ".".join(map(
@@ -218,63 +296,60 @@ class FastqData(FastqWithId, Dyntastic):
     def library_orcabus_id(self) -> str:
         return self.library.orcabus_id
 
-    def to_dict(self, include_s3_details: Optional[bool] = False) -> 'FastqResponseDict':
+    def to_dict(
+            self,
+            include_s3_details: Optional[bool] = False,
+            fields: Optional[FieldTree] = None,
+            s3_details_resolved: Optional[bool] = False
+    ) -> 'FastqResponseDict':
         """
         Alternative serialization path to return objects by camel case
+        :param include_s3_details:
+        :param fields: Optional sparse field tree, only the selected fields are serialized
+        :param s3_details_resolved: The s3 details have already been resolved (i.e by the list response)
         :return:
         """
-        if include_s3_details and self.read_set is not None and not environ.get(EVENT_BUS_NAME_ENV_VAR) == 'local':
-            # Get the s3 objects
-            s3_objs = get_s3_objs_from_ingest_ids_map(
-                list(filter(
-                    lambda ingest_id_iter_: not check_in_cache(ingest_id_iter_),
-                    list(map(
-                        lambda read_set_obj_iter_: read_set_obj_iter_.ingest_id,
-                        list(filter(
-                            lambda read_set_obj_iter_: read_set_obj_iter_ is not None,
-                            [self.read_set.r1, self.read_set.r2]
-                        ))
-                    ))
-                ))
-            )
+        # No need to collect s3 details if none of the s3 objects are selected
+        if not has_any_field(fields, FASTQ_RESPONSE_S3_FIELDS):
+            include_s3_details = False
 
-            # Check if the ntsm object is present
-            if self.ntsm and self.ntsm.ingest_id is not None:
-                s3_objs.extend(
-                    get_s3_objs_from_ingest_ids_map(
-                        list(filter(
-                            lambda ingest_id_iter_: not check_in_cache(ingest_id_iter_),
-                            [self.ntsm.ingest_id]
-                        ))
-                    )
-                )
+        if include_s3_details and not s3_details_resolved:
+            # Resolve the s3 details of the read set, ntsm and sequali reports in one pass
+            resolve_s3_details(self)
 
-            # Check if the qc object is present and has sequali reports
-            if self.qc is not None and self.qc.sequali_reports is not None:
-                s3_objs.extend(
-                    get_s3_objs_from_ingest_ids_map(
-                        list(filter(
-                            lambda ingest_id_iter_: not check_in_cache(ingest_id_iter_),
-                            [
-                                self.qc.sequali_reports.sequali_html.ingest_id,
-                                self.qc.sequali_reports.sequali_parquet.ingest_id,
-                                self.qc.sequali_reports.multiqc_html.ingest_id,
-                                self.qc.sequali_reports.multiqc_parquet.ingest_id,
-                            ]
-                        ))
-                    )
-                )
+        if fields is not None:
+            return select_fields(self.to_dict_from_cache(include_s3_details, fields=fields), fields)
 
-            for s3_obj_iter_ in s3_objs:
-                update_cache(s3_obj_iter_['ingestId'], s3_obj_iter_['fileObject'])
+        return self.to_dict_from_cache(include_s3_details)
 
-        return FastqResponse(
-            **self.model_dump(
-                exclude={"rgid_ext", "library_orcabus_id"},
-            )
-        ).model_dump(
-            include_s3_details=include_s3_details, by_alias=True
-        )
+    def to_dict_from_cache(
+            self,
+            include_s3_details: Optional[bool] = False,
+            fields: Optional[FieldTree] = None
+    ) -> 'FastqResponseDict':
+        """
+        Single pass serialization, identical to the FastqResponse.model_dump output.
+        S3 details are read from the cache only, they are not fetched here.
+        :param include_s3_details:
+        :param fields: Optional sparse field tree, only the selected top level fields are serialized
+        :return:
+        """
+        data = {}
+        for field_name, alias in FASTQ_RESPONSE_ALIASES.items():
+            if fields is not None and alias not in fields:
+                continue
+            value = getattr(self, field_name)
+            if value is None:
+                data[alias] = None
+            elif field_name in FASTQ_RESPONSE_SERIALIZERS:
+                data[alias] = FASTQ_RESPONSE_SERIALIZERS[field_name](value, include_s3_details)
+            elif field_name == 'date':
+                # Convert 'date' to hf field (we dont need the timestamp bit)
+                data[alias] = datetime_to_isodate(value)
+            else:
+                data[alias] = encode_value(value)
+
+        return data
 
     def to_fastq_list_row(
             self,
@@ -321,119 +396,94 @@ class FastqData(FastqWithId, Dyntastic):
                     "rgdt": datetime_to_isodate(self.date) if self.date else None,
                     "rgds": library_description,
                     "lane": self.lane,
-                    "read1FileUri": get_s3_uri_from_ingest_id(
+                    "read1FileUri": get_read_file_uri(
                         self.read_set.r1.ingest_id,
                         bucket=bucket,
                         key_prefix=key_prefix,
                     ),
-                    "read2FileUri": get_s3_uri_from_ingest_id(
+                    "read2FileUri": get_read_file_uri(
                         self.read_set.r2.ingest_id,
                         bucket=bucket,
                         key_prefix=key_prefix,
-                    ),
+                    ) if self.read_set.r2 is not None else None,
                 }).items()
             ))
         )
 
-    def presign_uris(self) -> PresignedUrlModel:
-        # Get all unarchived files
-        # Presign the URIs
-        r1_presigned_url = get_presigned_url_from_ingest_id(self.read_set.r1.ingest_id)
-        presigned_objects = {
-            "r1": {
-                "s3Uri": get_s3_uri_from_ingest_id(self.read_set.r1.ingest_id),
-                "presignedUrl": r1_presigned_url,
-                "expiresAt": datetime_to_isoformat(get_presigned_url_expiry(r1_presigned_url))
-            }
-        }
-        if self.read_set.r2:
-            r2_presigned_url = get_presigned_url_from_ingest_id(self.read_set.r2.ingest_id)
-            presigned_objects["r2"] = {
-                "s3Uri": get_s3_uri_from_ingest_id(self.read_set.r2.ingest_id),
-                "presignedUrl": r2_presigned_url,
-                "expiresAt": datetime_to_isoformat(get_presigned_url_expiry(r2_presigned_url))
-            }
-
-        return PresignedUrlModel(
-            **presigned_objects
+    @staticmethod
+    def to_fastq_list_rows(
+            fastq_list: List['FastqData'],
+            bucket: Optional[str] = None,
+            key_prefix: Optional[str] = None,
+    ) -> List[FastqListRowDict]:
+        """
+        Return many fastqs as CWL input objects (i.e for a fastq list csv over a whole instrument run),
+        rather than one row at a time, the read set s3 details and the libraries are resolved up front, in batches.
+        :param fastq_list:
+        :param bucket: Optional s3 bucket, return the fastq uris with this bucket
+        :param key_prefix: Optional s3 key prefix, return the fastq uris with this key prefix
+        :raises FastqMissingReadSetError: Any of the fastqs have no read set (rather than return an incomplete list)
+        :return:
+        """
+        missing_read_set_fastq_ids = list(map(
+            lambda fastq_obj_iter_: fastq_obj_iter_.id,
+            filter(
+                lambda fastq_obj_iter_: fastq_obj_iter_.read_set is None,
+                fastq_list
+            )
+        ))
+        if len(missing_read_set_fastq_ids) > 0:
+            raise FastqMissingReadSetError(missing_read_set_fastq_ids)
+
+        # Resolve the read set s3 details
+        resolve_ingest_ids(chain.from_iterable(map(
+            lambda fastq_obj_iter_: iter_ingest_ids(fastq_obj_iter_.read_set),
+            fastq_list
+        )))
+
+        # Look up the libraries
+        get_library_from_library_orcabus_id.get_many(map(
+            lambda fastq_obj_iter_: str(fastq_obj_iter_.library_orcabus_id),
+            fastq_list
+        ))
+
+        # Any rows that still need the file manager (i.e a copy under another bucket or key prefix)
+        # are run concurrently
+        return concurrent_map(
+            lambda fastq_obj_iter_: fastq_obj_iter_.to_fastq_list_row(
+                bucket=bucket,
+                key_prefix=key_prefix
+            ),
+            fastq_list
         )
 
+    def presign_uris(self) -> PresignedUrlModel:
+        # Resolve the read set s3 details, and presign locally where we can
+        resolve_ingest_ids(iter_ingest_ids(self.read_set))
+        return presign_fastq(self)
+
 
 class FastqListResponse(BaseModel):
     # List response
     fastq_list: List[FastqData]
     include_s3_details: Optional[bool] = False
+    fields: Optional[FieldTree] = None
 
     def model_dump(self, **kwargs) -> List[FastqResponseDict]:
         if len(self.fastq_list) == 0:
             return []
 
-        if not self.include_s3_details:
-            return list(map(lambda fastq_iter_: fastq_iter_.to_dict(), self.fastq_list))
-
-        # Collect the s3 ingest ids for the fastq list rows
-        fastqs_with_readsets = list(filter(
-            lambda fastq_iter_: fastq_iter_.read_set is not None,
-            self.fastq_list
-        ))
-
-        r1_ingest_ids = list(map(
-            lambda fastq_iter_: fastq_iter_.read_set.r1.ingest_id,
-            fastqs_with_readsets
-        ))
-
-        r2_ingest_ids = list(map(
-            lambda fastq_iter_: fastq_iter_.read_set.r2.ingest_id,
-            list(filter(
-                lambda fastq_iter_: fastq_iter_.read_set.r2 is not None,
-                fastqs_with_readsets
-            ))
-        ))
-
-        ntsm_ingest_ids = list(map(
-            lambda fastq_iter_: fastq_iter_.ntsm.ingest_id,
-            list(filter(
-                lambda fastq_iter_: fastq_iter_.ntsm is not None,
-                fastqs_with_readsets
-            ))
-        ))
-
-        # Get the qc ingest ids
-        try:
-            qc_ingest_ids = list(reduce(
-                concat,
-                list(map(
-                    lambda fastq_iter_: [
-                        fastq_iter_.qc.sequali_reports.sequali_html.ingest_id,
-                        fastq_iter_.qc.sequali_reports.sequali_parquet.ingest_id,
-                        fastq_iter_.qc.sequali_reports.multiqc_html.ingest_id,
-                        fastq_iter_.qc.sequali_reports.multiqc_parquet.ingest_id,
-                    ],
-                    list(filter(
-                        lambda fastq_iter_: fastq_iter_.qc is not None and fastq_iter_.qc.sequali_reports is not None,
-                        fastqs_with_readsets
-                    ))
-                ))
-            ))
-        except TypeError as e:
-            # TypeError: reduce() of empty iterable with no initial value
-            qc_ingest_ids = []
-
-        # Get the ntsm s3 uris
-        s3_list_dict = get_s3_objs_from_ingest_ids_map(
-            list(filter(
-                lambda ingest_id_iter_: not check_in_cache(ingest_id_iter_),
-                r1_ingest_ids + r2_ingest_ids + ntsm_ingest_ids + qc_ingest_ids
-            ))
-        )
+        if not self.include_s3_details or not has_any_field(self.fields, FASTQ_RESPONSE_S3_FIELDS):
+            return list(map(lambda fastq_iter_: fastq_iter_.to_dict(fields=self.fields), self.fastq_list))
 
-        # Update the cache with the s3 uris
-        for row in s3_list_dict:
-            update_cache(row['ingestId'], row['fileObject'])
+        # Resolve the s3 details across every fastq in the list in one pass
+        resolve_s3_details(self.fastq_list)
 
         # Now re-dump the fastq list rows
         return list(map(
-            lambda fastq_iter_: fastq_iter_.to_dict(include_s3_details=True),
+            lambda fastq_iter_: fastq_iter_.to_dict(
+                include_s3_details=True, fields=self.fields, s3_details_resolved=True
+            ),
             self.fastq_list
         ))
 
@@ -446,3 +496,23 @@ class FastqQueryPaginatedResponse(QueryPaginatedResponse):
     def resolve_url_placeholder(cls, **kwargs) -> str:
         # Get the url placeholder
         return cls.url_placeholder
+
+
+class FastqCursorPaginatedResponse(CursorPaginatedResponse):
+    url_placeholder: ClassVar[str] = get_fastq_endpoint_url()
+    results: List[FastqResponseDict]
+
+    @classmethod
+    def resolve_url_placeholder(cls, **kwargs) -> str:
+        # Get the url placeholder
+        return cls.url_placeholder
+
+
+class FastqSparseQueryPaginatedResponse(FastqQueryPaginatedResponse):
+    # Sparse fieldsets do not match the full response dict
+    results: List[Dict[str, Any]]
+
+
+class FastqSparseCursorPaginatedResponse(FastqCursorPaginatedResponse):
+    # Sparse fieldsets do not match the full response dict
+    results: List[Dict[str, Any]]
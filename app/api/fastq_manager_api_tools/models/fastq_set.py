@@ -1,32 +1,32 @@
 #!/usr/bin/env python3
 
 # Standard imports
-from time import sleep
-from functools import reduce
-from operator import concat
-from dyntastic import Dyntastic, DoesNotExist
+from itertools import chain
+from dyntastic import Dyntastic
 from os import environ
 from pydantic import Field, BaseModel, model_validator, ConfigDict, computed_field
-from typing import Optional, Self, List, Union, ClassVar, TypedDict
+from typing import Optional, List, Union, ClassVar, TypedDict, Dict, Any
 from fastapi_tools import QueryPaginatedResponse
 
-# Layer imports
-from orcabus_api_tools.filemanager import (
-    get_s3_objs_from_ingest_ids_map
-)
-
 # Local imports
-from . import FastqListRowDict, PresignedUrlModel
+from . import FastqListRowDict, FastqPresignedUrlModel
 from .fastq import FastqData, FastqResponse, FastqCreate, FastqResponseDict
 from .file_storage import FileStorageObjectResponse, FileStorageObjectResponseDict, FileStorageObjectData
-from ..cache import update_cache, check_in_cache
-from ..globals import FQS_CONTEXT_PREFIX, EVENT_BUS_NAME_ENV_VAR
+from ..fieldsets import FieldTree, has_any_field, select_fields
+from ..pagination import CursorPaginatedResponse
+from ..presign import presign_fastq_list
+from ..resolver import resolve_s3_details
+from ..globals import FQS_CONTEXT_PREFIX
+from ..hydration import batch_get_data_map
+from ..identity_map import IdentityMapMixin
+from ..versioned_update import next_version
 from ..utils import (
     get_ulid,
     to_snake, to_camel, get_fastq_set_endpoint_url
 )
 
 from .library import LibraryData, LibraryResponse, LibraryCreate, LibraryResponseDict
+from .serializers import build_alias_table, encode_value, serialize_library, serialize_file_storage_object
 
 
 class FastqSetBase(BaseModel):
@@ -119,6 +119,10 @@ class FastqSetResponse(FastqListSetWithId):
         return data
 
 
+# Response field name to camel case alias, in response field order
+FASTQ_SET_RESPONSE_ALIASES = build_alias_table(FastqSetResponse)
+
+
 class FastqSetCreate(FastqSetBase):
     # Set the model configuration
     model_config = ConfigDict(
@@ -133,7 +137,7 @@ class FastqSetCreate(FastqSetBase):
     fastq_set: List[Union[FastqCreate, str]]
 
 
-class FastqSetData(FastqListSetWithId, Dyntastic):
+class FastqSetData(FastqListSetWithId, IdentityMapMixin, Dyntastic):
     # We don't use aliases, instead we convert all keys to snake case first
     # And then we convert them back to camel case in the to_dict method.
     # This separates out serialization to the database store and serialization to the client
@@ -146,235 +150,224 @@ class FastqSetData(FastqListSetWithId, Dyntastic):
         # Convert the keys to snake caseZ
         return {to_snake(k): v for k, v in values.items()}
 
+    fastq_set_ids: List[str]
 
-    @classmethod
-    def from_response(cls, **kwargs) -> Self:
-        response_obj = FastqSetResponse(**kwargs)
-        response_dict = dict(**response_obj.model_dump(by_alias=True))
-        response_dict['fastqSetIds'] = list(map(
-            lambda fastq_set_iter_: fastq_set_iter_.id,
-            response_obj.fastq_set
-        ))
+    # Incremented on every write, events carry the version so consumers can order them
+    version: int = 0
 
-        _ = response_dict.pop('fastqSet')
+    # Summary of the member fastqs, kept up to date on create, link, unlink and merge (see update_fastq_summary)
+    # Projected into the library summary index, so the current fastq set of a library can be chosen from the index alone
+    # None for fastq sets written before the summary was added
+    fastq_count: Optional[int] = None
+    latest_instrument_run_id: Optional[str] = None
 
-        return cls(**response_dict)
+    def save(self, **kwargs):
+        with next_version(self):
+            return super().save(**kwargs)
 
-    fastq_set_ids: List[str]
+    def delete(self, **kwargs):
+        with next_version(self):
+            return super().delete(**kwargs)
 
     @computed_field
     def library_orcabus_id(self) -> str:
         return self.library.orcabus_id
 
-    def _get_fastq_set_from_ids(self) -> List[FastqResponse]:
+    def get_fastq_objs(self, fastq_data_map: Optional[Dict[str, FastqData]] = None) -> List[FastqData]:
+        """
+        Get the fastq data objects for this fastq set, in the order of the fastq set ids.
+        If a prefetched fastq data map is provided (i.e from get_fastq_data_map),
+        only the members missing from the map are fetched.
+        :param fastq_data_map:
+        :return:
+        """
+        if fastq_data_map is None:
+            fastq_data_map = {}
+
+        missing_fastq_ids = list(filter(
+            lambda fastq_id_iter_: fastq_id_iter_ not in fastq_data_map,
+            self.fastq_set_ids
+        ))
+
+        if len(missing_fastq_ids) > 0:
+            fastq_data_map = dict(
+                **fastq_data_map,
+                **batch_get_data_map(FastqData, missing_fastq_ids)
+            )
+
         return list(map(
-            lambda fastq_set_id_iter_: self._get_fastq_row_with_retry(fastq_set_id_iter_),
+            lambda fastq_id_iter_: fastq_data_map[fastq_id_iter_],
             self.fastq_set_ids
         ))
 
-    def to_dict(self, include_s3_details: Optional[bool] = False) -> FastqSetResponseDict:
+    def update_fastq_summary(self, fastq_data_map: Optional[Dict[str, FastqData]] = None):
         """
-        Alternative serialization path to return objects by camel case
+        Update the member fastq count and the latest instrument run id of the member fastqs,
+        call whenever the fastq set ids change.
+        :param fastq_data_map: Prefetched fastq data objects, fastqs missing from the map are fetched in a batch
         :return:
         """
-        # Generate as a dict
-        fastq_set_dict = dict(
-            **self.model_dump(
-                exclude={"library_orcabus_id"}
-            )
+        self.fastq_count = len(self.fastq_set_ids)
+        self.latest_instrument_run_id = max(
+            map(
+                lambda fastq_obj_iter_: fastq_obj_iter_.instrument_run_id,
+                self.get_fastq_objs(fastq_data_map)
+            ),
+            default=None
         )
 
-        # Generate fastq set data
-        fastq_set_dict['fastq_set'] = self._get_fastq_set_from_ids()
-
-        # Remove the fastq set ids
-        del fastq_set_dict['fastq_set_ids']
-
-        if include_s3_details and not environ.get(EVENT_BUS_NAME_ENV_VAR) == 'local':
-            # Get the s3 objects
-            s3_objs = get_s3_objs_from_ingest_ids_map(
-                list(filter(
-                    # Filter out the ingest ids that are already in the cache
-                    lambda ingest_id_iter_: not check_in_cache(ingest_id_iter_),
-                    list(map(
-                        # Get the ingest ids from the fastq set
-                        lambda read_set_obj_iter_: read_set_obj_iter_['ingestId'],
-                        list(filter(
-                            # Remove any empty read 2 objects
-                            lambda read_set_obj_iter_: read_set_obj_iter_ is not None,
-                            # Flatten the list
-                            list(reduce(
-                                concat,
-                                # Collect r1 and r2 read sets from each fastq list row
-                                list(map(
-                                    lambda fqlr_response_iter_: [
-                                        fqlr_response_iter_.get('readSet', {}).get('r1', None),
-                                        fqlr_response_iter_.get('readSet', {}).get('r2', None)
-                                    ],
-                                    fastq_set_dict['fastq_set']
-                                ))
-                            ))
-                        ))
-                    ))
-                ))
-            )
+    @staticmethod
+    def get_fastq_data_map(fastq_set_list: List['FastqSetData']) -> Dict[str, FastqData]:
+        """
+        Collect every fastq id across a list of fastq sets and fetch them in batches
+        :param fastq_set_list:
+        :return:
+        """
+        return batch_get_data_map(
+            FastqData,
+            list(chain.from_iterable(map(
+                lambda fastq_set_iter_: fastq_set_iter_.fastq_set_ids,
+                fastq_set_list
+            )))
+        )
 
-            for s3_obj_iter_ in s3_objs:
-                update_cache(s3_obj_iter_['ingestId'], s3_obj_iter_['fileObject'])
+    def to_dict(
+            self,
+            include_s3_details: Optional[bool] = False,
+            fastq_data_map: Optional[Dict[str, FastqData]] = None,
+            fields: Optional[FieldTree] = None,
+            s3_details_resolved: Optional[bool] = False
+    ) -> FastqSetResponseDict:
+        """
+        Alternative serialization path to return objects by camel case
+        :param include_s3_details: Include the s3 details of each of the fastq read sets
+        :param fastq_data_map: Prefetched fastq data objects, fastqs missing from the map are fetched in a batch
+        :param fields: Optional sparse field tree, only the selected fields are serialized
+        :param s3_details_resolved: The s3 details have already been resolved (i.e by the list response)
+        :return:
+        """
+        # The fastqs are not read at all unless the fastqSet field is selected
+        if has_any_field(fields, ["fastqSet"]):
+            fastq_objs = self.get_fastq_objs(fastq_data_map)
+        else:
+            fastq_objs = []
 
-        # Return as a response
-        return FastqSetResponse(
-            **fastq_set_dict
-        ).model_dump(
-            include_s3_details=include_s3_details,
-            by_alias=True
-        )
+        if include_s3_details and not s3_details_resolved:
+            # Resolve the s3 details of the fastq set (somalier) and its fastqs in one pass
+            resolve_s3_details(self, fastq_objs)
+
+        if fields is not None:
+            return select_fields(self.to_dict_from_cache(include_s3_details, fastq_objs, fields=fields), fields)
+
+        return self.to_dict_from_cache(include_s3_details, fastq_objs)
+
+    def to_dict_from_cache(
+            self,
+            include_s3_details: Optional[bool] = False,
+            fastq_objs: Optional[List[FastqData]] = None,
+            fields: Optional[FieldTree] = None,
+    ) -> FastqSetResponseDict:
+        """
+        Single pass serialization, identical to the FastqSetResponse.model_dump output.
+        S3 details are read from the cache only, they are not fetched here.
+        :param include_s3_details:
+        :param fastq_objs: The fastq data objects of this fastq set (in order)
+        :param fields: Optional sparse field tree, only the selected top level fields are serialized
+        :return:
+        """
+        data = {}
+        for field_name, alias in FASTQ_SET_RESPONSE_ALIASES.items():
+            if fields is not None and alias not in fields:
+                continue
+            if field_name == 'fastq_set':
+                # Pass the nested top level field selection through to each fastq
+                fastq_fields = fields[alias] if fields is not None and isinstance(fields[alias], dict) else None
+                data[alias] = list(map(
+                    lambda fastq_obj_iter_: fastq_obj_iter_.to_dict_from_cache(
+                        include_s3_details,
+                        fields=fastq_fields
+                    ),
+                    fastq_objs if fastq_objs is not None else []
+                ))
+                continue
+            value = getattr(self, field_name)
+            if value is None:
+                data[alias] = None
+            elif field_name == 'library':
+                data[alias] = serialize_library(value)
+            elif field_name == 'somalier':
+                data[alias] = serialize_file_storage_object(value, include_s3_details=include_s3_details)
+            else:
+                data[alias] = encode_value(value)
+
+        return data
 
     def to_fastq_list_rows(
             self,
             bucket: Optional[str] = None,
             key_prefix: Optional[str] = None,
+            fastq_data_map: Optional[Dict[str, FastqData]] = None,
     ) -> List[FastqListRowDict]:
         """
         Return as a CWL input object
 
         :param bucket: Optional s3 bucket, return the fastq uris with this bucket
         :param key_prefix: Optional s3 key prefix, return the fastq uris with this key prefix
+        :param fastq_data_map: Prefetched fastq data objects
 
         :return:
         """
-        return list(map(
-            lambda fastq_set_iter_: FastqData(**fastq_set_iter_).to_fastq_list_row(
-                bucket=bucket,
-                key_prefix=key_prefix
-            ),
-            self._get_fastq_set_from_ids()
-        ))
+        return FastqData.to_fastq_list_rows(
+            self.get_fastq_objs(fastq_data_map),
+            bucket=bucket,
+            key_prefix=key_prefix
+        )
 
-    def presign_uris(self) -> List[PresignedUrlModel]:
-        # Get all unarchived files
-        # Presign the URIs
-        return list(map(
-            lambda fastq_set_iter_: FastqData(**fastq_set_iter_).presign_uris(),
-            self._get_fastq_set_from_ids()
-        ))
+    def presign_uris(self, fastq_data_map: Optional[Dict[str, FastqData]] = None) -> List[FastqPresignedUrlModel]:
+        """
+        Presign the read sets of every fastq in the set, the s3 details are resolved in one pass
+        :param fastq_data_map: Prefetched fastq data objects
+        :return:
+        """
+        return presign_fastq_list(self.get_fastq_objs(fastq_data_map))
 
     def model_dump(self, **kwargs):
         # We need to exclude the fastq_set field from the serialization
         # When we are dumping the object to the database
         return super().model_dump(**kwargs)
 
-    @staticmethod
-    def _get_fastq_row_with_retry(fastq_id) -> FastqResponse:
-        attempts = 0
-        while attempts < 3:
-            try:
-                return FastqData.get(fastq_id).to_dict()
-            except DoesNotExist as e:
-                attempts += 1
-                sleep(0.5)
-        raise DoesNotExist(f"Fastq with id {fastq_id} does not exist")
-
 
 class FastqSetListResponse(BaseModel):
     # List response
     fastq_set_list: List[FastqSetData]
     include_s3_details: Optional[bool] = False
+    fields: Optional[FieldTree] = None
 
     def model_dump(self, **kwargs) -> List[FastqSetResponseDict]:
         if len(self.fastq_set_list) == 0:
             return []
 
-        if not self.include_s3_details:
-            return list(map(lambda fastq_set_iter_: fastq_set_iter_.to_dict(), self.fastq_set_list))
-
-        # Collect the s3 ingest ids for the fastq list rows
-        all_fastq_ids = list(reduce(
-            concat,
-            map(
-                lambda fastq_set_iter_: fastq_set_iter_.fastq_set_ids,
-                self.fastq_set_list
-            )
-        ))
-
-        all_fastq_list = list(map(
-            lambda fqlr_iter_:
-            FastqData.get(fqlr_iter_),
-            all_fastq_ids
-        ))
-
-        fastqs_with_readsets = list(filter(
-            lambda fastq_iter_: fastq_iter_.read_set is not None,
-            all_fastq_list
-        ))
-
-        r1_ingest_ids = list(map(
-            lambda fastq_iter_: fastq_iter_.read_set.r1.ingest_id,
-            fastqs_with_readsets
-        ))
-
-        r2_ingest_ids = list(map(
-            lambda fastq_iter_: fastq_iter_.read_set.r2.ingest_id,
-            list(filter(
-                lambda fastq_iter_: hasattr(fastq_iter_.read_set, 'r2') and fastq_iter_.read_set.r2 is not None,
-                fastqs_with_readsets
-            ))
-        ))
+        if not has_any_field(self.fields, ["fastqSet"]):
+            # We don't need to read the fastqs at all
+            fastq_data_map = {}
+        else:
+            # Collect the fastqs across all fastq sets in a single batched pass
+            fastq_data_map = FastqSetData.get_fastq_data_map(self.fastq_set_list)
 
-        # Get the ntsm ingest ids
-        ntsm_ingest_ids = list(map(
-            lambda fastq_iter_: fastq_iter_.ntsm.ingest_id,
-            list(filter(
-                lambda fastq_iter_: fastq_iter_.ntsm is not None,
-                fastqs_with_readsets
-            ))
-        ))
+        if self.include_s3_details:
+            # Resolve the s3 details across every fastq set and fastq in one pass
+            resolve_s3_details(self.fastq_set_list, list(fastq_data_map.values()))
 
-        # Get the qc ingest ids
-        try:
-            qc_ingest_ids = list(reduce(
-                concat,
-                list(map(
-                    lambda fastq_iter_: [
-                        fastq_iter_.qc.sequali_reports.sequali_html.ingest_id,
-                        fastq_iter_.qc.sequali_reports.sequali_parquet.ingest_id,
-                        fastq_iter_.qc.sequali_reports.multiqc_html.ingest_id,
-                        fastq_iter_.qc.sequali_reports.multiqc_parquet.ingest_id,
-                    ],
-                    list(filter(
-                        lambda fastq_iter_: fastq_iter_.qc is not None and fastq_iter_.qc.sequali_reports is not None,
-                        fastqs_with_readsets
-                    ))
-                ))
-            ))
-        except TypeError as e:
-            # TypeError: reduce() of empty iterable with no initial value
-            qc_ingest_ids = []
-
-        # Get the somalier ingest ids
-        somalier_ingest_ids = list(map(
-            lambda fastq_set_iter_: fastq_set_iter_.somalier.ingest_id,
-            list(filter(
-                lambda fastq_set_iter_: fastq_set_iter_.somalier is not None,
-                self.fastq_set_list
-            ))
+        return list(map(
+            lambda fastq_set_iter_: fastq_set_iter_.to_dict(
+                include_s3_details=self.include_s3_details,
+                fastq_data_map=fastq_data_map,
+                fields=self.fields,
+                s3_details_resolved=True
+            ),
+            self.fastq_set_list
         ))
 
-        # Get the s3 objects for the ingest ids that are not in the cache
-        s3_list_dict = get_s3_objs_from_ingest_ids_map(
-            list(filter(
-                lambda ingest_id_iter_: not check_in_cache(ingest_id_iter_),
-                r1_ingest_ids + r2_ingest_ids + ntsm_ingest_ids + qc_ingest_ids + somalier_ingest_ids
-            ))
-        )
-
-        # Update the cache with the s3 uris
-        for row in s3_list_dict:
-            update_cache(row['ingestId'], row['fileObject'])
-
-        # Now re-dump the fastq sets
-        return list(map(lambda fastq_set_iter_: fastq_set_iter_.to_dict(include_s3_details=True), self.fastq_set_list))
-
 
 class FastqSetQueryPaginatedResponse(QueryPaginatedResponse):
     """
@@ -387,3 +380,23 @@ class FastqSetQueryPaginatedResponse(QueryPaginatedResponse):
     def resolve_url_placeholder(cls, **kwargs) -> str:
         # Get the url placeholder
         return cls.url_placeholder
+
+
+class FastqSetCursorPaginatedResponse(CursorPaginatedResponse):
+    url_placeholder: ClassVar[str] = get_fastq_set_endpoint_url()
+    results: List[FastqSetResponseDict]
+
+    @classmethod
+    def resolve_url_placeholder(cls, **kwargs) -> str:
+        # Get the url placeholder
+        return cls.url_placeholder
+
+
+class FastqSetSparseQueryPaginatedResponse(FastqSetQueryPaginatedResponse):
+    # Sparse fieldsets do not match the full response dict
+    results: List[Dict[str, Any]]
+
+
+class FastqSetSparseCursorPaginatedResponse(FastqSetCursorPaginatedResponse):
+    # Sparse fieldsets do not match the full response dict
+    results: List[Dict[str, Any]]
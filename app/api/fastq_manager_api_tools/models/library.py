@@ -30,13 +30,11 @@ from typing import TYPE_CHECKING
 from fastapi.routing import HTTPException
 from pydantic import Field, BaseModel, model_validator, ConfigDict
 
-# Layer imports
-from orcabus_api_tools.metadata import (
+# Local imports
+from ..metadata_cache import (
     get_library_id_from_library_orcabus_id,
     get_library_orcabus_id_from_library_id
 )
-
-# Local imports
 from ..utils import to_snake, to_camel
 
 
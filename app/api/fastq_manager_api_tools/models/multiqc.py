@@ -5,15 +5,14 @@ from typing import TypedDict, Literal, List, Optional, Self, NotRequired
 from dyntastic import Dyntastic
 from pydantic import BaseModel, ConfigDict, model_validator, Field
 
-from orcabus_api_tools.filemanager import get_s3_objs_from_ingest_ids_map
 # Local imports
 from .file_storage import (
     FileStorageObjectResponseDict,
     FileStorageObjectData,
     FileStorageObjectResponse, FileStorageObjectCreate
 )
-from ..cache import check_in_cache, update_cache
 from ..globals import MULTIQC_JOB_PREFIX
+from ..resolver import resolve_s3_details
 from ..utils import to_camel, get_ulid, to_snake
 
 
@@ -167,24 +166,9 @@ class MultiqcJobData(MultiqcJobWithOrcabusId, Dyntastic):
         Alternative serialization path to return objects by camel case
         :return:
         """
-        # Update the s3 details cache if needed
+        # Resolve the multiqc output s3 details if needed
         if include_s3_details:
-            # Get the s3 objects
-            s3_objs = get_s3_objs_from_ingest_ids_map(
-                list(filter(
-                    lambda ingest_id_iter_: not check_in_cache(ingest_id_iter_),
-                    list(map(
-                        lambda object_iter_: object_iter_.ingest_id,
-                        list(filter(
-                            lambda object_iter_: object_iter_ is not None,
-                            [self.multiqc_html, self.multiqc_parquet]
-                        ))
-                    ))
-                ))
-            )
-
-            for s3_obj_iter_ in s3_objs:
-                update_cache(s3_obj_iter_['ingestId'], s3_obj_iter_['fileObject'])
+            resolve_s3_details(self)
 
         # Complete recursive serialization manually
         data = self.model_dump()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+"""
+Bulk presign request
+"""
+
+# Standard imports
+from typing import List, Optional, Self
+
+from pydantic import BaseModel, ConfigDict, model_validator
+
+# Local imports
+from ..utils import to_camel, sanitise_fqr_orcabus_id_sync
+
+
+class FastqPresignRequest(BaseModel):
+    """
+    Presign a list of fastqs and / or every (valid) fastq on an instrument run
+    """
+    model_config = ConfigDict(
+        alias_generator=to_camel,
+        populate_by_name=True
+    )
+
+    fastq_id_list: Optional[List[str]] = None
+    instrument_run_id: Optional[str] = None
+
+    @model_validator(mode='after')
+    def confirm_fastq_id_list_or_instrument_run_id(self) -> Self:
+        if self.fastq_id_list is None and self.instrument_run_id is None:
+            raise ValueError("At least one of fastqIdList or instrumentRunId is required")
+        if self.fastq_id_list is not None:
+            # The 'fqr.' prefix is optional
+            self.fastq_id_list = list(map(sanitise_fqr_orcabus_id_sync, self.fastq_id_list))
+        return self
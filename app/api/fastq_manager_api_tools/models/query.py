@@ -3,7 +3,7 @@ from typing import Optional, List, Dict
 from fastapi import Query, HTTPException
 
 # Import utils
-from ..utils import get_libraries_from_metadata_query
+from ..metadata_cache import get_libraries_from_metadata_query
 
 
 class BaseQueryParameters:
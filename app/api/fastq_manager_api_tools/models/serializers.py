@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+"""
+Single pass serializers
+
+The response models (i.e FastqResponse) serialize a data object by
+  * dumping the data object to a (snake case) dict,
+  * re-validating the dict into the response model, running to_camel over every key,
+  * dumping the response model, and then each sub model in turn,
+  * and finally running the result through jsonable_encoder.
+
+The serializers below produce the same output directly from the (already validated) data object.
+The camel case keys are computed once per response model at import time (the alias tables),
+in the field order of the response model, so the output is identical, key order included.
+
+The response models remain the reference implementation (see tests/test_serializers.py),
+any change to a response model must be reflected here.
+"""
+
+# Standard imports
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional, Type
+
+from fastapi.encoders import decimal_encoder
+from pydantic import BaseModel
+
+# Local imports
+from ..cache import get_from_cache
+from ..utils import to_camel, datetime_to_isodate
+from .fastq_pair import (
+    FastqStorageObjectBase, FastqStorageObjectResponse,
+    FastqPairStorageObjectResponse, FastqPairStorageObjectResponseDict
+)
+from .file_storage import FileStorageObjectBase, FileStorageObjectResponseDict
+from .library import LibraryBase, LibraryResponse, LibraryResponseDict
+from .qc import QcInformationBase, QcInformationResponse, QcInformationResponseDict
+from .sequali import SequaliBase, SequaliResponse, SequaliResponseDict
+
+
+def build_alias_table(model_cls: Type[BaseModel]) -> Dict[str, str]:
+    """
+    Map each field of the response model to its camel case alias, in the field order of the model
+    :param model_cls:
+    :return:
+    """
+    return dict(map(
+        lambda field_name_iter_: (field_name_iter_, to_camel(field_name_iter_)),
+        model_cls.model_fields.keys()
+    ))
+
+
+# Alias tables
+LIBRARY_RESPONSE_ALIASES = build_alias_table(LibraryResponse)
+SEQUALI_RESPONSE_ALIASES = build_alias_table(SequaliResponse)
+QC_RESPONSE_ALIASES = build_alias_table(QcInformationResponse)
+FASTQ_PAIR_RESPONSE_ALIASES = build_alias_table(FastqPairStorageObjectResponse)
+# The fastq storage object response only takes the fastq specific fields from the fastq storage object base
+# (the file storage object fields are then appended)
+FASTQ_STORAGE_OBJECT_RESPONSE_ALIASES = dict(filter(
+    lambda kv: kv[0] not in FileStorageObjectBase.model_fields,
+    build_alias_table(FastqStorageObjectResponse).items()
+))
+INGEST_ID_ALIAS = to_camel('ingest_id')
+S3_URI_ALIAS = to_camel('s3_uri')
+STORAGE_CLASS_ALIAS = to_camel('storage_class')
+SHA256_ALIAS = to_camel('sha256')
+COMPRESSION_FORMAT_ALIAS = to_camel('compression_format')
+
+
+def encode_value(value: Any) -> Any:
+    """
+    Equivalent of jsonable_encoder for the scalar types found on the data objects
+    :param value:
+    :return:
+    """
+    if isinstance(value, Decimal):
+        return decimal_encoder(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def serialize_library(library_obj: LibraryBase) -> LibraryResponseDict:
+    return dict(map(
+        lambda kv: (kv[1], getattr(library_obj, kv[0])),
+        LIBRARY_RESPONSE_ALIASES.items()
+    ))
+
+
+def serialize_file_storage_object(
+        file_storage_obj: FileStorageObjectBase,
+        include_s3_details: Optional[bool] = False
+) -> FileStorageObjectResponseDict:
+    """
+    Serialize as FileStorageObjectResponse.model_dump, None values are excluded
+    :param file_storage_obj:
+    :param include_s3_details:
+    :return:
+    """
+    data = {
+        INGEST_ID_ALIAS: file_storage_obj.ingest_id,
+    }
+
+    if not include_s3_details:
+        return data
+
+    # S3 details come from the cache only
+    file_object = get_from_cache(file_storage_obj.ingest_id)
+    if file_object is None:
+        return data
+
+    data[S3_URI_ALIAS] = f"s3://{file_object['bucket']}/{file_object['key']}"
+    if file_object.get('storageClass', None) is not None:
+        data[STORAGE_CLASS_ALIAS] = file_object['storageClass']
+    if file_object.get('sha256', None) is not None:
+        data[SHA256_ALIAS] = file_object['sha256']
+
+    return data
+
+
+def serialize_fastq_storage_object(
+        fastq_storage_obj: FastqStorageObjectBase,
+        include_s3_details: Optional[bool] = False
+) -> Dict[str, Any]:
+    """
+    Serialize as FastqStorageObjectResponse.model_dump,
+    the fastq specific fields (None values included) followed by the file storage object fields
+    :param fastq_storage_obj:
+    :param include_s3_details:
+    :return:
+    """
+    data = dict(map(
+        lambda kv: (kv[1], getattr(fastq_storage_obj, kv[0])),
+        FASTQ_STORAGE_OBJECT_RESPONSE_ALIASES.items()
+    ))
+    data.update(serialize_file_storage_object(fastq_storage_obj, include_s3_details=include_s3_details))
+    return data
+
+
+def serialize_fastq_pair_storage_object(
+        fastq_pair_storage_obj: BaseModel,
+        include_s3_details: Optional[bool] = False
+) -> FastqPairStorageObjectResponseDict:
+    """
+    Serialize as FastqPairStorageObjectResponse.model_dump
+    :param fastq_pair_storage_obj:
+    :param include_s3_details:
+    :return:
+    """
+    data = {}
+    for field_name, alias in FASTQ_PAIR_RESPONSE_ALIASES.items():
+        value = getattr(fastq_pair_storage_obj, field_name)
+        if value is None:
+            data[alias] = None
+        elif field_name in ['r1', 'r2']:
+            data[alias] = serialize_fastq_storage_object(value, include_s3_details=include_s3_details)
+        else:
+            data[alias] = value
+
+    # If compression format is None and include_s3_details is True, we can retrieve it from r1
+    if fastq_pair_storage_obj.compression_format is None and include_s3_details:
+        data[COMPRESSION_FORMAT_ALIAS] = "ORA" if data['r1'][S3_URI_ALIAS].endswith(".ora") else "GZIP"
+
+    return data
+
+
+def serialize_sequali(
+        sequali_obj: SequaliBase,
+        include_s3_details: Optional[bool] = False
+) -> SequaliResponseDict:
+    return dict(map(
+        lambda kv: (
+            kv[1],
+            serialize_file_storage_object(getattr(sequali_obj, kv[0]), include_s3_details=include_s3_details)
+        ),
+        SEQUALI_RESPONSE_ALIASES.items()
+    ))
+
+
+def serialize_qc(
+        qc_obj: QcInformationBase,
+        include_s3_details: Optional[bool] = False
+) -> QcInformationResponseDict:
+    """
+    Serialize as QcInformationResponse.model_dump (followed by jsonable_encoder)
+    :param qc_obj:
+    :param include_s3_details:
+    :return:
+    """
+    data = {}
+    for field_name, alias in QC_RESPONSE_ALIASES.items():
+        value = getattr(qc_obj, field_name)
+        if field_name == 'sequali_reports' and value is not None:
+            data[alias] = serialize_sequali(value, include_s3_details=include_s3_details)
+        else:
+            data[alias] = encode_value(value)
+    return data
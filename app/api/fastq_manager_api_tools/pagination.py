@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+"""
+Cursor (keyset) pagination
+
+The page / rowsPerPage pagination from fastapi_tools needs the full result list to be read (and serialized)
+before the page is sliced out, which for large instrument runs means reading every row on every request.
+
+Instead, when the 'nextToken' query parameter is provided, we read from DynamoDB only until the page is full,
+and return an opaque token the client can use to request the next page.
+
+The token is url-safe base64 encoded json, and carries
+  * the cursor (i.e the position in the list of index queries, and the DynamoDB LastEvaluatedKey)
+  * a hash of the query parameters, so that a token cannot be reused for a different query
+
+Without a 'nextToken', the page / rowsPerPage pagination still needs the full (index only) id list for the count,
+but only the ids in the requested page are read from the base table and serialized (see get_page_slice)
+"""
+
+# Standard imports
+import json
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from binascii import Error as BinasciiError
+from hashlib import sha256
+from typing import Dict, Optional, List, ClassVar, TypedDict, Any, Sequence, Type, TypeVar
+from typing import Self
+from urllib.parse import urlencode
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+# Import from orcabus layers
+from fastapi_tools import QueryPagination, QueryPaginatedResponse
+
+# Parameters that do not change the result set, and so are not part of the query hash
+NON_QUERY_PARAMS = ['page', 'rowsPerPage', 'nextToken']
+
+
+T = TypeVar('T')
+QueryPaginatedResponseType = TypeVar('QueryPaginatedResponseType', bound=QueryPaginatedResponse)
+
+
+class CursorLinksDict(TypedDict):
+    next: Optional[str]
+
+
+class CursorPaginationDict(TypedDict):
+    rowsPerPage: int
+    nextToken: Optional[str]
+
+
+def get_query_hash(params_response: Dict[str, Any]) -> str:
+    """
+    Hash of the query parameters, ignoring pagination parameters
+    :param params_response:
+    :return:
+    """
+    return sha256(
+        json.dumps(
+            dict(filter(
+                lambda kv: kv[0] not in NON_QUERY_PARAMS,
+                params_response.items()
+            )),
+            sort_keys=True,
+            default=str
+        ).encode()
+    ).hexdigest()[:16]
+
+
+def encode_next_token(cursor: Dict[str, Any], params_response: Dict[str, Any]) -> str:
+    """
+    Encode the cursor as an opaque token
+    :param cursor:
+    :param params_response:
+    :return:
+    """
+    return urlsafe_b64encode(
+        json.dumps(
+            {
+                "cursor": cursor,
+                "queryHash": get_query_hash(params_response),
+            },
+            separators=(',', ':'),
+            default=str
+        ).encode()
+    ).decode().rstrip("=")
+
+
+def decode_next_token(next_token: Optional[str], params_response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Decode the next token back to the cursor, an empty token is the first page (and returns None)
+    :param next_token:
+    :param params_response:
+    :raises HTTPException: if the token is not valid for this query
+    :return:
+    """
+    if next_token is None or next_token == "":
+        return None
+
+    try:
+        token_obj = json.loads(
+            urlsafe_b64decode(next_token + "=" * (-len(next_token) % 4)).decode()
+        )
+        cursor = token_obj['cursor']
+        query_hash = token_obj['queryHash']
+    except (BinasciiError, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid nextToken"
+        )
+
+    if query_hash != get_query_hash(params_response):
+        raise HTTPException(
+            status_code=400,
+            detail="nextToken was generated for a different query, please restart from the first page"
+        )
+
+    return cursor
+
+
+def get_page_slice(items: Sequence[T], query_pagination: QueryPagination) -> Sequence[T]:
+    """
+    Get the items in the requested page (pages start at 1)
+    :param items:
+    :param query_pagination:
+    :return:
+    """
+    page_start = (query_pagination['page'] - 1) * query_pagination['rowsPerPage']
+    return items[page_start:page_start + query_pagination['rowsPerPage']]
+
+
+def query_paginated_response_from_page(
+        response_cls: Type[QueryPaginatedResponseType],
+        results: List,
+        count: int,
+        query_pagination: QueryPagination,
+        params_response: Dict[str, Any],
+        **kwargs
+) -> QueryPaginatedResponseType:
+    """
+    Build the page / rowsPerPage response when only the requested page has been read and serialized.
+
+    The fastapi_tools response slices the page out of the full result list (and generates the count and links from it),
+    so we hand it a list of the full count, with the serialized page in the position of the requested page
+    :param response_cls:
+    :param results: The serialized results of the requested page only
+    :param count: The total number of results over all pages
+    :param query_pagination:
+    :param params_response:
+    :param kwargs: Passed through to the url placeholder
+    :return:
+    """
+    page_start = (query_pagination['page'] - 1) * query_pagination['rowsPerPage']
+
+    # Placeholders outside of the requested page are sliced off, and never validated
+    results_list = [None] * count
+    results_list[page_start:page_start + len(results)] = results
+
+    return response_cls.from_results_list(
+        results=results_list,
+        query_pagination=query_pagination,
+        params_response=params_response,
+        **kwargs
+    )
+
+
+class CursorPaginatedResponse(BaseModel):
+    """
+    Cursor paginated response, the next link / nextToken are None on the last page
+    """
+    url_placeholder: ClassVar[str] = None
+    links: CursorLinksDict
+    pagination: CursorPaginationDict
+    results: List
+
+    @classmethod
+    def resolve_url_placeholder(cls, **kwargs) -> str:
+        return cls.url_placeholder
+
+    @classmethod
+    def from_results_page(
+            cls,
+            results: List,
+            rows_per_page: int,
+            next_cursor: Optional[Dict[str, Any]],
+            params_response: Dict[str, Any],
+            **kwargs
+    ) -> Self:
+        if next_cursor is None:
+            next_token = None
+            next_url = None
+        else:
+            next_token = encode_next_token(next_cursor, params_response)
+            next_url = cls.resolve_url_placeholder(**kwargs) + "?" + urlencode(
+                dict(
+                    **dict(filter(
+                        lambda kv: kv[0] not in NON_QUERY_PARAMS,
+                        params_response.items()
+                    )),
+                    **{
+                        "rowsPerPage": rows_per_page,
+                        "nextToken": next_token,
+                    }
+                )
+            )
+
+        return cls(
+            links={
+                "next": next_url,
+            },
+            pagination={
+                "rowsPerPage": rows_per_page,
+                "nextToken": next_token,
+            },
+            results=results,
+        )
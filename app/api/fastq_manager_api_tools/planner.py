@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+"""
+Query planner for fastq list queries
+
+A fastq list query may have a predicate on any of the fastq table indexes,
+i.e rgid_ext, instrument_run_id, library_orcabus_id and fastq_set_id.
+
+Rather than run every index query in full and intersect the results,
+we estimate the number of rows each index query would read, and only run the cheapest one (the driving query).
+
+Every index projects the keys of the other indexes, so the remaining predicates can be applied to the driving query
+  * as a filter expression (attr IN values), or
+  * in memory against the projected attributes, if there are too many values for an IN condition
+
+The one exception is a predicate with extra attribute filters (i.e index or lane on an instrument run id predicate),
+these attributes are only projected into the instrument_run_id index.
+If that predicate is not the driving query, it is run index-only and joined on the fastq id.
+
+The chosen plan is returned in the X-Query-Plan response header.
+"""
+
+# Standard imports
+from typing import List, Dict, Optional, TypedDict, Callable, Set, Union, Any
+
+from boto3.dynamodb.conditions import ConditionBase
+from dyntastic import A
+
+# Local imports
+from .globals import (
+    FASTQ_INDEX_ESTIMATED_ROWS_PER_KEY,
+    FASTQ_INDEX_PROJECTED_ATTRIBUTES,
+    DYNAMODB_IN_CONDITION_MAX_VALUES
+)
+from .index_query import IndexQuery, combine_conditions, query_index_items
+
+
+class FastqQueryPredicate(TypedDict):
+    # The index key attribute, i.e 'instrument_run_id'
+    key_attr: str
+    key_values: List[str]
+    # Extra attribute filters that can only be applied on this index, i.e {'lane': [1, 2]}
+    attr_filters: Dict[str, List[Union[str, int]]]
+
+
+class QueryPlan(TypedDict):
+    # The driving index query
+    index_query: IndexQuery
+    # Attribute name to list of allowed values, checked against the projected attributes of the driving index
+    in_memory_filters: Dict[str, List[str]]
+    # Index queries that cannot be applied to the driving index, these are run index-only and joined on id
+    id_join_queries: List[IndexQuery]
+    # The attributes to request from the driving index
+    attributes: List[str]
+    estimated_rows: int
+
+
+def estimate_rows(predicate: FastqQueryPredicate) -> int:
+    """
+    Estimate the number of rows read by running the index query for this predicate
+    :param predicate:
+    :return:
+    """
+    return len(predicate['key_values']) * FASTQ_INDEX_ESTIMATED_ROWS_PER_KEY[predicate['key_attr']]
+
+
+def get_attr_filter_condition(predicate: FastqQueryPredicate) -> Optional[ConditionBase]:
+    return combine_conditions(*map(
+        lambda kv: getattr(A, kv[0]).is_in(kv[1]),
+        predicate['attr_filters'].items()
+    ))
+
+
+def predicate_to_index_query(
+        predicate: FastqQueryPredicate,
+        filter_condition: Optional[ConditionBase],
+) -> IndexQuery:
+    return IndexQuery(
+        index_name=f"{predicate['key_attr']}-index",
+        key_attr=predicate['key_attr'],
+        key_values=predicate['key_values'],
+        filter_condition=combine_conditions(
+            filter_condition,
+            get_attr_filter_condition(predicate)
+        ),
+    )
+
+
+def _requires_id_join(predicate: FastqQueryPredicate, driving_predicate: FastqQueryPredicate) -> bool:
+    # Does this predicate have attribute filters that are not projected into the driving index
+    return any(map(
+        lambda attr_iter_: attr_iter_ not in FASTQ_INDEX_PROJECTED_ATTRIBUTES[driving_predicate['key_attr']],
+        predicate['attr_filters'].keys()
+    ))
+
+
+def estimate_plan_rows(
+        driving_predicate: FastqQueryPredicate,
+        predicates: List[FastqQueryPredicate]
+) -> int:
+    """
+    The rows read by the driving query, plus the rows read by any index queries we need to join on
+    :param driving_predicate:
+    :param predicates:
+    :return:
+    """
+    return estimate_rows(driving_predicate) + sum(map(
+        estimate_rows,
+        filter(
+            lambda predicate_iter_: (
+                predicate_iter_ is not driving_predicate and
+                _requires_id_join(predicate_iter_, driving_predicate)
+            ),
+            predicates
+        )
+    ))
+
+
+def plan_fastq_query(
+        predicates: List[FastqQueryPredicate],
+        filter_condition: Optional[ConditionBase] = None,
+) -> QueryPlan:
+    """
+    Pick the cheapest driving index query, and work out how to apply the remaining predicates
+    :param predicates: Must have at least one predicate
+    :param filter_condition: A filter condition applied to all index queries, i.e is_valid == True
+    :return:
+    """
+    # Pick the driving predicate with the lowest estimated cost (ties go to the first predicate)
+    driving_predicate = min(
+        predicates,
+        key=lambda predicate_iter_: estimate_plan_rows(predicate_iter_, predicates)
+    )
+
+    filter_conditions = [filter_condition]
+    in_memory_filters = {}
+    id_join_queries = []
+
+    for predicate in predicates:
+        if predicate is driving_predicate:
+            continue
+        if _requires_id_join(predicate, driving_predicate):
+            id_join_queries.append(predicate_to_index_query(predicate, filter_condition))
+            continue
+        # Key attribute is projected into every index
+        if len(predicate['key_values']) <= DYNAMODB_IN_CONDITION_MAX_VALUES:
+            filter_conditions.append(getattr(A, predicate['key_attr']).is_in(predicate['key_values']))
+        else:
+            in_memory_filters[predicate['key_attr']] = predicate['key_values']
+        # Any attribute filters are projected into the driving index
+        if len(predicate['attr_filters']) > 0:
+            filter_conditions.append(get_attr_filter_condition(predicate))
+
+    return QueryPlan(
+        index_query=predicate_to_index_query(
+            driving_predicate,
+            combine_conditions(*filter_conditions)
+        ),
+        in_memory_filters=in_memory_filters,
+        id_join_queries=id_join_queries,
+        attributes=['id'] + list(in_memory_filters.keys()),
+        estimated_rows=estimate_plan_rows(driving_predicate, predicates),
+    )
+
+
+def get_plan_predicate(
+        table_name: str,
+        query_plan: QueryPlan,
+) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Run any of the id join queries, and return the in-memory predicate for items from the driving query
+    :param table_name:
+    :param query_plan:
+    :return:
+    """
+    id_sets: List[Set[str]] = list(map(
+        lambda index_query_iter_: set(map(
+            lambda item_iter_: item_iter_['id'],
+            query_index_items(table_name, index_query_iter_, attributes=['id'])
+        )),
+        query_plan['id_join_queries']
+    ))
+    in_memory_filter_sets: Dict[str, Set[str]] = dict(map(
+        lambda kv: (kv[0], set(kv[1])),
+        query_plan['in_memory_filters'].items()
+    ))
+
+    def plan_predicate(item: Dict[str, Any]) -> bool:
+        return (
+            all(map(
+                lambda kv: item.get(kv[0]) in kv[1],
+                in_memory_filter_sets.items()
+            )) and
+            all(map(
+                lambda id_set_iter_: item['id'] in id_set_iter_,
+                id_sets
+            ))
+        )
+
+    return plan_predicate
+
+
+def query_plan_to_str(query_plan: QueryPlan) -> str:
+    """
+    Render as a header value, i.e
+    'index=library_orcabus_id-index;keys=1;estimatedRows=8;inMemory=;idJoin=instrument_run_id-index'
+    :param query_plan:
+    :return:
+    """
+    return ";".join([
+        f"index={query_plan['index_query']['index_name']}",
+        f"keys={len(query_plan['index_query']['key_values'])}",
+        f"estimatedRows={query_plan['estimated_rows']}",
+        f"inMemory={','.join(query_plan['in_memory_filters'].keys())}",
+        f"idJoin={','.join(map(lambda index_query_iter_: index_query_iter_['index_name'], query_plan['id_join_queries']))}",
+    ])
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+"""
+Presign engine
+
+Presigning through the file manager takes three calls per read (the presigned url, the s3 uri, and the expiry),
+for r1 and again for r2, for every fastq.
+
+Once the bucket and key of an ingest id are in the s3 details cache, a presigned url is just a local SigV4 signature,
+so we
+  * resolve the read set s3 details for every fastq up front, in one pass (see resolver.py),
+  * sign locally (botocore, no network calls) any object under an s3 prefix we may read (PRESIGN_LOCAL_S3_URI_PREFIXES)
+    that is not archived, with a configurable expiry (PRESIGN_EXPIRY_SECONDS),
+  * and fall back to the file manager for everything else (i.e an ingest id missing from the file manager,
+    an archived object, or an object under a prefix we cannot read).
+
+A locally signed url is only valid for as long as the credentials that signed it,
+so the expiry should stay well under the lifetime of the lambda session credentials.
+
+Local and file manager presigns are counted in the request metrics (i.e 'presign.local=384').
+"""
+
+# Standard imports
+import typing
+from datetime import datetime, timedelta, timezone
+from functools import cache
+from itertools import chain
+from os import environ
+from typing import List, Optional
+
+import boto3
+from botocore.config import Config
+
+# Layer imports
+from orcabus_api_tools.filemanager import (
+    get_s3_uri_from_ingest_id, get_presigned_url_from_ingest_id,
+    get_presigned_url_expiry,
+)
+
+# Local imports
+from .cache import get_from_cache
+from .concurrency import concurrent_map
+from .globals import (
+    PRESIGN_EXPIRY_SECONDS_ENV_VAR, DEFAULT_PRESIGN_EXPIRY_SECONDS,
+    PRESIGN_LOCAL_S3_URI_PREFIXES_ENV_VAR, PRESIGN_ARCHIVED_STORAGE_CLASSES,
+)
+from .metrics import increment_request_metric, register_boto_call_counter
+from .models import PresignedUrl, PresignedUrlModel, FastqPresignedUrlModel
+from .resolver import resolve_ingest_ids, iter_ingest_ids
+from .utils import datetime_to_isoformat
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_s3 import S3Client
+    from orcabus_api_tools.filemanager.models import FileObject
+    from .models.fastq import FastqData
+
+
+def get_presign_expiry_seconds() -> int:
+    return int(environ.get(PRESIGN_EXPIRY_SECONDS_ENV_VAR, DEFAULT_PRESIGN_EXPIRY_SECONDS))
+
+
+def get_local_presign_s3_uri_prefixes() -> List[str]:
+    return list(filter(
+        lambda s3_uri_prefix_iter_: s3_uri_prefix_iter_ != "",
+        map(str.strip, environ.get(PRESIGN_LOCAL_S3_URI_PREFIXES_ENV_VAR, "").split(","))
+    ))
+
+
+@cache
+def get_s3_client() -> 'S3Client':
+    # Clients are thread safe, generating a presigned url makes no network calls
+    session = boto3.session.Session()
+    register_boto_call_counter(session)
+    return session.client('s3', config=Config(signature_version='s3v4'))
+
+
+def can_presign_locally(file_object: Optional['FileObject']) -> bool:
+    if file_object is None or file_object.get('storageClass', None) in PRESIGN_ARCHIVED_STORAGE_CLASSES:
+        return False
+    s3_uri = f"s3://{file_object['bucket']}/{file_object['key']}"
+    return any(map(
+        lambda s3_uri_prefix_iter_: s3_uri.startswith(s3_uri_prefix_iter_),
+        get_local_presign_s3_uri_prefixes()
+    ))
+
+
+def presign_file_object(file_object: 'FileObject') -> PresignedUrl:
+    """
+    Sign a presigned url locally
+    :param file_object:
+    :return:
+    """
+    expiry_seconds = get_presign_expiry_seconds()
+    increment_request_metric("presign.local")
+    return PresignedUrl(
+        s3Uri=f"s3://{file_object['bucket']}/{file_object['key']}",
+        presignedUrl=get_s3_client().generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': file_object['bucket'],
+                'Key': file_object['key'],
+            },
+            ExpiresIn=expiry_seconds,
+        ),
+        expiresAt=datetime_to_isoformat(datetime.now(timezone.utc) + timedelta(seconds=expiry_seconds)),
+    )
+
+
+def presign_ingest_id(ingest_id: str) -> PresignedUrl:
+    """
+    Presign locally if we can, otherwise through the file manager
+    :param ingest_id:
+    :return:
+    """
+    file_object = get_from_cache(ingest_id)
+    if can_presign_locally(file_object):
+        return presign_file_object(file_object)
+
+    increment_request_metric("presign.filemanager")
+    presigned_url = get_presigned_url_from_ingest_id(ingest_id)
+    return PresignedUrl(
+        s3Uri=(
+            f"s3://{file_object['bucket']}/{file_object['key']}"
+            if file_object is not None
+            else get_s3_uri_from_ingest_id(ingest_id)
+        ),
+        presignedUrl=presigned_url,
+        expiresAt=datetime_to_isoformat(get_presigned_url_expiry(presigned_url)),
+    )
+
+
+def presign_fastq(fastq_obj: 'FastqData') -> PresignedUrlModel:
+    """
+    Presign the read set of a single fastq, the s3 details should already be resolved (see presign_fastq_list)
+    :param fastq_obj:
+    :return:
+    """
+    presigned_objects = {
+        "r1": presign_ingest_id(fastq_obj.read_set.r1.ingest_id)
+    }
+    if fastq_obj.read_set.r2:
+        presigned_objects["r2"] = presign_ingest_id(fastq_obj.read_set.r2.ingest_id)
+
+    return PresignedUrlModel(
+        **presigned_objects
+    )
+
+
+def presign_fastq_list(fastq_list: List['FastqData']) -> List[FastqPresignedUrlModel]:
+    """
+    Presign the read sets of many fastqs (i.e a fastq set or an instrument run),
+    the s3 details are resolved in one pass, fastqs without a read set are skipped.
+    :param fastq_list:
+    :return:
+    """
+    fastq_list = list(filter(
+        lambda fastq_obj_iter_: fastq_obj_iter_.read_set is not None,
+        fastq_list
+    ))
+
+    # Resolve the read set s3 details
+    resolve_ingest_ids(chain.from_iterable(map(
+        lambda fastq_obj_iter_: iter_ingest_ids(fastq_obj_iter_.read_set),
+        fastq_list
+    )))
+
+    # Any file manager fallbacks are run concurrently
+    return concurrent_map(
+        lambda fastq_obj_iter_: FastqPresignedUrlModel(
+            fastqId=fastq_obj_iter_.id,
+            **presign_fastq(fastq_obj_iter_)
+        ),
+        fastq_list
+    )
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+"""
+S3 details resolver
+
+Rather than each data object (and each sub object) fetching its own s3 details as it is serialized,
+we walk the whole response tree first, collecting every ingest id
+(read sets, ntsm, sequali reports, somalier and multiqc outputs),
+and then resolve the ingest ids missing from the cache in one pass.
+
+Missing ingest ids are requested from the file manager in size limited chunks (S3_RESOLVER_CHUNK_SIZE),
+run concurrently on the query thread pool, so a response needs at most
+ceil(missing ingest ids / chunk size) file manager calls, all made up front.
+
+The data objects are then serialized from the cache only (see to_dict_from_cache).
+Resolved entries are pinned to the request (see cache.start_request_s3_objs).
+"""
+
+# Standard imports
+from itertools import chain
+from os import environ
+from typing import Any, Iterable, Iterator, List
+
+from pydantic import BaseModel
+
+# Layer imports
+from orcabus_api_tools.filemanager import get_s3_objs_from_ingest_ids_map
+
+# Local imports
+from .cache import filter_missing_ingest_ids, update_cache_from_s3_objs
+from .concurrency import concurrent_map
+from .globals import (
+    EVENT_BUS_NAME_ENV_VAR,
+    S3_RESOLVER_CHUNK_SIZE_ENV_VAR, DEFAULT_S3_RESOLVER_CHUNK_SIZE,
+)
+from .hydration import chunk_list
+from .metrics import increment_request_metric
+from .models.file_storage import FileStorageObjectBase
+
+
+def get_resolver_chunk_size() -> int:
+    return int(environ.get(S3_RESOLVER_CHUNK_SIZE_ENV_VAR, DEFAULT_S3_RESOLVER_CHUNK_SIZE))
+
+
+def iter_ingest_ids(obj: Any) -> Iterator[str]:
+    """
+    Walk a data object (or list of data objects) and yield the ingest id of every file storage object within it
+    :param obj:
+    :return:
+    """
+    if obj is None:
+        return
+    if isinstance(obj, FileStorageObjectBase):
+        if obj.ingest_id:
+            yield obj.ingest_id
+        return
+    if isinstance(obj, BaseModel):
+        for field_name in type(obj).model_fields.keys():
+            yield from iter_ingest_ids(getattr(obj, field_name))
+        return
+    if isinstance(obj, (list, tuple)):
+        for obj_iter_ in obj:
+            yield from iter_ingest_ids(obj_iter_)
+
+
+def resolve_ingest_ids(ingest_ids: Iterable[str]):
+    """
+    Resolve the ingest ids missing from the cache, in concurrent, size limited chunks
+    :param ingest_ids:
+    :return:
+    """
+    # No file manager to call locally
+    if environ.get(EVENT_BUS_NAME_ENV_VAR) == 'local':
+        return
+
+    missing_ingest_ids = filter_missing_ingest_ids(ingest_ids)
+
+    def _resolve_chunk(ingest_ids_chunk: List[str]):
+        increment_request_metric("filemanager.getS3Objs")
+        update_cache_from_s3_objs(
+            ingest_ids_chunk,
+            get_s3_objs_from_ingest_ids_map(ingest_ids_chunk)
+        )
+
+    concurrent_map(
+        _resolve_chunk,
+        chunk_list(missing_ingest_ids, get_resolver_chunk_size())
+    )
+
+
+def resolve_s3_details(*objs: Any):
+    """
+    Collect the ingest ids across every object in the response, and resolve them all up front
+    :param objs: Data objects, i.e a list of FastqData, or a FastqSetData followed by its FastqData members
+    :return:
+    """
+    resolve_ingest_ids(chain.from_iterable(map(iter_ingest_ids, objs)))
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+
+"""
+Response helpers
+
+Data objects are serialized in a single pass by their to_dict methods (see models/serializers.py),
+so there is no need for FastAPI to validate the result against the return annotation (a second full pass),
+and then serialize it again through jsonable_encoder.
+
+Routes that return a single serialized object return it directly instead (dumped by orjson),
+the return annotation is kept for the OpenAPI schema.
+"""
+
+# Standard imports
+from typing import Any
+
+import orjson
+from fastapi import Response
+
+
+def json_response(content: Any) -> Response:
+    """
+    Return already serialized (json compatible) content directly
+    :param content:
+    :return:
+    """
+    return Response(
+        content=orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS),
+        media_type="application/json"
+    )
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+"""
+Shared (second level) s3 details cache
+
+The in-memory cache in cache.py is per lambda instance, so every cold start, and every concurrent instance,
+would otherwise go back to the file manager for the same ingest ids.
+
+The shared cache sits behind the in-memory cache, it is
+  * read in a batch for the ingest ids missing from the in-memory cache (before we call the file manager),
+  * written through with the file manager results (including the negative entries),
+  * invalidated by s3 object deleted / storage class changed / restored events (see the invalidate_s3_cache lambda),
+    entries are looked up by their s3 uri (through the s3_uri index), since s3 events do not carry the ingest id.
+    The lambda is the only place entries are invalidated, so the backends here do not implement it.
+
+The backend is set by the S3_SHARED_CACHE_BACKEND environment variable
+  * 'dynamodb', a table (DYNAMODB_S3_CACHE_TABLE_NAME) with a ttl attribute and an s3_uri index,
+  * 'sqlite', a local file (S3_SHARED_CACHE_SQLITE_PATH), a stand-in for local development,
+  * 'none' (the default), no shared cache.
+
+Failures in the shared cache are logged and treated as a miss, the file manager remains the source of truth.
+
+The same backend also holds other lookups (i.e the metadata lookups in metadata_cache.py),
+these are kept under a namespace, the key is stored as '<namespace>#<key>' and has no s3 uri.
+"""
+
+# Standard imports
+import json
+import logging
+import sqlite3
+import threading
+import typing
+from abc import ABC, abstractmethod
+from datetime import datetime
+from functools import cache
+from os import environ
+from typing import Dict, List, Optional, Tuple
+
+# Local imports
+from .concurrency import concurrent_map
+from .globals import (
+    S3_SHARED_CACHE_BACKEND_ENV_VAR, DEFAULT_S3_SHARED_CACHE_BACKEND,
+    DYNAMODB_S3_CACHE_TABLE_NAME_ENV_VAR,
+    S3_SHARED_CACHE_SQLITE_PATH_ENV_VAR, DEFAULT_S3_SHARED_CACHE_SQLITE_PATH,
+    DYNAMODB_BATCH_WRITE_ITEM_MAX_ITEMS,
+)
+from .hydration import batch_get_items, chunk_list
+from .utils import get_dynamodb_resource
+
+if typing.TYPE_CHECKING:
+    from orcabus_api_tools.filemanager.models import FileObject
+
+# Set basic logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Ingest id -> (file object or None for a negative entry, expiry timestamp)
+SharedCacheEntries = Dict[str, Tuple[Optional['FileObject'], float]]
+
+
+def get_shared_cache_key(key: str, namespace: Optional[str] = None) -> str:
+    if namespace is None:
+        return key
+    return f"{namespace}#{key}"
+
+
+def get_key_from_shared_cache_key(shared_cache_key: str, namespace: Optional[str] = None) -> str:
+    if namespace is None:
+        return shared_cache_key
+    return shared_cache_key[len(namespace) + 1:]
+
+
+def get_s3_uri_from_file_object(file_object: Optional['FileObject']) -> Optional[str]:
+    if file_object is None:
+        return None
+    return f"s3://{file_object['bucket']}/{file_object['key']}"
+
+
+class SharedCache(ABC):
+    """
+    Shared cache backend
+    """
+    @abstractmethod
+    def get_many(self, ingest_ids: List[str], namespace: Optional[str] = None) -> SharedCacheEntries:
+        """
+        Get the current (unexpired) entries for the ingest ids, ingest ids with no entry are omitted
+        :param ingest_ids:
+        :param namespace: None for the s3 details, otherwise the lookup the keys belong to
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def put_many(self, entries: SharedCacheEntries, namespace: Optional[str] = None):
+        """
+        Put the entries, replacing any existing entries for the same ingest ids
+        :param entries:
+        :param namespace: None for the s3 details, otherwise the lookup the keys belong to
+        :return:
+        """
+        pass
+
+
+class DynamoDbSharedCache(SharedCache):
+    """
+    Items are of the form
+    {
+        "id": <ingest id>,
+        "s3_uri": "s3://bucket/key" (omitted for negative entries),
+        "file_object": <json string> (omitted for negative entries),
+        "ttl": <expiry epoch seconds>
+    }
+    Namespaced entries are of the form {"id": "<namespace>#<key>", "file_object": <json string>, "ttl": ...}
+    The file object is stored as a json string, so we do not need to convert floats to and from decimals.
+    DynamoDB only removes expired items eventually, so the ttl is also checked on read.
+    """
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+
+    def get_many(self, ingest_ids: List[str], namespace: Optional[str] = None) -> SharedCacheEntries:
+        now_timestamp = datetime.now().timestamp()
+        return dict(map(
+            lambda item_iter_: (
+                get_key_from_shared_cache_key(item_iter_['id'], namespace),
+                (
+                    json.loads(item_iter_['file_object']) if item_iter_.get('file_object') is not None else None,
+                    float(item_iter_['ttl'])
+                )
+            ),
+            filter(
+                lambda item_iter_: float(item_iter_['ttl']) > now_timestamp,
+                batch_get_items(
+                    self.table_name,
+                    list(map(lambda ingest_id_iter_: get_shared_cache_key(ingest_id_iter_, namespace), ingest_ids))
+                )
+            )
+        ))
+
+    def put_many(self, entries: SharedCacheEntries, namespace: Optional[str] = None):
+        def _put_chunk(ingest_ids_chunk: List[str]):
+            with get_dynamodb_resource().Table(self.table_name).batch_writer(overwrite_by_pkeys=['id']) as batch:
+                for ingest_id in ingest_ids_chunk:
+                    file_object, expiry_timestamp = entries[ingest_id]
+                    item = {
+                        "id": get_shared_cache_key(ingest_id, namespace),
+                        "ttl": int(expiry_timestamp),
+                    }
+                    if file_object is not None:
+                        # Only s3 details can be invalidated by s3 uri
+                        if namespace is None:
+                            item['s3_uri'] = get_s3_uri_from_file_object(file_object)
+                        item['file_object'] = json.dumps(file_object, default=str)
+                    batch.put_item(Item=item)
+
+        concurrent_map(
+            _put_chunk,
+            chunk_list(list(entries.keys()), DYNAMODB_BATCH_WRITE_ITEM_MAX_ITEMS)
+        )
+
+
+class SqliteSharedCache(SharedCache):
+    """
+    Local file stand-in for the DynamoDB table, shared by every process on the host
+    (there are no s3 events locally, so entries are not stored by s3 uri)
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS s3_cache ("
+                "ingest_id TEXT PRIMARY KEY, file_object TEXT, expires_at REAL"
+                ")"
+            )
+
+    def get_many(self, ingest_ids: List[str], namespace: Optional[str] = None) -> SharedCacheEntries:
+        rows = []
+        shared_cache_keys = list(map(
+            lambda ingest_id_iter_: get_shared_cache_key(ingest_id_iter_, namespace),
+            ingest_ids
+        ))
+        with self._lock:
+            # Stay well under the sqlite host parameter limit
+            for ingest_ids_chunk in chunk_list(shared_cache_keys, 500):
+                rows.extend(self._connection.execute(
+                    "SELECT ingest_id, file_object, expires_at FROM s3_cache "
+                    f"WHERE expires_at > ? AND ingest_id IN ({', '.join(['?'] * len(ingest_ids_chunk))})",
+                    [datetime.now().timestamp(), *ingest_ids_chunk]
+                ).fetchall())
+        return dict(map(
+            lambda row_iter_: (
+                get_key_from_shared_cache_key(row_iter_[0], namespace),
+                (json.loads(row_iter_[1]) if row_iter_[1] is not None else None, row_iter_[2])
+            ),
+            rows
+        ))
+
+    def put_many(self, entries: SharedCacheEntries, namespace: Optional[str] = None):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO s3_cache (ingest_id, file_object, expires_at) VALUES (?, ?, ?)",
+                list(map(
+                    lambda kv: (
+                        get_shared_cache_key(kv[0], namespace),
+                        json.dumps(kv[1][0], default=str) if kv[1][0] is not None else None,
+                        kv[1][1]
+                    ),
+                    entries.items()
+                ))
+            )
+
+
+@cache
+def get_shared_cache() -> Optional[SharedCache]:
+    """
+    Get the shared cache backend, None if there is no shared cache
+    :return:
+    """
+    backend = environ.get(S3_SHARED_CACHE_BACKEND_ENV_VAR, DEFAULT_S3_SHARED_CACHE_BACKEND)
+    if backend == 'none':
+        return None
+    if backend == 'dynamodb':
+        return DynamoDbSharedCache(environ[DYNAMODB_S3_CACHE_TABLE_NAME_ENV_VAR])
+    if backend == 'sqlite':
+        return SqliteSharedCache(environ.get(S3_SHARED_CACHE_SQLITE_PATH_ENV_VAR, DEFAULT_S3_SHARED_CACHE_SQLITE_PATH))
+    raise ValueError(
+        f"Unknown {S3_SHARED_CACHE_BACKEND_ENV_VAR} '{backend}', expected one of 'none', 'dynamodb' or 'sqlite'"
+    )
+
+
+def get_many_from_shared_cache(ingest_ids: List[str], namespace: Optional[str] = None) -> SharedCacheEntries:
+    shared_cache = get_shared_cache()
+    if shared_cache is None or len(ingest_ids) == 0:
+        return {}
+    try:
+        return shared_cache.get_many(ingest_ids, namespace=namespace)
+    except Exception as e:
+        logger.warning(f"Could not read from the shared s3 cache, {e}")
+        return {}
+
+
+def put_many_in_shared_cache(entries: SharedCacheEntries, namespace: Optional[str] = None):
+    shared_cache = get_shared_cache()
+    if shared_cache is None or len(entries) == 0:
+        return
+    try:
+        shared_cache.put_many(entries, namespace=namespace)
+    except Exception as e:
+        logger.warning(f"Could not write to the shared s3 cache, {e}")
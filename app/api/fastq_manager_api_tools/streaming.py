@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+"""
+Streaming (NDJSON / CSV) responses
+
+With format=ndjson, list endpoints stream one serialized object per line rather than building
+the whole (paginated) response in memory.
+With format=csv (i.e fastq list rows), each row is streamed as a line of csv.
+
+Items are read lazily from the index query, and loaded and serialized in chunks,
+so s3 details are resolved in rolling batches (one filemanager call per chunk)
+and only a single chunk of data objects is held in memory at a time.
+
+Pagination parameters are ignored in this mode, every matching row is streamed.
+"""
+
+# Standard imports
+import csv
+import io
+import json
+from itertools import chain
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Type, TypeVar
+
+from fastapi.responses import StreamingResponse
+
+# Local imports
+from .globals import NDJSON_MEDIA_TYPE, CSV_MEDIA_TYPE
+from .hydration import iter_data_chunks
+
+DataObjType = TypeVar("DataObjType")
+
+
+def iter_ndjson_lines(rows: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    """
+    Serialize each row as a single line of json
+    :param rows:
+    :return:
+    """
+    for row in rows:
+        yield (json.dumps(row, separators=(',', ':'), default=str) + "\n").encode()
+
+
+def iter_serialized_data(
+        data_cls: Type[DataObjType],
+        ids: Iterable[str],
+        serialize_chunk: Callable[[List[DataObjType]], List[Dict[str, Any]]],
+        chunk_filter: Optional[Callable[[DataObjType], bool]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Load the data objects in chunks, and serialize each chunk as a list response
+    (so that any s3 details are resolved for the whole chunk at once)
+    :param data_cls: i.e FastqData
+    :param ids: A (lazy) iterable of ids
+    :param serialize_chunk: i.e lambda fastq_list: FastqListResponse(fastq_list=fastq_list).model_dump()
+    :param chunk_filter: Optional in memory filter on the loaded data objects
+    :return:
+    """
+    return chain.from_iterable(map(
+        lambda data_chunk_iter_: (
+            serialize_chunk(list(filter(chunk_filter, data_chunk_iter_)))
+            if chunk_filter is not None
+            else serialize_chunk(data_chunk_iter_)
+        ),
+        iter_data_chunks(data_cls, ids)
+    ))
+
+
+def iter_csv_lines(rows: Iterable[Dict[str, Any]], columns: Dict[str, str]) -> Iterator[bytes]:
+    """
+    Serialize the header, and then each row, as a line of csv
+    :param rows:
+    :param columns: Map of column name to row key, i.e {"RGID": "rgid"}, missing keys are left empty
+    :return:
+    """
+    line_buffer = io.StringIO()
+    csv_writer = csv.writer(line_buffer, lineterminator="\n")
+
+    def _to_line(values: List[Any]) -> bytes:
+        line_buffer.seek(0)
+        line_buffer.truncate(0)
+        csv_writer.writerow(values)
+        return line_buffer.getvalue().encode()
+
+    yield _to_line(list(columns.keys()))
+    for row in rows:
+        yield _to_line(list(map(
+            lambda row_key_iter_: row.get(row_key_iter_, ""),
+            columns.values()
+        )))
+
+
+def ndjson_streaming_response(rows: Iterable[Dict[str, Any]]) -> StreamingResponse:
+    """
+    Stream the rows as newline delimited json
+    :param rows:
+    :return:
+    """
+    return StreamingResponse(
+        iter_ndjson_lines(rows),
+        media_type=NDJSON_MEDIA_TYPE
+    )
+
+
+def csv_streaming_response(
+        rows: Iterable[Dict[str, Any]],
+        columns: Dict[str, str],
+        file_name: str,
+) -> StreamingResponse:
+    """
+    Stream the rows as a csv attachment
+    :param rows:
+    :param columns: Map of column name to row key
+    :param file_name: i.e fastq_list.csv
+    :return:
+    """
+    return StreamingResponse(
+        iter_csv_lines(rows, columns),
+        media_type=CSV_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename={file_name}"}
+    )
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+"""
+Transactional writes for operations over many items
+
+Creating, merging, linking to and unlinking from a fastq set each write a fastq set and many fastqs,
+one save or delete at a time, so a merge of a 16 lane fastq set is dozens of round trips,
+and a failure midway leaves fastqs pointing at a deleted fastq set.
+
+Within write_transaction, saves and deletes are instead collected, and committed in a single TransactWriteItems call,
+all or nothing, and in one round trip (with or without the event outbox, see outbox.py).
+
+Each write carries a condition, so a concurrent change fails the whole transaction (TransactionConflictError, a 409),
+rather than being overwritten
+  * save_if_not_exists, the item is new (i.e the id of a new fastq set is unique),
+  * save_if_unchanged / delete_if_unchanged, the item is still at the version we read (see versioned_update.py),
+  * condition_check, an item we do not write still meets a condition
+    (i.e no other fastq set of the library has become the current fastq set).
+
+A transaction holds at most DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS writes (events included with the outbox),
+larger blocks are committed in consecutive transactions, so are NOT atomic.
+Writes are ordered such that each transaction leaves the items consistent
+(i.e fastqs are moved to a merged fastq set before the old fastq sets are deleted),
+and the events of each write are put straight after the write, so are committed in the same transaction
+(a block is never split between a write and its events, see OutboxTransactionWriter).
+
+Without the outbox, events put within the block are only sent once the transaction commits (see deferred_events).
+"""
+
+# Standard imports
+from contextlib import contextmanager
+from typing import Iterator, Optional, Type
+
+from boto3.dynamodb.conditions import Attr, ConditionBase
+from botocore.exceptions import ClientError
+from dyntastic import Dyntastic
+from dyntastic.transact import current_transaction_writer
+
+# Local imports
+from .events.events import deferred_events
+from .events.outbox import OutboxTransactionWriter
+from .identity_map import clear_request_identity_map
+from .index_query import combine_conditions
+from .metrics import increment_request_metric
+from .versioned_update import get_version_condition, is_version_conflict
+
+
+class TransactionConflictError(Exception):
+    """
+    An item was changed by another writer, so nothing in the transaction was written
+    """
+    pass
+
+
+@contextmanager
+def write_transaction() -> Iterator[None]:
+    """
+    Commit the saves and deletes made within the block (and with the outbox, the events) in a single transaction,
+    once the block exits without an exception.
+    Blocks of more than DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS writes are committed in consecutive transactions.
+    Reads within the block do not see the writes made within the block.
+    Nested blocks (and outbox transactions) join the outer transaction.
+    :raises TransactionConflictError: A condition failed, nothing was written
+    :return:
+    """
+    if current_transaction_writer() is not None:
+        yield
+        return
+
+    try:
+        with deferred_events(), OutboxTransactionWriter(chunked=True):
+            yield
+    except BaseException as e:
+        # The objects read in this request may hold changes that were never written
+        clear_request_identity_map()
+        if not isinstance(e, ClientError) or not is_version_conflict(e):
+            raise
+        increment_request_metric("transactions.conflict")
+        raise TransactionConflictError(
+            "One or more items were changed by another request, nothing was written, please try again"
+        ) from e
+
+
+def save_if_not_exists(data_obj: Dyntastic):
+    """
+    Save a new item, on the condition that no item has its id
+    :param data_obj:
+    :return:
+    """
+    data_obj.save(condition=Attr(data_obj.__hash_key__).not_exists())
+
+
+def save_if_unchanged(data_obj: Dyntastic, condition: Optional[ConditionBase] = None):
+    """
+    Save the item, on the condition that the item is still at the version we read (and the condition, if given)
+    :param data_obj: A Dyntastic data object with a version, i.e FastqData
+    :param condition:
+    :return:
+    """
+    # Before the save increments the version
+    data_obj.save(condition=combine_conditions(get_version_condition(data_obj), condition))
+
+
+def delete_if_unchanged(data_obj: Dyntastic, condition: Optional[ConditionBase] = None):
+    """
+    Delete the item, on the condition that the item is still at the version we read (and the condition, if given)
+    :param data_obj: A Dyntastic data object with a version, i.e FastqSetData
+    :param condition:
+    :return:
+    """
+    # Before the delete increments the version
+    data_obj.delete(condition=combine_conditions(get_version_condition(data_obj), condition))
+
+
+def condition_check(data_cls: Type[Dyntastic], hash_key: str, condition: ConditionBase):
+    """
+    Fail the transaction unless the item (that is not otherwise written in the transaction) meets the condition
+    :param data_cls: i.e FastqSetData
+    :param hash_key: The id of the item
+    :param condition:
+    :return:
+    """
+    transaction_writer = current_transaction_writer()
+    if transaction_writer is None:
+        raise ValueError("A condition check can only be made within a write transaction")
+
+    transaction_writer.add(
+        data_cls,
+        data_cls._construct_transact_item(
+            "transaction_condition",
+            {
+                "Key": {data_cls.__hash_key__: hash_key},
+                "ConditionExpression": condition,
+            }
+        )
+    )
@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 import re
-from functools import reduce
-from operator import concat
+import threading
 from os import environ
 # Imports
 from typing import Optional, List
@@ -14,27 +13,20 @@ from pydantic.alias_generators import (
     to_camel as pydantic_to_camel
 )
 
-from orcabus_api_tools.metadata import (
-    get_sample_orcabus_id_from_sample_id,
-    list_libraries_in_sample,
-    get_subject_orcabus_id_from_subject_id,
-    list_libraries_in_subject,
-    get_individual_orcabus_id_from_individual_id,
-    list_libraries_in_individual,
-    get_project_orcabus_id_from_project_id,
-    list_libraries_in_project
-)
-
 from .globals import (
     ORCABUS_ULID_REGEX_MATCH,
     FQR_CONTEXT_PREFIX, FQS_CONTEXT_PREFIX, RGID_REGEX_MATCH, MULTIQC_JOB_PREFIX
 )
+from .metrics import register_boto_call_counter
 
 if typing.TYPE_CHECKING:
     from mypy_boto3_lambda import LambdaClient
     from mypy_boto3_lambda.type_defs import InvocationResponseTypeDef
     from mypy_boto3_stepfunctions import SFNClient
     from mypy_boto3_ssm import SSMClient
+    from mypy_boto3_dynamodb import DynamoDBServiceResource
+
+_DYNAMODB_RESOURCE_LOCAL = threading.local()
 
 
 def get_ulid() -> str:
@@ -49,13 +41,17 @@ def is_orcabus_ulid(query: str) -> bool:
     return ORCABUS_ULID_REGEX_MATCH.match(query) is not None
 
 
-async def sanitise_fqr_orcabus_id(fastq_id: str) -> str:
+def sanitise_fqr_orcabus_id_sync(fastq_id: str) -> str:
     if ORCABUS_ULID_REGEX_MATCH.match(fastq_id):
         return fastq_id
     elif ORCABUS_ULID_REGEX_MATCH.match(f"{FQR_CONTEXT_PREFIX}.{fastq_id}"):
         return f"{FQR_CONTEXT_PREFIX}.{fastq_id}"
     raise ValueError(f"Invalid fastq list row id '{fastq_id}'")
 
+
+async def sanitise_fqr_orcabus_id(fastq_id: str) -> str:
+    return sanitise_fqr_orcabus_id_sync(fastq_id)
+
 async def sanitise_fqr_orcabus_id_list(fastq_id_list: List[str]) -> List[str]:
     fastq_id_list_sanitised = []
     for fastq_id in fastq_id_list:
@@ -151,138 +147,6 @@ def to_camel(s: str) -> str:
     return s
 
 
-def get_libraries_from_metadata_query(
-    library: str = None,
-    library_list: Optional[str] = None,
-    sample: str = None,
-    sample_list: Optional[str] = None,
-    subject: str = None,
-    subject_list: Optional[str] = None,
-    individual: str = None,
-    individual_list: Optional[str] = None,
-    project: str = None,
-    project_list: Optional[str] = None,
-) -> List[str]:
-    if library is not None:
-        library_list = [library]
-    if library_list is not None:
-        library_list = list(map(
-            lambda library_id_iter_: (
-                library_id_iter_ if is_orcabus_ulid(library_id_iter_)
-                else library_id_iter_
-            ),
-            library_list
-        ))
-
-    # Check sample list
-    if sample is not None:
-        sample_list = [sample]
-    if sample_list is not None:
-        sample_orcabus_ids = list(map(
-            lambda library_id_iter_: (
-                library_id_iter_ if is_orcabus_ulid(library_id_iter_)
-                else get_sample_orcabus_id_from_sample_id(library_id_iter_)
-            ),
-            sample_list
-        ))
-        library_list = list(map(
-            # Get orcabus id from all library ids
-            lambda library_id_iter_: library_id_iter_['orcabusId'],
-            # Flatten list of lists of library objects
-            list(reduce(
-                concat,
-                # Get all libraries in each sample
-                # Returns a list of lists
-                list(map(
-                    lambda sample_orcabus_id_iter_:
-                    list_libraries_in_sample(sample_orcabus_id_iter_),
-                    sample_orcabus_ids
-                ))
-            ))
-        ))
-
-    # Check subject list
-    if subject is not None:
-        subject_list = [subject]
-    if subject_list is not None:
-        subject_orcabus_ids = list(map(
-            lambda subject_id_iter_: (
-                subject_id_iter_ if is_orcabus_ulid(subject_id_iter_)
-                else get_subject_orcabus_id_from_subject_id(subject_id_iter_)
-            ),
-            subject_list
-        ))
-        library_list = list(map(
-            # Get orcabus id from all library ids
-            lambda library_id_iter_: library_id_iter_['orcabusId'],
-            # Flatten list of lists of library objects
-            list(reduce(
-                concat,
-                # Get all libraries in each subject
-                list(map(
-                    lambda subject_orcabus_id_iter_:
-                    list_libraries_in_subject(subject_orcabus_id_iter_),
-                    subject_orcabus_ids
-                ))
-            ))
-        ))
-
-    # Check individual list
-    if individual is not None:
-        individual_list = [individual]
-    if individual_list is not None:
-        individual_orcabus_ids = list(map(
-            lambda individual_id_iter_: (
-                individual_id_iter_ if is_orcabus_ulid(individual_id_iter_)
-                else get_individual_orcabus_id_from_individual_id(individual_id_iter_)
-            ),
-            individual_list
-        ))
-        library_list = list(map(
-            # Get orcabus id from all library ids
-            lambda library_id_iter_: library_id_iter_['orcabusId'],
-            # Flatten list of lists of library objects
-            list(reduce(
-                concat,
-                # Get all libraries in each individual
-                list(map(
-                    lambda individual_orcabus_id_iter_:
-                    list_libraries_in_individual(individual_orcabus_id_iter_),
-                    individual_orcabus_ids
-                ))
-            ))
-        ))
-
-    # Check project list
-    if project is not None:
-        project_list = [project]
-    if project_list is not None:
-        project_orcabus_ids = list(map(
-            lambda project_id_iter_: (
-                project_id_iter_ if is_orcabus_ulid(project_id_iter_)
-                else get_project_orcabus_id_from_project_id(project_id_iter_)
-            ),
-            project_list
-        ))
-        library_list = list(map(
-            # Get orcabus id from all library ids
-            lambda library_id_iter_: library_id_iter_['orcabusId'],
-            # Flatten list of lists of library objects
-            list(reduce(
-                concat,
-                # Get all libraries in each project
-                list(map(
-                    lambda project_orcabus_id_iter_:
-                    list_libraries_in_project(project_orcabus_id_iter_),
-                    project_orcabus_ids
-                ))
-            ))
-        ))
-
-    if library_list is not None:
-        return list(set(library_list))  # Remove duplicates
-
-
 # AWS Things
 def get_sfn_client() -> 'SFNClient':
     return boto3.client('stepfunctions')
@@ -292,6 +156,16 @@ def get_ssm_client() -> 'SSMClient':
     return boto3.client('ssm')
 
 
+def get_dynamodb_resource() -> 'DynamoDBServiceResource':
+    # Cached since we may call this many times over a single request
+    # Resources are not thread safe, and queries may be run concurrently, so we keep one per thread
+    if getattr(_DYNAMODB_RESOURCE_LOCAL, 'resource', None) is None:
+        session = boto3.session.Session()
+        register_boto_call_counter(session)
+        _DYNAMODB_RESOURCE_LOCAL.resource = session.resource('dynamodb', endpoint_url=environ['DYNAMODB_HOST'])
+    return _DYNAMODB_RESOURCE_LOCAL.resource
+
+
 def get_fastq_endpoint_url() -> str:
     return environ.get("FASTQ_BASE_URL") + "/api/v1/fastq"
 
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+"""
+Partial, versioned updates
+
+A PATCH route reads the whole item, changes one attribute, and then writes the whole item back (a full PutItem),
+so every write pays for the large qc and read set maps,
+and two writers at once (i.e a qc job and a read count job finishing together) silently overwrite each other.
+
+Instead, update_with_retry
+  * reads the item (strongly consistent),
+  * applies the change in memory, the change returns the names of the attributes it changed,
+  * issues an UpdateItem that only SETs (or REMOVEs, when None) the changed attributes, and increments the version,
+    on the condition that the version is still the version we read,
+  * uses the item returned by the UpdateItem (ReturnValues=ALL_NEW), so no further read is needed,
+  * on a version conflict, reads the item again, and re-applies the change (up to DYNAMODB_VERSIONED_UPDATE_MAX_ATTEMPTS).
+A change that changes no attributes is not written at all.
+
+Within an outbox transaction (see outbox.py), the update is added to the transaction instead,
+a transaction cannot return the updated item, so the in-memory item is used,
+and a version conflict cancels the whole transaction (events included) before the change is retried.
+
+Items written before versioning have no version attribute, these are treated as version 0.
+
+Saves and deletes increment the version of the data object within next_version,
+so a failed write (or a transaction that is never committed) leaves the data object at the version read.
+"""
+
+# Standard imports
+import logging
+from contextlib import contextmanager
+from time import sleep
+from typing import Callable, Iterator, List, Optional, Type, TypeVar
+
+from boto3.dynamodb.conditions import Attr, ConditionBase
+from botocore.exceptions import ClientError
+from dyntastic import attr
+from dyntastic.transact import current_transaction_writer
+
+# Local imports
+from .events.outbox import OutboxTransactionWriter, outbox_transaction
+from .globals import DYNAMODB_VERSIONED_UPDATE_MAX_ATTEMPTS
+from .identity_map import add_to_identity_map
+from .metrics import increment_request_metric
+
+# Set basic logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DataObjType = TypeVar("DataObjType")
+ResultType = TypeVar("ResultType")
+
+
+class VersionConflictError(Exception):
+    """
+    The item was changed by another writer on every attempt
+    """
+    pass
+
+
+@contextmanager
+def next_version(data_obj) -> Iterator[None]:
+    """
+    Increment the version of the data object for the write made within the block.
+    The version read is restored if the write fails,
+    or within a transaction, if the write is never committed (see OutboxTransactionWriter)
+    :param data_obj: A Dyntastic data object with a version, i.e FastqData
+    :return:
+    """
+    read_version = data_obj.version
+    data_obj.version += 1
+    try:
+        yield
+    except BaseException:
+        data_obj.version = read_version
+        raise
+
+    transaction_writer = current_transaction_writer()
+    if isinstance(transaction_writer, OutboxTransactionWriter):
+        transaction_writer.add_read_version(data_obj, read_version)
+
+
+def get_version_condition(data_obj) -> ConditionBase:
+    """
+    The item must exist, and still be at the version we read
+    :param data_obj:
+    :return:
+    """
+    hash_key_condition = Attr(data_obj.__hash_key__).exists()
+    if data_obj.version == 0:
+        return hash_key_condition & (Attr('version').not_exists() | Attr('version').eq(0))
+    return hash_key_condition & Attr('version').eq(data_obj.version)
+
+
+def get_update_kwargs(data_obj, attr_names: List[str]) -> dict:
+    """
+    Build the UpdateItem arguments, SET the changed attributes (REMOVE those that are now None) and the next version
+    :param data_obj: The updated data object
+    :param attr_names: The names of the changed attributes
+    :return:
+    """
+    # Serialize as a full save would (None attributes are omitted by a save, so are removed here)
+    data = attr.serialize(data_obj.model_dump(by_alias=True, include=set(attr_names)))
+
+    attr_names = list(dict.fromkeys(attr_names))
+    expression_attribute_names = dict(map(
+        lambda attr_iter_: (f"#upd{attr_iter_[0]}", attr_iter_[1]),
+        enumerate(attr_names)
+    ))
+    expression_attribute_names['#updversion'] = 'version'
+
+    set_actions = ["#updversion = :updversion"]
+    remove_actions = []
+    expression_attribute_values = {
+        ":updversion": data_obj.version + 1,
+    }
+    for attr_idx, attr_name in enumerate(attr_names):
+        if data.get(attr_name, None) is None:
+            remove_actions.append(f"#upd{attr_idx}")
+            continue
+        set_actions.append(f"#upd{attr_idx} = :upd{attr_idx}")
+        expression_attribute_values[f":upd{attr_idx}"] = data[attr_name]
+
+    update_expression = f"SET {', '.join(set_actions)}"
+    if len(remove_actions) > 0:
+        update_expression += f" REMOVE {', '.join(remove_actions)}"
+
+    return {
+        "Key": data_obj._dyntastic_key_dict,
+        "UpdateExpression": update_expression,
+        "ExpressionAttributeNames": expression_attribute_names,
+        "ExpressionAttributeValues": expression_attribute_values,
+        "ConditionExpression": get_version_condition(data_obj),
+    }
+
+
+def update_attributes(data_obj: DataObjType, attr_names: List[str]) -> DataObjType:
+    """
+    Write only the changed attributes of the data object (and the next version),
+    on the condition that the item is still at the version of the data object
+    :param data_obj: A Dyntastic data object with a version, i.e FastqData
+    :param attr_names: The names of the changed attributes
+    :raises ClientError: ConditionalCheckFailedException on a version conflict
+    :return: The updated data object
+    """
+    data_cls = type(data_obj)
+    update_kwargs = get_update_kwargs(data_obj, attr_names)
+
+    transaction_writer = current_transaction_writer()
+    if transaction_writer is not None:
+        # Committed along with the rest of the transaction, which cannot return the updated item
+        with next_version(data_obj):
+            transaction_writer.add(data_cls, data_cls._construct_transact_item("update_item", update_kwargs))
+        return data_obj
+
+    response = data_cls._dynamodb_table().update_item(
+        **update_kwargs,
+        ReturnValues="ALL_NEW",
+    )
+    updated_data_obj = data_cls._dyntastic_load_model(response['Attributes'])
+    add_to_identity_map(updated_data_obj)
+    return updated_data_obj
+
+
+def is_version_conflict(error: ClientError) -> bool:
+    error_code = error.response.get('Error', {}).get('Code')
+    if error_code == 'ConditionalCheckFailedException':
+        return True
+    if error_code == 'TransactionCanceledException':
+        return any(map(
+            lambda reason_iter_: reason_iter_.get('Code') == 'ConditionalCheckFailed',
+            error.response.get('CancellationReasons', [])
+        ))
+    return False
+
+
+def update_with_retry(
+        data_cls: Type[DataObjType],
+        hash_key: str,
+        apply_update: Callable[[DataObjType], List[str]],
+        after_update: Optional[Callable[[DataObjType], ResultType]] = None,
+        data_obj: Optional[DataObjType] = None,
+) -> ResultType:
+    """
+    Apply an update to the latest version of an item, retrying on a version conflict.
+    The update, and anything the after update puts (i.e events), are committed together within an outbox transaction.
+    :param data_cls: i.e FastqData
+    :param hash_key: The id of the item
+    :param apply_update: Changes the data object in memory, and returns the names of the attributes changed,
+        called again with the latest item on every retry (so may raise, i.e a 409 if the change no longer applies),
+        nothing is written if no attributes are changed
+    :param after_update: Called with the updated data object, i.e to put the update event, defaults to the data object
+    :param data_obj: The item, if already read (used on the first attempt only)
+    :raises DoesNotExist:
+    :raises VersionConflictError:
+    :return: The result of the after update
+    """
+    if after_update is None:
+        after_update = lambda data_obj_iter_: data_obj_iter_
+
+    for attempt in range(DYNAMODB_VERSIONED_UPDATE_MAX_ATTEMPTS):
+        if attempt > 0:
+            # Exponential backoff on conflicts
+            sleep(0.05 * (2 ** attempt))
+        if data_obj is None:
+            data_obj = data_cls.get(hash_key, consistent_read=True)
+
+        attr_names = apply_update(data_obj)
+        if len(attr_names) == 0:
+            return after_update(data_obj)
+
+        try:
+            with outbox_transaction():
+                return after_update(update_attributes(data_obj, attr_names))
+        except ClientError as e:
+            if not is_version_conflict(e):
+                raise
+            increment_request_metric("updates.versionConflict")
+            logger.info(f"Version conflict on {data_cls.__name__} '{hash_key}', attempt {attempt + 1}")
+            data_obj = None
+
+    raise VersionConflictError(
+        f"Could not update {data_cls.__name__} '{hash_key}', "
+        f"it was changed by another writer on each of {DYNAMODB_VERSIONED_UPDATE_MAX_ATTEMPTS} attempts"
+    )
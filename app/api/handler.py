@@ -1,8 +1,23 @@
-from fastapi import FastAPI
+import logging
+
+from fastapi import FastAPI, Request
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 from fastapi.routing import APIRouter
 from mangum import Mangum
+
+# Register the call counter before any boto3 clients are created
+from fastq_manager_api_tools.metrics import (
+    register_boto_call_counter, start_request_metrics, request_metrics_to_str, increment_request_metric
+)
+register_boto_call_counter()
+
+from fastq_manager_api_tools.globals import REQUEST_METRICS_HEADER
+from fastq_manager_api_tools.cache import (
+    S3_CACHE_METRIC_PREFIX, get_cache_stats, cache_stats_to_str, start_request_s3_objs
+)
+from fastq_manager_api_tools.events.events import start_request_event_buffer, flush_request_event_buffer
+from fastq_manager_api_tools.identity_map import start_request_identity_map
 from fastq_manager_api_tools.api.v1.routers import fastq
 from fastq_manager_api_tools.api.v1.routers import fastq_set
 from fastq_manager_api_tools.api.v1.routers import rgid
@@ -22,6 +37,38 @@ router.include_router(multiqc.router, prefix="/multiqc")
 
 app.include_router(router)
 
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@app.middleware("http")
+async def add_request_metrics(request: Request, call_next):
+    # Count the remote calls made over the course of this request
+    request_metrics = start_request_metrics()
+    # Pin the s3 details resolved over the course of this request
+    start_request_s3_objs()
+    # Read each fastq and fastq set at most once over the course of this request
+    start_request_identity_map()
+    # Buffer the events put over the course of this request
+    start_request_event_buffer()
+    # The events of a request that raises are dropped
+    response = await call_next(request)
+    # Send the buffered events, in as few PutEvents calls as we can
+    # The writes they describe are already committed, so a failure to send them is logged, rather than a 500
+    try:
+        flush_request_event_buffer()
+    except Exception:
+        increment_request_metric("events.flushFailed")
+        logger.exception(f"{request.method} {request.url.path} failed to send its events")
+    request_metrics_str = request_metrics_to_str(request_metrics)
+    logger.info(f"{request.method} {request.url.path} {request_metrics_str}")
+    # Report the lifetime s3 cache stats whenever the cache is used, so we can size it
+    if any(map(lambda metric_name_iter_: metric_name_iter_.startswith(S3_CACHE_METRIC_PREFIX), request_metrics.keys())):
+        logger.info(f"S3 cache {cache_stats_to_str(get_cache_stats())}")
+    response.headers[REQUEST_METRICS_HEADER] = request_metrics_str
+    return response
+
+
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+"""
+Configuration for the model benchmarks
+
+The benchmarks run fully offline (the s3 cache is pre-populated, and the database / file manager
+lookups are patched out), and are only collected when running with --benchmark-only.
+
+The baseline is a run saved by pytest-benchmark (under .benchmarks/), i.e (from app/api)
+
+    # Record (or re-record) the baseline
+    python -m pytest tests/benchmarks --benchmark-only --benchmark-autosave
+
+    # Compare against the last saved run, reporting the change of each benchmark,
+    # and failing on any regression of the mean over 10%
+    python -m pytest tests/benchmarks --benchmark-only --benchmark-compare --benchmark-compare-fail=mean:10%
+
+Since timings are machine dependent, record the baseline on the same machine you compare on.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+# Use the local event bus so that to_dict reads s3 details from the cache only
+os.environ["EVENT_BUS_NAME"] = "local"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+# Hold every synthetic ingest id in the s3 cache (10,000 rows of the full profile)
+os.environ["S3_CACHE_MAX_ENTRIES"] = "1000000"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[4] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+
+# Add app/api (fastq_manager_api_tools) and this directory (synthetic) to sys.path
+for _path in [Path(__file__).resolve().parents[2], Path(__file__).resolve().parent]:
+    if str(_path) not in sys.path:
+        sys.path.insert(0, str(_path))
+
+import pytest
+
+
+def pytest_collection_modifyitems(config, items):
+    # Only run the benchmarks when explicitly asked to
+    if config.getoption("benchmark_only", default=False):
+        return
+    skip_benchmark = pytest.mark.skip(reason="model benchmarks only run with --benchmark-only")
+    for item in items:
+        if Path(str(item.fspath)).resolve().parent == Path(__file__).resolve().parent:
+            item.add_marker(skip_benchmark)
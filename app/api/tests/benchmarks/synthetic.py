@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+"""
+Deterministic synthetic data for the model benchmarks.
+
+Objects are built from a seeded random generator so every run (and the stored baseline)
+serializes exactly the same data.
+
+Profiles:
+  * minimal: a read set only
+  * full: a read set, qc (with sequali reports) and ntsm
+"""
+
+# Standard imports
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Literal, Optional, Tuple, Any
+from uuid import UUID
+
+# Local imports
+from fastq_manager_api_tools.cache import update_cache
+from fastq_manager_api_tools.models.fastq import FastqData
+from fastq_manager_api_tools.models.fastq_set import FastqSetData
+from fastq_manager_api_tools.utils import to_camel
+
+ProfileType = Literal['minimal', 'full']
+
+PROFILES: List[ProfileType] = ['minimal', 'full']
+
+ULID_CHARS = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def random_ulid(rng: random.Random) -> str:
+    return "".join(rng.choices(ULID_CHARS, k=26))
+
+
+def random_ingest_id(rng: random.Random) -> str:
+    return str(UUID(int=rng.getrandbits(128), version=4))
+
+
+def random_decimal(rng: random.Random) -> Decimal:
+    return Decimal(str(round(rng.uniform(0, 100), 4)))
+
+
+def random_index(rng: random.Random) -> str:
+    return "".join(rng.choices("ACGT", k=8)) + "+" + "".join(rng.choices("ACGT", k=8))
+
+
+def make_library(rng: random.Random) -> Dict[str, str]:
+    return {
+        "orcabus_id": f"lib.{random_ulid(rng)}",
+        "library_id": f"L{rng.randint(2000000, 2599999)}",
+    }
+
+
+def make_fastq_dict(
+        rng: random.Random,
+        profile: ProfileType,
+        library: Optional[Dict[str, str]] = None,
+        fastq_set_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    A fastq as stored in the database (snake case)
+    """
+    fastq_dict = {
+        "id": f"fqr.{random_ulid(rng)}",
+        "fastq_set_id": fastq_set_id,
+        "index": random_index(rng),
+        "lane": rng.randint(1, 8),
+        "instrument_run_id": f"2501{rng.randint(10, 99)}_A01052_{rng.randint(1000, 9999)}_{random_ulid(rng)[:10]}",
+        "library": library if library is not None else make_library(rng),
+        "platform": "Illumina",
+        "center": "UMCCR",
+        "date": datetime(2025, 1, 1) + timedelta(days=rng.randint(0, 365)),
+        "read_set": {
+            "r1": {
+                "ingest_id": random_ingest_id(rng),
+                "gzip_compression_size_in_bytes": rng.randint(10 ** 9, 10 ** 11),
+                "raw_md5sum": "%032x" % rng.getrandbits(128),
+            },
+            "r2": {
+                "ingest_id": random_ingest_id(rng),
+                "gzip_compression_size_in_bytes": rng.randint(10 ** 9, 10 ** 11),
+                "raw_md5sum": "%032x" % rng.getrandbits(128),
+            },
+            "compression_format": "ORA",
+        },
+        "read_count": rng.randint(10 ** 8, 10 ** 9),
+        "base_count_est": rng.randint(10 ** 10, 10 ** 11),
+        "is_valid": True,
+    }
+
+    if profile == 'full':
+        fastq_dict["qc"] = {
+            "insert_size_estimate": random_decimal(rng),
+            "raw_wgs_coverage_estimate": random_decimal(rng),
+            "r1_q20_fraction": random_decimal(rng),
+            "r2_q20_fraction": random_decimal(rng),
+            "r1_gc_fraction": random_decimal(rng),
+            "r2_gc_fraction": random_decimal(rng),
+            "duplication_fraction_estimate": random_decimal(rng),
+            "sequali_reports": {
+                "sequali_html": {"ingest_id": random_ingest_id(rng)},
+                "sequali_parquet": {"ingest_id": random_ingest_id(rng)},
+                "multiqc_html": {"ingest_id": random_ingest_id(rng)},
+                "multiqc_parquet": {"ingest_id": random_ingest_id(rng)},
+            },
+        }
+        fastq_dict["ntsm"] = {"ingest_id": random_ingest_id(rng)}
+
+    return fastq_dict
+
+
+def to_create_payload(fastq_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A fastq as posted to the create endpoint (camel case, json types)
+    """
+    def _to_camel_dict(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {to_camel(k): _to_camel_dict(v) for k, v in value.items()}
+        if isinstance(value, Decimal):
+            return float(value)
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    return _to_camel_dict(dict(filter(
+        lambda kv: kv[0] not in ['id', 'fastq_set_id'],
+        fastq_dict.items()
+    )))
+
+
+def make_fastq_list(num_rows: int, profile: ProfileType, seed: int = 0) -> List[FastqData]:
+    rng = random.Random(seed)
+    return list(map(
+        lambda _: FastqData(**make_fastq_dict(rng, profile)),
+        range(num_rows)
+    ))
+
+
+def make_fastq_create_payloads(num_rows: int, profile: ProfileType, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return list(map(
+        lambda _: to_create_payload(make_fastq_dict(rng, profile)),
+        range(num_rows)
+    ))
+
+
+def make_fastq_set_list(
+        num_rows: int,
+        profile: ProfileType,
+        fastqs_per_set: int = 2,
+        seed: int = 0
+) -> Tuple[List[FastqSetData], Dict[str, FastqData]]:
+    """
+    Fastq sets, and the map of their member fastqs
+    """
+    rng = random.Random(seed)
+    fastq_set_list = []
+    fastq_data_map = {}
+    for _ in range(num_rows):
+        library = make_library(rng)
+        fastq_set_id = f"fqs.{random_ulid(rng)}"
+        fastq_list = list(map(
+            lambda _: FastqData(**make_fastq_dict(rng, profile, library=library, fastq_set_id=fastq_set_id)),
+            range(fastqs_per_set)
+        ))
+        fastq_data_map.update(map(lambda fastq_iter_: (fastq_iter_.id, fastq_iter_), fastq_list))
+        fastq_set_list.append(FastqSetData(**{
+            "id": fastq_set_id,
+            "library": library,
+            "fastq_set_ids": list(map(lambda fastq_iter_: fastq_iter_.id, fastq_list)),
+            "allow_additional_fastq": False,
+            "is_current_fastq_set": True,
+            "somalier": {"ingest_id": random_ingest_id(rng)} if profile == 'full' else None,
+        }))
+    return fastq_set_list, fastq_data_map
+
+
+def get_ingest_ids(fastq_obj: FastqData) -> List[str]:
+    ingest_ids = [fastq_obj.read_set.r1.ingest_id, fastq_obj.read_set.r2.ingest_id]
+    if fastq_obj.ntsm is not None:
+        ingest_ids.append(fastq_obj.ntsm.ingest_id)
+    if fastq_obj.qc is not None and fastq_obj.qc.sequali_reports is not None:
+        ingest_ids.extend([
+            fastq_obj.qc.sequali_reports.sequali_html.ingest_id,
+            fastq_obj.qc.sequali_reports.sequali_parquet.ingest_id,
+            fastq_obj.qc.sequali_reports.multiqc_html.ingest_id,
+            fastq_obj.qc.sequali_reports.multiqc_parquet.ingest_id,
+        ])
+    return ingest_ids
+
+
+def populate_s3_cache(ingest_ids: List[str]):
+    """
+    Pre-populate the s3 cache so that s3 details never require a call to the file manager
+    """
+    for ingest_id in ingest_ids:
+        update_cache(ingest_id, {
+            "bucket": "benchmark-bucket",
+            "key": f"primary/{ingest_id}.fastq.ora",
+            "storageClass": "Standard",
+            "sha256": "0" * 64,
+        })
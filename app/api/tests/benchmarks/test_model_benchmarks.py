@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+"""
+Serialization and validation benchmarks for the models package
+
+Each benchmark is run at 1, 100 and 10,000 rows, for the minimal (read set only)
+and full (qc, sequali reports and ntsm) profiles, with and without s3 details.
+
+FastqData.to_dict (the single pass serializer) is benchmarked alongside FastqResponse.model_dump,
+the multi-hop response model serialization it replaces.
+
+See conftest.py for running the benchmarks and comparing against the stored baseline.
+"""
+
+# Standard imports
+import random
+from functools import lru_cache
+from itertools import chain
+
+import pytest
+
+# Local imports
+from fastq_manager_api_tools import resolver
+from fastq_manager_api_tools.models import fastq as fastq_models
+from fastq_manager_api_tools.models.fastq import FastqData, FastqCreate, FastqListResponse, FastqResponse
+from fastq_manager_api_tools.models.fastq_set import FastqSetData, FastqSetListResponse
+from fastq_manager_api_tools.models.serializers import (
+    FASTQ_PAIR_RESPONSE_ALIASES, FASTQ_STORAGE_OBJECT_RESPONSE_ALIASES,
+    QC_RESPONSE_ALIASES, SEQUALI_RESPONSE_ALIASES, LIBRARY_RESPONSE_ALIASES
+)
+from fastq_manager_api_tools.utils import to_camel, to_snake
+
+from synthetic import (
+    PROFILES, make_fastq_dict, make_fastq_list, make_fastq_set_list, make_fastq_create_payloads,
+    get_ingest_ids, populate_s3_cache
+)
+
+ROW_COUNTS = [1, 100, 10_000]
+
+# Every key we convert when serializing a full fastq
+SNAKE_CASE_KEYS = list(dict.fromkeys(chain(
+    fastq_models.FASTQ_RESPONSE_ALIASES.keys(),
+    FASTQ_PAIR_RESPONSE_ALIASES.keys(),
+    FASTQ_STORAGE_OBJECT_RESPONSE_ALIASES.keys(),
+    QC_RESPONSE_ALIASES.keys(),
+    SEQUALI_RESPONSE_ALIASES.keys(),
+    LIBRARY_RESPONSE_ALIASES.keys(),
+)))
+CAMEL_CASE_KEYS = list(map(to_camel, SNAKE_CASE_KEYS))
+
+
+@lru_cache(maxsize=None)
+def get_fastq_list(num_rows: int, profile: str):
+    fastq_list = make_fastq_list(num_rows, profile)
+    populate_s3_cache(list(chain.from_iterable(map(get_ingest_ids, fastq_list))))
+    return fastq_list
+
+
+@lru_cache(maxsize=None)
+def get_fastq_set_list(num_rows: int, profile: str):
+    fastq_set_list, fastq_data_map = make_fastq_set_list(num_rows, profile)
+    populate_s3_cache(
+        list(chain.from_iterable(map(get_ingest_ids, fastq_data_map.values()))) +
+        list(map(
+            lambda fastq_set_iter_: fastq_set_iter_.somalier.ingest_id,
+            filter(lambda fastq_set_iter_: fastq_set_iter_.somalier is not None, fastq_set_list)
+        ))
+    )
+    return fastq_set_list, fastq_data_map
+
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+    # Everything is in the s3 cache, never call the file manager
+    monkeypatch.setattr(resolver, "get_s3_objs_from_ingest_ids_map", lambda ingest_ids: [])
+
+
+@pytest.mark.benchmark(group="FastqData.to_dict")
+@pytest.mark.parametrize("include_s3_details", [False, True])
+@pytest.mark.parametrize("profile", PROFILES)
+@pytest.mark.parametrize("num_rows", ROW_COUNTS)
+def test_fastq_to_dict(benchmark, num_rows, profile, include_s3_details):
+    fastq_list = get_fastq_list(num_rows, profile)
+
+    result = benchmark(lambda: list(map(
+        lambda fastq_iter_: fastq_iter_.to_dict(include_s3_details=include_s3_details),
+        fastq_list
+    )))
+
+    assert len(result) == num_rows
+
+
+@pytest.mark.benchmark(group="FastqResponse.model_dump")
+@pytest.mark.parametrize("include_s3_details", [False, True])
+@pytest.mark.parametrize("profile", PROFILES)
+@pytest.mark.parametrize("num_rows", ROW_COUNTS)
+def test_fastq_response_model_dump(benchmark, num_rows, profile, include_s3_details):
+    fastq_list = get_fastq_list(num_rows, profile)
+
+    result = benchmark(lambda: list(map(
+        lambda fastq_iter_: FastqResponse(
+            **fastq_iter_.model_dump(exclude={"rgid_ext", "library_orcabus_id"})
+        ).model_dump(include_s3_details=include_s3_details, by_alias=True),
+        fastq_list
+    )))
+
+    assert len(result) == num_rows
+
+
+@pytest.mark.benchmark(group="FastqListResponse.model_dump")
+@pytest.mark.parametrize("include_s3_details", [False, True])
+@pytest.mark.parametrize("profile", PROFILES)
+@pytest.mark.parametrize("num_rows", ROW_COUNTS)
+def test_fastq_list_response_model_dump(benchmark, num_rows, profile, include_s3_details):
+    fastq_list = get_fastq_list(num_rows, profile)
+
+    result = benchmark(lambda: FastqListResponse(
+        fastq_list=fastq_list,
+        include_s3_details=include_s3_details
+    ).model_dump(by_alias=True))
+
+    assert len(result) == num_rows
+
+
+@pytest.mark.benchmark(group="FastqSetListResponse.model_dump")
+@pytest.mark.parametrize("include_s3_details", [False, True])
+@pytest.mark.parametrize("profile", PROFILES)
+@pytest.mark.parametrize("num_rows", ROW_COUNTS)
+def test_fastq_set_list_response_model_dump(benchmark, monkeypatch, num_rows, profile, include_s3_details):
+    fastq_set_list, fastq_data_map = get_fastq_set_list(num_rows, profile)
+    # The member fastqs are already loaded, never read from the database
+    monkeypatch.setattr(FastqSetData, "get_fastq_data_map", staticmethod(lambda fastq_set_list_: fastq_data_map))
+
+    result = benchmark(lambda: FastqSetListResponse(
+        fastq_set_list=fastq_set_list,
+        include_s3_details=include_s3_details
+    ).model_dump(by_alias=True))
+
+    assert len(result) == num_rows
+
+
+@pytest.mark.benchmark(group="to_camel")
+@pytest.mark.parametrize("num_rows", ROW_COUNTS)
+def test_to_camel(benchmark, num_rows):
+    # One conversion per key per row
+    result = benchmark(lambda: list(map(
+        to_camel,
+        SNAKE_CASE_KEYS * num_rows
+    )))
+
+    assert result[:len(SNAKE_CASE_KEYS)] == CAMEL_CASE_KEYS
+
+
+@pytest.mark.benchmark(group="to_snake")
+@pytest.mark.parametrize("num_rows", ROW_COUNTS)
+def test_to_snake(benchmark, num_rows):
+    result = benchmark(lambda: list(map(
+        to_snake,
+        CAMEL_CASE_KEYS * num_rows
+    )))
+
+    assert result[:len(CAMEL_CASE_KEYS)] == SNAKE_CASE_KEYS
+
+
+@pytest.mark.benchmark(group="FastqData validation")
+@pytest.mark.parametrize("profile", PROFILES)
+@pytest.mark.parametrize("num_rows", ROW_COUNTS)
+def test_fastq_data_validation(benchmark, num_rows, profile):
+    # Loading fastqs from database items
+    rng = random.Random(0)
+    fastq_items = list(map(lambda _: make_fastq_dict(rng, profile), range(num_rows)))
+
+    result = benchmark(lambda: list(map(
+        lambda fastq_item_iter_: FastqData(**fastq_item_iter_),
+        fastq_items
+    )))
+
+    assert len(result) == num_rows
+
+
+@pytest.mark.benchmark(group="FastqCreate validation")
+@pytest.mark.parametrize("profile", PROFILES)
+@pytest.mark.parametrize("num_rows", ROW_COUNTS)
+def test_fastq_create_validation(benchmark, num_rows, profile):
+    # The create path, the camel case payload is validated as a FastqCreate then converted to a FastqData
+    payloads = make_fastq_create_payloads(num_rows, profile)
+
+    result = benchmark(lambda: list(map(
+        lambda payload_iter_: FastqData(**dict(FastqCreate(**payload_iter_).model_dump(by_alias=True))),
+        payloads
+    )))
+
+    assert len(result) == num_rows
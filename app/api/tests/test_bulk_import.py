@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the bulk fastq import, parsing a fastq_list.csv, duplicate detection, and grouping into fastq sets.
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+import pytest
+from hypothesis import given
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools import bulk_import
+from fastq_manager_api_tools.bulk_import import FastqBulkImportError
+from fastq_manager_api_tools.models.fastq import FastqData
+from fastq_manager_api_tools.models.fastq_set import FastqSetData
+
+INSTRUMENT_RUN_ID = "241024_A00130_0336_BHW7MVDSXC"
+
+index_strategy = st.text(alphabet="ACGT", min_size=6, max_size=10)
+library_a = {"orcabus_id": f"lib.{'A' * 26}", "library_id": "L2400001"}
+library_b = {"orcabus_id": f"lib.{'B' * 26}", "library_id": "L2400002"}
+
+
+def get_fastq_obj(index: str, lane: int = 1, library=None) -> FastqData:
+    return FastqData(**{
+        "index": index,
+        "lane": lane,
+        "instrument_run_id": INSTRUMENT_RUN_ID,
+        "library": library if library is not None else library_a,
+    })
+
+
+class TestFastqListCsv:
+    @given(
+        index=index_strategy,
+        index2=index_strategy,
+        lane=st.integers(min_value=1, max_value=8),
+        rgid_with_instrument_run_id=st.booleans(),
+    )
+    def test_rgid_forms(self, index, index2, lane, rgid_with_instrument_run_id):
+        if rgid_with_instrument_run_id:
+            rgid = f"{index}+{index2}.{lane}.{INSTRUMENT_RUN_ID}"
+        else:
+            rgid = f"{index}.{index2}.{lane}"
+        fastq_list_csv_str = (
+            "RGID,RGSM,RGLB,Lane,Read1File,Read2File\n"
+            f"{rgid},L2400001,L2400001,{lane},s3://bucket/R1.fastq.gz,s3://bucket/R2.fastq.gz\n"
+        )
+
+        fastq_create_dicts = bulk_import.fastq_list_csv_to_fastq_create_dicts(fastq_list_csv_str, INSTRUMENT_RUN_ID)
+
+        assert fastq_create_dicts == [{
+            "index": f"{index}+{index2}",
+            "lane": lane,
+            "instrumentRunId": INSTRUMENT_RUN_ID,
+            "library": {"libraryId": "L2400001"},
+            "readSet": {
+                "r1": {"s3Uri": "s3://bucket/R1.fastq.gz"},
+                "r2": {"s3Uri": "s3://bucket/R2.fastq.gz"},
+            },
+        }]
+
+    def test_single_read(self):
+        fastq_create_dicts = bulk_import.fastq_list_csv_to_fastq_create_dicts(
+            "RGID,RGSM,RGLB,Lane,Read1File,Read2File\n"
+            "ACGTACGT.1,L2400001,L2400001,1,s3://bucket/R1.fastq.gz,\n",
+            INSTRUMENT_RUN_ID
+        )
+        assert fastq_create_dicts[0]["readSet"] == {"r1": {"s3Uri": "s3://bucket/R1.fastq.gz"}}
+
+    def test_read_files_must_be_s3_uris(self):
+        with pytest.raises(ValueError):
+            bulk_import.fastq_list_csv_to_fastq_create_dicts(
+                "RGID,RGSM,RGLB,Lane,Read1File,Read2File\n"
+                "ACGTACGT.1,L2400001,L2400001,1,R1.fastq.gz,R2.fastq.gz\n",
+                INSTRUMENT_RUN_ID
+            )
+
+
+class TestDuplicates:
+    @given(indexes=st.lists(index_strategy, min_size=2, max_size=50, unique=True), data=st.data())
+    def test_existing_fastqs(self, indexes, data):
+        fastq_data_objs = list(map(get_fastq_obj, indexes))
+        existing_fastq_objs = data.draw(st.lists(
+            st.sampled_from(fastq_data_objs), max_size=len(indexes), unique_by=lambda fastq_obj_iter_: fastq_obj_iter_.id
+        ))
+        existing_rgid_ext_map = dict(map(
+            lambda fastq_obj_iter_: (fastq_obj_iter_.rgid_ext, fastq_obj_iter_.id),
+            existing_fastq_objs
+        ))
+
+        with mock.patch.object(bulk_import, "get_existing_rgid_ext_map", return_value=existing_rgid_ext_map):
+            new_fastq_objs, skipped_rgid_exts = bulk_import.filter_existing_fastqs(fastq_data_objs, skip_existing=True)
+
+            if len(existing_fastq_objs) > 0:
+                with pytest.raises(FastqBulkImportError):
+                    bulk_import.filter_existing_fastqs(fastq_data_objs)
+
+        assert set(skipped_rgid_exts) == set(existing_rgid_ext_map.keys())
+        assert list(map(lambda fastq_obj_iter_: fastq_obj_iter_.id, new_fastq_objs)) == list(map(
+            lambda fastq_obj_iter_: fastq_obj_iter_.id,
+            filter(lambda fastq_obj_iter_: fastq_obj_iter_.rgid_ext not in existing_rgid_ext_map, fastq_data_objs)
+        ))
+
+    def test_duplicates_within_the_import(self):
+        with (
+            mock.patch.object(bulk_import, "get_existing_rgid_ext_map", return_value={}),
+            pytest.raises(FastqBulkImportError, match="listed more than once"),
+        ):
+            bulk_import.filter_existing_fastqs(
+                [get_fastq_obj("ACGTACGT"), get_fastq_obj("ACGTACGT")],
+                skip_existing=True
+            )
+
+
+class TestFastqSets:
+    def test_link_or_create(self):
+        linked_fastq_set_obj = FastqSetData(**{
+            "library": library_b,
+            "allow_additional_fastq": True,
+            "is_current_fastq_set": True,
+            "fastq_set_ids": [f"fqr.{'0' * 26}"],
+        })
+        library_fastq_set_items = [
+            {
+                "id": linked_fastq_set_obj.id, "library_orcabus_id": library_b['orcabus_id'],
+                "is_current_fastq_set": True, "allow_additional_fastq": True,
+            },
+        ]
+        fastq_data_objs = [
+            get_fastq_obj("ACGTACGT", library=library_a),
+            get_fastq_obj("ACGTACGT", lane=2, library=library_a),
+            get_fastq_obj("TTTTCCCC", library=library_b),
+        ]
+
+        with (
+            mock.patch.object(bulk_import, "query_index_items", return_value=library_fastq_set_items),
+            mock.patch.object(
+                bulk_import, "batch_get_data_map",
+                lambda data_cls, ids: {linked_fastq_set_obj.id: linked_fastq_set_obj} if list(ids) else {}
+            ),
+        ):
+            new_fastq_set_objs, linked_fastq_set_objs = bulk_import.group_into_fastq_sets(fastq_data_objs)
+
+        # Library A has no fastq sets, so gets a new (current) fastq set
+        assert len(new_fastq_set_objs) == 1
+        assert new_fastq_set_objs[0].is_current_fastq_set
+        assert new_fastq_set_objs[0].fastq_set_ids == [fastq_data_objs[0].id, fastq_data_objs[1].id]
+        assert fastq_data_objs[0].fastq_set_id == new_fastq_set_objs[0].id
+
+        # Library B accepts additional fastqs, so the new fastq is linked
+        assert linked_fastq_set_objs == [linked_fastq_set_obj]
+        assert linked_fastq_set_obj.fastq_set_ids == [f"fqr.{'0' * 26}", fastq_data_objs[2].id]
+        assert fastq_data_objs[2].fastq_set_id == linked_fastq_set_obj.id
+
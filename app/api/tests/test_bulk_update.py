@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the bulk fastq update, per entry results, and a single write per updated fastq.
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+from botocore.exceptions import ClientError
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools import bulk_update, versioned_update
+from fastq_manager_api_tools.models.bulk_update import FastqBulkUpdateEntry
+from fastq_manager_api_tools.models.fastq import FastqData
+
+ulid_strategy = st.from_regex(r"[0-9A-Z]{26}", fullmatch=True)
+library = {"orcabus_id": f"lib.{'A' * 26}", "library_id": "L2400001"}
+read_set = {"r1": {"ingest_id": "r1-ingest-id"}, "r2": {"ingest_id": "r2-ingest-id"}}
+
+
+def get_fastq_item(fastq_id: str, **kwargs):
+    return FastqData(**{
+        "id": fastq_id,
+        "index": "ACGTACGT",
+        "lane": 1,
+        "instrument_run_id": "241024_A00130_0336_BHW7MVDSXC",
+        "library": library,
+        **kwargs
+    }).model_dump()
+
+
+def run_bulk_update(entry_dicts, items):
+    updated_attr_names_list = []
+
+    def update_attributes(data_obj, attr_names):
+        updated_attr_names_list.append((data_obj.id, attr_names))
+        data_obj.version += 1
+        return data_obj
+
+    with (
+        mock.patch.dict(os.environ, {"EVENT_OUTBOX_ENABLED": "false"}),
+        mock.patch.object(bulk_update, "batch_get_items", return_value=items),
+        mock.patch.object(bulk_update, "put_fastq_update_event") as put_event_mock,
+        mock.patch.object(versioned_update, "update_attributes", update_attributes),
+    ):
+        response = bulk_update.bulk_update_fastqs(entry_dicts)
+    return response, put_event_mock, updated_attr_names_list
+
+
+class TestEntry:
+    def test_requires_an_update(self):
+        result = bulk_update.validate_entry(0, {"fastqId": f"fqr.{'0' * 26}"})
+        assert result["status"] == "INVALID"
+
+    def test_fastq_id_prefix_is_optional(self):
+        entry = bulk_update.validate_entry(0, {"fastqId": "0" * 26, "isValid": True})
+        assert isinstance(entry, FastqBulkUpdateEntry)
+        assert entry.fastq_id == f"fqr.{'0' * 26}"
+
+    def test_compression_without_read_set_conflicts(self):
+        fastq_obj = FastqData(**get_fastq_item(f"fqr.{'0' * 26}"))
+        entry = FastqBulkUpdateEntry.model_validate({
+            "fastqId": fastq_obj.id,
+            "readCount": {"readCount": 10, "baseCountEst": 1500},
+            "fileCompressionInformation": {"compressionFormat": "ORA", "r1GzipCompressionSizeInBytes": 100},
+        })
+        try:
+            bulk_update.apply_entry(fastq_obj, entry)
+            assert False, "Expected a conflict"
+        except bulk_update.FastqBulkUpdateConflictError:
+            pass
+        # Nothing is applied
+        assert fastq_obj.read_count is None
+
+
+class TestBulkUpdate:
+    @given(
+        fastq_ulids=st.lists(ulid_strategy, min_size=1, max_size=30, unique=True),
+        read_counts=st.lists(st.integers(min_value=0, max_value=10 ** 9), min_size=30, max_size=30),
+    )
+    @settings(max_examples=25)
+    def test_one_write_per_fastq(self, fastq_ulids, read_counts):
+        fastq_ids = list(map(lambda ulid_iter_: f"fqr.{ulid_iter_}", fastq_ulids))
+        # Two entries for each fastq
+        entry_dicts = [
+            *map(
+                lambda fastq_pair_iter_: {
+                    "fastqId": fastq_pair_iter_[0],
+                    "readCount": {"readCount": fastq_pair_iter_[1], "baseCountEst": fastq_pair_iter_[1] * 150},
+                },
+                zip(fastq_ids, read_counts)
+            ),
+            *map(lambda fastq_id_iter_: {"fastqId": fastq_id_iter_, "isValid": True}, fastq_ids),
+        ]
+
+        response, put_event_mock, updated_attr_names_list = run_bulk_update(
+            entry_dicts,
+            list(map(get_fastq_item, fastq_ids))
+        )
+
+        assert response["updatedCount"] == len(entry_dicts)
+        assert response["failedCount"] == 0
+        assert list(map(lambda result_iter_: result_iter_["entryIndex"], response["results"])) == list(range(len(entry_dicts)))
+
+        # Each fastq is written once, only the changed attributes, with both updates applied
+        assert sorted(updated_attr_names_list) == sorted(map(
+            lambda fastq_id_iter_: (fastq_id_iter_, ["read_count", "base_count_est", "is_valid"]),
+            fastq_ids
+        ))
+        read_count_map = dict(zip(fastq_ids, read_counts))
+        for result in response["results"]:
+            assert result["fastq"]["readCount"] == read_count_map[result["fastqId"]]
+            assert result["fastq"]["isValid"] is True
+
+        # One event per update, the events of each fastq are put in the order of its entries
+        for fastq_id in fastq_ids:
+            assert list(map(
+                lambda call_iter_: call_iter_.kwargs["event_status"],
+                filter(lambda call_iter_: call_iter_.kwargs["fastq_obj"].id == fastq_id, put_event_mock.call_args_list)
+            )) == ["READ_COUNT_UPDATED", "FASTQ_IS_VALID"]
+
+    def test_per_entry_results(self):
+        fastq_in_set_id = f"fqr.{'1' * 26}"
+        missing_fastq_id = f"fqr.{'2' * 26}"
+        fastq_id = f"fqr.{'3' * 26}"
+
+        response, put_event_mock, _ = run_bulk_update(
+            [
+                {"fastqId": fastq_in_set_id, "isValid": False},
+                {"fastqId": missing_fastq_id, "isValid": True},
+                {"fastqId": fastq_id},
+                {"fastqId": fastq_id, "readCount": {"readCount": 10, "baseCountEst": 1500}},
+            ],
+            [
+                get_fastq_item(fastq_in_set_id, fastq_set_id=f"fqs.{'1' * 26}", read_set=read_set),
+                get_fastq_item(fastq_id, read_set=read_set),
+            ]
+        )
+
+        assert list(map(lambda result_iter_: result_iter_["status"], response["results"])) == [
+            "CONFLICT", "NOT_FOUND", "INVALID", "UPDATED"
+        ]
+        assert response["updatedCount"] == 1
+        assert response["failedCount"] == 3
+        assert put_event_mock.call_count == 1
+
+    def test_version_conflict(self):
+        fastq_id = f"fqr.{'3' * 26}"
+        fastq_item = get_fastq_item(fastq_id)
+        conflict_error = ClientError(
+            {"Error": {"Code": "ConditionalCheckFailedException", "Message": "The conditional request failed"}},
+            "UpdateItem"
+        )
+
+        with (
+            mock.patch.dict(os.environ, {"EVENT_OUTBOX_ENABLED": "false"}),
+            mock.patch.object(bulk_update, "batch_get_items", return_value=[fastq_item]),
+            mock.patch.object(bulk_update, "put_fastq_update_event") as put_event_mock,
+            mock.patch.object(versioned_update, "update_attributes", side_effect=conflict_error),
+            mock.patch.object(versioned_update, "sleep"),
+            mock.patch.object(FastqData, "get", side_effect=lambda *args, **kwargs: FastqData(**fastq_item)),
+        ):
+            response = bulk_update.bulk_update_fastqs([
+                {"fastqId": fastq_id, "isValid": True},
+                {"fastqId": fastq_id, "readCount": {"readCount": 10, "baseCountEst": 1500}},
+            ])
+
+        # The fastq was changed by another writer on every attempt, so nothing is applied
+        assert list(map(lambda result_iter_: result_iter_["status"], response["results"])) == ["CONFLICT", "CONFLICT"]
+        assert response["updatedCount"] == 0
+        put_event_mock.assert_not_called()
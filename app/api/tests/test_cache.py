@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+
+"""
+Property-based tests for the bounded, expiring s3 details cache.
+"""
+
+import os
+import sys
+import tempfile
+from itertools import chain
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools.cache import (
+    get_cache_max_entries, update_cache, update_cache_from_s3_objs, check_in_cache, get_from_cache, get_cache_stats,
+    clear_cache, filter_missing_ingest_ids, start_request_s3_objs
+)
+from fastq_manager_api_tools import resolver
+from fastq_manager_api_tools import shared_cache as shared_cache_module
+from fastq_manager_api_tools.shared_cache import DynamoDbSharedCache, SqliteSharedCache, get_shared_cache
+
+
+# Strategies for generating random data
+ingest_id_strategy = st.uuids().map(str)
+
+
+def file_object(ingest_id: str):
+    return {
+        "ingestId": ingest_id,
+        "bucket": "test-bucket",
+        "key": f"path/to/{ingest_id}.fastq.gz",
+        "storageClass": "Standard",
+    }
+
+
+@contextmanager
+def cache_env(**env):
+    """
+    Empty cache with the given limits (hypothesis tests cannot use the monkeypatch fixture)
+    """
+    previous_env = dict(map(lambda key_iter_: (key_iter_, os.environ.get(key_iter_)), env.keys()))
+    os.environ.update(env)
+    clear_cache()
+    get_shared_cache.cache_clear()
+    try:
+        yield
+    finally:
+        clear_cache()
+        get_shared_cache.cache_clear()
+        for key, value in previous_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+class TestBounded:
+    """
+    The cache never holds more than the maximum number of entries, the least recently used are evicted first
+    """
+
+    @given(
+        ingest_ids=st.lists(ingest_id_strategy, min_size=1, max_size=50, unique=True),
+        max_entries=st.integers(min_value=1, max_value=20),
+    )
+    @settings(max_examples=50)
+    def test_size_is_bounded(self, ingest_ids, max_entries):
+        with cache_env(S3_CACHE_MAX_ENTRIES=str(max_entries)):
+            for ingest_id in ingest_ids:
+                update_cache(ingest_id, file_object(ingest_id))
+
+            stats = get_cache_stats()
+            assert stats['size'] == min(len(ingest_ids), max_entries)
+            assert stats['eviction'] == max(len(ingest_ids) - max_entries, 0)
+            # The most recently added entries are kept
+            assert all(map(check_in_cache, ingest_ids[-max_entries:]))
+
+    def test_least_recently_used_is_evicted(self):
+        with cache_env(S3_CACHE_MAX_ENTRIES="2"):
+            update_cache("a", file_object("a"))
+            update_cache("b", file_object("b"))
+            # Touch a, so b is the least recently used
+            assert check_in_cache("a")
+            update_cache("c", file_object("c"))
+
+            assert check_in_cache("a")
+            assert not check_in_cache("b")
+            assert check_in_cache("c")
+
+
+class TestExpiry:
+    """
+    Entries expire after the ttl, negative entries after the (shorter) negative ttl
+    """
+
+    def test_stale_entries_are_evicted(self):
+        with cache_env(S3_CACHE_TTL_SECONDS="-1"):
+            update_cache("a", file_object("a"))
+
+            assert not check_in_cache("a")
+            assert get_from_cache("a") is None
+            assert get_cache_stats()['stale'] == 1
+            assert get_cache_stats()['size'] == 0
+
+    @given(
+        found_ingest_ids=st.lists(ingest_id_strategy, max_size=10, unique=True),
+        missing_ingest_ids=st.lists(ingest_id_strategy, max_size=10, unique=True),
+    )
+    @settings(max_examples=50)
+    def test_missing_ingest_ids_are_negatively_cached(self, found_ingest_ids, missing_ingest_ids):
+        missing_ingest_ids = list(filter(
+            lambda ingest_id_iter_: ingest_id_iter_ not in found_ingest_ids,
+            missing_ingest_ids
+        ))
+
+        with cache_env():
+            update_cache_from_s3_objs(
+                found_ingest_ids + missing_ingest_ids,
+                list(map(
+                    lambda ingest_id_iter_: {"ingestId": ingest_id_iter_, "fileObject": file_object(ingest_id_iter_)},
+                    found_ingest_ids
+                ))
+            )
+
+            # Neither needs to be requested again
+            assert all(map(check_in_cache, found_ingest_ids + missing_ingest_ids))
+            # But only the found ingest ids have s3 details
+            assert all(map(lambda ingest_id_iter_: get_from_cache(ingest_id_iter_) is not None, found_ingest_ids))
+            assert all(map(lambda ingest_id_iter_: get_from_cache(ingest_id_iter_) is None, missing_ingest_ids))
+
+            stats = get_cache_stats()
+            assert stats['hit'] == len(found_ingest_ids)
+            assert stats['negativeHit'] == len(missing_ingest_ids)
+
+    def test_negative_entries_use_the_negative_ttl(self):
+        with cache_env(S3_CACHE_NEGATIVE_TTL_SECONDS="-1"):
+            update_cache_from_s3_objs(["a", "b"], [{"ingestId": "a", "fileObject": file_object("a")}])
+
+            assert check_in_cache("a")
+            # The negative entry has already expired, so b is requested again
+            assert not check_in_cache("b")
+
+
+class TestStats:
+    def test_misses_are_counted(self):
+        with cache_env():
+            assert not check_in_cache("a")
+            update_cache("a", file_object("a"))
+            assert check_in_cache("a")
+
+            stats = get_cache_stats()
+            assert stats['miss'] == 1
+            assert stats['hit'] == 1
+            assert stats['maxEntries'] == get_cache_max_entries()
+
+
+class TestSharedCache:
+    """
+    Ingest ids missing from the in-memory cache are read from the shared cache before the file manager,
+    and file manager results are written through to the shared cache
+    """
+
+    @given(
+        found_ingest_ids=st.lists(ingest_id_strategy, max_size=10, unique=True),
+        missing_ingest_ids=st.lists(ingest_id_strategy, max_size=10, unique=True),
+    )
+    @settings(max_examples=20, deadline=None)
+    def test_write_through(self, found_ingest_ids, missing_ingest_ids):
+        missing_ingest_ids = list(filter(
+            lambda ingest_id_iter_: ingest_id_iter_ not in found_ingest_ids,
+            missing_ingest_ids
+        ))
+
+        with tempfile.TemporaryDirectory() as tmp_dir, cache_env(
+            S3_SHARED_CACHE_BACKEND="sqlite",
+            S3_SHARED_CACHE_SQLITE_PATH=os.path.join(tmp_dir, "s3_cache.sqlite"),
+        ):
+            # Populate from one lambda instance
+            update_cache_from_s3_objs(
+                found_ingest_ids + missing_ingest_ids,
+                list(map(
+                    lambda ingest_id_iter_: {"ingestId": ingest_id_iter_, "fileObject": file_object(ingest_id_iter_)},
+                    found_ingest_ids
+                ))
+            )
+
+            # Another lambda instance starts with an empty in-memory cache
+            clear_cache()
+
+            # Nothing needs to be requested from the file manager
+            assert filter_missing_ingest_ids(found_ingest_ids + missing_ingest_ids) == []
+            assert all(map(
+                lambda ingest_id_iter_: get_from_cache(ingest_id_iter_) == file_object(ingest_id_iter_),
+                found_ingest_ids
+            ))
+            assert all(map(lambda ingest_id_iter_: get_from_cache(ingest_id_iter_) is None, missing_ingest_ids))
+            assert get_cache_stats()['sharedHit'] == len(found_ingest_ids) + len(missing_ingest_ids)
+
+    def test_dynamodb_entries_have_an_s3_uri(self):
+        # The invalidate_s3_cache lambda finds entries to invalidate through the s3_uri index
+        dynamodb_resource_mock = mock.MagicMock()
+        batch_mock = dynamodb_resource_mock.Table.return_value.batch_writer.return_value.__enter__.return_value
+
+        with mock.patch.object(shared_cache_module, "get_dynamodb_resource", return_value=dynamodb_resource_mock):
+            DynamoDbSharedCache("test_s3_cache_table").put_many({
+                "a": (file_object("a"), 2 ** 40),
+                "b": (None, 2 ** 40),
+            })
+
+        items = dict(map(
+            lambda call_iter_: (call_iter_.kwargs['Item']['id'], call_iter_.kwargs['Item']),
+            batch_mock.put_item.call_args_list
+        ))
+        assert items["a"]["s3_uri"] == "s3://test-bucket/path/to/a.fastq.gz"
+        # Negative entries have nothing to invalidate
+        assert "s3_uri" not in items["b"]
+
+    def test_expired_entries_are_not_returned(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shared_cache = SqliteSharedCache(os.path.join(tmp_dir, "s3_cache.sqlite"))
+            shared_cache.put_many({"a": (file_object("a"), 0)})
+
+            assert shared_cache.get_many(["a"]) == {}
+
+
+class TestResolver:
+    """
+    Ingest ids missing from the cache are resolved up front, in size limited chunks
+    """
+
+    @given(
+        ingest_ids=st.lists(ingest_id_strategy, max_size=60),
+        chunk_size=st.integers(min_value=1, max_value=25),
+    )
+    @settings(max_examples=30, deadline=None)
+    def test_chunked(self, ingest_ids, chunk_size):
+        unique_ingest_ids = list(dict.fromkeys(ingest_ids))
+        requested_chunks = []
+
+        def _get_s3_objs(ingest_ids_chunk):
+            requested_chunks.append(list(ingest_ids_chunk))
+            return list(map(
+                lambda ingest_id_iter_: {"ingestId": ingest_id_iter_, "fileObject": file_object(ingest_id_iter_)},
+                ingest_ids_chunk
+            ))
+
+        with cache_env(S3_RESOLVER_CHUNK_SIZE=str(chunk_size)), \
+                mock.patch.object(resolver, "get_s3_objs_from_ingest_ids_map", _get_s3_objs):
+            resolver.resolve_ingest_ids(ingest_ids)
+
+            # Each unique ingest id is requested once, in ceil(n / chunk size) calls
+            assert sorted(chain.from_iterable(requested_chunks)) == sorted(unique_ingest_ids)
+            assert len(requested_chunks) == -(-len(unique_ingest_ids) // chunk_size)
+            assert all(map(lambda chunk_iter_: len(chunk_iter_) <= chunk_size, requested_chunks))
+
+            # And a second pass is served from the cache
+            resolver.resolve_ingest_ids(ingest_ids)
+            assert sum(map(len, requested_chunks)) == len(unique_ingest_ids)
+
+    def test_resolved_entries_are_pinned_to_the_request(self):
+        with cache_env(S3_CACHE_MAX_ENTRIES="1"), \
+                mock.patch.object(
+                    resolver, "get_s3_objs_from_ingest_ids_map",
+                    lambda ingest_ids_chunk: list(map(
+                        lambda ingest_id_iter_: {"ingestId": ingest_id_iter_, "fileObject": file_object(ingest_id_iter_)},
+                        ingest_ids_chunk
+                    ))
+                ):
+            start_request_s3_objs()
+            resolver.resolve_ingest_ids(["a", "b", "c"])
+
+            # Evicted from the bounded cache, but still available to serialize this response
+            assert get_cache_stats()['size'] == 1
+            assert all(map(
+                lambda ingest_id_iter_: get_from_cache(ingest_id_iter_) == file_object(ingest_id_iter_),
+                ["a", "b", "c"]
+            ))
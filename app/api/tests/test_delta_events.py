@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the compact (delta) event payloads, and the claim check of oversized payloads.
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+from typing import get_args
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+from dyntastic import Dyntastic
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools.events import delta
+from fastq_manager_api_tools.globals import (
+    DELTA_EVENT_PAYLOAD_VERSION,
+    FastqStateChangeStatusEventsType, FastqSetStateChangeStatusEventsType,
+)
+from fastq_manager_api_tools.models import fastq_set as fastq_set_models
+from fastq_manager_api_tools.models.fastq import FastqData, FASTQ_RESPONSE_ALIASES
+from fastq_manager_api_tools.models.fastq_set import FastqSetData
+
+ulid_strategy = st.from_regex(r"[0-9A-Z]{26}", fullmatch=True)
+library = {"orcabus_id": f"lib.{'0' * 26}", "library_id": "L2400001"}
+
+
+def get_fastq_obj(**kwargs) -> FastqData:
+    return FastqData(**{
+        "id": f"fqr.{'1' * 26}",
+        "index": "ACGTACGT+ACGTACGT",
+        "lane": 1,
+        "instrument_run_id": "240101_A01052_0001_ABCDEFGHIJ",
+        "library": library,
+        **kwargs
+    })
+
+
+class TestChangedFields:
+    def test_every_fastq_status_is_mapped(self):
+        assert set(delta.FASTQ_STATUS_CHANGED_FIELDS.keys()) == set(get_args(FastqStateChangeStatusEventsType))
+
+    def test_every_fastq_set_status_is_mapped(self):
+        assert set(delta.FASTQ_SET_STATUS_CHANGED_FIELDS.keys()) == set(get_args(FastqSetStateChangeStatusEventsType))
+
+    def test_fastq_changed_fields_are_response_fields(self):
+        for changed_field_names in delta.FASTQ_STATUS_CHANGED_FIELDS.values():
+            assert set(changed_field_names or []).issubset(FASTQ_RESPONSE_ALIASES.values())
+
+    def test_fastq_set_changed_fields_are_delta_fields(self):
+        for changed_field_names in delta.FASTQ_SET_STATUS_CHANGED_FIELDS.values():
+            assert set(changed_field_names or []).issubset(delta.FASTQ_SET_DELTA_FIELDS)
+
+
+class TestDeltaEventDetail:
+    @given(
+        read_count=st.integers(min_value=0, max_value=10 ** 10),
+        base_count_est=st.integers(min_value=0, max_value=10 ** 12),
+        version=st.integers(min_value=0, max_value=1000),
+    )
+    def test_fastq_only_carries_changed_fields(self, read_count, base_count_est, version):
+        fastq_obj = get_fastq_obj(read_count=read_count, base_count_est=base_count_est, version=version)
+
+        event_detail = delta.get_fastq_delta_event_detail(fastq_obj, "READ_COUNT_UPDATED")
+
+        assert event_detail == {
+            "id": fastq_obj.id,
+            "version": version,
+            "changedFields": {"readCount": read_count, "baseCountEst": base_count_est},
+        }
+
+    @given(fastq_ids=st.lists(ulid_strategy.map(lambda ulid_iter_: f"fqr.{ulid_iter_}"), min_size=1, max_size=20))
+    @settings(max_examples=25)
+    def test_fastq_set_references_fastqs_by_id(self, fastq_ids):
+        fastq_set_obj = FastqSetData(**{
+            "id": f"fqs.{'2' * 26}",
+            "library": library,
+            "fastq_set_ids": fastq_ids,
+        })
+
+        with mock.patch.object(
+                fastq_set_models, "batch_get_data_map",
+                mock.Mock(side_effect=AssertionError("Should not read the fastqs"))
+        ):
+            linked_event_detail = delta.get_fastq_set_delta_event_detail(fastq_set_obj, "FASTQ_LINKED")
+            created_event_detail = delta.get_fastq_set_delta_event_detail(fastq_set_obj, "FASTQ_SET_CREATED")
+
+        assert linked_event_detail["changedFields"] == {"fastqSetIds": fastq_ids}
+        assert "fastqSet" not in created_event_detail["changedFields"]
+        assert created_event_detail["changedFields"]["fastqSetIds"] == fastq_ids
+        assert created_event_detail["changedFields"]["library"]["libraryId"] == library["library_id"]
+
+    def test_deleted_fastq_has_no_changed_fields(self):
+        assert delta.get_fastq_delta_event_detail(get_fastq_obj(), "FASTQ_DELETED")["changedFields"] == {}
+
+
+class TestClaimCheck:
+    def teardown_method(self):
+        delta.get_s3_client.cache_clear()
+
+    def test_oversized_changed_fields_are_claim_checked(self):
+        s3_client = mock.Mock()
+        with (
+            mock.patch.dict(os.environ, {
+                "EVENT_CLAIM_CHECK_S3_URI_PREFIX": "s3://test-bucket/event-claim-check/",
+                "EVENT_CLAIM_CHECK_THRESHOLD_BYTES": "16",
+            }),
+            mock.patch.object(delta, "get_s3_client", lambda: s3_client),
+        ):
+            event_detail = delta.get_delta_event_detail("fqr.01", 3, {"library": {"libraryId": "L2400001"}})
+
+        assert "changedFields" not in event_detail
+        assert event_detail["claimCheckUri"].startswith("s3://test-bucket/event-claim-check/fqr.01/")
+        put_object_kwargs = s3_client.put_object.call_args.kwargs
+        assert put_object_kwargs["Bucket"] == "test-bucket"
+        assert event_detail["claimCheckUri"] == f"s3://test-bucket/{put_object_kwargs['Key']}"
+        assert json.loads(put_object_kwargs["Body"]) == {"library": {"libraryId": "L2400001"}}
+
+    def test_no_claim_check_without_a_location(self):
+        with mock.patch.dict(os.environ, {"EVENT_CLAIM_CHECK_THRESHOLD_BYTES": "16"}):
+            os.environ.pop("EVENT_CLAIM_CHECK_S3_URI_PREFIX", None)
+            event_detail = delta.get_delta_event_detail("fqr.01", 3, {"library": {"libraryId": "L2400001"}})
+
+        assert event_detail["changedFields"] == {"library": {"libraryId": "L2400001"}}
+
+
+class TestVersion:
+    def test_every_write_increments_the_version(self):
+        fastq_obj = get_fastq_obj()
+        with (
+            mock.patch.object(Dyntastic, "save"),
+            mock.patch.object(Dyntastic, "delete"),
+        ):
+            fastq_obj.save()
+            fastq_obj.save()
+            fastq_obj.delete()
+
+        assert fastq_obj.version == 3
+
+    def test_delta_payload_is_opt_in(self):
+        os.environ.pop("EVENT_PAYLOAD_VERSION", None)
+        assert not delta.is_delta_event_payload()
+        with mock.patch.dict(os.environ, {"EVENT_PAYLOAD_VERSION": DELTA_EVENT_PAYLOAD_VERSION}):
+            assert delta.is_delta_event_payload()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+"""
+Tests for buffering events, and packing them into as few PutEvents calls as we can.
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+from fastapi.testclient import TestClient
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools.events import events
+from fastq_manager_api_tools.globals import (
+    EVENTBRIDGE_PUT_EVENTS_MAX_ENTRIES, EVENTBRIDGE_PUT_EVENTS_MAX_SIZE_BYTES, REQUEST_METRICS_HEADER
+)
+
+
+def get_entry(detail_size: int):
+    return {
+        "EventBusName": "test-event-bus",
+        "Source": "test-source",
+        "DetailType": "FastqStateChange",
+        "Detail": "x" * detail_size,
+    }
+
+
+class MockEventClient:
+    """
+    Fails each entry on its first attempt if the entry is in fail_once
+    """
+    def __init__(self, fail_once=()):
+        self.fail_once = set(fail_once)
+        self.calls = []
+
+    def put_events(self, Entries):
+        self.calls.append(list(map(lambda entry_iter_: entry_iter_['Detail'], Entries)))
+        entry_results = []
+        for entry in Entries:
+            if entry['Detail'] in self.fail_once:
+                self.fail_once.remove(entry['Detail'])
+                entry_results.append({"ErrorCode": "ThrottlingException", "ErrorMessage": "Rate exceeded"})
+            else:
+                entry_results.append({"EventId": entry['Detail']})
+        return {
+            "FailedEntryCount": len(list(filter(lambda result_iter_: "ErrorCode" in result_iter_, entry_results))),
+            "Entries": entry_results,
+        }
+
+
+class TestChunkEntries:
+    @given(detail_sizes=st.lists(st.integers(min_value=1, max_value=100 * 1024), max_size=50))
+    @settings(max_examples=50)
+    def test_limits_and_order(self, detail_sizes):
+        entries = list(map(get_entry, detail_sizes))
+
+        entries_chunks = list(events.chunk_entries(entries))
+
+        assert [entry for entries_chunk in entries_chunks for entry in entries_chunk] == entries
+        for entries_chunk in entries_chunks:
+            assert 0 < len(entries_chunk) <= EVENTBRIDGE_PUT_EVENTS_MAX_ENTRIES
+            assert sum(map(events.get_entry_size, entries_chunk)) <= EVENTBRIDGE_PUT_EVENTS_MAX_SIZE_BYTES
+
+    def test_small_entries_fill_chunks(self):
+        entries_chunks = list(events.chunk_entries(list(map(get_entry, [10] * 25))))
+
+        assert list(map(len, entries_chunks)) == [10, 10, 5]
+
+
+class TestPutEntries:
+    def teardown_method(self):
+        events.REQUEST_EVENT_BUFFER.set(None)
+
+    def test_retries_only_failed_entries(self):
+        entries = list(map(lambda index_iter_: {**get_entry(1), "Detail": str(index_iter_)}, range(12)))
+        event_client = MockEventClient(fail_once=["3", "11"])
+
+        with (
+            mock.patch.object(events, "get_event_client", mock.Mock(return_value=event_client)),
+            mock.patch.object(events, "sleep"),
+        ):
+            events.put_entries(entries)
+
+        assert event_client.calls == [
+            list(map(str, range(10))),
+            ["3"],
+            ["10", "11"],
+            ["11"],
+        ]
+
+    def test_buffered_until_flushed(self):
+        event_client = MockEventClient()
+
+        with mock.patch.object(events, "get_event_client", mock.Mock(return_value=event_client)):
+            events.start_request_event_buffer()
+            for index in range(15):
+                events.put_event("FastqStateChange", "FASTQ_UPDATED", {"id": str(index)})
+
+            assert event_client.calls == []
+
+            events.flush_request_event_buffer()
+            events.flush_request_event_buffer()
+
+        assert list(map(len, event_client.calls)) == [10, 5]
+
+
+class TestRequestMiddleware:
+    """
+    The events buffered over a request are sent once the request has its response
+    """
+
+    def test_flush_failure_is_not_a_500(self):
+        # Imported here, so the test fails (rather than the whole module) if the api cannot be imported
+        import handler
+
+        with mock.patch.object(handler, "flush_request_event_buffer", mock.Mock(side_effect=Exception("Throttled"))):
+            response = TestClient(handler.app).get("/")
+
+        assert response.status_code == 200
+        assert "events.flushFailed=1" in response.headers[REQUEST_METRICS_HEADER]
+
+    def test_no_flush_when_the_request_raises(self):
+        import handler
+
+        @handler.app.get("/test/raises")
+        def raises():
+            raise RuntimeError("Unhandled")
+
+        try:
+            with mock.patch.object(handler, "flush_request_event_buffer") as flush_mock:
+                response = TestClient(handler.app, raise_server_exceptions=False).get("/test/raises")
+        finally:
+            handler.app.router.routes.pop()
+
+        assert response.status_code == 500
+        flush_mock.assert_not_called()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+"""
+Tests for rendering fastq list rows in bulk (and as a fastq_list.csv).
+"""
+
+import csv
+import io
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+
+from hypothesis import HealthCheck, given, settings
+from hypothesis import strategies as st
+
+import pytest
+
+from fastq_manager_api_tools.cache import clear_cache, update_cache
+from fastq_manager_api_tools.globals import FASTQ_LIST_CSV_COLUMNS
+from fastq_manager_api_tools.models import fastq as fastq_models
+from fastq_manager_api_tools.streaming import iter_csv_lines
+
+
+# Strategies for generating random data
+fastq_list_row_strategy = st.fixed_dictionaries(
+    {
+        "rgid": st.from_regex(r"[ACGT]{8}\.[1-8]\.[0-9]{6}_A[0-9]{5}_[0-9]{4}_[A-Z0-9]{10}", fullmatch=True),
+        "rgsm": st.from_regex(r"L[0-9]{7}", fullmatch=True),
+        "rglb": st.from_regex(r"L[0-9]{7}", fullmatch=True),
+        "lane": st.integers(min_value=1, max_value=8),
+        "read1FileUri": st.from_regex(r"s3://bucket/[a-z0-9/_]+_R1_001\.fastq\.gz", fullmatch=True),
+    },
+    optional={
+        "read2FileUri": st.from_regex(r"s3://bucket/[a-z0-9/_]+_R2_001\.fastq\.gz", fullmatch=True),
+        "rgds": st.text(),
+    }
+)
+
+
+class TestFastqListCsv:
+    # Each row draws five regexes, so generation is slow whatever the size of the list
+    @given(fastq_list_rows=st.lists(fastq_list_row_strategy, max_size=10))
+    @settings(max_examples=50, suppress_health_check=[HealthCheck.too_slow], deadline=None)
+    def test_round_trip(self, fastq_list_rows):
+        csv_text = b"".join(iter_csv_lines(fastq_list_rows, FASTQ_LIST_CSV_COLUMNS)).decode()
+
+        csv_rows = list(csv.DictReader(io.StringIO(csv_text)))
+
+        assert len(csv_rows) == len(fastq_list_rows)
+        for csv_row, fastq_list_row in zip(csv_rows, fastq_list_rows):
+            assert list(csv_row.keys()) == list(FASTQ_LIST_CSV_COLUMNS.keys())
+            for column_name, row_key in FASTQ_LIST_CSV_COLUMNS.items():
+                assert csv_row[column_name] == str(fastq_list_row.get(row_key, ""))
+
+
+class TestReadFileUri:
+    """
+    Read file uris come from the s3 details cache when the cached object is under the bucket / key prefix
+    """
+
+    def setup_method(self):
+        clear_cache()
+        update_cache("a", {"ingestId": "a", "bucket": "bucket", "key": "primary/run/a_R1_001.fastq.gz"})
+
+    def teardown_method(self):
+        clear_cache()
+
+    def test_from_cache(self):
+        with mock.patch.object(
+                fastq_models, "get_s3_uri_from_ingest_id",
+                mock.Mock(side_effect=AssertionError("Should not call the file manager"))
+        ):
+            assert fastq_models.get_read_file_uri("a") == "s3://bucket/primary/run/a_R1_001.fastq.gz"
+            assert fastq_models.get_read_file_uri(
+                "a", bucket="bucket", key_prefix="primary/"
+            ) == "s3://bucket/primary/run/a_R1_001.fastq.gz"
+
+    def test_other_key_prefix(self):
+        with mock.patch.object(
+                fastq_models, "get_s3_uri_from_ingest_id",
+                mock.Mock(return_value="s3://bucket/archive/run/a_R1_001.fastq.gz")
+        ) as get_s3_uri_mock:
+            assert fastq_models.get_read_file_uri(
+                "a", key_prefix="archive/"
+            ) == "s3://bucket/archive/run/a_R1_001.fastq.gz"
+            get_s3_uri_mock.assert_called_once_with("a", bucket=None, key_prefix="archive/")
+
+
+class TestMissingReadSet:
+    """
+    Fastqs without a read set fail the whole list, rather than being silently left out of it
+    """
+
+    def test_mixed_read_sets(self):
+        library = {"orcabus_id": f"lib.{'A' * 26}", "library_id": "L2400001"}
+        fastq_list = list(map(
+            lambda fastq_index_iter_: fastq_models.FastqData(**{
+                "id": f"fqr.{fastq_index_iter_:026d}",
+                "index": "ACGTACGT",
+                "lane": fastq_index_iter_ + 1,
+                "instrument_run_id": "241024_A00130_0336_BHW7MVDSXC",
+                "library": library,
+                # Only the even fastqs have a read set
+                "read_set": {
+                    "r1": {"ingest_id": f"r1.{fastq_index_iter_}"},
+                } if fastq_index_iter_ % 2 == 0 else None,
+            }),
+            range(4)
+        ))
+
+        with mock.patch.object(
+                fastq_models, "resolve_ingest_ids",
+                mock.Mock(side_effect=AssertionError("Should fail before resolving any s3 details"))
+        ), pytest.raises(fastq_models.FastqMissingReadSetError) as exc_info:
+            fastq_models.FastqData.to_fastq_list_rows(fastq_list)
+
+        assert exc_info.value.fastq_ids == [fastq_list[1].id, fastq_list[3].id]
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the fastq set summary (fastq count and latest instrument run id),
+and choosing the current fastq set of a library from the library summary index alone.
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+
+from hypothesis import given
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools import hydration
+from fastq_manager_api_tools.api.v1 import routers
+from fastq_manager_api_tools.models.fastq import FastqData
+from fastq_manager_api_tools.models.fastq_set import FastqSetData
+
+library = {"orcabus_id": f"lib.{'A' * 26}", "library_id": "L2400001"}
+instrument_run_id_strategy = st.from_regex(r"2[0-9]{5}_A00130_0[0-9]{3}_[A-Z0-9]{10}", fullmatch=True)
+
+
+def get_fastq_obj(fastq_index: int, instrument_run_id: str) -> FastqData:
+    return FastqData(**{
+        "id": f"fqr.{fastq_index:026d}",
+        "index": "ACGTACGT",
+        "lane": 1,
+        "instrument_run_id": instrument_run_id,
+        "library": library,
+    })
+
+
+class TestUpdateFastqSummary:
+    @given(instrument_run_ids=st.lists(instrument_run_id_strategy, max_size=20))
+    def test_count_and_latest_instrument_run_id(self, instrument_run_ids):
+        fastq_objs = list(map(
+            lambda fastq_pair_iter_: get_fastq_obj(*fastq_pair_iter_),
+            enumerate(instrument_run_ids)
+        ))
+        fastq_set_obj = FastqSetData(
+            library=library,
+            fastq_set_ids=list(map(lambda fastq_obj_iter_: fastq_obj_iter_.id, fastq_objs))
+        )
+
+        with mock.patch.object(hydration, "batch_get_items") as batch_get_items_mock:
+            fastq_set_obj.update_fastq_summary(dict(map(
+                lambda fastq_obj_iter_: (fastq_obj_iter_.id, fastq_obj_iter_),
+                fastq_objs
+            )))
+
+        batch_get_items_mock.assert_not_called()
+        assert fastq_set_obj.fastq_count == len(instrument_run_ids)
+        assert fastq_set_obj.latest_instrument_run_id == max(instrument_run_ids, default=None)
+
+
+class TestGetLatestFastqSetId:
+    def get_latest_fastq_set_id(self, library_fastq_set_items, excluded_fastq_set_id=None, items_by_id=None):
+        if items_by_id is None:
+            items_by_id = {}
+
+        with (
+            mock.patch.object(routers, "query_index_items", return_value=library_fastq_set_items) as query_mock,
+            mock.patch.object(
+                hydration, "batch_get_items",
+                side_effect=lambda table_name, ids: list(map(lambda id_iter_: items_by_id[id_iter_], ids))
+            ) as batch_get_items_mock,
+        ):
+            latest_fastq_set_id = routers.get_latest_fastq_set_id(library["orcabus_id"], excluded_fastq_set_id)
+
+        # The summary is only projected into the library summary index
+        assert query_mock.call_args.args[1]['index_name'] == "library_orcabus_id_summary-index"
+        assert query_mock.call_args.kwargs["attributes"] == ['id', 'latest_instrument_run_id']
+        return latest_fastq_set_id, batch_get_items_mock
+
+    def test_from_the_index_alone(self):
+        latest_fastq_set_id, batch_get_items_mock = self.get_latest_fastq_set_id(
+            [
+                {"id": "fqs.1", "latest_instrument_run_id": "240101_A00130_0001_AAAAAAAAAA"},
+                {"id": "fqs.2", "latest_instrument_run_id": "240601_A00130_0002_AAAAAAAAAA"},
+                {"id": "fqs.3", "latest_instrument_run_id": "240301_A00130_0003_AAAAAAAAAA"},
+            ],
+        )
+
+        assert latest_fastq_set_id == "fqs.2"
+        batch_get_items_mock.assert_not_called()
+
+    def test_excludes_the_deleted_fastq_set(self):
+        latest_fastq_set_id, _ = self.get_latest_fastq_set_id(
+            [
+                {"id": "fqs.1", "latest_instrument_run_id": "240101_A00130_0001_AAAAAAAAAA"},
+                {"id": "fqs.2", "latest_instrument_run_id": "240601_A00130_0002_AAAAAAAAAA"},
+            ],
+            excluded_fastq_set_id="fqs.2",
+        )
+
+        assert latest_fastq_set_id == "fqs.1"
+
+    def test_no_other_fastq_sets(self):
+        latest_fastq_set_id, _ = self.get_latest_fastq_set_id(
+            [{"id": "fqs.1", "latest_instrument_run_id": "240101_A00130_0001_AAAAAAAAAA"}],
+            excluded_fastq_set_id="fqs.1",
+        )
+
+        assert latest_fastq_set_id is None
+
+    def test_older_fastq_sets_are_summarised(self):
+        fastq_obj = get_fastq_obj(1, "241001_A00130_0004_AAAAAAAAAA")
+        legacy_fastq_set_obj = FastqSetData(library=library, fastq_set_ids=[fastq_obj.id])
+
+        latest_fastq_set_id, _ = self.get_latest_fastq_set_id(
+            [
+                {"id": "fqs.1", "latest_instrument_run_id": "240601_A00130_0002_AAAAAAAAAA"},
+                # Written before the summary was kept
+                {"id": legacy_fastq_set_obj.id},
+            ],
+            items_by_id={
+                legacy_fastq_set_obj.id: legacy_fastq_set_obj.model_dump(),
+                fastq_obj.id: fastq_obj.model_dump(),
+            }
+        )
+
+        assert latest_fastq_set_id == legacy_fastq_set_obj.id
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+
+"""
+Property-based tests for sparse fieldsets (the fields query parameter).
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from fastq_manager_api_tools.api.v1.routers import fastq as fastq_router
+from fastq_manager_api_tools.fieldsets import parse_fields, select_fields, has_any_field
+from fastq_manager_api_tools.models.fastq import FastqData, FastqResponseDict
+from fastq_manager_api_tools.models.fastq_set import FastqSetResponseDict
+
+
+# Strategies for generating random data
+fastq_field_names_strategy = st.lists(
+    st.sampled_from(list(FastqResponseDict.__annotations__.keys())),
+    min_size=1, unique=True
+)
+
+
+class TestParseFields:
+    """
+    The fields query parameter is parsed into a field tree, and validated against the response dict
+    """
+
+    def test_no_fields_returns_none(self):
+        assert parse_fields(None, FastqResponseDict) is None
+        assert parse_fields("", FastqResponseDict) is None
+
+    @given(field_names=fastq_field_names_strategy)
+    @settings(max_examples=50)
+    def test_top_level_fields(self, field_names):
+        field_tree = parse_fields(",".join(field_names), FastqResponseDict)
+
+        assert field_tree == dict.fromkeys(field_names, True)
+
+    def test_nested_fields(self):
+        assert parse_fields("id,library.libraryId,library.orcabusId", FastqResponseDict) == {
+            "id": True,
+            "library": {"libraryId": True, "orcabusId": True},
+        }
+        # Selecting the parent in full overrides any nested selections
+        assert parse_fields("library.libraryId,library", FastqResponseDict) == {"library": True}
+        assert parse_fields("library,library.libraryId", FastqResponseDict) == {"library": True}
+
+    def test_nested_fastq_set_fields(self):
+        assert parse_fields("id,fastqSet.id,fastqSet.library.libraryId", FastqSetResponseDict) == {
+            "id": True,
+            "fastqSet": {"id": True, "library": {"libraryId": True}},
+        }
+
+    @pytest.mark.parametrize("fields", ["notAField", "library.notAField", "fastqSet.id"])
+    def test_unknown_fields_are_rejected(self, fields):
+        with pytest.raises(HTTPException) as exc_info:
+            parse_fields(fields, FastqResponseDict)
+        assert exc_info.value.status_code == 400
+
+
+class TestSelectFields:
+    """
+    Only the selected fields are kept, in the order of the serialized data
+    """
+
+    @given(
+        data=st.dictionaries(st.text(min_size=1, max_size=5), st.integers(), min_size=1),
+        data_subset=st.data(),
+    )
+    @settings(max_examples=50)
+    def test_select_fields_keeps_selected_keys_in_order(self, data, data_subset):
+        selected_keys = data_subset.draw(st.lists(st.sampled_from(list(data.keys())), unique=True))
+
+        selected_data = select_fields(data, dict.fromkeys(selected_keys, True))
+
+        assert list(selected_data.keys()) == list(filter(lambda key_iter_: key_iter_ in selected_keys, data.keys()))
+        assert all(map(lambda kv: data[kv[0]] == kv[1], selected_data.items()))
+
+    def test_select_nested_fields_over_lists(self):
+        data = {
+            "id": "fqs.123",
+            "fastqSet": [
+                {"id": "fqr.1", "lane": 1, "library": {"libraryId": "L1", "orcabusId": "lib.1"}},
+                {"id": "fqr.2", "lane": 2, "library": None},
+            ]
+        }
+
+        assert select_fields(data, {"fastqSet": {"id": True, "library": {"libraryId": True}}}) == {
+            "fastqSet": [
+                {"id": "fqr.1", "library": {"libraryId": "L1"}},
+                {"id": "fqr.2", "library": None},
+            ]
+        }
+
+    def test_has_any_field(self):
+        assert has_any_field(None, ["readSet"])
+        assert has_any_field({"id": True, "readSet": True}, ["readSet", "qc"])
+        assert not has_any_field({"id": True}, ["readSet", "qc"])
+
+
+class TestSparseFieldsetRoutes:
+    """
+    The api (and so the response models using the field tree type) imports, and serves sparse responses
+    """
+
+    def test_list_fastq_fields(self):
+        # Imported here, so the test fails (rather than the whole module) if the api cannot be imported
+        import handler
+
+        fastq_obj = FastqData(**{
+            "id": f"fqr.{'0' * 26}",
+            "index": "ACGTACGT",
+            "lane": 1,
+            "instrument_run_id": "241024_A00130_0336_BHW7MVDSXC",
+            "library": {"orcabus_id": f"lib.{'A' * 26}", "library_id": "L2400001"},
+        })
+
+        with mock.patch.object(
+                fastq_router, "query_index_items",
+                mock.Mock(return_value=[{"id": fastq_obj.id, "instrument_run_id": fastq_obj.instrument_run_id}])
+        ), mock.patch.object(
+                fastq_router, "batch_get_data_map",
+                mock.Mock(return_value={fastq_obj.id: fastq_obj})
+        ):
+            response = TestClient(handler.app).get(
+                "/api/v1/fastq",
+                params={
+                    "instrumentRunId": fastq_obj.instrument_run_id,
+                    "fields": "id,lane,library.libraryId",
+                }
+            )
+
+        assert response.status_code == 200
+        assert response.json()["results"] == [
+            {"id": fastq_obj.id, "lane": 1, "library": {"libraryId": "L2400001"}}
+        ]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the request identity map, each fastq is read at most once per request.
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+import pytest
+from dyntastic import DoesNotExist
+from hypothesis import given
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools import hydration
+from fastq_manager_api_tools.identity_map import REQUEST_IDENTITY_MAP, start_request_identity_map
+from fastq_manager_api_tools.models.fastq import FastqData
+from fastq_manager_api_tools.transactions import write_transaction
+
+library = {"orcabus_id": f"lib.{'A' * 26}", "library_id": "L2400001"}
+
+
+def get_fastq_item(fastq_index: int, **kwargs):
+    return FastqData(**{
+        "id": f"fqr.{fastq_index:026d}",
+        "index": "ACGTACGT",
+        "lane": 1,
+        "instrument_run_id": "241024_A00130_0336_BHW7MVDSXC",
+        "library": library,
+        **kwargs
+    }).model_dump()
+
+
+def get_table_mock():
+    table_mock = mock.MagicMock()
+    table_mock.get_item.side_effect = lambda Key, ConsistentRead: {
+        "Item": get_fastq_item(int(Key["id"].split(".")[1]))
+    }
+    return table_mock
+
+
+class TestGet:
+    def setup_method(self):
+        start_request_identity_map()
+
+    def teardown_method(self):
+        REQUEST_IDENTITY_MAP.set(None)
+
+    def test_read_once(self):
+        table_mock = get_table_mock()
+        with mock.patch.object(FastqData, "_dynamodb_table", return_value=table_mock):
+            fastq_obj = FastqData.get(f"fqr.{1:026d}")
+            assert FastqData.get(f"fqr.{1:026d}") is fastq_obj
+
+        assert table_mock.get_item.call_count == 1
+
+    def test_consistent_read_is_always_read(self):
+        table_mock = get_table_mock()
+        with mock.patch.object(FastqData, "_dynamodb_table", return_value=table_mock):
+            fastq_obj = FastqData.get(f"fqr.{1:026d}")
+            consistent_fastq_obj = FastqData.get(f"fqr.{1:026d}", consistent_read=True)
+            # The consistent read replaces the object in the map
+            assert FastqData.get(f"fqr.{1:026d}") is consistent_fastq_obj
+
+        assert consistent_fastq_obj is not fastq_obj
+        assert table_mock.get_item.call_count == 2
+
+    def test_deleted_is_read_again(self):
+        table_mock = get_table_mock()
+        with (
+            mock.patch.dict(os.environ, {"EVENT_OUTBOX_ENABLED": "false"}),
+            mock.patch.object(FastqData, "_dynamodb_table", return_value=table_mock),
+        ):
+            FastqData.get(f"fqr.{1:026d}").delete()
+            FastqData.get(f"fqr.{1:026d}")
+
+        assert table_mock.get_item.call_count == 2
+
+    def test_outside_of_a_request_is_always_read(self):
+        REQUEST_IDENTITY_MAP.set(None)
+        table_mock = get_table_mock()
+        with mock.patch.object(FastqData, "_dynamodb_table", return_value=table_mock):
+            FastqData.get(f"fqr.{1:026d}")
+            FastqData.get(f"fqr.{1:026d}")
+
+        assert table_mock.get_item.call_count == 2
+
+    def test_failed_transaction_clears_the_map(self):
+        table_mock = get_table_mock()
+        with mock.patch.object(FastqData, "_dynamodb_table", return_value=table_mock):
+            fastq_obj = FastqData.get(f"fqr.{1:026d}")
+            with pytest.raises(ValueError):
+                with write_transaction():
+                    fastq_obj.fastq_set_id = f"fqs.{'1' * 26}"
+                    raise ValueError("Not written")
+            assert FastqData.get(f"fqr.{1:026d}").fastq_set_id is None
+
+
+class TestBatchGetDataMap:
+    def setup_method(self):
+        start_request_identity_map()
+
+    def teardown_method(self):
+        REQUEST_IDENTITY_MAP.set(None)
+
+    @given(
+        first_indexes=st.lists(st.integers(min_value=0, max_value=20), max_size=10),
+        second_indexes=st.lists(st.integers(min_value=0, max_value=20), min_size=1, max_size=10),
+    )
+    def test_only_unread_ids_are_read(self, first_indexes, second_indexes):
+        start_request_identity_map()
+        read_ids = []
+
+        def batch_get_items(table_name, ids):
+            read_ids.extend(ids)
+            return list(map(lambda id_iter_: get_fastq_item(int(id_iter_.split(".")[1])), ids))
+
+        with mock.patch.object(hydration, "batch_get_items", side_effect=batch_get_items):
+            first_data_map = hydration.batch_get_data_map(
+                FastqData, map(lambda index_iter_: f"fqr.{index_iter_:026d}", first_indexes)
+            )
+            second_ids = list(map(lambda index_iter_: f"fqr.{index_iter_:026d}", second_indexes))
+            second_data_map = hydration.batch_get_data_map(FastqData, second_ids)
+
+        # Each id is read once, and each reader gets the same object
+        assert sorted(read_ids) == sorted(set(read_ids))
+        assert set(read_ids) == set(first_data_map.keys()) | set(second_ids)
+        assert list(second_data_map.keys()) == list(dict.fromkeys(second_ids))
+        for fastq_id, fastq_obj in second_data_map.items():
+            if fastq_id in first_data_map:
+                assert first_data_map[fastq_id] is fastq_obj
+
+    def test_missing_ids_raise(self):
+        with (
+            mock.patch.object(hydration, "batch_get_items", return_value=[get_fastq_item(1)]),
+            pytest.raises(DoesNotExist),
+        ):
+            hydration.batch_get_data_map(FastqData, [f"fqr.{1:026d}", f"fqr.{2:026d}"])
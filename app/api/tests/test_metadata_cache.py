@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+"""
+Property-based tests for the cached, concurrent metadata lookups.
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools import metadata_cache
+from fastq_manager_api_tools.metadata_cache import (
+    MetadataLookup, clear_metadata_cache, get_libraries_from_metadata_query,
+    get_library_orcabus_ids_from_library_ids
+)
+from fastq_manager_api_tools.shared_cache import get_shared_cache
+
+
+# Strategies for generating random data
+library_id_strategy = st.from_regex(r"L[0-9]{7}", fullmatch=True)
+
+
+@contextmanager
+def metadata_cache_env(**env):
+    """
+    Empty cache with the given settings (hypothesis tests cannot use the monkeypatch fixture)
+    """
+    previous_env = dict(map(lambda key_iter_: (key_iter_, os.environ.get(key_iter_)), env.keys()))
+    os.environ.update(env)
+    clear_metadata_cache()
+    get_shared_cache.cache_clear()
+    try:
+        yield
+    finally:
+        clear_metadata_cache()
+        get_shared_cache.cache_clear()
+        for key, value in previous_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def fake_orcabus_id(library_id: str) -> str:
+    return f"lib.01J{library_id[1:].rjust(23, '0')}"
+
+
+class TestMetadataLookup:
+    """
+    Each unique key is looked up once, later lookups are served from the cache
+    """
+
+    @given(library_ids=st.lists(library_id_strategy, max_size=50))
+    @settings(max_examples=30, deadline=None)
+    def test_de_duplicated_and_cached(self, library_ids):
+        looked_up = []
+
+        def _lookup(library_id):
+            looked_up.append(library_id)
+            return fake_orcabus_id(library_id)
+
+        with metadata_cache_env():
+            lookup = MetadataLookup("test", _lookup)
+
+            assert lookup.get_many(library_ids) == dict(map(
+                lambda library_id_iter_: (library_id_iter_, fake_orcabus_id(library_id_iter_)),
+                library_ids
+            ))
+            assert sorted(looked_up) == sorted(set(library_ids))
+
+            # Served from the cache
+            for library_id in library_ids:
+                assert lookup(library_id) == fake_orcabus_id(library_id)
+            assert sorted(looked_up) == sorted(set(library_ids))
+
+    def test_failed_lookups_are_not_cached(self):
+        attempts = []
+
+        def _lookup(library_id):
+            attempts.append(library_id)
+            raise ValueError(f"Unknown library {library_id}")
+
+        with metadata_cache_env():
+            lookup = MetadataLookup("test", _lookup)
+            for _ in range(2):
+                try:
+                    lookup("L0000001")
+                except ValueError:
+                    pass
+            assert attempts == ["L0000001", "L0000001"]
+
+    def test_stale_entries_are_looked_up_again(self):
+        looked_up = []
+
+        with metadata_cache_env(METADATA_CACHE_TTL_SECONDS="-1"):
+            lookup = MetadataLookup("test", lambda library_id: looked_up.append(library_id) or library_id)
+            lookup("L0000001")
+            lookup("L0000001")
+            assert looked_up == ["L0000001", "L0000001"]
+
+    def test_shared_cache(self):
+        looked_up = []
+
+        with tempfile.TemporaryDirectory() as tmp_dir, metadata_cache_env(
+            S3_SHARED_CACHE_BACKEND="sqlite",
+            S3_SHARED_CACHE_SQLITE_PATH=os.path.join(tmp_dir, "s3_cache.sqlite"),
+            METADATA_SHARED_CACHE_ENABLED="true",
+        ):
+            lookup = MetadataLookup("test", lambda library_id: looked_up.append(library_id) or {"libraryId": library_id})
+            lookup.get_many(["L0000001", "L0000002"])
+
+            # Another lambda instance starts with an empty in-memory cache
+            clear_metadata_cache()
+            assert lookup.get_many(["L0000001", "L0000002"]) == {
+                "L0000001": {"libraryId": "L0000001"},
+                "L0000002": {"libraryId": "L0000002"},
+            }
+            assert looked_up == ["L0000001", "L0000002"]
+
+
+class TestLibrariesFromMetadataQuery:
+    def test_project_query(self):
+        project_libraries = {
+            "prj.01J00000000000000000000001": [
+                {"libraryId": "L0000001", "orcabusId": fake_orcabus_id("L0000001")},
+                {"libraryId": "L0000002", "orcabusId": fake_orcabus_id("L0000002")},
+            ],
+            "prj.01J00000000000000000000002": [
+                {"libraryId": "L0000002", "orcabusId": fake_orcabus_id("L0000002")},
+                {"libraryId": "L0000003", "orcabusId": fake_orcabus_id("L0000003")},
+            ],
+        }
+
+        with metadata_cache_env(), \
+                mock.patch.object(
+                    metadata_cache.get_project_orcabus_id_from_project_id, "func",
+                    lambda project_id: {
+                        "PROJECT_A": "prj.01J00000000000000000000001",
+                        "PROJECT_B": "prj.01J00000000000000000000002",
+                    }[project_id]
+                ), \
+                mock.patch.object(
+                    metadata_cache.list_libraries_in_project, "func",
+                    lambda project_orcabus_id: project_libraries[project_orcabus_id]
+                ), \
+                mock.patch.object(
+                    metadata_cache.get_library_orcabus_id_from_library_id, "func",
+                    mock.Mock(side_effect=AssertionError("Library ids should already be known"))
+                ):
+            assert sorted(get_libraries_from_metadata_query(project_list=["PROJECT_A", "PROJECT_B"])) == sorted(map(
+                fake_orcabus_id, ["L0000001", "L0000002", "L0000003"]
+            ))
+
+            # The library ids in the projects are now known without a lookup
+            assert get_library_orcabus_ids_from_library_ids(["L0000003", "L0000001"]) == list(map(
+                fake_orcabus_id, ["L0000003", "L0000001"]
+            ))
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the transactional event outbox, and the local outbox relay.
+"""
+
+import contextlib
+import json
+import os
+import sys
+from pathlib import Path
+from typing import ClassVar, List
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+import pytest
+from hypothesis import given
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools.events import events, outbox, relay
+from fastq_manager_api_tools.globals import DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS
+from fastq_manager_api_tools.models.event_outbox import EventOutboxBase, EventOutboxData
+from fastq_manager_api_tools.models.fastq import FastqData
+
+entry_strategy = st.fixed_dictionaries({
+    "EventBusName": st.text(min_size=1, max_size=20),
+    "Source": st.text(min_size=1, max_size=20),
+    "DetailType": st.text(min_size=1, max_size=20),
+    "Detail": st.text(max_size=200),
+})
+
+
+class MockEventOutbox(EventOutboxBase):
+    """
+    An outbox item that records its own deletion, rather than calling DynamoDB
+    """
+    deleted_ids: ClassVar[List[str]] = []
+
+    def delete(self):
+        self.deleted_ids.append(self.id)
+
+
+class TestEventOutboxModel:
+    @given(entry=entry_strategy)
+    def test_entry_round_trip(self, entry):
+        assert EventOutboxBase.from_entry(entry).to_entry() == entry
+
+    def test_ids_sort_in_put_order(self):
+        outbox_obj_list = list(map(
+            lambda detail_iter_: EventOutboxBase.from_entry({
+                "EventBusName": "test-event-bus",
+                "Source": "test-source",
+                "DetailType": "FastqStateChange",
+                "Detail": str(detail_iter_),
+            }),
+            range(20)
+        ))
+        assert sorted(outbox_obj_list, key=lambda outbox_obj_iter_: outbox_obj_iter_.id) == outbox_obj_list
+
+
+class TestOutboxTransaction:
+    def test_no_transaction_when_disabled(self):
+        with mock.patch.dict(os.environ, {"EVENT_OUTBOX_ENABLED": "false"}):
+            with outbox.outbox_transaction():
+                assert outbox.current_transaction_writer() is None
+
+    def test_put_event_writes_to_outbox_when_enabled(self):
+        added_entries = []
+        with (
+            mock.patch.dict(os.environ, {"EVENT_OUTBOX_ENABLED": "true"}),
+            mock.patch.object(events, "add_to_outbox", added_entries.append),
+            mock.patch.object(events, "put_entries") as put_entries_mock,
+        ):
+            events.put_event("FastqStateChange", "CREATED", {"id": "fqr.01"})
+
+        put_entries_mock.assert_not_called()
+        assert len(added_entries) == 1
+        assert added_entries[0]["EventBusName"] == "test-event-bus"
+        assert json.loads(added_entries[0]["Detail"]) == {"status": "CREATED", "id": "fqr.01"}
+
+
+class TestOutboxTransactionWriter:
+    """
+    A write is never committed in a different transaction to the events put after it
+    """
+    def run_writer(self, writer: outbox.OutboxTransactionWriter, group_sizes: List[int]) -> List[list]:
+        client_mock = mock.MagicMock()
+        with (
+            mock.patch.object(FastqData, "_dynamodb_client", return_value=client_mock),
+            mock.patch.object(EventOutboxData, "_dynamodb_client", return_value=client_mock),
+            writer,
+        ):
+            # Each group is a write followed by its events
+            for group_index, group_size in enumerate(group_sizes):
+                writer.add(FastqData, {"Put": {"group": group_index}})
+                for _ in range(group_size - 1):
+                    writer.add(EventOutboxData, {"Put": {"group": group_index}})
+        return list(map(
+            lambda call_iter_: call_iter_.kwargs["TransactItems"],
+            client_mock.transact_write_items.call_args_list
+        ))
+
+    @given(group_sizes=st.lists(st.integers(min_value=1, max_value=5), max_size=100))
+    def test_chunked_keeps_groups_together(self, group_sizes):
+        transact_items_list = self.run_writer(outbox.OutboxTransactionWriter(chunked=True), group_sizes)
+
+        assert sum(map(len, transact_items_list)) == sum(group_sizes)
+        assert all(map(
+            lambda transact_items_iter_: len(transact_items_iter_) <= DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS,
+            transact_items_list
+        ))
+        # Each group is only ever found in a single transaction
+        group_indexes_list = list(map(
+            lambda transact_items_iter_: set(map(lambda item_iter_: item_iter_["Put"]["group"], transact_items_iter_)),
+            transact_items_list
+        ))
+        for group_index in range(len(group_sizes)):
+            assert sum(map(lambda group_indexes_iter_: group_index in group_indexes_iter_, group_indexes_list)) == 1
+
+    def test_unchunked_raises_when_too_large(self):
+        with pytest.raises(outbox.TransactionTooLargeError):
+            self.run_writer(outbox.OutboxTransactionWriter(), [2] * (DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS // 2 + 1))
+
+    def test_unchunked_commits_once(self):
+        transact_items_list = self.run_writer(
+            outbox.OutboxTransactionWriter(), [2] * (DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS // 2)
+        )
+        assert list(map(len, transact_items_list)) == [DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS]
+
+    def test_outbox_transaction_is_unchunked(self):
+        with mock.patch.dict(os.environ, {"EVENT_OUTBOX_ENABLED": "true"}):
+            with outbox.outbox_transaction():
+                assert outbox.current_transaction_writer().chunked is False
+
+
+class TestRelayOutbox:
+    def setup_method(self):
+        MockEventOutbox.deleted_ids = []
+
+    @given(entries=st.lists(entry_strategy, max_size=30))
+    def test_relays_in_put_order_and_removes(self, entries):
+        outbox_obj_list = list(map(MockEventOutbox.from_entry, entries))
+        # Hypothesis runs every example within a single test
+        MockEventOutbox.deleted_ids = []
+        relayed_entries = []
+
+        with (
+            mock.patch.object(relay.EventOutboxData, "scan", lambda: reversed(outbox_obj_list)),
+            mock.patch.object(relay.EventOutboxData, "batch_writer", contextlib.nullcontext),
+        ):
+            relay_count = relay.relay_outbox(relayed_entries.extend)
+
+        assert relay_count == len(entries)
+        assert relayed_entries == entries
+        assert MockEventOutbox.deleted_ids == list(map(lambda outbox_obj_iter_: outbox_obj_iter_.id, outbox_obj_list))
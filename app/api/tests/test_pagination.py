@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""
+Property-based tests for the page / rowsPerPage pagination of a pre-sliced page.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+
+from typing import ClassVar, Dict, List
+
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from fastapi_tools import QueryPaginatedResponse
+
+from fastq_manager_api_tools.pagination import get_page_slice, query_paginated_response_from_page
+
+
+class ItemQueryPaginatedResponse(QueryPaginatedResponse):
+    url_placeholder: ClassVar[str] = "http://localhost:8457/api/v1/item"
+    results: List[Dict[str, str]]
+
+    @classmethod
+    def resolve_url_placeholder(cls, **kwargs) -> str:
+        return cls.url_placeholder
+
+
+class TestQueryPaginatedResponseFromPage:
+    """
+    Only reading and serializing the requested page must give the same response
+    as slicing the page out of the full result list
+    """
+
+    @given(
+        num_results=st.integers(min_value=0, max_value=50),
+        page=st.integers(min_value=1, max_value=10),
+        rows_per_page=st.integers(min_value=1, max_value=20),
+    )
+    @settings(max_examples=100)
+    def test_matches_full_results_list(self, num_results: int, page: int, rows_per_page: int):
+        results = list(map(
+            lambda index_iter_: {"id": f"item.{index_iter_:026d}"},
+            range(num_results)
+        ))
+        query_pagination = {"page": page, "rowsPerPage": rows_per_page}
+        params_response = {"instrumentRunId": "250101_A01052_0001_ABCDEFGHIJ", **query_pagination}
+
+        from_page = query_paginated_response_from_page(
+            ItemQueryPaginatedResponse,
+            results=get_page_slice(results, query_pagination),
+            count=num_results,
+            query_pagination=query_pagination,
+            params_response=params_response,
+        )
+        from_results_list = ItemQueryPaginatedResponse.from_results_list(
+            results=results,
+            query_pagination=query_pagination,
+            params_response=params_response,
+        )
+
+        assert from_page.model_dump() == from_results_list.model_dump()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+"""
+Tests for presigning read sets, locally where we can, through the file manager otherwise.
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+# Presigning needs credentials, but never calls aws
+os.environ["AWS_ACCESS_KEY_ID"] = "testing"
+os.environ["AWS_SECRET_ACCESS_KEY"] = "testing"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools import presign
+from fastq_manager_api_tools.cache import clear_cache, update_cache
+from fastq_manager_api_tools.globals import PRESIGN_LOCAL_S3_URI_PREFIXES_ENV_VAR
+
+
+LOCAL_S3_URI_PREFIXES = "s3://pipeline-cache/byob-icav2/,s3://decompression/decompression-data/"
+
+
+class TestCanPresignLocally:
+    @given(
+        bucket=st.sampled_from(["pipeline-cache", "decompression", "other"]),
+        key=st.sampled_from(["byob-icav2/run/a.fastq.gz", "decompression-data/a.fastq.gz", "other/a.fastq.gz"]),
+        storage_class=st.sampled_from(["Standard", "IntelligentTiering", "Glacier", "DeepArchive"]),
+    )
+    @settings(max_examples=50)
+    def test_prefixes_and_storage_class(self, bucket, key, storage_class):
+        with mock.patch.dict(os.environ, {PRESIGN_LOCAL_S3_URI_PREFIXES_ENV_VAR: LOCAL_S3_URI_PREFIXES}):
+            can_presign_locally = presign.can_presign_locally({
+                "bucket": bucket, "key": key, "storageClass": storage_class
+            })
+
+        assert can_presign_locally == (
+            (bucket, key.split("/")[0]) in [("pipeline-cache", "byob-icav2"), ("decompression", "decompression-data")]
+            and storage_class not in ["Glacier", "DeepArchive"]
+        )
+
+    def test_no_prefixes(self):
+        with mock.patch.dict(os.environ, {PRESIGN_LOCAL_S3_URI_PREFIXES_ENV_VAR: ""}):
+            assert not presign.can_presign_locally({
+                "bucket": "pipeline-cache", "key": "byob-icav2/a.fastq.gz", "storageClass": "Standard"
+            })
+
+    def test_not_in_cache(self):
+        with mock.patch.dict(os.environ, {PRESIGN_LOCAL_S3_URI_PREFIXES_ENV_VAR: LOCAL_S3_URI_PREFIXES}):
+            assert not presign.can_presign_locally(None)
+
+
+class TestPresignIngestId:
+    def setup_method(self):
+        clear_cache()
+        update_cache("local", {
+            "ingestId": "local", "bucket": "pipeline-cache", "key": "byob-icav2/a.fastq.gz", "storageClass": "Standard"
+        })
+        update_cache("archived", {
+            "ingestId": "archived", "bucket": "pipeline-cache", "key": "byob-icav2/b.fastq.gz",
+            "storageClass": "DeepArchive"
+        })
+
+    def teardown_method(self):
+        clear_cache()
+
+    def test_local(self):
+        with (
+            mock.patch.dict(os.environ, {PRESIGN_LOCAL_S3_URI_PREFIXES_ENV_VAR: LOCAL_S3_URI_PREFIXES}),
+            mock.patch.object(
+                presign, "get_presigned_url_from_ingest_id",
+                mock.Mock(side_effect=AssertionError("Should not call the file manager"))
+            ),
+        ):
+            presigned_url = presign.presign_ingest_id("local")
+
+        assert presigned_url['s3Uri'] == "s3://pipeline-cache/byob-icav2/a.fastq.gz"
+        assert "X-Amz-Signature=" in presigned_url['presignedUrl']
+
+    def test_file_manager_fallback(self):
+        with (
+            mock.patch.dict(os.environ, {PRESIGN_LOCAL_S3_URI_PREFIXES_ENV_VAR: LOCAL_S3_URI_PREFIXES}),
+            mock.patch.object(
+                presign, "get_presigned_url_from_ingest_id",
+                mock.Mock(return_value="https://pipeline-cache.s3.amazonaws.com/byob-icav2/b.fastq.gz?X-Amz-Expires=60")
+            ) as get_presigned_url_mock,
+            mock.patch.object(
+                presign, "get_presigned_url_expiry",
+                mock.Mock(return_value=datetime(2026, 1, 1, tzinfo=timezone.utc))
+            ),
+            mock.patch.object(
+                presign, "get_s3_uri_from_ingest_id",
+                mock.Mock(side_effect=AssertionError("The s3 uri is already cached"))
+            ),
+        ):
+            presigned_url = presign.presign_ingest_id("archived")
+
+        get_presigned_url_mock.assert_called_once_with("archived")
+        assert presigned_url['s3Uri'] == "s3://pipeline-cache/byob-icav2/b.fastq.gz"
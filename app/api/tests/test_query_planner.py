@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+"""
+Property-based tests for the fastq list query planner.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools.globals import DYNAMODB_IN_CONDITION_MAX_VALUES
+from fastq_manager_api_tools.planner import (
+    FastqQueryPredicate,
+    plan_fastq_query,
+    estimate_rows,
+    query_plan_to_str,
+)
+
+
+# Strategies for generating random data
+instrument_run_id_strategy = st.from_regex(r"[0-9]{6}_[A-Z0-9]{6}_[0-9]{4}_[A-Z0-9]{10}", fullmatch=True)
+library_orcabus_id_strategy = st.from_regex(r"lib\.[A-Z0-9]{26}", fullmatch=True)
+# Cheap to generate in the hundreds (a regex per id is too slow for hypothesis)
+numbered_library_orcabus_id_strategy = st.integers(min_value=0, max_value=10 ** 26 - 1).map(
+    lambda n_iter_: f"lib.{n_iter_:026d}"
+)
+
+
+def instrument_predicate(instrument_run_ids, attr_filters=None) -> FastqQueryPredicate:
+    return FastqQueryPredicate(
+        key_attr="instrument_run_id",
+        key_values=instrument_run_ids,
+        attr_filters=attr_filters if attr_filters is not None else {},
+    )
+
+
+def library_predicate(library_orcabus_ids) -> FastqQueryPredicate:
+    return FastqQueryPredicate(
+        key_attr="library_orcabus_id",
+        key_values=library_orcabus_ids,
+        attr_filters={},
+    )
+
+
+class TestDrivingIndexSelection:
+    """
+    The planner only runs the index query with the lowest estimated row count
+    """
+
+    @given(
+        instrument_run_ids=st.lists(instrument_run_id_strategy, min_size=1, max_size=5, unique=True),
+        library_orcabus_ids=st.lists(library_orcabus_id_strategy, min_size=1, max_size=20, unique=True),
+    )
+    @settings(max_examples=50)
+    def test_library_drives_over_instrument_run(self, instrument_run_ids, library_orcabus_ids):
+        query_plan = plan_fastq_query([
+            instrument_predicate(instrument_run_ids),
+            library_predicate(library_orcabus_ids),
+        ])
+
+        # A handful of libraries is always cheaper than reading a whole run
+        assert query_plan['index_query']['index_name'] == "library_orcabus_id-index"
+        assert query_plan['index_query']['key_values'] == library_orcabus_ids
+        # The instrument run predicate is pushed down as a filter, no join required
+        assert query_plan['index_query']['filter_condition'] is not None
+        assert query_plan['id_join_queries'] == []
+        assert query_plan['estimated_rows'] == estimate_rows(library_predicate(library_orcabus_ids))
+
+    @given(
+        instrument_run_ids=st.lists(instrument_run_id_strategy, min_size=1, max_size=5, unique=True),
+        library_orcabus_ids=st.lists(library_orcabus_id_strategy, min_size=1, max_size=5, unique=True),
+        lane_list=st.lists(st.integers(min_value=1, max_value=8), min_size=1, max_size=8, unique=True),
+    )
+    @settings(max_examples=50)
+    def test_attr_filters_off_the_driving_index_are_joined(
+            self, instrument_run_ids, library_orcabus_ids, lane_list
+    ):
+        query_plan = plan_fastq_query([
+            instrument_predicate(instrument_run_ids, {"lane": lane_list}),
+            library_predicate(library_orcabus_ids),
+        ])
+
+        # Lane is only projected into the instrument run id index, so we need to join on the id
+        if query_plan['index_query']['index_name'] == "library_orcabus_id-index":
+            assert len(query_plan['id_join_queries']) == 1
+            assert query_plan['id_join_queries'][0]['index_name'] == "instrument_run_id-index"
+        else:
+            assert query_plan['id_join_queries'] == []
+
+    @given(
+        library_orcabus_ids=st.lists(
+            numbered_library_orcabus_id_strategy,
+            # Enough libraries that reading the run is cheaper, and too many values for an IN condition
+            min_size=max(DYNAMODB_IN_CONDITION_MAX_VALUES + 1, 130),
+            max_size=max(DYNAMODB_IN_CONDITION_MAX_VALUES + 10, 140),
+            unique=True
+        ),
+        instrument_run_id=instrument_run_id_strategy,
+    )
+    @settings(max_examples=10)
+    def test_large_value_lists_are_filtered_in_memory(self, library_orcabus_ids, instrument_run_id):
+        query_plan = plan_fastq_query([
+            instrument_predicate([instrument_run_id]),
+            library_predicate(library_orcabus_ids),
+        ])
+
+        assert query_plan['index_query']['index_name'] == "instrument_run_id-index"
+        assert query_plan['in_memory_filters'] == {"library_orcabus_id": library_orcabus_ids}
+        assert "library_orcabus_id" in query_plan['attributes']
+        assert "inMemory=library_orcabus_id" in query_plan_to_str(query_plan)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+"""
+Golden output tests for the single pass serializers (models/serializers.py).
+
+The response models (FastqResponse, FastqSetResponse) are the reference implementation,
+the single pass serializers must produce byte-identical json (key order included).
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+
+import json
+from datetime import datetime
+
+import orjson
+import pytest
+from hypothesis import HealthCheck, given, settings
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools.cache import update_cache
+from fastq_manager_api_tools.models.fastq import FastqData, FastqResponse
+from fastq_manager_api_tools.models.fastq_set import FastqSetData, FastqSetResponse
+
+
+@pytest.fixture(scope="module", autouse=True)
+def local_event_bus():
+    # Use the local event bus so that to_dict reads s3 details from the cache only
+    # (patched for this module's tests only, the other test modules expect a real event bus)
+    with mock.patch.dict(os.environ, {"EVENT_BUS_NAME": "local"}):
+        yield
+
+
+# Strategies for generating random data
+ulid_strategy = st.from_regex(r"[0-9A-Z]{26}", fullmatch=True)
+ingest_id_strategy = st.uuids().map(str)
+optional = lambda strategy: st.one_of(st.none(), strategy)
+decimal_strategy = st.decimals(min_value=0, max_value=1000, places=4, allow_nan=False, allow_infinity=False)
+
+
+@st.composite
+def library_strategy(draw):
+    return {
+        "orcabus_id": f"lib.{draw(ulid_strategy)}",
+        "library_id": draw(st.from_regex(r"L[0-9]{7}", fullmatch=True)),
+    }
+
+
+@st.composite
+def fastq_storage_object_strategy(draw):
+    return {
+        "ingest_id": draw(ingest_id_strategy),
+        "gzip_compression_size_in_bytes": draw(optional(st.integers(min_value=0, max_value=10 ** 12))),
+        "raw_md5sum": draw(optional(st.from_regex(r"[0-9a-f]{32}", fullmatch=True))),
+    }
+
+
+@st.composite
+def qc_strategy(draw):
+    qc = {
+        "insert_size_estimate": draw(decimal_strategy),
+        "raw_wgs_coverage_estimate": draw(decimal_strategy),
+        "r1_q20_fraction": draw(decimal_strategy),
+        "r2_q20_fraction": draw(decimal_strategy),
+        "r1_gc_fraction": draw(decimal_strategy),
+        "r2_gc_fraction": draw(decimal_strategy),
+        "duplication_fraction_estimate": draw(decimal_strategy),
+        "sequali_reports": None,
+    }
+    if draw(st.booleans()):
+        qc["sequali_reports"] = {
+            "sequali_html": {"ingest_id": draw(ingest_id_strategy)},
+            "sequali_parquet": {"ingest_id": draw(ingest_id_strategy)},
+            "multiqc_html": {"ingest_id": draw(ingest_id_strategy)},
+            "multiqc_parquet": {"ingest_id": draw(ingest_id_strategy)},
+        }
+    return qc
+
+
+@st.composite
+def fastq_data_strategy(draw, library=None, fastq_set_id=None):
+    return FastqData(**{
+        "id": f"fqr.{draw(ulid_strategy)}",
+        "fastq_set_id": fastq_set_id if fastq_set_id is not None else draw(optional(st.just(f"fqs.{draw(ulid_strategy)}"))),
+        "index": draw(st.from_regex(r"[ACGT]{8}\+[ACGT]{8}", fullmatch=True)),
+        "lane": draw(st.integers(min_value=1, max_value=8)),
+        "instrument_run_id": draw(st.from_regex(r"[0-9]{6}_A[0-9]{5}_[0-9]{4}_[A-Z0-9]{10}", fullmatch=True)),
+        "library": library if library is not None else draw(library_strategy()),
+        "platform": draw(optional(st.just("Illumina"))),
+        "center": draw(optional(st.sampled_from(["UMCCR", "CCGCM", "AGRF"]))),
+        "date": draw(optional(st.datetimes(min_value=datetime(2015, 1, 1), max_value=datetime(2030, 1, 1)))),
+        "read_set": draw(optional(st.fixed_dictionaries({
+            "r1": fastq_storage_object_strategy(),
+            "r2": optional(fastq_storage_object_strategy()),
+            "compression_format": optional(st.sampled_from(["ORA", "GZIP"])),
+        }))),
+        "qc": draw(optional(qc_strategy())),
+        "read_count": draw(optional(st.integers(min_value=0, max_value=10 ** 10))),
+        "base_count_est": draw(optional(st.integers(min_value=0, max_value=10 ** 12))),
+        "is_valid": draw(optional(st.booleans())),
+        "ntsm": draw(optional(st.fixed_dictionaries({"ingest_id": ingest_id_strategy}))),
+    })
+
+
+@st.composite
+def fastq_set_strategy(draw):
+    library = draw(library_strategy())
+    fastq_set_id = f"fqs.{draw(ulid_strategy)}"
+    fastq_list = draw(st.lists(
+        fastq_data_strategy(library=library, fastq_set_id=fastq_set_id),
+        min_size=1, max_size=4, unique_by=lambda fastq_iter_: fastq_iter_.id
+    ))
+    fastq_set = FastqSetData(**{
+        "id": fastq_set_id,
+        "library": library,
+        "fastq_set_ids": list(map(lambda fastq_iter_: fastq_iter_.id, fastq_list)),
+        "allow_additional_fastq": draw(optional(st.booleans())),
+        "is_current_fastq_set": draw(optional(st.booleans())),
+        "somalier": draw(optional(st.fixed_dictionaries({"ingest_id": ingest_id_strategy}))),
+    })
+    return fastq_set, fastq_list
+
+
+def get_ingest_ids(fastq_obj: FastqData):
+    ingest_ids = []
+    if fastq_obj.read_set is not None:
+        ingest_ids.append(fastq_obj.read_set.r1.ingest_id)
+        if fastq_obj.read_set.r2 is not None:
+            ingest_ids.append(fastq_obj.read_set.r2.ingest_id)
+    if fastq_obj.ntsm is not None:
+        ingest_ids.append(fastq_obj.ntsm.ingest_id)
+    if fastq_obj.qc is not None and fastq_obj.qc.sequali_reports is not None:
+        ingest_ids.extend([
+            fastq_obj.qc.sequali_reports.sequali_html.ingest_id,
+            fastq_obj.qc.sequali_reports.sequali_parquet.ingest_id,
+            fastq_obj.qc.sequali_reports.multiqc_html.ingest_id,
+            fastq_obj.qc.sequali_reports.multiqc_parquet.ingest_id,
+        ])
+    return ingest_ids
+
+
+def populate_cache(ingest_ids, with_sha256: bool, ora: bool):
+    for ingest_id in ingest_ids:
+        file_object = {
+            "bucket": "test-bucket",
+            "key": f"fastq/{ingest_id}.fastq" + (".ora" if ora else ".gz"),
+            "storageClass": "Standard",
+        }
+        if with_sha256:
+            file_object["sha256"] = "0" * 64
+        update_cache(ingest_id, file_object)
+
+
+def reference_fastq_dict(fastq_obj: FastqData, include_s3_details: bool):
+    # The multi-hop response model serialization
+    return FastqResponse(
+        **fastq_obj.model_dump(
+            exclude={"rgid_ext", "library_orcabus_id"},
+        )
+    ).model_dump(
+        include_s3_details=include_s3_details, by_alias=True
+    )
+
+
+def reference_fastq_set_dict(fastq_set_obj: FastqSetData, fastq_list, include_s3_details: bool):
+    fastq_set_dict = dict(
+        **fastq_set_obj.model_dump(
+            exclude={"library_orcabus_id"}
+        )
+    )
+    fastq_set_dict['fastq_set'] = list(map(
+        lambda fastq_obj_iter_: reference_fastq_dict(fastq_obj_iter_, include_s3_details=False),
+        fastq_list
+    ))
+    del fastq_set_dict['fastq_set_ids']
+    return FastqSetResponse(
+        **fastq_set_dict
+    ).model_dump(
+        include_s3_details=include_s3_details,
+        by_alias=True
+    )
+
+
+def assert_byte_identical(actual, expected):
+    assert json.dumps(actual) == json.dumps(expected)
+    assert orjson.dumps(actual) == orjson.dumps(expected)
+
+
+class TestFastqSerializer:
+    """
+    FastqData.to_dict is byte-identical to the FastqResponse.model_dump output
+    """
+
+    @given(fastq_obj=fastq_data_strategy())
+    @settings(max_examples=200)
+    def test_to_dict_without_s3_details(self, fastq_obj):
+        assert_byte_identical(
+            fastq_obj.to_dict(),
+            reference_fastq_dict(fastq_obj, include_s3_details=False)
+        )
+
+    @given(fastq_obj=fastq_data_strategy(), with_sha256=st.booleans(), ora=st.booleans())
+    @settings(max_examples=200)
+    def test_to_dict_with_s3_details(self, fastq_obj, with_sha256, ora):
+        populate_cache(get_ingest_ids(fastq_obj), with_sha256=with_sha256, ora=ora)
+
+        assert_byte_identical(
+            fastq_obj.to_dict(include_s3_details=True),
+            reference_fastq_dict(fastq_obj, include_s3_details=True)
+        )
+
+
+class TestFastqSetSerializer:
+    """
+    FastqSetData.to_dict is byte-identical to the FastqSetResponse.model_dump output
+    """
+
+    # Each fastq set draws up to four fully populated fastqs, so generation is slow
+    @given(fastq_set_and_fastqs=fastq_set_strategy(), include_s3_details=st.booleans())
+    @settings(max_examples=100, suppress_health_check=[HealthCheck.too_slow], deadline=None)
+    def test_to_dict(self, fastq_set_and_fastqs, include_s3_details):
+        fastq_set_obj, fastq_list = fastq_set_and_fastqs
+        fastq_data_map = dict(map(lambda fastq_iter_: (fastq_iter_.id, fastq_iter_), fastq_list))
+
+        if include_s3_details:
+            populate_cache(
+                [ingest_id for fastq_obj in fastq_list for ingest_id in get_ingest_ids(fastq_obj)] +
+                ([fastq_set_obj.somalier.ingest_id] if fastq_set_obj.somalier is not None else []),
+                with_sha256=True, ora=False
+            )
+
+        assert_byte_identical(
+            fastq_set_obj.to_dict(include_s3_details=include_s3_details, fastq_data_map=fastq_data_map),
+            reference_fastq_set_dict(fastq_set_obj, fastq_list, include_s3_details=include_s3_details)
+        )
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+
+"""
+Tests for transactional writes, conditional writes are committed together (in transactions of at most 100 writes),
+a failed condition writes nothing, and events are only sent once the transaction commits.
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+import pytest
+from boto3.dynamodb.conditions import Attr
+from botocore.exceptions import ClientError
+from fastapi.routing import HTTPException
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools.events import events
+from fastq_manager_api_tools.globals import DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS
+from fastq_manager_api_tools.models.fastq import FastqData
+from fastq_manager_api_tools.models.fastq_set import FastqSetData
+from fastq_manager_api_tools.transactions import (
+    write_transaction, save_if_not_exists, save_if_unchanged, delete_if_unchanged, condition_check,
+    TransactionConflictError
+)
+
+library = {"orcabus_id": f"lib.{'A' * 26}", "library_id": "L2400001"}
+
+
+def get_fastq_obj(fastq_index: int, **kwargs) -> FastqData:
+    return FastqData(**{
+        "id": f"fqr.{fastq_index:026d}",
+        "index": "ACGTACGT",
+        "lane": 1,
+        "instrument_run_id": "241024_A00130_0336_BHW7MVDSXC",
+        "library": library,
+        **kwargs
+    })
+
+
+def get_cancelled_error() -> ClientError:
+    return ClientError(
+        {
+            "Error": {"Code": "TransactionCanceledException", "Message": "Transaction cancelled"},
+            "CancellationReasons": [{"Code": "None"}, {"Code": "ConditionalCheckFailed"}],
+        },
+        "TransactWriteItems"
+    )
+
+
+class TestWriteTransaction:
+    def setup_method(self):
+        events.start_request_event_buffer()
+
+    def teardown_method(self):
+        events.REQUEST_EVENT_BUFFER.set(None)
+
+    def run_write_transaction(self, write_func, transact_write_items_side_effect=None):
+        client_mock = mock.MagicMock()
+        client_mock.transact_write_items.side_effect = transact_write_items_side_effect
+        with (
+            mock.patch.dict(os.environ, {"EVENT_OUTBOX_ENABLED": "false"}),
+            mock.patch.object(FastqData, "_dynamodb_client", return_value=client_mock),
+            mock.patch.object(FastqSetData, "_dynamodb_client", return_value=client_mock),
+            write_transaction(),
+        ):
+            write_func()
+        return list(map(
+            lambda call_iter_: call_iter_.kwargs["TransactItems"],
+            client_mock.transact_write_items.call_args_list
+        ))
+
+    def test_writes_are_conditional(self):
+        fastq_obj = get_fastq_obj(1, version=2)
+        fastq_set_obj = FastqSetData(library=library, fastq_set_ids=[fastq_obj.id], version=5)
+
+        def write_func():
+            save_if_unchanged(fastq_obj)
+            save_if_not_exists(FastqSetData(library=library, fastq_set_ids=[fastq_obj.id]))
+            delete_if_unchanged(fastq_set_obj)
+            condition_check(FastqSetData, f"fqs.{'1' * 26}", Attr('is_current_fastq_set').eq(False))
+
+        transact_items_list = self.run_write_transaction(write_func)
+
+        # A single transaction
+        assert len(transact_items_list) == 1
+        put_fastq, put_fastq_set, delete_fastq_set, check_fastq_set = transact_items_list[0]
+
+        # The condition is on the version read, not the version written
+        assert put_fastq["Put"]["Item"]["version"] == {"N": "3"}
+        assert {"N": "2"} in put_fastq["Put"]["ExpressionAttributeValues"].values()
+        assert "attribute_not_exists" in put_fastq_set["Put"]["ConditionExpression"]
+        assert {"N": "5"} in delete_fastq_set["Delete"]["ExpressionAttributeValues"].values()
+        assert check_fastq_set["ConditionCheck"]["Key"] == {"id": {"S": f"fqs.{'1' * 26}"}}
+
+    @given(write_count=st.integers(min_value=1, max_value=250))
+    @settings(max_examples=10, deadline=None)
+    def test_chunked(self, write_count):
+        def write_func():
+            for fastq_index in range(write_count):
+                save_if_not_exists(get_fastq_obj(fastq_index))
+
+        transact_items_list = self.run_write_transaction(write_func)
+
+        assert sum(map(len, transact_items_list)) == write_count
+        assert all(map(
+            lambda transact_items_iter_: len(transact_items_iter_) <= DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS,
+            transact_items_list
+        ))
+
+    def test_events_are_sent_once_committed(self):
+        def write_func():
+            save_if_unchanged(get_fastq_obj(1))
+            events.put_event("FastqStateChange", "FASTQ_SET_UPDATED", {"id": "1"})
+            # Held back until the transaction commits
+            assert outer_event_buffer == []
+
+        outer_event_buffer = events.REQUEST_EVENT_BUFFER.get()
+        self.run_write_transaction(write_func)
+
+        assert len(outer_event_buffer) == 1
+        assert events.REQUEST_EVENT_BUFFER.get() is outer_event_buffer
+
+    def test_conflict_writes_nothing(self):
+        def write_func():
+            save_if_unchanged(get_fastq_obj(1))
+            events.put_event("FastqStateChange", "FASTQ_SET_UPDATED", {"id": "1"})
+
+        outer_event_buffer = events.REQUEST_EVENT_BUFFER.get()
+        with pytest.raises(TransactionConflictError):
+            self.run_write_transaction(write_func, transact_write_items_side_effect=get_cancelled_error())
+
+        # The events of the failed transaction are dropped
+        assert outer_event_buffer == []
+
+    def test_conflict_keeps_the_versions_read(self):
+        fastq_obj = get_fastq_obj(1, version=2)
+        fastq_set_obj = FastqSetData(library=library, fastq_set_ids=[fastq_obj.id], version=5)
+
+        def write_func():
+            save_if_unchanged(fastq_obj)
+            fastq_obj.read_count = 100
+            save_if_unchanged(fastq_obj)
+            delete_if_unchanged(fastq_set_obj)
+
+        with pytest.raises(TransactionConflictError):
+            self.run_write_transaction(write_func, transact_write_items_side_effect=get_cancelled_error())
+
+        assert fastq_obj.version == 2
+        assert fastq_set_obj.version == 5
+
+    def test_committed_chunks_keep_their_versions(self):
+        fastq_obj_list = list(map(
+            lambda fastq_index_iter_: get_fastq_obj(fastq_index_iter_, version=1),
+            range(DYNAMODB_TRANSACT_WRITE_ITEMS_MAX_ITEMS + 1)
+        ))
+
+        def write_func():
+            for fastq_obj in fastq_obj_list:
+                save_if_unchanged(fastq_obj)
+
+        # The first chunk commits, the second is cancelled
+        with pytest.raises(TransactionConflictError):
+            self.run_write_transaction(write_func, transact_write_items_side_effect=[None, get_cancelled_error()])
+
+        assert all(map(lambda fastq_obj_iter_: fastq_obj_iter_.version == 2, fastq_obj_list[:-1]))
+        assert fastq_obj_list[-1].version == 1
+
+    def test_fastq_saves_are_conditional_on_version(self):
+        def write_func():
+            get_fastq_obj(1, version=2).save()
+            get_fastq_obj(2).save()
+
+        put_read_fastq, put_new_fastq = self.run_write_transaction(write_func)[0]
+
+        # A fastq read at a version may only overwrite that version
+        assert put_read_fastq["Put"]["Item"]["version"] == {"N": "3"}
+        assert {"N": "2"} in put_read_fastq["Put"]["ExpressionAttributeValues"].values()
+        # A new fastq may not overwrite a versioned fastq
+        assert put_new_fastq["Put"]["Item"]["version"] == {"N": "1"}
+        assert "attribute_not_exists" in put_new_fastq["Put"]["ConditionExpression"]
+
+    def test_nested_transactions_join(self):
+        def write_func():
+            save_if_unchanged(get_fastq_obj(1))
+            with write_transaction():
+                save_if_unchanged(get_fastq_obj(2))
+
+        assert list(map(len, self.run_write_transaction(write_func))) == [2]
+
+
+def test_condition_check_requires_a_transaction():
+    with pytest.raises(ValueError):
+        condition_check(FastqSetData, f"fqs.{'1' * 26}", Attr('is_current_fastq_set').eq(False))
+
+
+class TestFastqSetFlagRoutes:
+    """
+    Setting a fastq set flag is conditional on the version read, and on the other fastq sets of the library
+    """
+    def run_set_is_current_fastq_set(self, transact_write_items_side_effect=None):
+        from fastq_manager_api_tools.api.v1.routers import fastq_set as fastq_set_router
+
+        fastq_set_obj = FastqSetData(
+            library=library, fastq_set_ids=[f"fqr.{'1' * 26}"], is_current_fastq_set=False, version=3
+        )
+        other_fastq_set_id = f"fqs.{'2' * 26}"
+        client_mock = mock.MagicMock()
+        client_mock.transact_write_items.side_effect = transact_write_items_side_effect
+        with (
+            mock.patch.dict(os.environ, {"EVENT_OUTBOX_ENABLED": "false"}),
+            mock.patch.object(FastqSetData, "get", return_value=fastq_set_obj),
+            mock.patch.object(FastqSetData, "to_dict", return_value={"id": fastq_set_obj.id}),
+            mock.patch.object(FastqSetData, "_dynamodb_client", return_value=client_mock),
+            mock.patch.object(fastq_set_router, "put_fastq_set_update_event"),
+            mock.patch.object(
+                fastq_set_router, "query_index_items",
+                return_value=[
+                    {"id": fastq_set_obj.id},
+                    {"id": other_fastq_set_id, "is_current_fastq_set": False},
+                ]
+            ),
+        ):
+            try:
+                fastq_set_router.set_is_current_fastq_set(fastq_set_obj.id)
+                http_exception = None
+            except HTTPException as e:
+                http_exception = e
+
+        # The transaction is written whether or not it is cancelled
+        client_mock.transact_write_items.assert_called_once()
+        return (
+            client_mock.transact_write_items.call_args.kwargs["TransactItems"],
+            other_fastq_set_id,
+            http_exception
+        )
+
+    @staticmethod
+    def assert_transact_items(transact_items, other_fastq_set_id: str):
+        (check_other_fastq_set, put_fastq_set) = transact_items
+        assert check_other_fastq_set["ConditionCheck"]["Key"] == {"id": {"S": other_fastq_set_id}}
+        assert put_fastq_set["Put"]["Item"]["is_current_fastq_set"] == {"BOOL": True}
+        assert {"N": "3"} in put_fastq_set["Put"]["ExpressionAttributeValues"].values()
+
+    def test_set_is_current_fastq_set(self):
+        transact_items, other_fastq_set_id, http_exception = self.run_set_is_current_fastq_set()
+
+        assert http_exception is None
+        self.assert_transact_items(transact_items, other_fastq_set_id)
+
+    def test_conflict_is_a_409(self):
+        transact_items, other_fastq_set_id, http_exception = self.run_set_is_current_fastq_set(
+            transact_write_items_side_effect=get_cancelled_error()
+        )
+
+        assert http_exception is not None and http_exception.status_code == 409
+        self.assert_transact_items(transact_items, other_fastq_set_id)
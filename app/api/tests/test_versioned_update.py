@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the partial, versioned update write path, only the changed attributes are written,
+and a version conflict re-applies the change to the latest item.
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Set required environment variables before any model imports
+os.environ["DYNAMODB_FASTQ_SET_JOB_TABLE_NAME"] = "test_fastq_set_job_table"
+os.environ["DYNAMODB_HOST"] = "http://localhost:8456"
+os.environ["DYNAMODB_FASTQ_TABLE_NAME"] = "test_fastq_table"
+os.environ["DYNAMODB_FASTQ_SET_TABLE_NAME"] = "test_fastq_set_table"
+os.environ["DYNAMODB_FASTQ_JOB_TABLE_NAME"] = "test_fastq_job_table"
+os.environ["DYNAMODB_MULTIQC_JOB_TABLE_NAME"] = "test_multiqc_job_table"
+os.environ["FASTQ_BASE_URL"] = "http://localhost:8457"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["AWS_DEFAULT_REGION"] = "us-east-1"
+os.environ["EVENT_BUS_NAME"] = "test-event-bus"
+os.environ["EVENT_SOURCE"] = "test-source"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE"] = "FastqStateChange"
+os.environ["EVENT_DETAIL_TYPE_FASTQ_SET_ROW_STATE_CHANGE"] = "FastqSetStateChange"
+os.environ["EVENT_DETAIL_TYPE_MULTIQC_JOB_STATE_CHANGE"] = "MultiqcJobStateChange"
+
+# Add Lambda layer paths (fastapi_tools, orcabus_api_tools) to sys.path for testing
+_LAYERS_BASE = Path(__file__).resolve().parents[3] / "node_modules" / ".pnpm"
+_LAYERS_DIRS = list(_LAYERS_BASE.glob(
+    "@orcabus+platform-cdk-constructs*/node_modules/@orcabus/platform-cdk-constructs/lambda/layers"
+))
+if _LAYERS_DIRS:
+    _layers_dir = _LAYERS_DIRS[0]
+    for _layer in ["fastapi_tools", "orcabus_api_tools"]:
+        _layer_src = _layers_dir / _layer / "src"
+        if _layer_src.exists() and str(_layer_src) not in sys.path:
+            sys.path.insert(0, str(_layer_src))
+import pytest
+from botocore.exceptions import ClientError
+from dyntastic import transaction
+from hypothesis import given
+from hypothesis import strategies as st
+
+from fastq_manager_api_tools import versioned_update
+from fastq_manager_api_tools.models.fastq import FastqData
+from fastq_manager_api_tools.versioned_update import (
+    get_update_kwargs, update_attributes, update_with_retry, VersionConflictError
+)
+
+library = {"orcabus_id": f"lib.{'A' * 26}", "library_id": "L2400001"}
+fastq_id = f"fqr.{'0' * 26}"
+
+
+def get_fastq_obj(**kwargs) -> FastqData:
+    return FastqData(**{
+        "id": fastq_id,
+        "index": "ACGTACGT",
+        "lane": 1,
+        "instrument_run_id": "241024_A00130_0336_BHW7MVDSXC",
+        "library": library,
+        **kwargs
+    })
+
+
+def get_conflict_error() -> ClientError:
+    return ClientError(
+        {"Error": {"Code": "ConditionalCheckFailedException", "Message": "The conditional request failed"}},
+        "UpdateItem"
+    )
+
+
+class TestUpdateKwargs:
+    @given(read_count=st.integers(min_value=0, max_value=10 ** 9), version=st.integers(min_value=0, max_value=1000))
+    def test_only_changed_attributes_are_set(self, read_count, version):
+        fastq_obj = get_fastq_obj(read_count=read_count, version=version)
+        update_kwargs = get_update_kwargs(fastq_obj, ["read_count"])
+
+        assert update_kwargs["Key"] == {"id": fastq_id}
+        assert update_kwargs["UpdateExpression"] == "SET #updversion = :updversion, #upd0 = :upd0"
+        assert update_kwargs["ExpressionAttributeNames"] == {"#upd0": "read_count", "#updversion": "version"}
+        assert update_kwargs["ExpressionAttributeValues"] == {":upd0": read_count, ":updversion": version + 1}
+
+    def test_none_is_removed(self):
+        update_kwargs = get_update_kwargs(get_fastq_obj(read_set=None), ["read_set"])
+
+        assert update_kwargs["UpdateExpression"] == "SET #updversion = :updversion REMOVE #upd0"
+        assert ":upd0" not in update_kwargs["ExpressionAttributeValues"]
+
+
+class TestUpdateAttributes:
+    def test_returns_the_updated_item(self):
+        fastq_obj = get_fastq_obj(version=3, is_valid=False)
+        table_mock = mock.MagicMock()
+        table_mock.update_item.return_value = {
+            "Attributes": {**fastq_obj.model_dump(), "is_valid": True, "version": 4}
+        }
+
+        with (
+            mock.patch.dict(os.environ, {"EVENT_OUTBOX_ENABLED": "false"}),
+            mock.patch.object(FastqData, "_dynamodb_table", return_value=table_mock),
+        ):
+            fastq_obj.is_valid = True
+            updated_fastq_obj = update_attributes(fastq_obj, ["is_valid"])
+
+        assert updated_fastq_obj.is_valid is True
+        assert updated_fastq_obj.version == 4
+        assert table_mock.update_item.call_args.kwargs["ReturnValues"] == "ALL_NEW"
+
+    def test_joins_the_transaction(self):
+        fastq_obj = get_fastq_obj(version=3)
+        table_mock = mock.MagicMock()
+
+        with (
+            mock.patch.object(FastqData, "_dynamodb_table", return_value=table_mock),
+            mock.patch.object(FastqData, "_dynamodb_client") as client_mock,
+            transaction(),
+        ):
+            fastq_obj.is_valid = True
+            updated_fastq_obj = update_attributes(fastq_obj, ["is_valid"])
+
+        table_mock.update_item.assert_not_called()
+        transact_items = client_mock.return_value.transact_write_items.call_args.kwargs["TransactItems"]
+        assert len(transact_items) == 1
+        assert transact_items[0]["Update"]["ExpressionAttributeValues"][":updversion"] == {"N": "4"}
+        assert updated_fastq_obj.version == 4
+
+
+class TestNextVersion:
+    def test_failed_save_keeps_the_version_read(self):
+        fastq_obj = get_fastq_obj(version=3)
+        table_mock = mock.MagicMock()
+        table_mock.put_item.side_effect = get_conflict_error()
+
+        with (
+            mock.patch.object(FastqData, "_dynamodb_table", return_value=table_mock),
+            pytest.raises(ClientError),
+        ):
+            fastq_obj.save()
+
+        # The item written was at the next version, the data object is still at the version read
+        assert table_mock.put_item.call_args.kwargs["Item"]["version"] == 4
+        assert fastq_obj.version == 3
+
+    def test_save_increments_the_version(self):
+        fastq_obj = get_fastq_obj(version=3)
+
+        with mock.patch.object(FastqData, "_dynamodb_table"):
+            fastq_obj.save()
+
+        assert fastq_obj.version == 4
+
+
+class TestUpdateWithRetry:
+    def run_update_with_retry(self, update_item_side_effect, fastq_obj_list):
+        table_mock = mock.MagicMock()
+        table_mock.update_item.side_effect = update_item_side_effect
+        applied_read_counts = []
+
+        def apply_update(fastq_obj: FastqData):
+            applied_read_counts.append(fastq_obj.read_count)
+            fastq_obj.base_count_est = 100
+            return ["base_count_est"]
+
+        with (
+            mock.patch.dict(os.environ, {"EVENT_OUTBOX_ENABLED": "false"}),
+            mock.patch.object(FastqData, "_dynamodb_table", return_value=table_mock),
+            mock.patch.object(FastqData, "get", side_effect=fastq_obj_list) as get_mock,
+            mock.patch.object(versioned_update, "sleep"),
+        ):
+            result = update_with_retry(FastqData, fastq_id, apply_update)
+
+        return result, applied_read_counts, table_mock, get_mock
+
+    def test_conflict_reapplies_to_the_latest_item(self):
+        # Another writer added a read count between our read and our write
+        stale_fastq_obj = get_fastq_obj(version=1)
+        latest_fastq_obj = get_fastq_obj(version=2, read_count=50)
+
+        result, applied_read_counts, table_mock, get_mock = self.run_update_with_retry(
+            [
+                get_conflict_error(),
+                {"Attributes": {**latest_fastq_obj.model_dump(), "base_count_est": 100, "version": 3}},
+            ],
+            [stale_fastq_obj, latest_fastq_obj]
+        )
+
+        assert applied_read_counts == [None, 50]
+        assert get_mock.call_count == 2
+        assert table_mock.update_item.call_args_list[1].kwargs["ExpressionAttributeValues"][":updversion"] == 3
+        # The other writer's change is kept
+        assert result.read_count == 50
+        assert result.base_count_est == 100
+
+    def test_gives_up_after_max_attempts(self):
+        with pytest.raises(VersionConflictError):
+            self.run_update_with_retry(
+                get_conflict_error(),
+                list(map(
+                    lambda version_iter_: get_fastq_obj(version=version_iter_),
+                    range(versioned_update.DYNAMODB_VERSIONED_UPDATE_MAX_ATTEMPTS)
+                ))
+            )
+
+    def test_other_errors_are_not_retried(self):
+        throttled_error = ClientError(
+            {"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "Throttled"}},
+            "UpdateItem"
+        )
+        with pytest.raises(ClientError):
+            self.run_update_with_retry(throttled_error, [get_fastq_obj(version=1)])
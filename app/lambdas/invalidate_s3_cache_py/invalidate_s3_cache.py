@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+"""
+Invalidate the shared s3 details cache
+
+The api keeps the file manager s3 details of each ingest id in a shared DynamoDB table (with a ttl).
+When an object is moved (deleted from its old key), or its storage class changes (i.e archived or restored),
+the cached s3 details are out of date, so we remove the cached entries for that s3 uri.
+
+S3 events do not carry the ingest id, so entries are found through the s3_uri index of the cache table.
+
+Triggered by the S3 'Object Deleted', 'Object Storage Class Changed' and 'Object Restore Completed' events.
+"""
+
+# Standard imports
+import typing
+from os import environ
+from typing import List
+from urllib.parse import unquote_plus
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_dynamodb.service_resource import Table
+
+S3_URI_INDEX_NAME = "s3_uri-index"
+
+
+def get_s3_cache_table() -> 'Table':
+    return boto3.resource('dynamodb').Table(environ['DYNAMODB_S3_CACHE_TABLE_NAME'])
+
+
+def get_ingest_ids_from_s3_uri(s3_uri: str) -> List[str]:
+    ingest_ids = []
+    query_kwargs = {
+        "IndexName": S3_URI_INDEX_NAME,
+        "KeyConditionExpression": Key('s3_uri').eq(s3_uri),
+    }
+    while True:
+        response = get_s3_cache_table().query(**query_kwargs)
+        ingest_ids.extend(map(lambda item_iter_: item_iter_['id'], response['Items']))
+        if response.get('LastEvaluatedKey') is None:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return ingest_ids
+
+
+def handler(event, context):
+    """
+    Remove any cached entries for the s3 object in the event
+    :param event:
+    :param context:
+    :return:
+    """
+    bucket = event['detail']['bucket']['name']
+    key = event['detail']['object']['key']
+
+    # Keys may be url encoded, check both forms
+    s3_uris = list(dict.fromkeys([
+        f"s3://{bucket}/{key}",
+        f"s3://{bucket}/{unquote_plus(key)}",
+    ]))
+
+    ingest_ids = list(dict.fromkeys(
+        ingest_id
+        for s3_uri in s3_uris
+        for ingest_id in get_ingest_ids_from_s3_uri(s3_uri)
+    ))
+
+    with get_s3_cache_table().batch_writer() as batch:
+        for ingest_id in ingest_ids:
+            batch.delete_item(Key={"id": ingest_id})
+
+    return {
+        "s3Uris": s3_uris,
+        "ingestIds": ingest_ids,
+    }
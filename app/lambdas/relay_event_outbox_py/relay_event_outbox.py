@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+"""
+Relay the event outbox
+
+With the transactional outbox enabled, the api writes its events to the outbox table,
+in the same DynamoDB transaction as the change they describe, rather than sending them to the event bus.
+
+This lambda is triggered by the outbox table stream, it
+  * sends the new outbox items to the event bus, packed into PutEvents calls of at most 10 entries and 256 KB,
+  * retries only the entries that failed (i.e were throttled), with an exponential backoff,
+  * removes the relayed items from the outbox.
+
+Entries that still fail are reported as batch item failures, so the stream retries from the first failed record.
+Delivery is at least once, a retried batch may send an event more than once.
+"""
+
+# Standard imports
+import typing
+from os import environ
+from time import sleep
+from typing import Dict, Iterator, List
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+
+if typing.TYPE_CHECKING:
+    from mypy_boto3_dynamodb.service_resource import Table
+    from mypy_boto3_events import EventBridgeClient
+    from mypy_boto3_events.type_defs import PutEventsRequestEntryTypeDef
+
+PUT_EVENTS_MAX_ENTRIES = 10
+PUT_EVENTS_MAX_SIZE_BYTES = 256 * 1024
+PUT_EVENTS_MAX_ATTEMPTS = 5
+
+_deserializer = TypeDeserializer()
+
+
+def get_event_outbox_table() -> 'Table':
+    return boto3.resource('dynamodb').Table(environ['DYNAMODB_EVENT_OUTBOX_TABLE_NAME'])
+
+
+def get_event_client() -> 'EventBridgeClient':
+    return boto3.client('events')
+
+
+def get_entry_size(entry: 'PutEventsRequestEntryTypeDef') -> int:
+    # https://docs.aws.amazon.com/eventbridge/latest/userguide/eb-putevent-size.html
+    return len(entry['Source'].encode()) + len(entry['DetailType'].encode()) + len(entry['Detail'].encode())
+
+
+def chunk_records(records: List[Dict]) -> Iterator[List[Dict]]:
+    """
+    Pack records, in order, into chunks of at most ten entries and 256 KB
+    :param records:
+    :return:
+    """
+    records_chunk = []
+    records_chunk_size = 0
+    for record in records:
+        entry_size = get_entry_size(record['entry'])
+        if len(records_chunk) > 0 and (
+            len(records_chunk) >= PUT_EVENTS_MAX_ENTRIES or
+            records_chunk_size + entry_size > PUT_EVENTS_MAX_SIZE_BYTES
+        ):
+            yield records_chunk
+            records_chunk = []
+            records_chunk_size = 0
+        records_chunk.append(record)
+        records_chunk_size += entry_size
+    if len(records_chunk) > 0:
+        yield records_chunk
+
+
+def put_records(records_chunk: List[Dict]) -> List[Dict]:
+    """
+    Send the entries of the records, retrying only the entries that failed
+    :param records_chunk:
+    :return: The records that could not be sent
+    """
+    attempts = 0
+    while len(records_chunk) > 0 and attempts < PUT_EVENTS_MAX_ATTEMPTS:
+        if attempts > 0:
+            # Exponential backoff on failed entries
+            sleep(0.05 * (2 ** attempts))
+
+        response = get_event_client().put_events(
+            Entries=list(map(lambda record_iter_: record_iter_['entry'], records_chunk))
+        )
+
+        # Result entries are in the same order as the request entries, failed entries have an error code
+        records_chunk = list(map(
+            lambda record_result_pair_iter_: record_result_pair_iter_[0],
+            filter(
+                lambda record_result_pair_iter_: record_result_pair_iter_[1].get('ErrorCode') is not None,
+                zip(records_chunk, response['Entries'])
+            )
+        ))
+        attempts += 1
+
+    return records_chunk
+
+
+def handler(event, context):
+    """
+    Relay the outbox items inserted into the table
+    :param event:
+    :param context:
+    :return:
+    """
+    records = []
+    for stream_record in event['Records']:
+        # Removed items (relayed, or expired) have nothing to send
+        if stream_record['eventName'] != 'INSERT':
+            continue
+        item = dict(map(
+            lambda kv: (kv[0], _deserializer.deserialize(kv[1])),
+            stream_record['dynamodb']['NewImage'].items()
+        ))
+        records.append({
+            "id": item['id'],
+            "sequenceNumber": stream_record['dynamodb']['SequenceNumber'],
+            "entry": {
+                'EventBusName': item['event_bus_name'],
+                'Source': item['source'],
+                'DetailType': item['detail_type'],
+                'Detail': item['detail'],
+            }
+        })
+
+    # Ulids sort in the order the events were put
+    records.sort(key=lambda record_iter_: record_iter_['id'])
+
+    failed_records = []
+    for records_chunk in chunk_records(records):
+        failed_records.extend(put_records(records_chunk))
+
+    failed_ids = set(map(lambda record_iter_: record_iter_['id'], failed_records))
+
+    with get_event_outbox_table().batch_writer(overwrite_by_pkeys=['id']) as batch:
+        for record in records:
+            if record['id'] not in failed_ids:
+                batch.delete_item(Key={"id": record['id']})
+
+    if len(failed_records) == 0:
+        return {"batchItemFailures": []}
+
+    # The stream retries from the earliest failed record
+    return {
+        "batchItemFailures": [
+            {
+                "itemIdentifier": min(
+                    failed_records,
+                    key=lambda record_iter_: int(record_iter_['sequenceNumber'])
+                )['sequenceNumber']
+            }
+        ]
+    }
@@ -17,17 +17,29 @@ import {
 } from 'aws-cdk-lib/aws-apigatewayv2';
 import { NagSuppressions } from 'cdk-nag';
 import {
+  API_EVENT_PAYLOAD_VERSION,
+  API_METADATA_CACHE_MAX_ENTRIES,
+  API_METADATA_CACHE_TTL_SECONDS,
+  API_PRESIGN_EXPIRY_SECONDS,
+  API_QUERY_CONCURRENCY_LIMIT,
+  API_S3_CACHE_MAX_ENTRIES,
+  API_S3_CACHE_NEGATIVE_TTL_SECONDS,
+  API_S3_CACHE_TTL_SECONDS,
+  API_S3_RESOLVER_CHUNK_SIZE,
   API_SUBDOMAIN_NAME,
   API_VERSION,
+  EVENT_CLAIM_CHECK_PREFIX,
   EVENT_FASTQ_SET_STATE_CHANGE_DETAIL_TYPE,
   EVENT_FASTQ_STATE_CHANGE_DETAIL_TYPE,
   EVENT_MULTIQC_JOB_STATE_CHANGE_DETAIL_TYPE,
   FASTQ_API_GLOBAL_SECONDARY_INDEX_NAMES,
   FASTQ_JOB_GLOBAL_SECONDARY_INDEX_NAMES,
   FASTQ_SET_API_GLOBAL_SECONDARY_INDEX_NAMES,
+  FASTQ_SET_API_SUMMARY_GLOBAL_SECONDARY_INDEX_NAME,
   FASTQ_SET_JOB_GLOBAL_SECONDARY_INDEX_NAMES,
   INTERFACE_DIR,
   MULTIQC_JOB_GLOBAL_SECONDARY_INDEX_NAMES,
+  S3_CACHE_GLOBAL_SECONDARY_INDEX_NAMES,
   STACK_SOURCE,
 } from '../constants';
 import path from 'path';
@@ -56,6 +68,26 @@ export function buildApiInterfaceLambda(scope: Construct, props: LambdaApiProps)
       DYNAMODB_FASTQ_JOB_TABLE_NAME: props.jobsTable.tableName,
       DYNAMODB_MULTIQC_JOB_TABLE_NAME: props.multiqcJobsTable.tableName,
       DYNAMODB_FASTQ_SET_JOB_TABLE_NAME: props.fastqSetJobsTable.tableName,
+      QUERY_CONCURRENCY_LIMIT: API_QUERY_CONCURRENCY_LIMIT.toString(),
+
+      /* S3 details cache env vars */
+      S3_CACHE_MAX_ENTRIES: API_S3_CACHE_MAX_ENTRIES.toString(),
+      S3_CACHE_TTL_SECONDS: API_S3_CACHE_TTL_SECONDS.toString(),
+      S3_CACHE_NEGATIVE_TTL_SECONDS: API_S3_CACHE_NEGATIVE_TTL_SECONDS.toString(),
+      S3_RESOLVER_CHUNK_SIZE: API_S3_RESOLVER_CHUNK_SIZE.toString(),
+      S3_SHARED_CACHE_BACKEND: 'dynamodb',
+      DYNAMODB_S3_CACHE_TABLE_NAME: props.s3CacheTable.tableName,
+
+      /* Metadata lookups cache env vars */
+      METADATA_CACHE_MAX_ENTRIES: API_METADATA_CACHE_MAX_ENTRIES.toString(),
+      METADATA_CACHE_TTL_SECONDS: API_METADATA_CACHE_TTL_SECONDS.toString(),
+      METADATA_SHARED_CACHE_ENABLED: 'true',
+
+      /* Presign env vars */
+      PRESIGN_EXPIRY_SECONDS: API_PRESIGN_EXPIRY_SECONDS.toString(),
+      PRESIGN_LOCAL_S3_URI_PREFIXES: props.presignLocations
+        .map((location) => `s3://${location.bucket.bucketName}/${location.prefix}`)
+        .join(','),
 
       /* SSM and Secrets Manager env vars */
       FASTQ_BASE_URL: `https://${API_SUBDOMAIN_NAME}.${props.hostedZoneSsmParameter.stringValue}`,
@@ -63,6 +95,10 @@ export function buildApiInterfaceLambda(scope: Construct, props: LambdaApiProps)
       /* Event bridge env vars */
       EVENT_BUS_NAME: props.eventBus.eventBusName,
       EVENT_SOURCE: STACK_SOURCE,
+      EVENT_OUTBOX_ENABLED: 'true',
+      DYNAMODB_EVENT_OUTBOX_TABLE_NAME: props.eventOutboxTable.tableName,
+      EVENT_PAYLOAD_VERSION: API_EVENT_PAYLOAD_VERSION,
+      EVENT_CLAIM_CHECK_S3_URI_PREFIX: `s3://${props.eventClaimCheckBucket.bucketName}/${EVENT_CLAIM_CHECK_PREFIX}`,
 
       /* Event detail types */
       EVENT_DETAIL_TYPE_FASTQ_LIST_ROW_STATE_CHANGE: EVENT_FASTQ_STATE_CHANGE_DETAIL_TYPE,
@@ -74,6 +110,20 @@ export function buildApiInterfaceLambda(scope: Construct, props: LambdaApiProps)
   // Give lambda function permissions to put events on the event bus
   props.eventBus.grantPutEventsTo(lambdaApiFunction.currentVersion);
 
+  // Give lambda function permissions to read (and so presign urls for) the presign locations
+  for (const presignLocation of props.presignLocations) {
+    presignLocation.bucket.grantRead(
+      lambdaApiFunction.currentVersion,
+      path.join(presignLocation.prefix, '*')
+    );
+  }
+
+  // Allow the lambda to write the event claim checks
+  props.eventClaimCheckBucket.grantPut(
+    lambdaApiFunction.currentVersion,
+    path.join(EVENT_CLAIM_CHECK_PREFIX, '*')
+  );
+
   // Add in permissions and env vars to the six state machines
   for (const sfnObject of props.stepFunctions) {
     switch (sfnObject.stateMachineName) {
@@ -156,6 +206,8 @@ export function buildApiInterfaceLambda(scope: Construct, props: LambdaApiProps)
   props.jobsTable.grantReadWriteData(lambdaApiFunction.currentVersion);
   props.multiqcJobsTable.grantReadWriteData(lambdaApiFunction.currentVersion);
   props.fastqSetJobsTable.grantReadWriteData(lambdaApiFunction.currentVersion);
+  props.s3CacheTable.grantReadWriteData(lambdaApiFunction.currentVersion);
+  props.eventOutboxTable.grantWriteData(lambdaApiFunction.currentVersion);
 
   // Grant query permissions on indexes
   const fastq_api_table_index_arn_list: string[] = FASTQ_API_GLOBAL_SECONDARY_INDEX_NAMES.map(
@@ -163,10 +215,12 @@ export function buildApiInterfaceLambda(scope: Construct, props: LambdaApiProps)
       return `arn:aws:dynamodb:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:table/${props.fastqTable.tableName}/index/${index_name}-index`;
     }
   );
-  const fastq_set_api_table_index_arn_list: string[] =
-    FASTQ_SET_API_GLOBAL_SECONDARY_INDEX_NAMES.map((index_name) => {
-      return `arn:aws:dynamodb:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:table/${props.fastqSetTable.tableName}/index/${index_name}-index`;
-    });
+  const fastq_set_api_table_index_arn_list: string[] = [
+    ...FASTQ_SET_API_GLOBAL_SECONDARY_INDEX_NAMES,
+    FASTQ_SET_API_SUMMARY_GLOBAL_SECONDARY_INDEX_NAME,
+  ].map((index_name) => {
+    return `arn:aws:dynamodb:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:table/${props.fastqSetTable.tableName}/index/${index_name}-index`;
+  });
   const fastq_job_table_index_arn_list: string[] = FASTQ_JOB_GLOBAL_SECONDARY_INDEX_NAMES.map(
     (index_name) => {
       return `arn:aws:dynamodb:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:table/${props.jobsTable.tableName}/index/${index_name}-index`;
@@ -181,6 +235,11 @@ export function buildApiInterfaceLambda(scope: Construct, props: LambdaApiProps)
     FASTQ_SET_JOB_GLOBAL_SECONDARY_INDEX_NAMES.map((index_name) => {
       return `arn:aws:dynamodb:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:table/${props.fastqSetJobsTable.tableName}/index/${index_name}-index`;
     });
+  const s3_cache_table_index_arn_list: string[] = S3_CACHE_GLOBAL_SECONDARY_INDEX_NAMES.map(
+    (index_name) => {
+      return `arn:aws:dynamodb:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:table/${props.s3CacheTable.tableName}/index/${index_name}-index`;
+    }
+  );
 
   lambdaApiFunction.currentVersion.addToRolePolicy(
     new iam.PolicyStatement({
@@ -191,6 +250,7 @@ export function buildApiInterfaceLambda(scope: Construct, props: LambdaApiProps)
         ...fastq_job_table_index_arn_list,
         ...multiqc_job_table_index_arn_list,
         ...fastq_set_job_table_index_arn_list,
+        ...s3_cache_table_index_arn_list,
       ],
     })
   );
@@ -1,4 +1,5 @@
 import { ITableV2 } from 'aws-cdk-lib/aws-dynamodb';
+import { IBucket } from 'aws-cdk-lib/aws-s3';
 import { IEventBus } from 'aws-cdk-lib/aws-events';
 import { PythonFunction } from '@aws-cdk/aws-lambda-python-alpha';
 import { OrcaBusApiGateway } from '@orcabus/platform-cdk-constructs/api-gateway';
@@ -6,6 +7,11 @@ import { HttpLambdaIntegration } from 'aws-cdk-lib/aws-apigatewayv2-integrations
 import { SfnObject } from '../step-functions/interfaces';
 import { IStringParameter } from 'aws-cdk-lib/aws-ssm/lib/parameter';
 
+export interface PresignLocation {
+  bucket: IBucket;
+  prefix: string;
+}
+
 export interface LambdaApiProps {
   /* The lambda name */
   lambdaName: string;
@@ -21,10 +27,20 @@ export interface LambdaApiProps {
   multiqcJobsTable: ITableV2;
   // FastqSet Jobs
   fastqSetJobsTable: ITableV2;
+  // Shared s3 details cache
+  s3CacheTable: ITableV2;
+  // Transactional event outbox
+  eventOutboxTable: ITableV2;
 
   /* Step Functions */
   stepFunctions: SfnObject[];
 
+  /* Bucket prefixes we may sign presigned urls for locally */
+  presignLocations: PresignLocation[];
+
+  /* Bucket for the event claim checks (delta event payloads over the claim check threshold) */
+  eventClaimCheckBucket: IBucket;
+
   /* Event Bus */
   eventBus: IEventBus;
 
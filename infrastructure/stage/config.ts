@@ -16,6 +16,8 @@ import {
   JOB_API_TABLE_NAME,
   MULTIQC_API_TABLE_NAME,
   NTSM_BUCKET,
+  S3_CACHE_API_TABLE_NAME,
+  EVENT_OUTBOX_API_TABLE_NAME,
   QC_HTML_BUCKET,
   REFERENCE_URIS,
   SITES_URIS,
@@ -64,6 +66,8 @@ export const getStatefulApplicationStackProps = (
     fastqJobApiTableName: JOB_API_TABLE_NAME,
     multiqcJobApiTableName: MULTIQC_API_TABLE_NAME,
     fastqSetJobApiTableName: FASTQ_SET_JOB_API_TABLE_NAME,
+    s3CacheApiTableName: S3_CACHE_API_TABLE_NAME,
+    eventOutboxApiTableName: EVENT_OUTBOX_API_TABLE_NAME,
 
     /* SSM Stuff */
     ssmParameters: {
@@ -98,6 +102,8 @@ export const getStatelessApplicationStackProps = (
     fastqJobApiTableName: JOB_API_TABLE_NAME,
     multiqcJobApiTableName: MULTIQC_API_TABLE_NAME,
     fastqSetJobApiTableName: FASTQ_SET_JOB_API_TABLE_NAME,
+    s3CacheApiTableName: S3_CACHE_API_TABLE_NAME,
+    eventOutboxApiTableName: EVENT_OUTBOX_API_TABLE_NAME,
 
     /* API */
     apiGatewayCognitoProps: {
@@ -17,6 +17,18 @@ export const INTERFACE_DIR = path.join(APP_ROOT, 'api');
 // API Constants
 export const API_VERSION = 'v1';
 export const API_SUBDOMAIN_NAME = 'fastq';
+// Maximum number of concurrent per-key DynamoDB queries / batch gets over a single api request
+export const API_QUERY_CONCURRENCY_LIMIT = 16;
+// S3 details cache (per lambda instance), maximum number of ingest ids and how long to hold each for
+export const API_S3_CACHE_MAX_ENTRIES = 10000;
+export const API_S3_CACHE_TTL_SECONDS = 900;
+export const API_S3_CACHE_NEGATIVE_TTL_SECONDS = 60;
+export const API_S3_RESOLVER_CHUNK_SIZE = 50;
+// Metadata lookups cache (per lambda instance, and held in the shared cache table)
+export const API_METADATA_CACHE_MAX_ENTRIES = 10000;
+export const API_METADATA_CACHE_TTL_SECONDS = 600;
+// Presigned urls are signed with the lambda credentials, so must not outlive them
+export const API_PRESIGN_EXPIRY_SECONDS = 3600;
 export const API_NAME = 'FastqManagerAPI';
 
 // Table constants
@@ -26,6 +38,10 @@ export const FASTQ_SET_API_TABLE_NAME = 'FastqSetDataTable';
 export const JOB_API_TABLE_NAME = 'FastqJobsTable';
 export const MULTIQC_API_TABLE_NAME = 'FastqMultiqcJobsTable';
 export const FASTQ_SET_JOB_API_TABLE_NAME = 'FastqSetJobsTable';
+// Shared cache of the file manager s3 details for each ingest id
+export const S3_CACHE_API_TABLE_NAME = 'FastqS3ObjectCacheTable';
+// Transactional outbox of the events yet to be relayed to the event bus
+export const EVENT_OUTBOX_API_TABLE_NAME = 'FastqEventOutboxTable';
 
 // Table indexes
 export const FASTQ_API_GLOBAL_SECONDARY_INDEX_NAMES = [
@@ -43,18 +59,39 @@ export const FASTQ_SET_API_GLOBAL_SECONDARY_INDEX_NON_KEY_ATTRIBUTE_NAMES = [
   'allow_additional_fastq',
 ];
 
+// The library index, also projecting the fastq set summary,
+// so the current fastq set of a library can be chosen from the index alone.
+// The projection of an existing index cannot be changed, so this is a new index,
+// the library_orcabus_id index is to be dropped in a later deploy, once nothing queries it
+export const FASTQ_SET_API_SUMMARY_GLOBAL_SECONDARY_INDEX_NAME = 'library_orcabus_id_summary';
+export const FASTQ_SET_API_SUMMARY_GLOBAL_SECONDARY_INDEX_PARTITION_KEY = 'library_orcabus_id';
+export const FASTQ_SET_API_SUMMARY_GLOBAL_SECONDARY_INDEX_NON_KEY_ATTRIBUTE_NAMES = [
+  ...FASTQ_SET_API_GLOBAL_SECONDARY_INDEX_NON_KEY_ATTRIBUTE_NAMES,
+  'latest_instrument_run_id',
+  'fastq_count',
+];
+
 export const FASTQ_JOB_GLOBAL_SECONDARY_INDEX_NAMES = ['fastq_id', 'job_type', 'status'];
 
 export const MULTIQC_JOB_GLOBAL_SECONDARY_INDEX_NAMES = ['status'];
 
 export const FASTQ_SET_JOB_GLOBAL_SECONDARY_INDEX_NAMES = ['fastq_set_id'];
 
+// Cached entries are invalidated by s3 uri
+export const S3_CACHE_GLOBAL_SECONDARY_INDEX_NAMES = ['s3_uri'];
+
 // Event Constants
 export const EVENT_BUS_NAME = 'OrcaBusMain';
 export const STACK_SOURCE = 'orcabus.fastqmanager';
 export const EVENT_FASTQ_STATE_CHANGE_DETAIL_TYPE = 'FastqStateChange';
 export const EVENT_FASTQ_SET_STATE_CHANGE_DETAIL_TYPE = 'FastqSetStateChange';
 export const EVENT_MULTIQC_JOB_STATE_CHANGE_DETAIL_TYPE = 'FastqMultiqcJobStateChange';
+// S3 events (on the default event bus) that invalidate the shared s3 cache
+export const S3_CACHE_INVALIDATION_EVENT_DETAIL_TYPES = [
+  'Object Deleted',
+  'Object Storage Class Changed',
+  'Object Restore Completed',
+];
 
 // Step Function Constants
 export const STACK_PREFIX = 'fastq-manager';
@@ -67,6 +104,8 @@ export const FASTQ_MANAGER_CACHE_BUCKET: Record<StageName, string> = {
 };
 export const FASTQ_CACHE_PREFIX = 'cache/';
 export const FASTQ_MULTIQC_CACHE_PREFIX = 'multiqc-cache/';
+// Delta event payloads over the claim check threshold are written here
+export const EVENT_CLAIM_CHECK_PREFIX = 'event-claim-check/';
 
 export const NTSM_BUCKET: Record<StageName, string> = {
   BETA: `ntsm-fingerprints-${ACCOUNT_ID_ALIAS.BETA}-${REGION}`,
@@ -118,6 +157,12 @@ export const MAX_SOMALIER_READS = 180_000_000; // 180 million reads ~ 15x covera
 /* SSM Parameter Paths */
 export const SSM_PARAMETER_PATH_PREFIX = path.join(`/orcabus/services/${STACK_PREFIX}/`);
 
+// The event outbox table stream arn (imported tables do not carry their stream)
+export const SSM_PARAMETER_PATH_EVENT_OUTBOX_TABLE_STREAM_ARN = path.join(
+  SSM_PARAMETER_PATH_PREFIX,
+  'event-outbox-table-stream-arn'
+);
+
 // Somalier Reference paths
 export const SSM_PARAMETER_PATH_REFERENCE_PATH_PREFIX = path.join(
   SSM_PARAMETER_PATH_PREFIX,
@@ -148,3 +193,7 @@ export const EVENT_SCHEMAS_DIR = path.join(APP_ROOT, 'event-schemas');
 export const SCHEMA_REGISTRY_NAME = 'orcabus.events';
 export const SSM_SCHEMA_ROOT = path.join(SSM_PARAMETER_PATH_PREFIX, 'event-schemas');
 export const DEFAULT_PAYLOAD_VERSION = '2025.06.04';
+// Compact (delta) payloads, the id, version and changed fields only (fastq and fastq set events)
+export const DELTA_PAYLOAD_VERSION = '2026.10.17';
+// The payload version the api sends, the delta payload is opt-in
+export const API_EVENT_PAYLOAD_VERSION = DEFAULT_PAYLOAD_VERSION;
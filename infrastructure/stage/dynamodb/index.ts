@@ -11,11 +11,16 @@ import {
   FASTQ_JOB_GLOBAL_SECONDARY_INDEX_NAMES,
   FASTQ_SET_API_GLOBAL_SECONDARY_INDEX_NAMES,
   FASTQ_SET_API_GLOBAL_SECONDARY_INDEX_NON_KEY_ATTRIBUTE_NAMES,
+  FASTQ_SET_API_SUMMARY_GLOBAL_SECONDARY_INDEX_NAME,
+  FASTQ_SET_API_SUMMARY_GLOBAL_SECONDARY_INDEX_NON_KEY_ATTRIBUTE_NAMES,
+  FASTQ_SET_API_SUMMARY_GLOBAL_SECONDARY_INDEX_PARTITION_KEY,
   FASTQ_SET_JOB_GLOBAL_SECONDARY_INDEX_NAMES,
   MULTIQC_JOB_GLOBAL_SECONDARY_INDEX_NAMES,
+  S3_CACHE_GLOBAL_SECONDARY_INDEX_NAMES,
   TABLE_REMOVAL_POLICY,
 } from '../constants';
 import { Construct } from 'constructs';
+import { RemovalPolicy } from 'aws-cdk-lib';
 
 function getFastqApiSecondaryIndexes(
   props: BuildGlobalIndexesProps
@@ -90,6 +95,21 @@ function getFastqSetSecondaryIndexes(
     });
   }
 
+  // The library index, with the fastq set summary projected
+  secondaryIndexList.push({
+    indexName: `${FASTQ_SET_API_SUMMARY_GLOBAL_SECONDARY_INDEX_NAME}-index`,
+    partitionKey: {
+      name: FASTQ_SET_API_SUMMARY_GLOBAL_SECONDARY_INDEX_PARTITION_KEY,
+      type: AttributeType.STRING,
+    },
+    sortKey: {
+      name: props.sortKey,
+      type: AttributeType.STRING,
+    },
+    projectionType: ProjectionType.INCLUDE,
+    nonKeyAttributes: FASTQ_SET_API_SUMMARY_GLOBAL_SECONDARY_INDEX_NON_KEY_ATTRIBUTE_NAMES,
+  });
+
   return secondaryIndexList;
 }
 
@@ -249,3 +269,49 @@ export function buildFastqSetJobApiTable(scope: Construct, props: ApiTableProps)
     timeToLiveAttribute: 'ttl',
   });
 }
+
+export function buildS3CacheApiTable(scope: Construct, props: ApiTableProps) {
+  new dynamodb.TableV2(scope, props.tableName, {
+    tableName: props.tableName,
+    partitionKey: {
+      name: props.partitionKey,
+      type: dynamodb.AttributeType.STRING,
+    },
+    // The table is only a cache of the file manager, it can always be rebuilt
+    removalPolicy: RemovalPolicy.DESTROY,
+    pointInTimeRecoverySpecification: {
+      pointInTimeRecoveryEnabled: true,
+    },
+    globalSecondaryIndexes: S3_CACHE_GLOBAL_SECONDARY_INDEX_NAMES.map((indexName) => ({
+      indexName: `${indexName}-index`,
+      partitionKey: {
+        name: indexName,
+        type: AttributeType.STRING,
+      },
+      sortKey: {
+        name: props.partitionKey,
+        type: AttributeType.STRING,
+      },
+      projectionType: ProjectionType.KEYS_ONLY,
+    })),
+    timeToLiveAttribute: 'ttl',
+  });
+}
+
+export function buildEventOutboxApiTable(scope: Construct, props: ApiTableProps): dynamodb.TableV2 {
+  return new dynamodb.TableV2(scope, props.tableName, {
+    tableName: props.tableName,
+    partitionKey: {
+      name: props.partitionKey,
+      type: dynamodb.AttributeType.STRING,
+    },
+    removalPolicy: TABLE_REMOVAL_POLICY,
+    pointInTimeRecoverySpecification: {
+      pointInTimeRecoveryEnabled: true,
+    },
+    // New outbox items are relayed to the event bus from the table stream
+    dynamoStream: dynamodb.StreamViewType.NEW_IMAGE,
+    // Relayed items are deleted, the ttl only clears items the relay could never deliver
+    timeToLiveAttribute: 'ttl',
+  });
+}
@@ -0,0 +1,71 @@
+/**
+ * Event rules
+ */
+import * as events from 'aws-cdk-lib/aws-events';
+import * as eventsTargets from 'aws-cdk-lib/aws-events-targets';
+import { Construct } from 'constructs';
+import * as lambda from 'aws-cdk-lib/aws-lambda';
+import * as lambdaEventSources from 'aws-cdk-lib/aws-lambda-event-sources';
+import { EventOutboxRelayEventSourceProps, S3CacheInvalidationRuleProps } from './interfaces';
+import { S3_CACHE_INVALIDATION_EVENT_DETAIL_TYPES } from '../constants';
+
+export function buildS3CacheInvalidationRule(
+  scope: Construct,
+  props: S3CacheInvalidationRuleProps
+): events.Rule {
+  const invalidateS3CacheLambdaObj = props.lambdaObjects.find(
+    (lambdaObject) => lambdaObject.lambdaName === 'invalidateS3Cache'
+  )?.lambdaFunction;
+
+  if (invalidateS3CacheLambdaObj === undefined) {
+    throw new Error('Could not find the invalidateS3Cache lambda');
+  }
+
+  // S3 events are sent to the default event bus
+  // Only match the buckets that hold fastq files, rather than every object in the account
+  const rule = new events.Rule(scope, 'invalidateS3CacheRule', {
+    eventPattern: {
+      source: ['aws.s3'],
+      detailType: S3_CACHE_INVALIDATION_EVENT_DETAIL_TYPES,
+      detail: {
+        bucket: {
+          name: props.bucketNames,
+        },
+      },
+    },
+  });
+
+  rule.addTarget(new eventsTargets.LambdaFunction(invalidateS3CacheLambdaObj));
+
+  return rule;
+}
+
+export function buildEventOutboxRelayEventSource(
+  scope: Construct,
+  props: EventOutboxRelayEventSourceProps
+) {
+  const relayEventOutboxLambdaObj = props.lambdaObjects.find(
+    (lambdaObject) => lambdaObject.lambdaName === 'relayEventOutbox'
+  )?.lambdaFunction;
+
+  if (relayEventOutboxLambdaObj === undefined) {
+    throw new Error('Could not find the relayEventOutbox lambda');
+  }
+
+  // New outbox items are relayed in the order they were written,
+  // a failed batch is retried from the earliest failed item
+  relayEventOutboxLambdaObj.addEventSource(
+    new lambdaEventSources.DynamoEventSource(props.eventOutboxTable, {
+      startingPosition: lambda.StartingPosition.TRIM_HORIZON,
+      batchSize: 100,
+      bisectBatchOnError: true,
+      retryAttempts: 10,
+      reportBatchItemFailures: true,
+      filters: [
+        lambda.FilterCriteria.filter({
+          eventName: lambda.FilterRule.isEqual('INSERT'),
+        }),
+      ],
+    })
+  );
+}
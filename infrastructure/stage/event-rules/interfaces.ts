@@ -0,0 +1,13 @@
+import { LambdaResponse } from '../lambdas/interfaces';
+import { ITableV2 } from 'aws-cdk-lib/aws-dynamodb';
+
+export interface S3CacheInvalidationRuleProps {
+  lambdaObjects: LambdaResponse[];
+  // The buckets that hold fastq files, only events from these buckets invalidate the cache
+  bucketNames: string[];
+}
+
+export interface EventOutboxRelayEventSourceProps {
+  lambdaObjects: LambdaResponse[];
+  eventOutboxTable: ITableV2;
+}
@@ -3,12 +3,13 @@ import * as schemas from 'aws-cdk-lib/aws-eventschemas';
 import * as ssm from 'aws-cdk-lib/aws-ssm';
 import * as fs from 'fs';
 import * as path from 'path';
-import { SchemaNames, schemaNamesList } from './interfaces';
+import { deltaSchemaNamesList, SchemaNames, schemaNamesList } from './interfaces';
 import {
   EVENT_SCHEMAS_DIR,
   SCHEMA_REGISTRY_NAME,
   SSM_SCHEMA_ROOT,
   DEFAULT_PAYLOAD_VERSION,
+  DELTA_PAYLOAD_VERSION,
   STACK_PREFIX,
 } from '../constants';
 import { camelCaseToKebabCase } from '../utils';
@@ -31,7 +32,10 @@ export function buildSchema(
   const schemaContent = fs.readFileSync(schemaFilePath, 'utf-8');
   const registeredSchemaName = `${STACK_PREFIX}--${schemaName}--${payloadVersion}`;
 
-  new schemas.CfnSchema(scope, `Schema-${schemaName}`, {
+  // The default payload version keeps its original construct ids and ssm paths
+  const idSuffix = payloadVersion === DEFAULT_PAYLOAD_VERSION ? '' : `-${payloadVersion}`;
+
+  new schemas.CfnSchema(scope, `Schema-${schemaName}${idSuffix}`, {
     registryName: SCHEMA_REGISTRY_NAME,
     schemaName: registeredSchemaName,
     type: 'JSONSchemaDraft4',
@@ -39,19 +43,22 @@ export function buildSchema(
   });
 
   // SSM Parameters for schema discovery
-  const ssmBasePath = path.join(SSM_SCHEMA_ROOT, schemaName);
+  const ssmBasePath =
+    payloadVersion === DEFAULT_PAYLOAD_VERSION
+      ? path.join(SSM_SCHEMA_ROOT, schemaName)
+      : path.join(SSM_SCHEMA_ROOT, schemaName, payloadVersion);
 
-  new ssm.StringParameter(scope, `SsmSchemaRegistryName-${schemaName}`, {
+  new ssm.StringParameter(scope, `SsmSchemaRegistryName-${schemaName}${idSuffix}`, {
     parameterName: path.join(ssmBasePath, 'registry-name'),
     stringValue: SCHEMA_REGISTRY_NAME,
   });
 
-  new ssm.StringParameter(scope, `SsmSchemaName-${schemaName}`, {
+  new ssm.StringParameter(scope, `SsmSchemaName-${schemaName}${idSuffix}`, {
     parameterName: path.join(ssmBasePath, 'schema-name'),
     stringValue: registeredSchemaName,
   });
 
-  new ssm.StringParameter(scope, `SsmSchemaPayloadVersion-${schemaName}`, {
+  new ssm.StringParameter(scope, `SsmSchemaPayloadVersion-${schemaName}${idSuffix}`, {
     parameterName: path.join(ssmBasePath, 'payload-version'),
     stringValue: payloadVersion,
   });
@@ -61,4 +68,7 @@ export function buildSchemas(scope: Construct): void {
   for (const schemaName of schemaNamesList) {
     buildSchema(scope, schemaName, DEFAULT_PAYLOAD_VERSION);
   }
+  for (const schemaName of deltaSchemaNamesList) {
+    buildSchema(scope, schemaName, DELTA_PAYLOAD_VERSION);
+  }
 }
@@ -5,3 +5,6 @@ export const schemaNamesList: SchemaNames[] = [
   'fastqSetStateChange',
   'fastqMultiqcJobStateChange',
 ];
+
+// Schemas that also have a compact (delta) payload version
+export const deltaSchemaNamesList: SchemaNames[] = ['fastqStateChange', 'fastqSetStateChange'];
@@ -22,6 +22,8 @@ export interface StatefulApplicationStackConfig {
   fastqJobApiTableName: string;
   multiqcJobApiTableName: string;
   fastqSetJobApiTableName: string;
+  s3CacheApiTableName: string;
+  eventOutboxApiTableName: string;
 
   /* SSM */
   ssmParameters: SsmParameters;
@@ -49,6 +51,8 @@ export interface StatelessApplicationStackConfig {
   fastqJobApiTableName: string;
   multiqcJobApiTableName: string;
   fastqSetJobApiTableName: string;
+  s3CacheApiTableName: string;
+  eventOutboxApiTableName: string;
 
   /* API */
   apiGatewayCognitoProps: OrcaBusApiGatewayProps;
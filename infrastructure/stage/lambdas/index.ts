@@ -15,7 +15,8 @@ import * as path from 'path';
 import * as iam from 'aws-cdk-lib/aws-iam';
 import { Duration, Size } from 'aws-cdk-lib';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
-import { LAMBDA_DIR } from '../constants';
+import { LAMBDA_DIR, S3_CACHE_GLOBAL_SECONDARY_INDEX_NAMES } from '../constants';
+import * as cdk from 'aws-cdk-lib';
 import { NagSuppressions } from 'cdk-nag';
 import { DockerImageCode, DockerImageFunction } from 'aws-cdk-lib/aws-lambda';
 
@@ -54,6 +55,34 @@ function buildLambdaFunction(scope: Construct, props: LambdaProps): LambdaRespon
     lambdaObject.addEnvironment('JOB_TABLE_NAME', props.jobsTable.tableName);
   }
 
+  if (lambdaRequirements.needsS3CacheTableWritePermissions) {
+    props.s3CacheTable.grantReadWriteData(lambdaObject.currentVersion);
+    // Entries are found by their s3 uri
+    lambdaObject.currentVersion.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: ['dynamodb:Query'],
+        resources: S3_CACHE_GLOBAL_SECONDARY_INDEX_NAMES.map((indexName) => {
+          return `arn:aws:dynamodb:${cdk.Aws.REGION}:${cdk.Aws.ACCOUNT_ID}:table/${props.s3CacheTable.tableName}/index/${indexName}-index`;
+        }),
+      })
+    );
+    // Add the DYNAMODB_S3_CACHE_TABLE_NAME environment variable
+    lambdaObject.addEnvironment('DYNAMODB_S3_CACHE_TABLE_NAME', props.s3CacheTable.tableName);
+  }
+
+  if (lambdaRequirements.needsEventOutboxTableWritePermissions) {
+    props.eventOutboxTable.grantReadWriteData(lambdaObject.currentVersion);
+    // Add the DYNAMODB_EVENT_OUTBOX_TABLE_NAME environment variable
+    lambdaObject.addEnvironment(
+      'DYNAMODB_EVENT_OUTBOX_TABLE_NAME',
+      props.eventOutboxTable.tableName
+    );
+  }
+
+  if (lambdaRequirements.needsEventBusPutPermissions) {
+    props.eventBus.grantPutEventsTo(lambdaObject.currentVersion);
+  }
+
   if (lambdaRequirements.needsFastqCacheBucketAccess) {
     props.fastqCacheBucket.grantReadWrite(lambdaObject.currentVersion);
     // Add cdk nag stack suppressions
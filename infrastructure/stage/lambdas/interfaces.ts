@@ -5,6 +5,7 @@ import { PythonFunction } from '@aws-cdk/aws-lambda-python-alpha';
 import { DockerImageFunction } from 'aws-cdk-lib/aws-lambda';
 import { ITableV2 } from 'aws-cdk-lib/aws-dynamodb';
 import { IBucket } from 'aws-cdk-lib/aws-s3';
+import { IEventBus } from 'aws-cdk-lib/aws-events';
 
 export type LambdaNameList =
   // NTSM functions
@@ -29,7 +30,11 @@ export type LambdaNameList =
   | 'updateFastqSetObject'
   // Holmes functions
   | 'getCloudmapService'
-  | 'getServiceInstances';
+  | 'getServiceInstances'
+  // Cache functions
+  | 'invalidateS3Cache'
+  // Event outbox functions
+  | 'relayEventOutbox';
 
 export const lambdaNameList: LambdaNameList[] = [
   // NTSM functions
@@ -55,6 +60,10 @@ export const lambdaNameList: LambdaNameList[] = [
   // Holmes functions
   'getCloudmapService',
   'getServiceInstances',
+  // Cache functions
+  'invalidateS3Cache',
+  // Event outbox functions
+  'relayEventOutbox',
 ];
 
 export interface LambdaRequirementsProps {
@@ -67,6 +76,9 @@ export interface LambdaRequirementsProps {
   needsNtsmCacheBucketAccess?: boolean;
   needsLargeEphemeralStorage?: boolean;
   needsCloudMapAccess?: boolean;
+  needsS3CacheTableWritePermissions?: boolean;
+  needsEventOutboxTableWritePermissions?: boolean;
+  needsEventBusPutPermissions?: boolean;
 }
 
 // Map of Lambda names to their requirements
@@ -127,11 +139,23 @@ export const lambdaRequirementsMap: Record<LambdaNameList, LambdaRequirementsPro
   getServiceInstances: {
     needsCloudMapAccess: true,
   },
+  // Cache functions
+  invalidateS3Cache: {
+    needsS3CacheTableWritePermissions: true,
+  },
+  // Event outbox functions
+  relayEventOutbox: {
+    needsEventOutboxTableWritePermissions: true,
+    needsEventBusPutPermissions: true,
+  },
 };
 
 export interface LambdaProps {
   lambdaName: LambdaNameList;
   jobsTable: ITableV2;
+  s3CacheTable: ITableV2;
+  eventOutboxTable: ITableV2;
+  eventBus: IEventBus;
   sequaliBucket: IBucket;
   fastqCacheBucket: IBucket;
   fastqDecompressionBucket: IBucket;
@@ -6,7 +6,7 @@ import {
 import { Duration, RemovalPolicy } from 'aws-cdk-lib';
 import * as s3 from 'aws-cdk-lib/aws-s3';
 import { Construct } from 'constructs';
-import { FASTQ_CACHE_PREFIX } from '../constants';
+import { EVENT_CLAIM_CHECK_PREFIX, FASTQ_CACHE_PREFIX } from '../constants';
 import { Bucket } from 'aws-cdk-lib/aws-s3';
 
 function addTemporaryMetadataDataLifeCycleRuleToBucket(bucket: Bucket): void {
@@ -18,6 +18,15 @@ function addTemporaryMetadataDataLifeCycleRuleToBucket(bucket: Bucket): void {
   });
 }
 
+function addEventClaimCheckLifeCycleRuleToBucket(bucket: Bucket): void {
+  bucket.addLifecycleRule({
+    id: 'DeleteEventClaimChecksAfterFourteenDays',
+    enabled: true,
+    expiration: Duration.days(14), // Consumers may replay events, so keep the claim checks for a while
+    prefix: EVENT_CLAIM_CHECK_PREFIX,
+  });
+}
+
 export function addNtsmBucket(scope: Construct, props: AddNtsmBucketProps) {
   return new s3.Bucket(scope, props.bucketName, {
     bucketName: props.bucketName,
@@ -46,4 +55,5 @@ export function addFastqManagerCacheBucket(
     enforceSSL: true,
   });
   addTemporaryMetadataDataLifeCycleRuleToBucket(cacheBucket);
+  addEventClaimCheckLifeCycleRuleToBucket(cacheBucket);
 }
@@ -8,10 +8,14 @@ import {
   buildFastqMultiqcJobApiTable,
   buildFastqSetApiTable,
   buildFastqSetJobApiTable,
+  buildEventOutboxApiTable,
+  buildS3CacheApiTable,
 } from './dynamodb';
 import { NagSuppressions } from 'cdk-nag';
 import { buildSsmParameters } from './ssm';
 import { buildSchemas } from './event-schemas';
+import * as ssm from 'aws-cdk-lib/aws-ssm';
+import { SSM_PARAMETER_PATH_EVENT_OUTBOX_TABLE_STREAM_ARN } from './constants';
 
 export type StatefulApplicationStackProps = cdk.StackProps & StatefulApplicationStackConfig;
 
@@ -58,6 +62,20 @@ export class StatefulApplicationStack extends cdk.Stack {
       tableName: props.fastqSetJobApiTableName,
       partitionKey: 'id',
     });
+    buildS3CacheApiTable(this, {
+      tableName: props.s3CacheApiTableName,
+      partitionKey: 'id',
+    });
+    const eventOutboxTable = buildEventOutboxApiTable(this, {
+      tableName: props.eventOutboxApiTableName,
+      partitionKey: 'id',
+    });
+
+    // SSM Parameter (for the event outbox table stream, read by the relay in the stateless stack)
+    new ssm.StringParameter(this, 'event-outbox-table-stream-arn', {
+      parameterName: SSM_PARAMETER_PATH_EVENT_OUTBOX_TABLE_STREAM_ARN,
+      stringValue: eventOutboxTable.tableStreamArn!,
+    });
 
     // SSM Parameters (for sites paths)
     buildSsmParameters(this, { ...props.ssmParameters });
@@ -9,12 +9,18 @@ import { StatelessApplicationStackConfig } from './interfaces';
 import { buildAllLambdaFunctions } from './lambdas';
 import { buildFargateTasks } from './ecs';
 import { buildAllStepFunctions } from './step-functions';
+import { buildEventOutboxRelayEventSource, buildS3CacheInvalidationRule } from './event-rules';
 import {
   addHttpRoutes,
   buildApiGateway,
   buildApiIntegration,
   buildApiInterfaceLambda,
 } from './api';
+import {
+  BYOB_ICAV2_PREFIX,
+  S3_DECOMPRESSION_PREFIX,
+  SSM_PARAMETER_PATH_EVENT_OUTBOX_TABLE_STREAM_ARN,
+} from './constants';
 
 export type StatelessApplicationStackProps = cdk.StackProps & StatelessApplicationStackConfig;
 
@@ -108,9 +114,31 @@ export class StatelessApplicationStack extends cdk.Stack {
       props.fastqSetJobApiTableName
     );
 
+    const s3CacheTableObj = dynamodb.TableV2.fromTableName(
+      this,
+      props.s3CacheApiTableName,
+      props.s3CacheApiTableName
+    );
+
+    // The relay is triggered by the outbox table stream
+    const eventOutboxTableObj = dynamodb.TableV2.fromTableAttributes(
+      this,
+      props.eventOutboxApiTableName,
+      {
+        tableName: props.eventOutboxApiTableName,
+        tableStreamArn: ssm.StringParameter.valueForStringParameter(
+          this,
+          SSM_PARAMETER_PATH_EVENT_OUTBOX_TABLE_STREAM_ARN
+        ),
+      }
+    );
+
     // Part 1 - build the lambdas
     const lambdaObjList = buildAllLambdaFunctions(this, {
       jobsTable: fastqJobApiTableObj,
+      s3CacheTable: s3CacheTableObj,
+      eventOutboxTable: eventOutboxTableObj,
+      eventBus: eventBusObj,
       sequaliBucket: sequaliBucketObj,
       fastqCacheBucket: fastqManagerCacheBucketObj,
       ntsmBucket: ntsmBucketObj,
@@ -141,6 +169,18 @@ export class StatelessApplicationStack extends cdk.Stack {
       ssmParameters: props.ssmParameterPaths,
     });
 
+    // Part 3b - invalidate the shared s3 cache when objects move or change storage class
+    buildS3CacheInvalidationRule(this, {
+      lambdaObjects: lambdaObjList,
+      bucketNames: [props.pipelineCacheBucketName, props.fastqDecompressionBucketName],
+    });
+
+    // Part 3c - relay the event outbox to the event bus
+    buildEventOutboxRelayEventSource(this, {
+      lambdaObjects: lambdaObjList,
+      eventOutboxTable: eventOutboxTableObj,
+    });
+
     /*
     Part 4: API Gateway for the stateless application
     */
@@ -155,6 +195,13 @@ export class StatelessApplicationStack extends cdk.Stack {
       hostedZoneSsmParameter: hostedZoneSsmParameter,
       multiqcJobsTable: multiqcJobsTableObj,
       fastqSetJobsTable: fastqSetJobsTableObj,
+      s3CacheTable: s3CacheTableObj,
+      eventOutboxTable: eventOutboxTableObj,
+      presignLocations: [
+        { bucket: pipelineCacheBucketObj, prefix: BYOB_ICAV2_PREFIX },
+        { bucket: fastqDecompressionBucketObj, prefix: S3_DECOMPRESSION_PREFIX },
+      ],
+      eventClaimCheckBucket: fastqManagerCacheBucketObj,
     });
     const apiGateway = buildApiGateway(this, props.apiGatewayCognitoProps);
     const apiIntegration = buildApiIntegration({
@@ -17,8 +17,20 @@ describe('Event Schemas CDK Synthesis', () => {
   });
 
   describe('AWS::EventSchemas::Schema resources', () => {
-    test('stateful stack contains exactly 3 schema resources', () => {
-      template.resourceCountIs('AWS::EventSchemas::Schema', 3);
+    test('stateful stack contains exactly 5 schema resources', () => {
+      // Three default payload schemas, and two delta payload schemas
+      template.resourceCountIs('AWS::EventSchemas::Schema', 5);
+    });
+
+    test.each([
+      ['fastqStateChange', 'fastq-manager--fastqStateChange--2026.10.17'],
+      ['fastqSetStateChange', 'fastq-manager--fastqSetStateChange--2026.10.17'],
+    ])('delta schema %s is registered with correct naming pattern', (_schemaName, expectedSchemaName) => {
+      template.hasResourceProperties('AWS::EventSchemas::Schema', {
+        RegistryName: 'orcabus.events',
+        SchemaName: expectedSchemaName,
+        Type: 'JSONSchemaDraft4',
+      });
     });
 
     test.each([
@@ -68,5 +80,15 @@ describe('Event Schemas CDK Synthesis', () => {
         });
       }
     );
+
+    test.each([['fastqStateChange'], ['fastqSetStateChange']])(
+      'SSM parameter for %s delta payload-version exists with correct value',
+      (schemaName) => {
+        template.hasResourceProperties('AWS::SSM::Parameter', {
+          Name: `/orcabus/services/fastq-manager/event-schemas/${schemaName}/2026.10.17/payload-version`,
+          Value: '2026.10.17',
+        });
+      }
+    );
   });
 });
@@ -1,8 +1,16 @@
 import * as path from 'path';
 import * as fs from 'fs';
 import { App, Stack } from 'aws-cdk-lib';
-import { DEFAULT_PAYLOAD_VERSION, EVENT_SCHEMAS_DIR } from '../infrastructure/stage/constants';
-import { schemaNamesList, SchemaNames } from '../infrastructure/stage/event-schemas/interfaces';
+import {
+  DEFAULT_PAYLOAD_VERSION,
+  DELTA_PAYLOAD_VERSION,
+  EVENT_SCHEMAS_DIR,
+} from '../infrastructure/stage/constants';
+import {
+  deltaSchemaNamesList,
+  schemaNamesList,
+  SchemaNames,
+} from '../infrastructure/stage/event-schemas/interfaces';
 import { camelCaseToKebabCase } from '../infrastructure/stage/utils';
 import { buildSchema } from '../infrastructure/stage/event-schemas';
 
@@ -198,6 +206,46 @@ describe('Event Schema Structure Tests', () => {
     });
   });
 
+  describe('Delta payload schemas', () => {
+    const loadDeltaSchema = (schemaName: SchemaNames): Record<string, unknown> => {
+      const schemaFilePath = path.join(
+        EVENT_SCHEMAS_DIR,
+        camelCaseToKebabCase(schemaName),
+        DELTA_PAYLOAD_VERSION,
+        'schema.json'
+      );
+      return JSON.parse(fs.readFileSync(schemaFilePath, 'utf-8'));
+    };
+
+    test('DELTA_PAYLOAD_VERSION matches YYYY.MM.DD format and is newer than the default', () => {
+      expect(DELTA_PAYLOAD_VERSION).toMatch(/^\d{4}\.\d{2}\.\d{2}$/);
+      expect(DELTA_PAYLOAD_VERSION > DEFAULT_PAYLOAD_VERSION).toBe(true);
+    });
+
+    test.each(deltaSchemaNamesList)('%s delta schema requires id, status and version', (schemaName) => {
+      expect(loadDeltaSchema(schemaName)['required']).toEqual(['id', 'status', 'version']);
+    });
+
+    test.each(deltaSchemaNamesList)(
+      '%s delta schema has the same id pattern and status enum as the full schema',
+      (schemaName) => {
+        const deltaProperties = loadDeltaSchema(schemaName)['properties'] as Record<string, unknown>;
+        const fullProperties = schemas[schemaName]['properties'] as Record<string, unknown>;
+        expect(deltaProperties['id']).toEqual(fullProperties['id']);
+        expect(deltaProperties['status']).toEqual(fullProperties['status']);
+      }
+    );
+
+    test('fastqSetStateChange delta schema references the fastqs by id', () => {
+      const properties = loadDeltaSchema('fastqSetStateChange')['properties'] as Record<
+        string,
+        Record<string, Record<string, unknown>>
+      >;
+      expect(Object.keys(properties['changedFields']['properties'])).toContain('fastqSetIds');
+      expect(Object.keys(properties['changedFields']['properties'])).not.toContain('fastqSet');
+    });
+  });
+
   describe('buildSchema error handling', () => {
     test('throws when schema file is missing for non-existent version', () => {
       const app = new App();